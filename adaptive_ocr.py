@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解像度適応型OCRモジュール
+ページをまず低い解像度（150dpiなど）で画像化してOCRし、単語の信頼度や顧客名・金額の抽出結果が
+しきい値に届かない場合だけ高い解像度（300dpi以上）で描画し直す
+
+- 信頼度の低い行が一部だけの場合は、高解像度の画像からその行の領域だけを切り出してOCRし直す
+- 低い行が多い場合や、必要な項目（金額・顧客名）が取れない場合はページ全体をOCRし直す
+- 設定はテナントごとに上書きできる（ocr_tenant_policies）
+"""
+
+import re
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import ocr_pool
+from keyword_automaton import AMOUNT_PARTIAL, AMOUNT_TARGET, extraction_automaton
+from page_rasterizer import DEFAULT_MEMORY_BUDGET_MB, iter_page_images
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOW_DPI = 150
+DEFAULT_HIGH_DPI = 300
+DEFAULT_MIN_CONFIDENCE = 0.75  # 行の平均信頼度（0〜1）がこれ未満なら高解像度でOCRし直す
+DEFAULT_MAX_REGION_RATIO = 0.5  # 信頼度の低い行がこの割合を超えたらページ全体をOCRし直す
+DEFAULT_REQUIRED_FIELDS = ("amount", "customer")
+REGION_PADDING = 4  # 切り出す領域の余白（低解像度でのピクセル数）
+
+# 必須項目の有無の簡易判定に使うパターン（OCRで入った空白は除いてから照合する）
+_SPACES = re.compile(r'[ \t\u3000]+')
+_DIGIT = re.compile(r'[0-9０-９]')
+_AMOUNT_VALUE = re.compile(r'[¥￥][0-9０-９]|[0-9０-９]円|[0-9０-９]{1,3}(?:[,，][0-9０-９]{3})+')
+_CUSTOMER_MARKER = re.compile(r'様|御中|殿|お客様|顧客|お名前|氏名|宛名|宛先|請求先')
+
+
+def tenant_config(config: Optional[Dict[str, Any]], tenant: Any = None) -> Dict[str, Any]:
+    """
+    テナントごとの設定（ocr_tenant_policies[テナントID]）で上書きした設定を返す
+
+    Args:
+        config: 設定情報
+        tenant: テナントID（Noneの場合は上書きしない）
+
+    Returns:
+        Dict: 上書き後の設定（元の辞書は変更しない）
+    """
+    config = dict(config or {})
+    if tenant is not None:
+        overrides = (config.get('ocr_tenant_policies') or {}).get(str(tenant))
+        if overrides:
+            config.update(overrides)
+    return config
+
+
+def adaptive_policy(config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    設定から解像度適応型OCRのポリシーを取得する
+
+    Args:
+        config: 設定情報（ocr_adaptive_*）。テナントごとの上書きはtenant_configで適用しておく
+
+    Returns:
+        Dict: ポリシー（無効の場合はNone）
+    """
+    config = config or {}
+    if not config.get('ocr_adaptive_enabled', False):
+        return None
+    fields = config.get('ocr_adaptive_required_fields', DEFAULT_REQUIRED_FIELDS)
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    return {
+        'low_dpi': int(config.get('ocr_adaptive_low_dpi') or DEFAULT_LOW_DPI),
+        'high_dpi': int(config.get('ocr_adaptive_high_dpi') or DEFAULT_HIGH_DPI),
+        'min_confidence': float(config.get('ocr_adaptive_min_confidence', DEFAULT_MIN_CONFIDENCE)),
+        'max_region_ratio': float(config.get('ocr_adaptive_max_region_ratio', DEFAULT_MAX_REGION_RATIO)),
+        'required_fields': list(fields),
+        'memory_budget_mb': int(config.get('ocr_memory_budget_mb') or DEFAULT_MEMORY_BUDGET_MB),
+    }
+
+
+def data_to_lines(data: Dict[str, list]) -> List[Dict[str, Any]]:
+    """
+    image_to_dataの結果を行ごとにまとめる
+
+    Returns:
+        行の辞書のリスト（text, conf（0〜1、不明な場合はNone）, left, top, right, bottom, par）
+    """
+    lines = {}
+    for i, text in enumerate(data.get("text", [])):
+        if not text or not text.strip():
+            continue
+        key = (int(data["block_num"][i]), int(data["par_num"][i]), int(data["line_num"][i]))
+        left, top = int(data["left"][i]), int(data["top"][i])
+        right, bottom = left + int(data["width"][i]), top + int(data["height"][i])
+        conf = float(data["conf"][i]) if "conf" in data else -1.0
+        line = lines.get(key)
+        if line is None:
+            lines[key] = {"words": [text], "confs": [conf] if conf >= 0 else [], "par": key[:2],
+                          "left": left, "top": top, "right": right, "bottom": bottom}
+            continue
+        line["words"].append(text)
+        if conf >= 0:
+            line["confs"].append(conf)
+        line["left"] = min(line["left"], left)
+        line["top"] = min(line["top"], top)
+        line["right"] = max(line["right"], right)
+        line["bottom"] = max(line["bottom"], bottom)
+
+    result = []
+    for line in lines.values():
+        confs = line.pop("confs")
+        line["text"] = " ".join(line.pop("words"))
+        line["conf"] = sum(confs) / len(confs) / 100 if confs else None
+        result.append(line)
+    return result
+
+
+def lines_to_text(lines: List[Dict[str, Any]]) -> str:
+    """行をつなげ、段落の区切りに空行を入れたテキストにする"""
+    parts = []
+    previous = None
+    for line in lines:
+        if previous is not None and line["par"] != previous:
+            parts.append("")
+        parts.append(line["text"])
+        previous = line["par"]
+    return "\n".join(parts) + "\n" if parts else ""
+
+
+def page_confidence(lines: List[Dict[str, Any]]) -> Optional[float]:
+    """行の信頼度の平均（不明な場合はNone）"""
+    confs = [line["conf"] for line in lines if line["conf"] is not None]
+    return sum(confs) / len(confs) if confs else None
+
+
+def has_amount(text: str) -> bool:
+    """
+    金額らしい値を含むか（通貨記号・「円」・桁区切りの数字、金額キーワードのある行の数字、
+    「請求金額」などの完全なキーワードの場合は次の行の数字も見る）
+    """
+    if _AMOUNT_VALUE.search(text):
+        return True
+    automaton = extraction_automaton()
+    lines = text.splitlines()
+    for index, line in enumerate(lines):
+        hits = automaton.match(line)
+        if AMOUNT_TARGET in hits:
+            if _DIGIT.search("".join(lines[index:index + 2])):
+                return True
+        elif AMOUNT_PARTIAL in hits and _DIGIT.search(line):
+            return True
+    return False
+
+
+def has_customer(text: str) -> bool:
+    """宛名の目印（「様」「御中」や宛先のキーワード）を含むか"""
+    return _CUSTOMER_MARKER.search(text) is not None
+
+
+def missing_fields(text: str, required_fields: List[str]) -> List[str]:
+    """
+    テキストから取れそうにない必須項目（amount / customer）を返す
+
+    高解像度でOCRし直すかどうかの判定に使うため、金額・顧客名の抽出は行わず、
+    目印となるキーワードや値の形があるかだけを調べる（抽出はこの後のパイプラインで1回だけ行う）
+    """
+    text = _SPACES.sub('', text)
+    missing = []
+    if "amount" in required_fields and not has_amount(text):
+        missing.append("amount")
+    if "customer" in required_fields and not has_customer(text):
+        missing.append("customer")
+    return missing
+
+
+def _render_page(pdf_path: str, page_number: int, dpi: int, memory_budget_mb: int):
+    for _, image in iter_page_images(pdf_path, dpi=dpi, memory_budget_mb=memory_budget_mb,
+                                     page_numbers=[page_number]):
+        # iter_page_imagesは次のページに進む時点で画像を閉じるため、複製して返す
+        return image.copy()
+    return None
+
+
+def _reocr_regions(image, low_lines: List[Dict[str, Any]], scale: float, lang: str) -> None:
+    """高解像度の画像から信頼度の低い行の領域だけを切り出してOCRし、行のテキストを置き換える"""
+    width, height = image.size
+    for line in low_lines:
+        box = (
+            max(0, int((line["left"] - REGION_PADDING) * scale)),
+            max(0, int((line["top"] - REGION_PADDING) * scale)),
+            min(width, int((line["right"] + REGION_PADDING) * scale)),
+            min(height, int((line["bottom"] + REGION_PADDING) * scale)),
+        )
+        region = image.crop(box)
+        try:
+            text = " ".join(ocr_pool.image_to_string(region, lang=lang).split())
+        finally:
+            region.close()
+        if text:
+            line["text"] = text
+
+
+def ocr_page_adaptive(pdf_path: str, page_number: int, policy: Dict[str, Any], lang: str = 'jpn+eng',
+                      field_check: Callable[[str, List[str]], List[str]] = missing_fields) -> Tuple[str, Dict[str, Any]]:
+    """
+    1ページを低解像度でOCRし、必要な場合だけ高解像度でOCRし直す
+
+    Args:
+        pdf_path: PDFファイルのパス
+        page_number: ページ番号（1始まり）
+        policy: adaptive_policyの結果
+        lang: 言語設定
+        field_check: 取れなかった必須項目を返す関数
+
+    Returns:
+        Tuple[str, Dict]: (テキスト, 処理内容（dpi, escalation, confidence, regions）)
+    """
+    budget = policy['memory_budget_mb']
+    image = _render_page(pdf_path, page_number, policy['low_dpi'], budget)
+    if image is None:
+        return "", {'dpi': policy['low_dpi'], 'escalation': 'none', 'confidence': None, 'regions': 0}
+    try:
+        lines = data_to_lines(ocr_pool.image_to_data(image, lang=lang))
+    finally:
+        image.close()
+
+    text = lines_to_text(lines)
+    confidence = page_confidence(lines)
+    low_lines = [line for line in lines if line["conf"] is not None and line["conf"] < policy['min_confidence']]
+    missing = field_check(text, policy['required_fields']) if policy['required_fields'] else []
+    info = {'dpi': policy['low_dpi'], 'escalation': 'none', 'confidence': confidence, 'regions': 0}
+
+    if not lines or missing or len(low_lines) > len(lines) * policy['max_region_ratio']:
+        # ページ全体を高解像度でOCRし直す
+        reason = f"項目不足: {', '.join(missing)}" if missing else f"信頼度: {confidence}"
+        logger.info(f"ページ{page_number}を{policy['high_dpi']}dpiでOCRし直します（{reason}）")
+        image = _render_page(pdf_path, page_number, policy['high_dpi'], budget)
+        if image is not None:
+            try:
+                high_text = ocr_pool.image_to_string(image, lang=lang)
+            finally:
+                image.close()
+            if high_text.strip() or not text.strip():
+                text = high_text
+            info.update(dpi=policy['high_dpi'], escalation='page')
+    elif low_lines:
+        # 信頼度の低い行の領域だけを高解像度でOCRし直す
+        logger.info(f"ページ{page_number}の{len(low_lines)}行を{policy['high_dpi']}dpiでOCRし直します")
+        image = _render_page(pdf_path, page_number, policy['high_dpi'], budget)
+        if image is not None:
+            try:
+                _reocr_regions(image, low_lines, policy['high_dpi'] / policy['low_dpi'], lang)
+            finally:
+                image.close()
+            text = lines_to_text(lines)
+            info.update(dpi=policy['high_dpi'], escalation='regions', regions=len(low_lines))
+
+    return text, info
@@ -9,6 +9,7 @@ import requests
 import logging
 from typing import Dict, List, Optional, Tuple, Any
 from extractors import ExtractionResult
+from ocr_clients import annotate_in_batches, client_settings, get_azure_client, get_vision_client
 from PIL import Image
 import pdfplumber
 import numpy as np
@@ -36,6 +37,7 @@ except ImportError:
 # Tesseractを使用する場合（ローカル実行、APIキー不要）
 try:
     import pytesseract
+    import ocr_pool
     # Tesseractが実際にインストールされているか確認
     pytesseract.get_tesseract_version()
     TESSERACT_AVAILABLE = True
@@ -58,29 +60,13 @@ class AIOCR:
         self.ocr_method = self.config.get('ocr_method', 'tesseract')
         self.api_key = self.config.get('ocr_api_key', '')
         self.endpoint = self.config.get('ocr_endpoint', '')
+        self.vision_endpoint = self.config.get('google_vision_endpoint', '')
         
-        # OCRエンジンの初期化
-        if self.ocr_method == 'google_vision' and GOOGLE_VISION_AVAILABLE:
+        # OCRエンジンの初期化（クライアントは認証情報ごとにプロセス内で使い回す）
+        if self.ocr_method == 'google_vision' and self._vision_available():
             try:
-                if self.api_key:
-                    # APIキーから認証情報を作成（JSONキーの内容をAPIキーとして使用）
-                    try:
-                        # APIキーがJSON形式の場合
-                        import json
-                        credentials_info = json.loads(self.api_key)
-                        credentials = service_account.Credentials.from_service_account_info(credentials_info)
-                        self.client = vision.ImageAnnotatorClient(credentials=credentials)
-                        logger.info("Google Cloud Vision API: JSONキーから認証情報を作成しました")
-                    except json.JSONDecodeError:
-                        # APIキーがJSONでない場合、環境変数を使用
-                        import os
-                        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = self.api_key
-                        self.client = vision.ImageAnnotatorClient()
-                        logger.info("Google Cloud Vision API: 環境変数から認証情報を作成しました")
-                else:
-                    # APIキーがない場合、デフォルトの認証情報を使用
-                    self.client = vision.ImageAnnotatorClient()
-                    logger.info("Google Cloud Vision API: デフォルトの認証情報を使用します")
+                # Vision用のエンドポイントを指定した場合はAPIキーでREST APIを直接呼び出す
+                self.client = get_vision_client(self.api_key, self.vision_endpoint)
             except Exception as e:
                 logger.error(f"Google Cloud Vision APIの初期化エラー: {str(e)}")
                 self.ocr_method = 'tesseract'
@@ -97,14 +83,14 @@ class AIOCR:
                     self.endpoint = "https://api.cognitive.microsofttranslator.com/"
                     logger.warning(f"Azure Form Recognizerのエンドポイントが指定されていないため、デフォルト値を使用します: {self.endpoint}")
                     
-                self.client = DocumentAnalysisClient(
-                    endpoint=self.endpoint, 
-                    credential=AzureKeyCredential(self.api_key)
-                )
-                logger.info("Azure Form Recognizer: クライアントを初期化しました")
+                self.client = get_azure_client(self.api_key, self.endpoint)
             except Exception as e:
                 logger.error(f"Azure Form Recognizerの初期化エラー: {str(e)}")
                 self.ocr_method = 'tesseract'
+    
+    def _vision_available(self) -> bool:
+        # REST APIを直接呼び出す場合はgoogle-cloud-visionがなくても使える
+        return GOOGLE_VISION_AVAILABLE or bool(self.vision_endpoint)
                 
     def extract_from_pdf(self, pdf_path: str) -> ExtractionResult:
         """
@@ -115,7 +101,7 @@ class AIOCR:
             (顧客名, 金額)のタプル
         """
         # OCR方式に応じて処理
-        if self.ocr_method == 'google_vision' and GOOGLE_VISION_AVAILABLE:
+        if self.ocr_method == 'google_vision' and self._vision_available():
             return self._extract_with_google_vision(pdf_path)
         elif self.ocr_method == 'azure_form_recognizer' and AZURE_FORM_RECOGNIZER_AVAILABLE:
             return self._extract_with_azure_form_recognizer(pdf_path)
@@ -128,53 +114,40 @@ class AIOCR:
     def _extract_with_google_vision(self, pdf_path: str) -> ExtractionResult:
         """
         Google Cloud Vision APIを使用して抽出
+        ページごとにリクエストせず、複数ページをまとめたバッチリクエストを同時実行数を制限して送信する
         """
         try:
-            from pdf2image import convert_from_path
+            from page_rasterizer import iter_page_images
             
             logger.info(f"Google Cloud Vision APIでPDFを処理: {pdf_path}")
             
-            # PDFを画像に変換
-            images = convert_from_path(pdf_path, dpi=300, first_page=1, last_page=1)
-            
-            if not images:
-                logger.warning("PDFから画像への変換に失敗しました")
-                return ExtractionResult(customer=None, amount=None)
-            
-            # 最初のページを処理
-            img = images[0]
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='PNG')
-            content = img_byte_arr.getvalue()
-            
-            # Vision APIでOCR実行
-            image = vision.Image(content=content)
+            def page_contents():
+                # PDFをメモリ上限に収まるページ数ずつ画像化し、PNGに変換した時点で画像は解放する
+                for page_number, img in iter_page_images(pdf_path, dpi=300):
+                    img_byte_arr = io.BytesIO()
+                    img.save(img_byte_arr, format='PNG')
+                    yield img_byte_arr.getvalue()
             
             try:
-                response = self.client.document_text_detection(image=image)
-                
-                if hasattr(response, 'error') and response.error and response.error.message:
-                    logger.error(f"Google Vision APIエラー: {response.error.message}")
-                    return ExtractionResult(customer=None, amount=None)
-                
-                # 全テキスト
-                if hasattr(response, 'full_text_annotation') and response.full_text_annotation:
-                    full_text = response.full_text_annotation.text
-                    logger.info(f"Google Cloud Vision APIでテキスト抽出成功: {len(full_text)}文字")
-                    
-                    # 請求書解析AI処理
-                    amount = self._extract_amount_with_ai(full_text)
-                    customer = self._extract_customer_with_ai(full_text)
-                    
-                    logger.info(f"抽出結果: 顧客名={customer}, 金額={amount}")
-                    return ExtractionResult(customer=customer, amount=amount)
-                else:
-                    logger.warning("Google Cloud Vision APIからテキストを取得できませんでした")
-                    return ExtractionResult(customer=None, amount=None)
-                    
+                page_texts = list(annotate_in_batches(self.client, page_contents(), config=self.config,
+                                                      **client_settings(self.config)))
             except Exception as e:
                 logger.error(f"Google Cloud Vision API呼び出しエラー: {str(e)}")
                 return ExtractionResult(customer=None, amount=None)
+            
+            full_text = "\n".join(text for text in page_texts if text)
+            if not full_text.strip():
+                logger.warning("Google Cloud Vision APIからテキストを取得できませんでした")
+                return ExtractionResult(customer=None, amount=None)
+            
+            logger.info(f"Google Cloud Vision APIでテキスト抽出成功: {len(page_texts)}ページ, {len(full_text)}文字")
+            
+            # 請求書解析AI処理
+            amount = self._extract_amount_with_ai(full_text)
+            customer = self._extract_customer_with_ai(full_text)
+            
+            logger.info(f"抽出結果: 顧客名={customer}, 金額={amount}")
+            return ExtractionResult(customer=customer, amount=amount)
                 
         except Exception as e:
             logger.error(f"Google Cloud Vision API処理エラー: {str(e)}")
@@ -191,14 +164,10 @@ class AIOCR:
                 logger.error("Azure Form RecognizerのAPIキーまたはエンドポイントが設定されていません")
                 return ExtractionResult(customer=None, amount=None)
             
-            # クライアントが初期化されていない場合は再初期化
+            # クライアントが初期化されていない場合は共有のクライアントを取得
             if not hasattr(self, 'client') or self.client is None:
                 try:
-                    self.client = DocumentAnalysisClient(
-                        endpoint=self.endpoint, 
-                        credential=AzureKeyCredential(self.api_key)
-                    )
-                    logger.info("Azure Form Recognizerクライアントを初期化しました")
+                    self.client = get_azure_client(self.api_key, self.endpoint)
                 except Exception as e:
                     logger.error(f"Azure Form Recognizerクライアントの初期化エラー: {str(e)}")
                     return ExtractionResult(customer=None, amount=None)
@@ -268,7 +237,7 @@ class AIOCR:
         img = images[0]
         
         # Tesseractで日本語OCR実行
-        text = pytesseract.image_to_string(img, lang='jpn')
+        text = ocr_pool.image_to_string(img, lang='jpn')
         
         # 請求書解析AI処理
         amount = self._extract_amount_with_ai(text)
@@ -294,51 +263,12 @@ class AIOCR:
     def _extract_amount_with_ai(self, text: str) -> Optional[int]:
         """
         AIを使用して金額を抽出
+        文字間に空白の入った「ご 請 求 額」なども含め、請求額・合計のキーワードに続く金額を探す
+        （extraction_engineのspaced_keywordルール）
         """
-        # 「ご請求額」パターンを優先的に検索
-        amount_patterns = [
-            r'ご\s*請\s*求\s*額[^\n]*?([0-9,.]+)(?:\s*円|\s*$)',
-            r'ご\s*請\s*求\s*額[^\n]*?[¥\u00a5]\s*([0-9,.]+)',
-            r'請\s*求\s*額[^\n]*?([0-9,.]+)(?:\s*円|\s*$)',
-            r'合\s*計\s*金\s*額[^\n]*?([0-9,.]+)(?:\s*円|\s*$)',
-            r'\b合\s*計\b[^\n]*?([0-9,.]+)(?:\s*円|\s*$)',
-            r'([0-9,.]+)\s*円'
-        ]
-        
-        # 配列にパターンマッチ結果を保存（優先度、金額、コンテキスト）
-        found_amounts = []
-        
-        # テキスト全体を探索
-        for priority, pattern in enumerate(amount_patterns):
-            matches = re.finditer(pattern, text, re.MULTILINE)
-            for match in matches:
-                try:
-                    # カンマや空白を除去して整数変換
-                    amount_str = match.group(1).replace(',', '').replace(' ', '').replace('¥', '')
-                    amt = int(amount_str)
-                    if 100 <= amt < 10000000:  # 妥当な金額範囲のみ取得
-                        context = text[max(0, match.start() - 40):min(len(text), match.end() + 40)]
-                        # 優先度を計算
-                        weight = len(amount_patterns) - priority
-                        
-                        # 「ご請求額」が含まれる場合は優先度を大幅に上げる
-                        if 'ご請求額' in context:
-                            weight += 10
-                        elif '請求額' in context:
-                            weight += 5
-                        elif '合計' in context:
-                            weight += 3
-                            
-                        found_amounts.append((weight, amt, context))
-                except ValueError:
-                    continue
-        
-        if found_amounts:
-            # 優先度でソート（降順）
-            found_amounts.sort(key=lambda x: (-x[0], -x[1]))
-            return found_amounts[0][1]
-        
-        return None
+        from extraction_engine import AMOUNT, SPACED_KEYWORD, best_candidate
+        candidate = best_candidate(text, AMOUNT, rules=(SPACED_KEYWORD,))
+        return candidate.value if candidate else None
     
     def _extract_customer_with_ai(self, text: str) -> Optional[str]:
         """
@@ -419,6 +349,14 @@ def process_pdf_with_ai_ocr(pdf_path: str, config: Dict = None) -> ExtractionRes
     """
     logger.info(f"PDF処理開始: {pdf_path}")
     
+    # 設定が渡されない場合はアプリケーションの設定（ocr_method / ocr_api_key / ocr_endpoint / google_vision_endpoint）を使う
+    if config is None:
+        try:
+            from config_manager import get_config
+            config = get_config()
+        except Exception:
+            config = {}
+    
     # 抽出結果を格納する変数
     amount = None
     customer = None
@@ -477,10 +415,10 @@ def process_pdf_with_ai_ocr(pdf_path: str, config: Dict = None) -> ExtractionRes
     try:
         logger.info("pdf2image + pytesseractでの抽出を試行中...")
         if TESSERACT_AVAILABLE:
-            from pdf2image import convert_from_path
-            images = convert_from_path(pdf_path)
-            for i, image in enumerate(images):
-                page_text = pytesseract.image_to_string(image, lang='jpn')
+            from page_rasterizer import iter_page_images
+            # メモリ上限に収まるページ数ずつ画像化し、OCR後すぐに解放する
+            for page_number, image in iter_page_images(pdf_path):
+                page_text = ocr_pool.image_to_string(image, lang='jpn')
                 tesseract_text += page_text or ""
             
             if tesseract_text.strip():
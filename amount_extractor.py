@@ -1,12 +1,153 @@
 import re
 import math
 import logging
-from typing import List, Dict, Tuple, Optional, Any
-from text_normalizer import normalize_text, extract_readable_content
+from typing import List, Dict, NamedTuple, Tuple, Optional, Any, Sequence, Union
+from text_normalizer import NormalizedDocument, as_document, normalize_text, extract_readable_content
+from keyword_automaton import AMOUNT_EXCLUDE, AMOUNT_PARTIAL, AMOUNT_TARGET, ID_MARKER, extraction_automaton
+from extraction_engine import AMOUNT, INVOICE_LINES, best_candidate
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
 
+# 重要キーワード - 完全一致
+TARGET_KEYWORDS = (
+    "ご請求金額", "請求金額", "合計請求額", "ご請求額", "総請求額",
+    "合計金額", "お支払金額", "お支払い金額", "お支払額"
+)
+
+# 除外キーワード
+EXCLUDE_KEYWORDS = (
+    "小計", "消費税", "税額", "明細", "単価", "数量",
+    "振込手数料", "前回繰越", "中間金額", "郵便番号", "受給者番号",
+    "〒", "電話番号", "TEL", "FAX", "年月日"
+)
+
+# 部分一致キーワード
+PARTIAL_KEYWORDS = ("請求", "合計", "支払", "金額", "総額")
+
+# この語の後ろに数字や区切りが続く行は電話番号・各種番号として除外する（〒は除外キーワードに含まれる）
+ID_MARKERS = ("電話", "番号")
+
+# 全角数字・記号を半角に変換する変換表
+ZEN_HAN_TABLE = str.maketrans({
+    '０': '0', '１': '1', '２': '2', '３': '3', '４': '4',
+    '５': '5', '６': '6', '７': '7', '８': '8', '９': '9',
+    '　': ' ', '，': ',', '．': '.', '￥': '¥'
+})
+
+MIN_AMOUNT = 100  # 候補とする金額の範囲（100円から1000万円まで）
+MIN_FALLBACK_AMOUNT = 1000  # ページ下部のフォールバックで候補とする最小金額
+MAX_AMOUNT = 10000000
+BOTTOM_FRACTION = 0.8  # ページ下部とする位置（ページの高さに対する割合。行の位置が分からない場合は行数の割合）
+
+
+# 数値（全角の数字・カンマを含む）
+# 全角のまま一致させるため、行全体を正規化（normalize_text）する必要はない
+_NUMBER_RE = re.compile(r"[0-9０-９,，]+")
+# 番号の目印の後ろに続く数字・区切り
+_ID_TAIL_RE = re.compile(r"[0-9０-９\-−－]")
+NUMBER_SEPARATORS_TABLE = str.maketrans('', '', ',，')
+
+# filter_candidatesで使う郵便番号・受給者番号・電話番号・日付のパターン
+POSTAL_CODE_RE = re.compile(r'〒\s*([0-9]{3}[-－]?[0-9]{4})')
+RECIPIENT_NUMBER_RE = re.compile(r'[（(]([0-9]{7,10})[）)]')
+PHONE_NUMBER_RE = re.compile(r'(?:TEL|電話)[：:]?\s*([0-9\-]{10,13})')
+DATE_RE = re.compile(r'[0-9]{4}[年/\-][0-9]{1,2}[月/\-][0-9]{1,2}日?')
+DATE_SEPARATORS_TABLE = str.maketrans('', '', '年月日/-')
+
+
+class LineTokens(NamedTuple):
+    """1行分の走査結果"""
+    line: str  # 元の行
+    amounts: Tuple[int, ...]  # 行中の数値（出現順、カンマのみの場合は0）
+    has_yen: bool
+    kw_exact: bool
+    kw_loose: bool
+    excluded: bool  # 除外キーワード、または電話番号・郵便番号・各種番号を含む
+
+
+def scan_line(line: str) -> Optional[LineTokens]:
+    """
+    行を1回だけ走査し、金額候補の判定に必要なトークンをまとめる
+    キーワードは顧客名抽出と共通のオートマトン（keyword_automaton）で全グループをまとめて照合する
+
+    Returns:
+        LineTokens（数値を含まない行はNone）
+    """
+    numbers = _NUMBER_RE.findall(line)
+    if not numbers:
+        return None
+    # int()は全角数字もそのまま変換できる
+    amounts = []
+    for number in numbers:
+        digits = number.translate(NUMBER_SEPARATORS_TABLE)
+        amounts.append(int(digits) if digits else 0)
+
+    hits = extraction_automaton().match(line)
+    kw_exact = AMOUNT_TARGET in hits
+    excluded = AMOUNT_EXCLUDE in hits
+    if not excluded and ID_MARKER in hits:
+        # 電話・番号の後ろに数字や区切りが続く場合は電話番号・各種番号として除外
+        marker_end = min(end for _, _, end in hits[ID_MARKER])
+        excluded = _ID_TAIL_RE.search(line, marker_end) is not None
+    return LineTokens(
+        line=line,
+        amounts=tuple(amounts),
+        has_yen='¥' in line or '￥' in line or '円' in line,
+        kw_exact=kw_exact,
+        kw_loose=kw_exact or AMOUNT_PARTIAL in hits,
+        excluded=excluded,
+    )
+
+
+class AmountCandidate:
+    """
+    金額候補（collect_candidates_from_tokensの結果）
+    行の文字列はコピーせず走査済みの行（LineTokens）を参照し、ページ上の位置は行番号（index）で持つ
+    既存の呼び出し元のため、辞書と同じ candidate["amount"] などの読み書きもできる
+    """
+
+    __slots__ = ('amount', 'kw_exact', 'kw_loose', 'page_last', 'bottom', 'has_yen', 'index', 'score', 'tokens')
+
+    def __init__(self, amount: int, kw_exact: int, kw_loose: int, page_last: int, bottom: int, has_yen: int,
+                 index: int, tokens: LineTokens):
+        self.amount = amount
+        self.kw_exact = kw_exact
+        self.kw_loose = kw_loose
+        self.page_last = page_last
+        self.bottom = bottom
+        self.has_yen = has_yen
+        self.index = index  # ページ内の行番号
+        self.score = None  # score_candidateの結果（スコア付けした後に設定する）
+        self.tokens = tokens
+
+    @property
+    def largest(self) -> int:
+        return self.amount
+
+    @property
+    def line(self) -> str:
+        """候補の行（ログや結果の表示に使う時だけ参照する）"""
+        return self.tokens.line
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        setattr(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __repr__(self) -> str:
+        return (f"AmountCandidate(amount={self.amount}, index={self.index}, score={self.score}, "
+                f"kw_exact={self.kw_exact}, kw_loose={self.kw_loose}, page_last={self.page_last}, "
+                f"bottom={self.bottom}, has_yen={self.has_yen})")
+
+
 class AmountExtractor:
     """
     高精度な請求金額抽出のためのクラス
@@ -15,33 +156,18 @@ class AmountExtractor:
     
     def __init__(self):
         # 重要キーワード - 完全一致
-        self.target_keywords = [
-            "ご請求金額", "請求金額", "合計請求額", "ご請求額", "総請求額",
-            "合計金額", "お支払金額", "お支払い金額", "お支払額"
-        ]
+        self.target_keywords = list(TARGET_KEYWORDS)
         
         # 除外キーワード
-        self.exclude_keywords = [
-            "小計", "消費税", "税額", "明細", "単価", "数量", 
-            "振込手数料", "前回繰越", "中間金額", "郵便番号", "受給者番号",
-            "〒", "電話番号", "TEL", "FAX", "年月日"
-        ]
+        self.exclude_keywords = list(EXCLUDE_KEYWORDS)
         
         # 部分一致キーワード
-        self.partial_keywords = ["請求", "合計", "支払", "金額", "総額"]
+        self.partial_keywords = list(PARTIAL_KEYWORDS)
     
     def normalize_text(self, text: str) -> str:
         """テキストの正規化（全角→半角、空白除去など）"""
         # 全角数字・記号を半角に変換
-        zen_han_map = {
-            '０': '0', '１': '1', '２': '2', '３': '3', '４': '4',
-            '５': '5', '６': '6', '７': '7', '８': '8', '９': '9',
-            '　': ' ', '，': ',', '．': '.', '￥': '¥', '円': '円'
-        }
-        for zen, han in zen_han_map.items():
-            text = text.replace(zen, han)
-            
-        return text
+        return text.translate(ZEN_HAN_TABLE)
     
     def yen_to_int(self, s: str) -> int:
         """金額表記を整数値に変換（例: "123,456" → 123456）"""
@@ -52,105 +178,103 @@ class AmountExtractor:
         except ValueError:
             return 0
     
-    def collect_candidates(self, text: str, page_idx: int = 0, n_pages: int = 1) -> List[Dict[str, Any]]:
+    def scan_lines(self, lines: List[str]) -> List[Optional[LineTokens]]:
+        """各行を1回ずつ走査したトークン列（本処理とフォールバックで共用する）"""
+        return [scan_line(line) for line in lines]
+    
+    def collect_candidates(self, text: Union[str, NormalizedDocument], page_idx: int = 0,
+                           n_pages: int = 1) -> List[AmountCandidate]:
         """金額候補行を収集する"""
-        # 郵便番号や受給者番号のパターン
-        postal_code_pattern = r'〒\s*[0-9]{3}[-－]?[0-9]{4}'
-        recipient_number_pattern = r'[（(][0-9]{7,10}[）)]'
-        phone_number_pattern = r'(?:TEL|電話)[：:]?\s*[0-9\-\(\)（）]{10,13}'
+        return self.collect_candidates_from_tokens(self.scan_lines(as_document(text).lines), page_idx, n_pages)
+    
+    def collect_candidates_from_tokens(self, tokens: List[Optional[LineTokens]], page_idx: int = 0,
+                                       n_pages: int = 1, positions: Optional[Sequence[float]] = None) -> List[AmountCandidate]:
+        """
+        走査済みの行（scan_lines）から金額候補を収集する
+        positionsには各行のページ上の縦位置（page_layout.PageLayout.line_positions）を指定できる
+        """
         candidates = []
-        lines = text.split('\n')
         
-        # ページ下部20%の行を特定するため、全体行数の80%以降の行にフラグを設定
-        bottom_threshold = int(len(lines) * 0.8)
+        # ページ下部20%の行を特定するため、行の縦位置が分かる場合はその位置で、
+        # 分からない場合は全体行数の80%以降の行にフラグを設定
+        bottom_threshold = int(len(tokens) * BOTTOM_FRACTION)
+        is_last_page = page_idx == n_pages - 1
         
         # 行ごとに処理
-        for i, line in enumerate(lines):
-            normalized_line = self.normalize_text(line)
-            
-            # 金額候補を含む行を検出
-            amount_matches = re.findall(r"[0-9,]+", normalized_line)
-            if not amount_matches:
-                continue
-                
-            # ① キーワード含有チェック
-            is_target_line = any(k in normalized_line for k in self.target_keywords)
-            has_exclude = any(e in normalized_line for e in self.exclude_keywords)
-            
-            # 電話番号、郵便番号、受給者番号を除外
-            phone_match = re.search(r"電話.*?([0-9０-９\-−－]+)", normalized_line)
-            postal_match = re.search(r"〒.*?([0-9０-９\-−－]+)", normalized_line)
-            id_match = re.search(r"番号.*?([0-9０-９\-−－]+)", normalized_line)
-            
-            if has_exclude or phone_match or postal_match or id_match:
+        for i, token in enumerate(tokens):
+            # 金額候補を含まない行、除外キーワード・電話番号・郵便番号・受給者番号を含む行は除外
+            if token is None or token.excluded:
                 continue
             
             # 有効な金額候補を抽出
-            valid_amounts = []
-            for amt_str in amount_matches:
-                amt = self.yen_to_int(amt_str)
-                if amt >= 100 and amt <= 10000000:  # 100円から1000万円までの範囲
-                    valid_amounts.append(amt)
-            
+            valid_amounts = [amt for amt in token.amounts if MIN_AMOUNT <= amt <= MAX_AMOUNT]
             if not valid_amounts:
                 continue
                 
             # 最大の金額を使用
             amount = max(valid_amounts)
             
-            # タグ付け
-            is_bottom = i >= bottom_threshold
-            is_last_page = page_idx == n_pages - 1
-            has_yen = '¥' in normalized_line or '￥' in normalized_line or '円' in normalized_line
-            
             # 重要なコンテキストに基づいて特徴量を計算
-            features = {
-                "kw_exact": 1 if is_target_line else 0,
-                "kw_loose": 1 if any(k in normalized_line for k in self.partial_keywords) else 0,
-                "largest": amount,
-                "page_last": 1 if is_last_page else 0,
-                "bottom": 1 if is_bottom else 0,
-                "has_yen": 1 if has_yen else 0,
-                "line": line,
-                "amount": amount
-            }
-            
-            candidates.append(features)
+            candidates.append(AmountCandidate(
+                amount=amount,
+                kw_exact=1 if token.kw_exact else 0,
+                kw_loose=1 if token.kw_loose else 0,
+                page_last=1 if is_last_page else 0,
+                bottom=1 if (i >= bottom_threshold if positions is None else positions[i] >= BOTTOM_FRACTION) else 0,
+                has_yen=1 if token.has_yen else 0,
+                index=i,
+                tokens=token,
+            ))
         
         # ヒットがなかった場合のフォールバック: ページ最下部の金額を含む行を追加
-        if not any(c["kw_exact"] == 1 for c in candidates) and page_idx == n_pages - 1:
-            bottom_lines = lines[bottom_threshold:] if bottom_threshold < len(lines) else lines[-5:]
-            for line in bottom_lines:
-                normalized_line = self.normalize_text(line)
-                amount_matches = re.findall(r"[0-9,]+", normalized_line)
-                
-                for amt_str in amount_matches:
-                    amt = self.yen_to_int(amt_str)
-                    if amt >= 1000 and amt <= 10000000:  # 1000円から1000万円まで
-                        has_yen = '¥' in normalized_line or '￥' in normalized_line or '円' in normalized_line
-                        candidates.append({
-                            "kw_exact": 0,
-                            "kw_loose": 0,
-                            "largest": amt,
-                            "page_last": 1,
-                            "bottom": 1,
-                            "has_yen": 1 if has_yen else 0,
-                            "line": line,
-                            "amount": amt
-                        })
+        if not any(c.kw_exact == 1 for c in candidates) and is_last_page:
+            if positions is None:
+                bottom_start = bottom_threshold if bottom_threshold < len(tokens) else max(0, len(tokens) - 5)
+                bottom_lines = range(bottom_start, len(tokens))
+            else:
+                bottom_lines = [i for i, position in enumerate(positions) if position >= BOTTOM_FRACTION]
+            for index in bottom_lines:
+                token = tokens[index]
+                if token is None:
+                    continue
+                for amt in token.amounts:
+                    if MIN_FALLBACK_AMOUNT <= amt <= MAX_AMOUNT:
+                        candidates.append(AmountCandidate(
+                            amount=amt,
+                            kw_exact=0,
+                            kw_loose=0,
+                            page_last=1,
+                            bottom=1,
+                            has_yen=1 if token.has_yen else 0,
+                            index=index,
+                            tokens=token,
+                        ))
         
         return candidates
     
+    def collect_page_candidates(self, tokens: List[Optional[LineTokens]], page_count: int = 1,
+                                positions: Optional[Sequence[float]] = None) -> List[AmountCandidate]:
+        """
+        走査済みの行をページ数で行数ごとに等分し、ページごとに金額候補を収集する
+        候補のindexはテキスト全体での行番号（ページ順・行順に並ぶ）
+        positionsは各行のページ上の縦位置（1ページ分のテキストの場合だけ指定する）
+        """
+        candidates = []
+        for page_idx in range(page_count):
+            page_start = int(len(tokens) * page_idx / page_count)
+            page_end = int(len(tokens) * (page_idx + 1) / page_count)
+            page_candidates = self.collect_candidates_from_tokens(
+                tokens[page_start:page_end], page_idx, page_count,
+                None if positions is None else positions[page_start:page_end])
+            for candidate in page_candidates:
+                candidate.index += page_start
+            candidates.extend(page_candidates)
+        return candidates
+    
     def filter_candidates(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """候補をフィルタリングして優先順位付けする"""
         if not candidates:
             return []
-            
-        # 郵便番号や受給者番号のパターン
-        postal_code_pattern = r'〒\s*[0-9]{3}[-－]?[0-9]{4}'
-        recipient_number_pattern = r'[（(][0-9]{7,10}[）)]'
-        phone_number_pattern = r'(?:TEL|電話)[：:]?\s*[0-9\-\(\)（）]{10,13}'
-        date_pattern = r'[0-9]{4}[年/\-][0-9]{1,2}[月/\-][0-9]{1,2}日?'
         
         filtered_candidates = []
         for candidate in candidates:
@@ -158,58 +282,54 @@ class AmountExtractor:
             amount_str = str(candidate['amount'])
             
             # 郵便番号パターンとマッチするか確認
-            if re.search(postal_code_pattern, context):
-                postal_match = re.search(r'〒\s*([0-9]{3}[-－]?[0-9]{4})', context)
-                if postal_match and postal_match.group(1).replace('-', '').replace('－', '') == amount_str:
-                    logger.info(f"郵便番号と一致する金額を除外: {amount_str}")
-                    continue
+            postal_match = POSTAL_CODE_RE.search(context)
+            if postal_match and postal_match.group(1).replace('-', '').replace('－', '') == amount_str:
+                logger.info(f"郵便番号と一致する金額を除外: {amount_str}")
+                continue
             
             # 受給者番号パターンとマッチするか確認
-            if re.search(recipient_number_pattern, context):
-                recipient_match = re.search(r'[（(]([0-9]{7,10})[）)]', context)
-                if recipient_match and (amount_str in recipient_match.group(1) or recipient_match.group(1) in amount_str):
-                    logger.info(f"受給者番号と一致する金額を除外: {amount_str}")
-                    continue
+            recipient_match = RECIPIENT_NUMBER_RE.search(context)
+            if recipient_match and (amount_str in recipient_match.group(1) or recipient_match.group(1) in amount_str):
+                logger.info(f"受給者番号と一致する金額を除外: {amount_str}")
+                continue
             
             # 電話番号パターンとマッチするか確認
-            if re.search(phone_number_pattern, context):
-                phone_match = re.search(r'(?:TEL|電話)[：:]?\s*([0-9\-]{10,13})', context)
-                if phone_match and phone_match.group(1).replace('-', '') == amount_str:
-                    logger.info(f"電話番号と一致する金額を除外: {amount_str}")
-                    continue
+            phone_match = PHONE_NUMBER_RE.search(context)
+            if phone_match and phone_match.group(1).replace('-', '') == amount_str:
+                logger.info(f"電話番号と一致する金額を除外: {amount_str}")
+                continue
             
             # 日付パターンとマッチするか確認
-            if re.search(date_pattern, context):
-                date_match = re.search(date_pattern, context)
-                if date_match and date_match.group(0).replace('年', '').replace('月', '').replace('日', '').replace('/', '').replace('-', '') == amount_str:
-                    logger.info(f"日付と一致する金額を除外: {amount_str}")
-                    continue
+            date_match = DATE_RE.search(context)
+            if date_match and date_match.group(0).translate(DATE_SEPARATORS_TABLE) == amount_str:
+                logger.info(f"日付と一致する金額を除外: {amount_str}")
+                continue
             
             filtered_candidates.append(candidate)
         
         return filtered_candidates
     
-    def score_candidate(self, candidate: Dict[str, Any]) -> float:
+    def score_candidate(self, candidate: AmountCandidate) -> float:
         """候補に重み付けスコアを与える"""
         score = 0
         
         # キーワード一致によるスコア
-        if candidate["kw_exact"]:
+        if candidate.kw_exact:
             score += 6
-        if candidate["kw_loose"]:
+        if candidate.kw_loose:
             score += 3
             
         # 位置によるスコア
-        if candidate["page_last"]:
+        if candidate.page_last:
             score += 2
-        if candidate["bottom"]:
+        if candidate.bottom:
             score += 1
             
         # 金額の特徴によるスコア
-        amount = candidate["amount"]
+        amount = candidate.amount
         
         # 円記号があればボーナス
-        if candidate["has_yen"]:
+        if candidate.has_yen:
             score += 2
             
         # 金額の大きさによるスコアを対数スケールで加算
@@ -242,59 +362,39 @@ class AmountExtractor:
             return None
             
         # スコアリング
-        for i, candidate in enumerate(filtered_candidates):
-            filtered_candidates[i]["score"] = self.score_candidate(candidate)
+        for candidate in filtered_candidates:
+            candidate.score = self.score_candidate(candidate)
             
         # スコア降順でソート
-        filtered_candidates.sort(key=lambda x: x["score"], reverse=True)
+        filtered_candidates.sort(key=lambda x: x.score, reverse=True)
         
         # 最高スコアの候補を返す
         if filtered_candidates:
-            return filtered_candidates[0]["amount"]
+            return filtered_candidates[0].amount
             
         return None
         
-    def extract_from_pdf_text(self, text: str, page_count: int = 1) -> Tuple[Optional[int], str]:
+    def extract_from_pdf_text(self, text: Union[str, NormalizedDocument], page_count: int = 1) -> Tuple[Optional[int], str]:
         """
         PDFテキストから請求金額を抽出し、金額と元の行を返す
         複数ページの場合は最後のページを優先
+        textには顧客名抽出と共有するNormalizedDocumentも渡せる（トークン列を使い回す）
+        候補の収集とスコアはこのクラスの処理を、extraction_engineのinvoice_linesルールとして実行する
         """
-        if not text:
+        document = as_document(text)
+        if not document.raw:
             return None, ""
-            
-        lines = text.split('\n')
-        best_amount = None
-        best_line = ""
-        best_score = -float('inf')
-        
-        # 各ページとして扱う（単一テキストの場合はページ数=1）
-        for page_idx in range(page_count):
-            # 単一テキストをページ数で分割する簡易的な方法
-            page_start = int(len(lines) * page_idx / page_count)
-            page_end = int(len(lines) * (page_idx + 1) / page_count)
-            page_text = '\n'.join(lines[page_start:page_end])
-            
-            # 候補収集とスコアリング
-            candidates = self.collect_candidates(page_text, page_idx, page_count)
-            
-            if not candidates:
-                continue
-                
-            for candidate in candidates:
-                score = self.score_candidate(candidate)
-                if score > best_score:
-                    best_score = score
-                    best_amount = candidate["amount"]
-                    best_line = candidate["line"]
-        
-        return best_amount, best_line
+        candidate = best_candidate(document, AMOUNT, rules=(INVOICE_LINES,), page_count=page_count)
+        if candidate is None:
+            return None, ""
+        return candidate.value, candidate.context
 
 # シングルトンインスタンスを作成
 extractor = AmountExtractor()
 
-def extract_invoice_amount(text: str, page_count: int = 1) -> Tuple[Optional[int], str]:
+def extract_invoice_amount(text: Union[str, NormalizedDocument], page_count: int = 1) -> Tuple[Optional[int], str]:
     """
-    PDFテキストから請求金額を抽出するユーティリティ関数
+    PDFテキスト（またはNormalizedDocument）から請求金額を抽出するユーティリティ関数
     戻り値: (金額, 抽出元の行)のタプル、金額が見つからない場合はNone
     """
     return extractor.extract_from_pdf_text(text, page_count)
@@ -150,15 +150,29 @@ def setup_logger():
     
     return logger
 
-# 処理済みファイルのキャッシュ（ファイル名 -> 処理結果のマッピング）
-processed_files_cache = {}
-_process_cache = {}
-
 # キャッシュをクリアする関数
-def clear_cache():
-    global processed_files_cache, _process_cache
-    processed_files_cache.clear()
-    _process_cache.clear()
+# include_persistent=Trueの場合はディスク上の抽出結果キャッシュ・OCR結果キャッシュも削除する
+def clear_cache(include_persistent=False):
+    try:
+        from customer_extractor import clear_cache as clear_customer_cache
+        clear_customer_cache()
+    except Exception as e:
+        logger.warning(f"顧客名キャッシュのクリアに失敗しました: {e}")
+    if include_persistent:
+        try:
+            from extraction_cache import get_extraction_cache
+            get_extraction_cache(get_config()).clear()
+            logger.info("抽出結果キャッシュをクリアしました")
+        except Exception as e:
+            logger.warning(f"抽出結果キャッシュのクリアに失敗しました: {e}")
+        try:
+            from ocr_cache import get_ocr_cache
+            cache = get_ocr_cache(get_config())
+            if cache is not None:
+                cache.clear()
+                logger.info("OCR結果キャッシュをクリアしました")
+        except Exception as e:
+            logger.warning(f"OCR結果キャッシュのクリアに失敗しました: {e}")
     logger.info("処理キャッシュをクリアしました")
 
 
@@ -255,7 +269,7 @@ import requests
 import shutil
 import subprocess
 from datetime import datetime, timedelta
-from flask import Flask, request, render_template, jsonify, send_from_directory, redirect, url_for, current_app, flash, session, make_response
+from flask import Flask, request, render_template, jsonify, send_from_directory, redirect, url_for, current_app, flash, session, make_response, Response, stream_with_context, has_request_context
 # Flask-WTF の安全なインポート
 try:
     from flask_wtf import FlaskForm, CSRFProtect
@@ -995,6 +1009,52 @@ try:
 except ImportError:
     PYTESSERACT_AVAILABLE = False
 
+# ページストリーミング抽出（複数ページPDFを一度だけ開いて処理する）
+try:
+    import page_stream
+    from page_stream import iter_pdf_pages
+    # OCR時の画像化設定（ocr_dpi / ocr_memory_budget_mb）と解像度適応型OCRのポリシー（ocr_adaptive_*）
+    from page_rasterizer import raster_settings
+    from adaptive_ocr import adaptive_policy
+    PAGE_STREAM_AVAILABLE = page_stream.PDFPLUMBER_AVAILABLE
+except ImportError:
+    PAGE_STREAM_AVAILABLE = False
+
+# ページ並列処理（プロセスプール）
+try:
+    import page_pool
+    PAGE_POOL_AVAILABLE = PAGE_STREAM_AVAILABLE
+except ImportError:
+    PAGE_POOL_AVAILABLE = False
+
+# 抽出結果キャッシュ（PDF内容のハッシュをキーに全ワーカーで共有）
+try:
+    import extraction_cache
+    from extraction_cache import get_extraction_cache
+    EXTRACTION_CACHE_AVAILABLE = True
+except ImportError:
+    EXTRACTION_CACHE_AVAILABLE = False
+
+# 非同期ジョブ（SQLiteに登録し、ジョブのワーカープロセス（job_worker.py）で処理する）
+try:
+    import job_queue
+    from job_queue import get_job_store, iter_job_events
+    JOB_QUEUE_AVAILABLE = True
+except ImportError:
+    JOB_QUEUE_AVAILABLE = False
+
+# 一括アップロード（複数PDF・ZIP）
+try:
+    import bulk_upload
+    BULK_UPLOAD_AVAILABLE = True
+except ImportError:
+    BULK_UPLOAD_AVAILABLE = False
+
+# 処理段階ごとの時間計測（処理結果の'timings'・ログ・段階ごとのヒストグラム）
+import stage_timing
+from stage_timing import (STAGE_AMOUNT, STAGE_CACHE, STAGE_CUSTOMER, STAGE_HISTORY, STAGE_PAYMENT,
+                          STAGE_REQUEST, STAGE_TEXT, StageTimer)
+
 # ロガー設定
 logging.basicConfig(
     level=logging.INFO,
@@ -1123,12 +1183,13 @@ except ImportError as e:
     logger.warning("拡張OCRモジュールが見つかりません。基本的なOCR機能のみ使用します。")
 
 # PDFからテキストを抽出する関数
-def extract_text_from_pdf(pdf_path):
+def extract_text_from_pdf(pdf_path, tenant=None):
     # 
 #     PDFからテキストを抽出する関数。複数の方法を試みる。
 #     
 #     Args:
 #         pdf_path: PDFファイルのパス
+#         tenant: テナントID（OCRの解像度などのテナントごとの設定に使用）
 #         
 #     Returns:
 #         dict: 抽出結果を含む辞書
@@ -1142,91 +1203,139 @@ def extract_text_from_pdf(pdf_path):
     
     methods_tried = []
     last_error = None
+    page_stream_tried = False
     
-    # 方法1: pdfplumberを使用
-    try:
-        import pdfplumber
-        methods_tried.append("pdfplumber")
-        logger.info(f"pdfplumberでテキスト抽出を試みます: {pdf_path}")
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n\n"
+    # 方法0: ページごとにテキストレイヤーを判定し、抽出方法を1つに絞って処理する
+    # （スキャンページはpdfplumber/PyPDF2を試さずにOCRへ直接回す）
+    if PAGE_STREAM_AVAILABLE:
+        try:
+            methods_tried.append("page_probe")
+            page_texts = []
+            page_methods = []
+            page_probes = []
+            ocr_config = resolve_ocr_config(tenant)
+            for page in iter_pdf_pages(pdf_path, raster=raster_settings(ocr_config),
+                                       ocr_policy=adaptive_policy(ocr_config)):
+                page_texts.append(page.text or "")
+                page_methods.append(page.method)
+                page_probes.append(page.probe)
+            page_stream_tried = True
+            
+            text = "".join(page_text + "\n\n" for page_text in page_texts)
+            if text.strip():
+                used_methods = []
+                for page_method in page_methods:
+                    if page_method != "failed" and page_method not in used_methods:
+                        used_methods.append(page_method)
+                method = "+".join(used_methods)
+                logger.info(f"ページ判定によるテキスト抽出成功: {len(text)} 文字 (方法: {page_methods})")
+                return {
+                    "text": text,
+                    "method": method,
+                    "success": True,
+                    "page_methods": page_methods,
+                    "page_probes": page_probes
+                }
+            else:
+                logger.warning("ページ判定によるテキスト抽出失敗: テキストが空です")
+        except Exception as e:
+            last_error = str(e)
+            logger.warning(f"ページ判定によるテキスト抽出エラー: {e}")
+    
+    # ページ判定による抽出が実行できなかった場合のみ、従来の順次カスケードを使用する
+    if not page_stream_tried:
+        # 方法1: pdfplumberを使用
+        try:
+            import pdfplumber
+            methods_tried.append("pdfplumber")
+            logger.info(f"pdfplumberでテキスト抽出を試みます: {pdf_path}")
+        
+            with pdfplumber.open(pdf_path) as pdf:
+                text = ""
+                for page in pdf.pages:
+                    page_text = page.extract_text() or ""
+                    text += page_text + "\n\n"
                 
-        if text.strip():
-            logger.info(f"pdfplumberでテキスト抽出成功: {len(text)} 文字")
-            return {"text": text, "method": "pdfplumber", "success": True}
-        else:
-            logger.warning("pdfplumberでテキスト抽出失敗: テキストが空です")
-    except Exception as e:
-        last_error = str(e)
-        logger.warning(f"pdfplumberでテキスト抽出エラー: {e}")
+            if text.strip():
+                logger.info(f"pdfplumberでテキスト抽出成功: {len(text)} 文字")
+                return {"text": text, "method": "pdfplumber", "success": True}
+            else:
+                logger.warning("pdfplumberでテキスト抽出失敗: テキストが空です")
+        except Exception as e:
+            last_error = str(e)
+            logger.warning(f"pdfplumberでテキスト抽出エラー: {e}")
     
-    # 方法2: PyPDF2を使用
-    try:
-        import PyPDF2
-        methods_tried.append("PyPDF2")
-        logger.info(f"PyPDF2でテキスト抽出を試みます: {pdf_path}")
-        
-        text = ""
-        with open(pdf_path, "rb") as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n\n"
+        # 方法2: PyPDF2を使用
+        try:
+            import PyPDF2
+            methods_tried.append("PyPDF2")
+            logger.info(f"PyPDF2でテキスト抽出を試みます: {pdf_path}")
+        
+            text = ""
+            with open(pdf_path, "rb") as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                for page in pdf_reader.pages:
+                    page_text = page.extract_text() or ""
+                    text += page_text + "\n\n"
                 
-        if text.strip():
-            logger.info(f"PyPDF2でテキスト抽出成功: {len(text)} 文字")
-            return {"text": text, "method": "PyPDF2", "success": True}
-        else:
-            logger.warning("PyPDF2でテキスト抽出失敗: テキストが空です")
-    except Exception as e:
-        last_error = str(e)
-        logger.warning(f"PyPDF2でテキスト抽出エラー: {e}")
+            if text.strip():
+                logger.info(f"PyPDF2でテキスト抽出成功: {len(text)} 文字")
+                return {"text": text, "method": "PyPDF2", "success": True}
+            else:
+                logger.warning("PyPDF2でテキスト抽出失敗: テキストが空です")
+        except Exception as e:
+            last_error = str(e)
+            logger.warning(f"PyPDF2でテキスト抽出エラー: {e}")
     
-    # 方法3: OCR (pytesseract) を使用
-    try:
-        import pytesseract
-        from pdf2image import convert_from_path
-        methods_tried.append("pytesseract")
-        logger.info(f"OCR (pytesseract) でテキスト抽出を試みます: {pdf_path}")
-        
-        # PDFを画像に変換
-        images = convert_from_path(pdf_path)
-        text = ""
-        
-        for i, image in enumerate(images):
-            # OCRでテキスト抽出
-            page_text = pytesseract.image_to_string(image, lang='jpn+eng') or ""
-            text += page_text + "\n\n"
+        # 方法3: OCR (pytesseract) を使用
+        try:
+            import ocr_pool
+            from page_rasterizer import count_pages, iter_page_images, raster_settings
+            from adaptive_ocr import adaptive_policy, ocr_page_adaptive
+            methods_tried.append("pytesseract")
+            logger.info(f"OCR (pytesseract) でテキスト抽出を試みます: {pdf_path}")
+        
+            # PDFをメモリ上限に収まるページ数ずつ画像化し、OCR後すぐに解放する
+            text = ""
+            ocr_config = resolve_ocr_config(tenant)
+            ocr_policy = adaptive_policy(ocr_config)
+        
+            if ocr_policy:
+                # 低解像度でOCRし、信頼度や顧客名・金額の抽出結果が不十分なページだけ解像度を上げる
+                for page_number in range(1, count_pages(pdf_path) + 1):
+                    page_text, _ = ocr_page_adaptive(pdf_path, page_number, ocr_policy)
+                    text += page_text + "\n\n"
+            else:
+                for page_number, image in iter_page_images(pdf_path, **raster_settings(ocr_config)):
+                    # OCRでテキスト抽出
+                    page_text = ocr_pool.image_to_string(image, lang='jpn+eng', config=ocr_config)
+                    text += page_text + "\n\n"
             
-        if text.strip():
-            logger.info(f"OCRでテキスト抽出成功: {len(text)} 文字")
-            return {"text": text, "method": "ocr_pytesseract", "success": True}
-        else:
-            logger.warning("OCRでテキスト抽出失敗: テキストが空です")
-    except Exception as e:
-        last_error = str(e)
-        logger.warning(f"OCRでテキスト抽出エラー: {e}")
+            if text.strip():
+                logger.info(f"OCRでテキスト抽出成功: {len(text)} 文字")
+                return {"text": text, "method": "ocr_pytesseract", "success": True}
+            else:
+                logger.warning("OCRでテキスト抽出失敗: テキストが空です")
+        except Exception as e:
+            last_error = str(e)
+            logger.warning(f"OCRでテキスト抽出エラー: {e}")
     
-    # 方法4: pdfminer.six を使用
-    try:
-        from pdfminer.high_level import extract_text as pdfminer_extract_text
-        methods_tried.append("pdfminer.six")
-        logger.info(f"pdfminer.sixでテキスト抽出を試みます: {pdf_path}")
+        # 方法4: pdfminer.six を使用
+        try:
+            from pdfminer.high_level import extract_text as pdfminer_extract_text
+            methods_tried.append("pdfminer.six")
+            logger.info(f"pdfminer.sixでテキスト抽出を試みます: {pdf_path}")
         
-        text = pdfminer_extract_text(pdf_path)
+            text = pdfminer_extract_text(pdf_path)
         
-        if text.strip():
-            logger.info(f"pdfminer.sixでテキスト抽出成功: {len(text)} 文字")
-            return {"text": text, "method": "pdfminer.six", "success": True}
-        else:
-            logger.warning("pdfminer.sixでテキスト抽出失敗: テキストが空です")
-    except Exception as e:
-        last_error = str(e)
-        logger.warning(f"pdfminer.sixでテキスト抽出エラー: {e}")
+            if text.strip():
+                logger.info(f"pdfminer.sixでテキスト抽出成功: {len(text)} 文字")
+                return {"text": text, "method": "pdfminer.six", "success": True}
+            else:
+                logger.warning("pdfminer.sixでテキスト抽出失敗: テキストが空です")
+        except Exception as e:
+            last_error = str(e)
+            logger.warning(f"pdfminer.sixでテキスト抽出エラー: {e}")
     
     # 方法5: pdftotextコマンドを使用
     try:
@@ -1528,7 +1637,7 @@ from flask import current_app
 def api_clear_cache():
     """手動でキャッシュをクリアするAPI"""
     try:
-        clear_cache()
+        clear_cache(include_persistent=True)
         return jsonify({
             'success': True,
             'message': 'キャッシュが正常にクリアされました'
@@ -2312,6 +2421,7 @@ def settings():
     ocr_method = config.get('ocr_method', 'tesseract')
     ocr_api_key = config.get('ocr_api_key', '')
     ocr_endpoint = config.get('ocr_endpoint', '')
+    google_vision_endpoint = config.get('google_vision_endpoint', '')
     
     # 権限情報を取得（Flask-Loginとセッションの両方をチェック）
     is_admin = False
@@ -2366,6 +2476,7 @@ def settings():
                            ocr_method=ocr_method,
                            ocr_api_key=ocr_api_key,
                            ocr_endpoint=ocr_endpoint,
+                           google_vision_endpoint=google_vision_endpoint,
                            show_all_settings=show_all_settings,
                            show_sandbox_settings=show_sandbox_settings,
                            show_production_settings=show_production_settings)
@@ -3261,37 +3372,150 @@ def upload_file():
         }), 500
 
 
-def process_single_pdf(filepath, filename, request):
+def process_single_pdf(filepath, filename, request, provider=None, tenant=None):
     try:
         logger.info(f"単一PDF処理開始: {filepath}")
+        timer = StageTimer()
         
         # PDFからテキストを抽出
-        text_result = extract_text_from_pdf(filepath)
+        with timer.span(STAGE_TEXT):
+            text_result = extract_text_from_pdf(filepath, tenant=tenant)
         extracted_text = text_result.get('text', '')
         extraction_method = text_result.get('method', 'unknown')
-        
+
+        return process_extracted_text(extracted_text, extraction_method, filename, request, provider=provider,
+                                      timer=timer)
+
+    except Exception as e:
+        logger.error(f"PDF処理エラー ({filename}): {str(e)}")
+        return {
+            'filename': filename,
+            'success': False,
+            'error': str(e)
+        }
+
+
+def resolve_payment_provider(request=None):
+    # リクエストデータから決済プロバイダーを取得し、指定がなければ設定のデフォルトを返す
+    provider = None
+    if request is not None:
+        if request.is_json:
+            request_data = request.get_json()
+            provider = request_data.get('payment_provider') if request_data else None
+        else:
+            provider = request.form.get('payment_provider')
+    
+    # 設定からデフォルトプロバイダーを取得
+    if not provider:
+        config = get_config()
+        provider = config.get('default_payment_provider', 'paypal')
+    return provider
+
+
+def current_tenant_id():
+    # ログイン中のユーザーのテナントIDを返す（リクエスト外やテナントのないユーザーはNone）
+    if not has_request_context() or current_user is None:
+        return None
+    try:
+        if not current_user.is_authenticated:
+            return None
+    except Exception:
+        return None
+    return getattr(current_user, 'tenant_id', None)
+
+
+def current_job_owner():
+    # 非同期ジョブの所有者を返す（ログイン中のユーザー、未ログインの場合はセッションごとの識別子）
+    if current_user is not None:
+        try:
+            if current_user.is_authenticated:
+                return f"user:{current_user.get_id()}"
+        except Exception:
+            pass
+    owner = session.get('job_owner')
+    if not owner:
+        owner = uuid.uuid4().hex
+        session['job_owner'] = owner
+    return f"session:{owner}"
+
+
+def can_access_job(store, job_id):
+    # ジョブを登録した本人か、同じテナントの管理者（テナントのない管理者は全ジョブ）のみ参照できる
+    job_owner = store.get_owner(job_id)
+    if job_owner is None:
+        return False
+    if job_owner['owner'] and job_owner['owner'] == current_job_owner():
+        return True
+    is_admin = bool(getattr(current_user, 'is_admin', False)) if current_user is not None else False
+    if is_admin or session.get('admin_logged_in'):
+        tenant = current_tenant_id()
+        return tenant is None or tenant == job_owner['tenant_id']
+    return False
+
+
+def resolve_ocr_config(tenant=None):
+    # OCR関連の設定（ocr_*）をテナントごとの設定（ocr_tenant_policies）で上書きして返す
+    from adaptive_ocr import tenant_config
+    return tenant_config(get_config(), tenant)
+
+
+def process_extracted_text(extracted_text, extraction_method, filename, request, fields=None, provider=None,
+                           layout=None, timer=None, content_fields=None):
+    # 抽出済みのテキストから顧客名と金額を抽出し、決済リンクを生成する
+    #
+    # process_single_pdfと、ページストリーミング抽出を使うprocess_pdfの共通処理
+    # fieldsにはページ並列処理のワーカーで抽出済みの顧客名・金額、または抽出結果キャッシュの金額が渡される
+    # （キャッシュには内容だけから決まる金額のみを保存するため、customer_nameがない場合は顧客名をここで抽出する）
+    # content_fieldsに辞書を渡すと、内容だけから決まる項目（金額と抽出元の行）を入れる（抽出結果キャッシュ用）
+    # layoutにはページの単語の位置（PageText.layout）が渡される（金額・顧客名の位置の判定に使用）
+    # バックグラウンドジョブではrequestがNoneになるため、providerを直接指定する
+    # timerには呼び出し元でテキスト抽出などを計測したStageTimerが渡される（結果の'timings'に段階ごとの時間を入れる）
+    if timer is None:
+        timer = StageTimer()
+    try:
         if not extracted_text:
-            logger.warning(f"テキスト抽出失敗: {filepath}")
+            logger.warning(f"テキスト抽出失敗: {filename}")
             return {
                 'filename': filename,
                 'success': False,
-                'error': 'テキストを抽出できませんでした'
+                'error': 'テキストを抽出できませんでした',
+                'timings': timer.finish('page', filename, method=extraction_method, provider=provider)
             }
         
         # テキストの一部をログに記録
         text_preview = extracted_text[:200] + '...' if len(extracted_text) > 200 else extracted_text
         logger.info(f"抽出されたテキストプレビュー: {text_preview}")
         
-        # 顧客名を抽出
-        customer_name = customer_extractor.extract_customer(extracted_text, filename)
+        fields = fields or {}
+        # ワーカーで抽出済みの結果を使用（抽出にかかった時間もワーカーで計測済み）
+        timer.merge(fields.get('timings'))
+        document = None
+        if 'customer_name' not in fields or 'amount' not in fields:
+            # 顧客名・金額の抽出でテキストの正規化結果を共有する
+            from text_normalizer import NormalizedDocument
+            document = NormalizedDocument(extracted_text, layout=layout)
+        
+        # 顧客名を抽出（ファイル名からも抽出するため、抽出結果キャッシュには保存しない）
+        if 'customer_name' in fields:
+            customer_name = fields['customer_name']
+        else:
+            with timer.span(STAGE_CUSTOMER):
+                customer_name = customer_extractor.extract_customer(document, filename)
         
         # 金額を抽出
-        amount_result = amount_extractor.extract_invoice_amount(extracted_text)
+        if 'amount' in fields:
+            amount_result = (fields['amount'], fields.get('amount_source_line', ''))
+        else:
+            with timer.span(STAGE_AMOUNT):
+                amount_result = amount_extractor.extract_invoice_amount(document)
         # タプルから直接値を取得 (金額, 抽出元の行)
         amount = amount_result[0] if amount_result and amount_result[0] is not None else "0"
         # 抽出元の行（デバッグ用）
         amount_source_line = amount_result[1] if amount_result and len(amount_result) > 1 else ""
         logger.debug(f"抽出された金額: {amount}, 抽出元: {amount_source_line}")
+        if content_fields is not None:
+            content_fields.update({'amount': amount_result[0] if amount_result else None,
+                                   'amount_source_line': amount_source_line})
         
         # 金額のフォーマットを整える
         amount_str = str(amount).replace(',', '').strip()
@@ -3301,21 +3525,12 @@ def process_single_pdf(filepath, filename, request):
         order_id = None
         used_provider = None
         
-        # リクエストデータから決済プロバイダーを取得
-        provider = None
-        if request.is_json:
-            request_data = request.get_json()
-            provider = request_data.get('payment_provider') if request_data else None
-        else:
-            provider = request.form.get('payment_provider')
-        
-        # 設定からデフォルトプロバイダーを取得
         if not provider:
-            config = get_config()
-            provider = config.get('default_payment_provider', 'paypal')
+            provider = resolve_payment_provider(request)
         
         logger.info(f"決済プロバイダー: {provider}")
         
+        payment_started = time.perf_counter()
         try:
             if amount_str and amount_str != '0':
                 logger.info(f"決済リンク生成開始: プロバイダー={provider}, 金額={amount_str}, 顧客={customer_name}")
@@ -3368,6 +3583,8 @@ def process_single_pdf(filepath, filename, request):
         except Exception as e:
             logger.error(f"決済リンク生成エラー: {str(e)}")
             # エラーを記録するが処理は続行
+        if amount_str and amount_str != '0':
+            timer.record(STAGE_PAYMENT, (time.perf_counter() - payment_started) * 1000)
         
         # 結果を返す
         return {
@@ -3378,7 +3595,8 @@ def process_single_pdf(filepath, filename, request):
             'order_id': order_id,
             'provider': used_provider,
             'extraction_method': extraction_method,
-            'success': True
+            'success': True,
+            'timings': timer.finish('page', filename, method=extraction_method, provider=used_provider or provider)
         }
         
     except Exception as e:
@@ -3386,9 +3604,156 @@ def process_single_pdf(filepath, filename, request):
         return {
             'filename': filename,
             'success': False,
-            'error': str(e)
+            'error': str(e),
+            'timings': timer.finish('page', filename, method=extraction_method, provider=provider)
         }
 
+
+def process_pdf_pages(filepath, filename, request=None, provider=None, on_result=None, tenant=None):
+    # PDFをページ単位で処理し、ページごとの結果のリストを返す
+    #
+    # /process（同期）とバックグラウンドジョブの共通処理
+    # on_resultを指定すると、各ページの結果を(結果, 総ページ数)で逐次通知する
+    # tenantを指定すると、OCRの解像度などにテナントごとの設定を使う
+    
+    # 抽出結果キャッシュを確認（キー: PDF内容のSHA-256 + 抽出ロジックのバージョン + テナントのOCR設定のハッシュ）
+    # OCR設定の異なるテナント同士では結果を共有しない。決済リンクはキャッシュせず、毎回生成する
+    ocr_config = resolve_ocr_config(tenant)
+    cache_key = None
+    cached_pages = None
+    cache_lookup_ms = None
+    if PAGE_STREAM_AVAILABLE and EXTRACTION_CACHE_AVAILABLE:
+        cache_started = time.perf_counter()
+        try:
+            cache_key = extraction_cache.make_key(extraction_cache.file_digest(filepath),
+                                                  config_hash=extraction_cache.config_digest(ocr_config))
+            cached_pages = get_extraction_cache(get_config()).get(cache_key)
+            if cached_pages:
+                logger.info(f"抽出結果キャッシュを使用します: {filename} ({len(cached_pages)}ページ)")
+        except Exception as e:
+            logger.warning(f"抽出結果キャッシュの確認に失敗しました: {e}")
+            cache_key = None
+            cached_pages = None
+        cache_lookup_ms = (time.perf_counter() - cache_started) * 1000
+    
+    # PDFからテキストを抽出
+    logger.info(f"PDFからテキストを抽出開始: {filename}")
+    
+    # 結果を格納するリスト
+    results = []
+
+    if PAGE_STREAM_AVAILABLE:
+        # PDFを一度だけ開き、ページごとのテキストをそのまま抽出処理に渡す（一時ファイルなし）
+        # ページ数が多い場合はプロセスプールで並列に処理し、結果はページ順で受け取る
+        page_number = 0
+        pages_for_cache = []
+        page_failed = False
+        try:
+            if cached_pages:
+                page_iterator = extraction_cache.records_to_pages(cached_pages)
+            elif PAGE_POOL_AVAILABLE:
+                page_iterator = page_pool.iter_pages(filepath, filename, ocr_config)
+            else:
+                page_iterator = ((page, None) for page in iter_pdf_pages(filepath, raster=raster_settings(ocr_config),
+                                                                         ocr_policy=adaptive_policy(ocr_config)))
+            for page, page_fields in page_iterator:
+                page_number = page.page_number
+                if page.page_number == 1:
+                    logger.info(f"PDFページ数: {page.page_count}")
+
+                # 単一ページの場合は元のファイル名をそのまま使用
+                page_filename = filename if page.page_count == 1 else f"{filename}_page{page.page_number}"
+                # テキスト抽出の時間はページの抽出時に計測済み（キャッシュから読んだページは抽出していない）
+                # キャッシュの確認は文書単位のため、最初のページの時間に含める
+                page_timer = StageTimer()
+                if not cached_pages:
+                    page_timer.merge({STAGE_TEXT: page.elapsed_ms})
+                if cache_lookup_ms is not None and page.page_number == 1:
+                    page_timer.merge({STAGE_CACHE: cache_lookup_ms})
+                # キャッシュにはファイル名に依存しない金額と抽出元の行だけを保存する
+                # （顧客名はファイル名からも抽出するため、キャッシュを使う場合も毎回抽出する）
+                content_fields = {}
+                try:
+                    page_result = process_extracted_text(page.text, page.method, page_filename, request,
+                                                         fields=page_fields, provider=provider, layout=page.layout,
+                                                         timer=page_timer, content_fields=content_fields)
+                    if page_result:
+                        results.append(page_result)
+                        if on_result:
+                            on_result(page_result, page.page_count)
+                    pages_for_cache.append((page, content_fields or None))
+                except Exception as e:
+                    page_failed = True
+                    logger.error(f"ページ{page.page_number}の処理中にエラーが発生しました: {str(e)}")
+                    error_result = {
+                        'page': page.page_number,
+                        'error': str(e),
+                        'success': False
+                    }
+                    results.append(error_result)
+                    if on_result:
+                        on_result(error_result, page.page_count)
+        except Exception as e:
+            page_failed = True
+            logger.error(f"ページ{page_number + 1}のテキスト抽出中にエラーが発生しました: {str(e)}")
+            error_result = {
+                'page': page_number + 1,
+                'error': str(e),
+                'success': False
+            }
+            results.append(error_result)
+            if on_result:
+                on_result(error_result, None)
+        
+        # 全ページの抽出に成功した場合のみキャッシュに保存
+        if cache_key and not cached_pages and not page_failed and pages_for_cache:
+            try:
+                get_extraction_cache(get_config()).set(cache_key, extraction_cache.pages_to_records(pages_for_cache))
+                logger.info(f"抽出結果をキャッシュに保存しました: {filename}")
+            except Exception as e:
+                logger.warning(f"抽出結果キャッシュの保存に失敗しました: {e}")
+    else:
+        # ページストリーミングが使えない場合は文書全体を1件として処理
+        result = process_single_pdf(filepath, filename, request, provider=provider, tenant=tenant)
+        if result:
+            results.append(result)
+            if on_result:
+                on_result(result, 1)
+    
+    return results
+
+
+def save_history_results(results):
+    # 処理結果を履歴ファイル（results/payment_links_*.json）に保存し、ファイル名を返す
+    try:
+        results_folder = app.config['RESULTS_FOLDER']
+        os.makedirs(results_folder, exist_ok=True)
+        
+        # 現在の日時をファイル名に含める
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        history_filename = f'payment_links_{timestamp}.json'
+        history_path = os.path.join(results_folder, history_filename)
+        
+        # 結果をJSONファイルとして保存
+        with open(history_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        
+        logger.info(f'履歴ファイルを保存しました: {history_filename}')
+        return history_filename
+    except Exception as e:
+        logger.error(f'履歴ファイルの保存に失敗しました: {str(e)}')
+        return None
+
+
+def add_result_timestamps(results):
+    # 処理日時を全ての結果に追加
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for result in results:
+        if isinstance(result, dict):
+            result['timestamp'] = current_time
+    return results
+
+
 # PDFファイルの処理
 @app.route('/process', methods=['POST'])
 @api_access_required
@@ -3449,101 +3814,48 @@ def process_pdf():
         file_size = os.path.getsize(filepath)
         logger.info(f"PDFファイルサイズ: {file_size} バイト")
         
-        # キャッシュキーを作成（ファイル名 + 決済プロバイダー）
-        cache_key = f"{filename}_{payment_provider}"
+        # 非同期処理の指定がある場合はジョブとして登録し、ジョブIDをすぐに返す
+        if str(data.get('async', request.args.get('async', ''))).lower() in ('1', 'true', 'yes', 'on'):
+            if not JOB_QUEUE_AVAILABLE:
+                return jsonify({'success': False, 'error': '非同期処理は利用できません'}), 503
+            provider = resolve_payment_provider(request)
+            tenant = current_tenant_id()
+            job_id = job_queue.enqueue(
+                JOB_KIND_PROCESS, filename,
+                {'filepath': filepath, 'filename': filename, 'provider': provider, 'tenant': tenant},
+                owner=current_job_owner(), tenant_id=tenant, config=get_config())
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': job_queue.STATUS_QUEUED,
+                'status_url': url_for('get_job_status', job_id=job_id),
+                'stream_url': url_for('stream_job_status', job_id=job_id)
+            }), 202
         
-        # キャッシュを確認
-        if cache_key in processed_files_cache:
-            logger.info(f"キャッシュから結果を返します: {filename} (プロバイダー: {payment_provider})")
-            return jsonify(processed_files_cache[cache_key])
-        
-        # PDFからテキストを抽出
-        logger.info(f"PDFからテキストを抽出開始: {filename}")
-        
-        # 複数ページのPDF処理のための一時ディレクトリ作成
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # PDFのページ数を確認
-            with open(filepath, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                num_pages = len(pdf_reader.pages)
-                
-                logger.info(f"PDFページ数: {num_pages}")
-                
-                # 結果を格納するリスト
-                results = []
-                
-                # 単一ページの場合はそのまま処理
-                if num_pages == 1:
-                    result = process_single_pdf(filepath, filename, request)
-                    if result:
-                        results.append(result)
-                else:
-                    # 複数ページの場合は分割して処理
-                    logger.info(f"複数ページPDFを分割処理します: {num_pages}ページ")
-                    
-                    for page_num in range(num_pages):
-                        try:
-                            # 各ページを個別のPDFとして保存
-                            output_pdf = PyPDF2.PdfWriter()
-                            output_pdf.add_page(pdf_reader.pages[page_num])
-                            
-                            page_filename = f"page_{page_num + 1}.pdf"
-                            page_filepath = os.path.join(temp_dir, page_filename)
-                            
-                            with open(page_filepath, 'wb') as output_file:
-                                output_pdf.write(output_file)
-                            
-                            # 各ページを処理
-                            page_result = process_single_pdf(page_filepath, f"{filename}_page{page_num + 1}", request)
-                            if page_result:
-                                results.append(page_result)
-                                
-                        except Exception as e:
-                            logger.error(f"ページ{page_num + 1}の処理中にエラーが発生しました: {str(e)}")
-                            results.append({
-                                'page': page_num + 1,
-                                'error': str(e),
-                                'success': False
-                            })
+        request_timer = StageTimer()
+        results = process_pdf_pages(filepath, filename, request, tenant=current_tenant_id())
         
         # 結果が空の場合のエラー処理
         if not results:
             logger.warning(f"処理結果が空です: {filename}")
             return jsonify({'error': 'PDFから情報を抽出できませんでした'}), 400
         
-        # 処理日時を全ての結果に追加
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        for result in results:
-            if isinstance(result, dict):
-                result['timestamp'] = current_time
+        add_result_timestamps(results)
         
-        # 結果をキャッシュに保存
         response_data = {
             'success': True,
             'results': results,
             'message': f'{len(results)}件の処理が完了しました'
         }
         
-        processed_files_cache[cache_key] = response_data
-        logger.info(f"キャッシュに結果を保存しました: {filename} (プロバイダー: {payment_provider})")
-        
         # 履歴ファイルに保存
-        try:
-            results_folder = app.config['RESULTS_FOLDER']
-            os.makedirs(results_folder, exist_ok=True)
-            
-            # 現在の日時をファイル名に含める
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            history_filename = f'payment_links_{timestamp}.json'
-            history_path = os.path.join(results_folder, history_filename)
-            
-            # 結果をJSONファイルとして保存
-            with open(history_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f'履歴ファイルを保存しました: {history_filename}')
-        except Exception as e:
-            logger.error(f'履歴ファイルの保存に失敗しました: {str(e)}')
+        with request_timer.span(STAGE_HISTORY):
+            save_history_results(results)
+        
+        # リクエスト全体の時間（ページごとの時間は各結果の'timings'）
+        method, used_provider = stage_timing.result_labels(results)
+        response_data['timings'] = request_timer.finish('request', filename, method=method, provider=used_provider,
+                                                        total_stage=STAGE_REQUEST)
         
         return jsonify(response_data)
         
@@ -3564,6 +3876,184 @@ def process_pdf():
 
 
 
+# ジョブの種類（ジョブのワーカープロセスが対応する処理を呼び出す）
+JOB_KIND_PROCESS = 'process'
+JOB_KIND_BULK = 'bulk'
+
+
+def run_process_job(job_id, filepath, filename, provider, tenant=None):
+    # ジョブのワーカープロセスでPDFを処理し、ページごとの結果をジョブストアに記録する
+    #
+    # 完了した結果は同期処理と同じ履歴ファイルに保存し、そのファイル名を返す
+    # 中断されたジョブを実行し直す場合は、記録済みの結果を削除して最初のページから処理する
+    store = get_job_store(get_config())
+    store.clear_results(job_id)
+    total_pages_recorded = False
+
+    def on_result(result, page_count):
+        nonlocal total_pages_recorded
+        if page_count and not total_pages_recorded:
+            store.set_total_pages(job_id, page_count)
+            total_pages_recorded = True
+        result['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        store.append_result(job_id, result)
+
+    with app.app_context():
+        logger.info(f"ジョブ処理開始: {job_id} ({filename})")
+        timer = StageTimer(provider=provider)
+        results = process_pdf_pages(filepath, filename, provider=provider, on_result=on_result, tenant=tenant)
+        if not results:
+            raise ValueError('PDFから情報を抽出できませんでした')
+        with timer.span(STAGE_HISTORY):
+            history_file = save_history_results(results)
+        method, used_provider = stage_timing.result_labels(results)
+        timer.finish('job', filename, method=method, provider=used_provider, total_stage=STAGE_REQUEST)
+        return history_file
+
+
+# ジョブの状態確認
+@app.route('/jobs/<job_id>', methods=['GET'])
+@api_access_required
+def get_job_status(job_id):
+    # 非同期ジョブの状態とページごとの結果を返す（sinceで取得済みの結果を省略できる）
+    if not JOB_QUEUE_AVAILABLE:
+        return jsonify({'success': False, 'error': '非同期処理は利用できません'}), 503
+    
+    since = request.args.get('since', 0, type=int)
+    store = get_job_store(get_config())
+    # 他の利用者のジョブは存在しない場合と同じ応答にする
+    if not can_access_job(store, job_id):
+        return jsonify({'success': False, 'error': 'ジョブが見つかりません'}), 404
+    job = store.get(job_id, since=since)
+    if job is None:
+        return jsonify({'success': False, 'error': 'ジョブが見つかりません'}), 404
+    
+    return jsonify({'success': True, **job})
+
+
+# ジョブの進行状況のストリーミング
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+@api_access_required
+def stream_job_status(job_id):
+    # 非同期ジョブの状態とページごとの結果をNDJSON（1行1イベント）で返す
+    #
+    # gunicornのsyncワーカーを長時間占有しないようにショートポーリングとし、取得できた結果か状態の変化を
+    # 返した時点（なければjob_stream_timeout秒後）に打ち切る（event: continue）
+    # 続きはcontinueのsinceを指定して再度リクエストする
+    if not JOB_QUEUE_AVAILABLE:
+        return jsonify({'success': False, 'error': '非同期処理は利用できません'}), 503
+    
+    store = get_job_store(get_config())
+    if not can_access_job(store, job_id):
+        return jsonify({'success': False, 'error': 'ジョブが見つかりません'}), 404
+    
+    since = request.args.get('since', 0, type=int)
+    timeout = min(float(get_config().get('job_stream_timeout', job_queue.MAX_STREAM_SECONDS)),
+                  job_queue.MAX_STREAM_SECONDS)
+    
+    def generate():
+        for event in iter_job_events(store, job_id, timeout=timeout, since=since, short_poll=True):
+            yield json.dumps(event, ensure_ascii=False, default=str) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# 複数PDF・ZIPの一括処理
+@app.route('/process/bulk', methods=['POST'])
+@api_access_required
+def process_bulk():
+    # 複数のPDF（multipartのfiles）またはZIPアーカイブを受け取り、非同期ジョブとして並列に処理する
+    #
+    # 数百件のバッチはgunicornのタイムアウトを超えるため、保存したファイルをジョブに登録してジョブIDをすぐに返す
+    # 結果は完了した順に/jobs/<job_id>/stream（NDJSON）または/jobs/<job_id>で取得する
+    # 全件の結果は/processと同じ履歴ファイルに保存する
+    logger.info("一括処理リクエストを受信")
+    
+    if not BULK_UPLOAD_AVAILABLE or not JOB_QUEUE_AVAILABLE:
+        return jsonify({'success': False, 'error': '一括処理は利用できません'}), 503
+    
+    files = request.files.getlist('files') or request.files.getlist('file')
+    if not files:
+        return jsonify({'success': False, 'error': 'ファイルが見つかりません'}), 400
+    
+    upload_folder = current_app.config.get('UPLOAD_FOLDER') or os.environ.get('UPLOAD_FOLDER') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    
+    config = get_config()
+    try:
+        items = bulk_upload.save_bulk_files(
+            files,
+            upload_folder,
+            max_files=int(config.get('bulk_max_files', bulk_upload.DEFAULT_MAX_FILES)),
+            max_total_bytes=int(config.get('bulk_max_total_mb', bulk_upload.DEFAULT_MAX_TOTAL_MB)) * 1024 * 1024
+        )
+    except bulk_upload.BulkUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if not items:
+        return jsonify({'success': False, 'error': 'PDFファイルが含まれていません'}), 400
+    
+    # ジョブのスレッドではrequestを参照できないため、決済プロバイダーとテナントを先に決めておく
+    provider = resolve_payment_provider(request)
+    tenant = current_tenant_id()
+    job_id = job_queue.enqueue(
+        JOB_KIND_BULK, f"{len(items)}件の一括処理",
+        {'items': [[name, path] for name, path in items], 'provider': provider, 'tenant': tenant},
+        owner=current_job_owner(), tenant_id=tenant, config=config)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': job_queue.STATUS_QUEUED,
+        'total': len(items),
+        'files': [name for name, _ in items],
+        'status_url': url_for('get_job_status', job_id=job_id),
+        'stream_url': url_for('stream_job_status', job_id=job_id)
+    }), 202
+
+
+def run_bulk_job(job_id, items, provider, tenant=None):
+    # ジョブのワーカープロセスで一括処理のファイルを並列に処理し、ファイルごとの結果をジョブストアに記録する
+    #
+    # 途中で中断した場合も、処理が終わったファイル（決済リンクを生成済み）の結果は履歴ファイルに保存する
+    # 中断されたジョブを実行し直す場合は、結果を記録済みのファイルを処理し直さない（決済リンクを重複して生成しない）
+    store = get_job_store(get_config())
+    store.set_total_pages(job_id, len(items))
+    finished = store.get_results(job_id)
+    done = {result.get('filename') for result in finished}
+    remaining = [(name, path) for name, path in items if name not in done]
+    
+    def process_one(filepath, filename):
+        with app.app_context():
+            result = process_single_pdf(filepath, filename, None, provider=provider, tenant=tenant)
+        if result:
+            result['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            # 結果の記録より前に中断された場合にも履歴に残すため、ワーカースレッドで控えておく
+            finished.append(result)
+        return result
+    
+    history_file = None
+    with app.app_context():
+        logger.info(f"一括処理ジョブ開始: {job_id} ({len(remaining)}/{len(items)}件)")
+        completed = bulk_upload.iter_completed(
+            remaining, process_one,
+            max_workers=int(get_config().get('bulk_workers', bulk_upload.DEFAULT_BULK_WORKERS)))
+        try:
+            for result in completed:
+                store.append_result(job_id, result)
+        finally:
+            # 未着手のファイルの処理を取り消し、処理中のファイルの完了を待ってから履歴を保存する
+            completed.close()
+            if finished:
+                # 履歴は元の順序で保存する（ファイル名はsave_bulk_filesで重複しないようにしてある）
+                order = {name: index for index, (name, _) in enumerate(items)}
+                results = sorted(finished, key=lambda r: order.get(r.get('filename'), 0))
+                history_file = save_history_results(results)
+    return history_file
+
+
+if JOB_QUEUE_AVAILABLE:
+    job_queue.register_handler(JOB_KIND_PROCESS, run_process_job)
+    job_queue.register_handler(JOB_KIND_BULK, run_bulk_job)
+
 # 設定の保存
 @app.route('/settings/save', methods=['POST'])
 @admin_required
@@ -3888,6 +4378,18 @@ def save_common_settings():
         if 'ocr_endpoint' in data:
             config_updates['ocr_endpoint'] = data['ocr_endpoint']
         
+        if 'google_vision_endpoint' in data:
+            google_vision_endpoint = data['google_vision_endpoint'].strip()
+            if google_vision_endpoint:
+                from ocr_clients import is_plain_api_key
+                api_key = config_updates.get('ocr_api_key', config_manager.config.get('ocr_api_key', ''))
+                if not is_plain_api_key(api_key):
+                    return jsonify({
+                        'success': False,
+                        'error': 'Google VisionのREST APIエンドポイントを使う場合、APIキーにはAPIキーのみ指定できます'
+                    }), 400
+            config_updates['google_vision_endpoint'] = google_vision_endpoint
+        
         # 抽出設定
         if 'enable_customer_extraction' in data:
             config_updates['enable_customer_extraction'] = data['enable_customer_extraction']
@@ -3912,11 +4414,20 @@ def save_common_settings():
                 
                 # 設定変更時にキャッシュをクリア
                 try:
-                    clear_cache()
+                    clear_cache(include_persistent=True)
                     logger.info("共通設定変更によりキャッシュをクリアしました")
                 except Exception as e:
                     logger.warning(f"キャッシュクリア中にエラー: {e}")
                 
+                # OCRの認証情報・エンドポイントを変更した場合は、共有しているOCRクライアントを作り直す
+                if {'ocr_method', 'ocr_api_key', 'ocr_endpoint', 'google_vision_endpoint'} & set(config_updates):
+                    try:
+                        from ocr_clients import clear_clients
+                        clear_clients()
+                        logger.info("OCR設定変更により共有OCRクライアントを破棄しました")
+                    except Exception as e:
+                        logger.warning(f"OCRクライアントの破棄中にエラー: {e}")
+                
                 return jsonify({
                     'success': True,
                     'message': '共通設定が正常に保存されました'
@@ -4018,7 +4529,7 @@ def save_advanced_settings():
                 
                 # 設定変更時にキャッシュをクリア
                 try:
-                    clear_cache()
+                    clear_cache(include_persistent=True)
                     logger.info("高度な設定変更によりキャッシュをクリアしました")
                 except Exception as e:
                     logger.warning(f"キャッシュクリア中にエラー: {e}")
@@ -4832,6 +5343,75 @@ def api_health_check():
         'encryption_available': cipher_suite is not None
     }), 200
 
+
+@app.route('/api/health/ocr', methods=['GET'])
+def api_ocr_health_check():
+    """OCRワーカープールの状態とメトリクス（キュー待ち時間・OCR処理時間・OCR結果キャッシュのヒット数）"""
+    try:
+        import ocr_pool
+        from ocr_cache import get_ocr_cache
+        cache = get_ocr_cache(get_config())
+    except Exception as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    cache_stats = cache.stats() if cache is not None else None
+    
+    # tesserocrがない場合はページごとにtesseractを起動するため、常駐ワーカーの効果がない
+    if ocr_pool.OCR_AVAILABLE and not ocr_pool.TESSEROCR_AVAILABLE:
+        return jsonify({
+            'status': 'degraded',
+            'engine': ocr_pool.engine_name(),
+            'error': 'tesserocrが利用できないため、OCRはページごとにtesseractを起動して実行されています',
+            'cache': cache_stats
+        }), 503
+    
+    if not ocr_pool.OCR_AVAILABLE or not get_config().get('ocr_pool_enabled', True):
+        return jsonify({'status': 'disabled', 'cache': cache_stats}), 200
+    
+    # ヘルスチェックでワーカーを起動しないよう、起動済みのプールだけを確認する
+    pool = ocr_pool.current_ocr_pool()
+    if pool is None:
+        return jsonify({'status': 'not_started', 'engine': ocr_pool.engine_name(), 'cache': cache_stats}), 200
+    
+    health = pool.health()
+    healthy = all(worker['alive'] for worker in health['workers'])
+    return jsonify({'status': 'healthy' if healthy else 'degraded', **health, 'cache': cache_stats}), 200 if healthy else 503
+
+
+@app.route('/api/metrics/stages', methods=['GET'])
+@admin_required
+def api_stage_metrics():
+    """/processの段階ごとの処理時間のヒストグラム（段階・抽出方法・決済プロバイダーごと。全ワーカーの合算）"""
+    return jsonify({'buckets_ms': list(stage_timing.DEFAULT_BUCKETS_MS),
+                    'stages': stage_timing.get_registry().snapshot()}), 200
+
+
+def metrics_access_required(f):
+    # Prometheusの取得用のルートに対するデコレータ
+    # ログインページへのリダイレクトではなく、設定のトークン（Authorization: Bearer）か接続元IP
+    # （metrics_token / metrics_allowed_ips）で認可し、許可されない場合は401を返す
+    # ブラウザで確認する管理者は従来どおりアクセスできる
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if stage_timing.scrape_allowed(get_config(), request.headers.get('Authorization'), request.remote_addr):
+            return f(*args, **kwargs)
+        if current_user and getattr(current_user, 'is_authenticated', False) and getattr(current_user, 'is_admin', False):
+            return f(*args, **kwargs)
+        response = jsonify({'error': 'メトリクスを取得する権限がありません'})
+        response.headers['WWW-Authenticate'] = 'Bearer'
+        return response, 401
+    return decorated_function
+
+
+@app.route('/metrics', methods=['GET'])
+@metrics_access_required
+def prometheus_metrics():
+    """Prometheus形式のメトリクス（全ワーカーの合算。prometheus_clientがない場合は404）"""
+    exposition = stage_timing.prometheus_exposition()
+    if exposition is None:
+        return jsonify({'error': 'prometheus_clientが利用できません'}), 404
+    body, content_type = exposition
+    return Response(body, content_type=content_type)
+
 # Gunicorn用のアプリケーションオブジェクト
 try:
     application = create_app()
@@ -4879,5 +5459,9 @@ if __name__ == '__main__':
     for rule in application.url_map.iter_rules():
         logger.info(f"Route: {rule.endpoint} - {rule.rule} - {rule.methods}")
     
+    # 開発サーバーではジョブのワーカーを同じプロセスのスレッドで動かす（gunicornではgunicorn.conf.pyが別プロセスで起動する）
+    if JOB_QUEUE_AVAILABLE:
+        job_queue.create_job_worker(get_config()).start()
+    
     # アプリケーションを実行
     application.run(debug=debug_mode, host=host, port=port)
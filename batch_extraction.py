@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+一括抽出モジュール
+ルールを変更した後に過去の請求書を再抽出する場合など、多数のページのテキストをまとめて処理する
+
+金額は全文書の候補の特徴量（キーワード・位置・円記号・金額）をNumPyの配列にまとめ、
+AmountExtractor.score_candidateと同じスコアを1回の配列演算で計算して文書ごとの最上位を選ぶ
+結果は文書ごとにextract_invoice_amountを呼んだ場合と同じになる（NumPyがない場合は文書ごとに処理する）
+顧客名は文書ごとにextract_customerを呼ぶ
+"""
+
+import math
+import logging
+from itertools import chain
+from operator import attrgetter
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from text_normalizer import NormalizedDocument
+from extraction_engine import as_stream
+from amount_extractor import extractor, extract_invoice_amount
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.warning("NumPyが利用できません。一括抽出は文書ごとに処理します。")
+
+# 候補から取り出す特徴量（CandidateFeaturesの列と同じ順）
+_FEATURES = attrgetter('amount', 'kw_exact', 'kw_loose', 'page_last', 'bottom', 'has_yen')
+_N_FEATURES = 6
+_LINE = attrgetter('line')
+
+
+class CandidateFeatures(NamedTuple):
+    """全文書の金額候補の特徴量（各列は候補ごとの配列。候補は文書順・ページ順・行順に並ぶ）"""
+    doc: Any  # 候補の文書番号
+    amount: Any
+    kw_exact: Any
+    kw_loose: Any
+    page_last: Any
+    bottom: Any
+    has_yen: Any
+    lines: List[str]  # 候補の行（最上位の候補の行を返すのに使う）
+
+
+def _page_counts(page_count: Union[int, Sequence[int]], n_docs: int) -> Sequence[int]:
+    """ページ数の指定（全文書共通の値または文書ごとの値）を文書ごとの値にする"""
+    if isinstance(page_count, int):
+        return [page_count] * n_docs
+    if len(page_count) != n_docs:
+        raise ValueError(f"page_countの数がテキストの数と一致しません: {len(page_count)} != {n_docs}")
+    return page_count
+
+
+def build_features(documents: Sequence[Union[str, NormalizedDocument]],
+                   page_count: Union[int, Sequence[int]] = 1) -> CandidateFeatures:
+    """
+    全文書の金額候補を収集し、特徴量を配列にまとめる
+
+    Args:
+        documents: テキストまたはNormalizedDocumentのリスト
+        page_count: ページ数（全文書共通の値、または文書ごとの値のリスト）
+
+    Returns:
+        CandidateFeatures: 候補ごとの特徴量
+    """
+    page_counts = _page_counts(page_count, len(documents))
+    # 候補のオブジェクトは文書ごとに捨て、特徴量は整数のリストに、行は文字列のリストに溜める
+    # （数千件分のオブジェクトを保持すると、ガベージコレクションの走査が増えて文書ごとの処理より遅くなる）
+    values = []
+    lines = []
+    doc_ids = []
+    for doc_id, text in enumerate(documents):
+        count = int(page_counts[doc_id])
+        positions = None
+        if isinstance(text, NormalizedDocument):
+            # 呼び出し元が持つNormalizedDocumentは、行のトークンをextraction_engineと共有する
+            tokens = as_stream(text).line_tokens()
+            if text.layout is not None and count == 1:
+                positions = text.layout.line_positions(text.lines)
+        else:
+            tokens = extractor.scan_lines((text or "").split('\n'))
+        document_candidates = extractor.collect_page_candidates(tokens, count, positions)
+        values.extend(chain.from_iterable(map(_FEATURES, document_candidates)))
+        lines.extend(map(_LINE, document_candidates))
+        doc_ids.extend([doc_id] * len(document_candidates))
+
+    columns = np.array(values, dtype=np.int64).reshape(-1, _N_FEATURES).T
+    return CandidateFeatures(np.array(doc_ids, dtype=np.int64), *columns, lines=lines)
+
+
+def score_features(features: CandidateFeatures) -> 'np.ndarray':
+    """
+    AmountExtractor.score_candidateと同じスコアを全候補について計算する
+    浮動小数点の加算もscore_candidateと同じ順に行い、同点の判定まで同じ結果にする
+    """
+    amount = features.amount
+    # キーワード一致・位置・円記号のスコア（整数の和なので誤差はない）
+    scores = (6 * features.kw_exact + 3 * features.kw_loose + 2 * features.page_last
+              + features.bottom + 2 * features.has_yen).astype(np.float64)
+
+    # 金額の大きさ（対数）: np.log10はmath.log10と最後の桁が異なる場合があるため、
+    # 異なる金額ごとにmath.log10で計算する（同じ金額が多いため計算回数は候補数より少ない）
+    if len(amount):
+        unique, inverse = np.unique(amount, return_inverse=True)
+        logs = np.array([math.log10(value) if value > 0 else 0.0 for value in unique.tolist()], dtype=np.float64)
+        scores += logs[inverse.reshape(-1)]
+
+    # 丸い数字（1000や10000の倍数）のボーナス
+    scores += np.where(amount % 1000 == 0, 0.5, 0.0)
+    scores += np.where(amount % 10000 == 0, 0.5, 0.0)
+    return scores
+
+
+def pick_best(doc: 'np.ndarray', scores: 'np.ndarray', n_docs: int) -> 'np.ndarray':
+    """
+    文書ごとに最高スコアの候補の位置を返す（候補のない文書は-1）
+    同じスコアの場合は先に見つかった候補を選ぶ（文書ごとの処理のmaxと同じ）
+    """
+    best = np.full(n_docs, -1, dtype=np.int64)
+    if not len(scores):
+        return best
+    # 文書番号の昇順 → スコアの降順 → 候補の順で並べ、各文書の先頭を選ぶ
+    order = np.lexsort((np.arange(len(scores)), -scores, doc))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = doc[order[1:]] != doc[order[:-1]]
+    best[doc[order[first]]] = order[first]
+    return best
+
+
+def extract_invoice_amounts(texts: Sequence[Union[str, NormalizedDocument]],
+                            page_count: Union[int, Sequence[int]] = 1) -> List[Tuple[Optional[int], str]]:
+    """
+    複数のテキストから請求金額を一括で抽出する
+
+    Args:
+        texts: テキストまたはNormalizedDocumentのリスト
+        page_count: ページ数（全文書共通の値、または文書ごとの値のリスト）
+
+    Returns:
+        List[Tuple]: 文書ごとの(金額, 抽出元の行)。extract_invoice_amountと同じ値
+    """
+    page_counts = _page_counts(page_count, len(texts))
+    if not NUMPY_AVAILABLE:
+        return [extract_invoice_amount(text, page_count=count) for text, count in zip(texts, page_counts)]
+
+    features = build_features(texts, page_counts)
+    best = pick_best(features.doc, score_features(features), len(texts))
+    amounts = features.amount.tolist()
+    return [(None, "") if index < 0 else (amounts[index], features.lines[index]) for index in best.tolist()]
+
+
+def extract_batch(texts: Sequence[Union[str, NormalizedDocument]], filenames: Optional[Sequence[Optional[str]]] = None,
+                  page_count: Union[int, Sequence[int]] = 1, force_refresh: bool = False) -> List[Dict[str, Any]]:
+    """
+    複数のテキストから請求金額と顧客名を一括で抽出する
+
+    Args:
+        texts: テキストまたはNormalizedDocumentのリスト
+        filenames: 文書ごとのPDFファイル名（顧客名の候補に使う。省略可）
+        page_count: ページ数（全文書共通の値、または文書ごとの値のリスト）
+        force_refresh: 顧客名のキャッシュを無視して再抽出する（ルール変更後の再抽出用）
+
+    Returns:
+        List[Dict]: 文書ごとの抽出結果（amount, amount_line, customer）
+    """
+    from customer_extractor import extract_customer
+
+    if filenames is None:
+        filenames = [None] * len(texts)
+    elif len(filenames) != len(texts):
+        raise ValueError(f"filenamesの数がテキストの数と一致しません: {len(filenames)} != {len(texts)}")
+
+    amounts = extract_invoice_amounts(texts, page_count)
+    results = []
+    for text, filename, (amount, line) in zip(texts, filenames, amounts):
+        results.append({
+            'amount': amount,
+            'amount_line': line,
+            'customer': extract_customer(text, filename, force_refresh=force_refresh),
+        })
+    logger.info(f"一括抽出: {len(texts)} 件")
+    return results
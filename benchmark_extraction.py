@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抽出処理のマイクロベンチマーク
+大量の請求書テキストに対して金額抽出（amount_extractor）・顧客名抽出（customer_extractor）・
+キーワード照合（keyword_automaton）・一括抽出（batch_extraction）の処理時間と、約1MBのOCR出力に対するテキスト正規化（text_normalizer）のスループットを測る
+大きな文書（請求書を連結した1ページ）での候補・抽出処理のメモリ使用量とメモリ確保の回数も測る（tracemalloc）
+
+使い方:
+    python benchmark_extraction.py                      # 合成した請求書テキスト2000件
+    python benchmark_extraction.py --invoices 10000 --repeat 5
+    python benchmark_extraction.py --corpus texts/      # ディレクトリ内の*.txtを請求書テキストとして使う
+"""
+
+import os
+import sys
+import glob
+import time
+import random
+import logging
+import argparse
+import statistics
+import tracemalloc
+
+import amount_extractor
+import batch_extraction
+import customer_extractor
+import text_normalizer
+from keyword_automaton import extraction_automaton
+
+CUSTOMERS = ["株式会社山田商事", "有限会社サンプル", "医療法人さくら会", "田中 太郎", "合同会社テスト"]
+ITEMS = ["システム保守費", "ライセンス料", "出張費", "消耗品", "作業費", "交通費"]
+
+
+def synthetic_invoice(rng: random.Random) -> str:
+    """郵便番号・電話番号・日付・明細・小計などを含む請求書らしいテキストを作る"""
+    lines = [
+        "請求書",
+        f"〒{rng.randint(100, 999)}-{rng.randint(1000, 9999)} 東京都千代田区丸の内{rng.randint(1, 9)}-{rng.randint(1, 20)}",
+        f"{rng.choice(CUSTOMERS)} 御中",
+        f"TEL：03-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}  FAX：03-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+        f"請求日 2024年{rng.randint(1, 12)}月{rng.randint(1, 28)}日",
+        f"受給者番号（{rng.randint(1000000, 9999999)}）",
+        "下記のとおりご請求申し上げます。",
+        "品名 数量 単価 金額",
+    ]
+    subtotal = 0
+    for _ in range(rng.randint(3, 30)):
+        quantity = rng.randint(1, 20)
+        price = rng.randint(1, 500) * 100
+        subtotal += quantity * price
+        lines.append(f"{rng.choice(ITEMS)} {quantity} {price:,} {quantity * price:,}")
+    tax = subtotal // 10
+    lines += [
+        f"小計 ¥{subtotal:,}",
+        f"消費税（10%） ¥{tax:,}",
+        f"ご請求金額 ￥{subtotal + tax:,}円",
+        "お振込先 ○○銀行 本店 普通 1234567",
+        "お支払期限 2024年12月31日",
+    ]
+    return "\n".join(lines)
+
+
+def ocr_output(texts, size_mb: float, rng: random.Random) -> str:
+    """請求書テキストに全角文字・文字化け・制御文字・余分な空白を混ぜたOCR出力らしいテキストを約size_mb MB作る"""
+    noise = ["　", "  ", "\t", "�", "��", "\x0c", "１２，３４５", "：", "ー", "／", "％", "￥"]
+    parts = []
+    size = 0
+    limit = int(size_mb * 1024 * 1024)
+    while size < limit:
+        for line in texts[rng.randrange(len(texts))].split("\n"):
+            line = line + rng.choice(noise) if rng.random() < 0.3 else line
+            parts.append(line)
+            size += len(line.encode("utf-8")) + 1
+    return "\n".join(parts)
+
+
+def load_corpus(args) -> list:
+    if args.corpus:
+        texts = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.txt"))):
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read())
+        return texts
+    rng = random.Random(args.seed)
+    return [synthetic_invoice(rng) for _ in range(args.invoices)]
+
+
+def bench(name, func, texts, repeat, batch=False):
+    """batch=Trueの場合はfuncに全件のリストを1回で渡す（一括抽出用）"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if batch:
+            func(texts)
+        else:
+            for text in texts:
+                func(text)
+        durations.append(time.perf_counter() - started)
+    best = min(durations)
+    chars = sum(len(text) for text in texts)
+    print(f"{name}: best {best * 1000:.1f} ms / median {statistics.median(durations) * 1000:.1f} ms "
+          f"({best / len(texts) * 1e6:.1f} us/件, {chars / best / 1e6:.2f} M文字/秒)")
+
+
+def measure_memory(name, func, text):
+    """
+    funcを1回実行した時のメモリのピーク（実行前からの増加分）、
+    実行中に確保したメモリブロックの数（ピーク時点）と、結果として残るメモリを出力する
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = func(text)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = [stat for stat in after.compare_to(before, "filename") if stat.size_diff > 0]
+    retained_bytes = sum(stat.size_diff for stat in retained)
+    retained_blocks = sum(stat.count_diff for stat in retained)
+    print(f"{name}: ピーク {(peak - base) / 1024:.1f} KB, "
+          f"結果 {retained_bytes / 1024:.1f} KB ({retained_blocks:,} ブロック)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽出処理のマイクロベンチマーク")
+    parser.add_argument("--corpus", help="請求書テキスト（*.txt）のディレクトリ")
+    parser.add_argument("--invoices", type=int, default=2000, help="合成する請求書の件数")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--normalizer-mb", type=float, default=1.0, help="正規化のベンチマークに使うOCR出力の大きさ（MB）")
+    parser.add_argument("--memory-invoices", type=int, default=200, help="メモリ測定に使う大きな文書に連結する請求書の件数")
+    args = parser.parse_args()
+
+    texts = load_corpus(args)
+    if not texts:
+        print("請求書テキストがありません")
+        return 1
+    print(f"請求書 {len(texts)} 件, {sum(len(t) for t in texts):,} 文字")
+
+    # 抽出処理のログ（INFO・WARNING）を出力しない
+    logging.disable(logging.WARNING)
+
+    automaton = extraction_automaton()
+    bench("キーワード照合（全行）",
+          lambda text: [automaton.match(line) for line in text.split("\n")], texts, args.repeat)
+    bench("extract_invoice_amount", amount_extractor.extract_invoice_amount, texts, args.repeat)
+    bench("extract_invoice_amount (3ページ)",
+          lambda text: amount_extractor.extract_invoice_amount(text, 3), texts, args.repeat)
+    bench("extract_customer",
+          lambda text: customer_extractor.extract_customer(text, force_refresh=True), texts, args.repeat)
+    bench("extract_invoice_amounts（一括）", batch_extraction.extract_invoice_amounts, texts, args.repeat, batch=True)
+    bench("extract_invoice_amounts（一括・3ページ）",
+          lambda batch: batch_extraction.extract_invoice_amounts(batch, 3), texts, args.repeat, batch=True)
+
+    # テキスト正規化（変換表による高速化と従来の手順）
+    ocr_text = ocr_output(texts, args.normalizer_mb, random.Random(args.seed))
+    normalizer = text_normalizer.normalizer
+    print(f"OCR出力 {len(ocr_text.encode('utf-8')) / 1024 / 1024:.2f} MB, {len(ocr_text):,} 文字")
+    bench("normalize_text", normalizer.normalize, [ocr_text], args.repeat)
+    bench("normalize_text（従来の手順）", normalizer._normalize_slow, [ocr_text], args.repeat)
+    bench("extract_readable_content", normalizer.extract_readable_text, [ocr_text], args.repeat)
+
+    # 大きな文書でのメモリ使用量（金額候補・顧客名候補）
+    large_text = "\n".join(texts[i % len(texts)] for i in range(args.memory_invoices))
+    print(f"大きな文書 {len(large_text):,} 文字, {large_text.count(chr(10)) + 1:,} 行")
+    tokens = amount_extractor.extractor.scan_lines(large_text.split("\n"))
+    measure_memory("金額候補（collect_candidates_from_tokens）",
+                   amount_extractor.extractor.collect_candidates_from_tokens, tokens)
+    measure_memory("extract_invoice_amount", amount_extractor.extract_invoice_amount, large_text)
+    measure_memory("extract_customer",
+                   lambda text: customer_extractor.extract_customer(text, force_refresh=True), large_text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
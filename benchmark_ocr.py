@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+拡張OCRのベンチマーク
+enhanced_ocrの旧パイプライン（ページ・前処理・領域ごとにPNGを書き出して読み直す）と、
+メモリ上で画像を受け渡す現在のパイプラインのページあたりの処理時間を比較する
+
+使い方:
+    python benchmark_ocr.py sample.pdf --pages 3 --repeat 3
+    python benchmark_ocr.py sample.pdf --skip-ocr   # OCRを除いた受け渡しのコストだけを測る
+    python benchmark_ocr.py sample.pdf --skip-ocr --profile auto   # 現在のパイプラインの前処理プロファイルを指定する
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import cv2
+import pytesseract
+from PIL import Image
+
+import enhanced_ocr
+import ocr_pool
+from page_rasterizer import iter_page_images
+
+
+def _regions(gray):
+    height, width = gray.shape
+    return {
+        "top": gray[0:int(height*0.3), 0:width],
+        "middle": gray[int(height*0.3):int(height*0.7), 0:width],
+        "bottom": gray[int(height*0.7):height, 0:width],
+        "left": gray[0:height, 0:int(width*0.5)],
+        "right": gray[0:height, int(width*0.5):width],
+        "center": gray[int(height*0.3):int(height*0.7), int(width*0.3):int(width*0.7)]
+    }
+
+
+def legacy_page(image):
+    """旧パイプライン: ページPNG → 前処理PNG → 領域PNGの順にディスクを経由する"""
+    def ocr(img):
+        return pytesseract.image_to_string(img, lang='jpn+eng')
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        page_path = os.path.join(temp_dir, "page.png")
+        image.save(page_path, "PNG")
+
+        gray = cv2.cvtColor(cv2.imread(page_path), cv2.COLOR_BGR2GRAY)
+        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+        binary = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        processed_path = os.path.join(temp_dir, "processed.png")
+        cv2.imwrite(processed_path, binary)
+
+        if enhanced_ocr.check_tesseract_available():
+            ocr(Image.open(processed_path))
+
+        layout = cv2.cvtColor(cv2.imread(processed_path), cv2.COLOR_BGR2GRAY)
+        for name, region in _regions(layout).items():
+            region_path = os.path.join(temp_dir, f"{name}.png")
+            cv2.imwrite(region_path, region)
+            ocr(Image.open(region_path))
+            os.unlink(region_path)
+        ocr(Image.open(processed_path))
+
+        os.unlink(processed_path)
+        os.unlink(page_path)
+    finally:
+        os.rmdir(temp_dir)
+
+
+def in_memory_page(image, profile="full", timings=None):
+    """現在のパイプライン: enhanced_ocrの1ページ分の処理をそのまま実行する"""
+    enhanced_ocr._extract_page_texts(image, {'ocr_preprocess_profile': profile}, [], {}, timings=timings)
+
+
+def run(pdf_path, pages, repeat, dpi, skip_ocr, profile="full"):
+    images = [image.copy() for _, image in iter_page_images(pdf_path, dpi=dpi, page_numbers=range(1, pages + 1))]
+    print(f"{pdf_path}: {len(images)}ページ, dpi={dpi}, repeat={repeat}, OCR={'なし' if skip_ocr else 'あり'}, "
+          f"前処理={profile}")
+
+    with ExitStack() as stack:
+        if skip_ocr:
+            # OCR自体は実行せず、画像の受け渡しと前処理のコストだけを比較する
+            stack.enter_context(patch.object(pytesseract, 'image_to_string', return_value=''))
+            stack.enter_context(patch.object(pytesseract, 'get_tesseract_version', return_value='0'))
+            stack.enter_context(patch.object(ocr_pool, 'image_to_string', return_value=''))
+            stack.enter_context(patch.object(ocr_pool, 'image_to_data', return_value={'text': []}))
+        step_timings = []
+
+        def current_page(image):
+            timing = {}
+            in_memory_page(image, profile, timing)
+            step_timings.append(timing)
+
+        for label, pipeline in (("旧パイプライン（PNG経由）", legacy_page), ("メモリ上のパイプライン", current_page)):
+            timings = []
+            for _ in range(repeat):
+                for image in images:
+                    start = time.perf_counter()
+                    pipeline(image)
+                    timings.append(time.perf_counter() - start)
+            print(f"  {label}: 平均 {statistics.mean(timings) * 1000:.1f} ms/ページ, "
+                  f"中央値 {statistics.median(timings) * 1000:.1f} ms/ページ")
+
+    # 現在のパイプラインの処理ごとの内訳（平均）
+    steps = sorted({step for timing in step_timings for step in timing if step not in ("profile", "noise")})
+    for step in steps:
+        values = [timing[step] for timing in step_timings if timing.get(step) is not None]
+        print(f"    {step}: 平均 {statistics.mean(values):.1f} ms")
+    profiles = [timing.get("profile") for timing in step_timings]
+    print("    選ばれた前処理: " + ", ".join(f"{name}={profiles.count(name)}" for name in sorted(set(profiles), key=str)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='enhanced_ocrのページあたり処理時間を比較する')
+    parser.add_argument('pdf', help='計測に使うPDFファイル')
+    parser.add_argument('--pages', type=int, default=3, help='計測するページ数')
+    parser.add_argument('--repeat', type=int, default=3, help='繰り返し回数')
+    parser.add_argument('--dpi', type=int, default=300, help='画像化の解像度')
+    parser.add_argument('--skip-ocr', action='store_true', help='OCRを実行せず受け渡しのコストだけを測る')
+    parser.add_argument('--profile', default='full', choices=['auto', 'none', 'fast', 'full'],
+                        help='現在のパイプラインで使う前処理プロファイル')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pdf):
+        print(f"ファイルが見つかりません: {args.pdf}")
+        return 1
+    run(args.pdf, args.pages, args.repeat, args.dpi, args.skip_ocr, args.profile)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+メモリ上の上限付きキャッシュモジュール
+エントリ数の上限（LRUで削除）と有効期間（TTL）を持つ、スレッドセーフなプロセス内キャッシュ
+顧客名抽出やapp.pyの処理結果など、モジュールレベルの辞書で持っていたキャッシュの代わりに使う
+
+- キーは内容のハッシュ（content_key）にすると、同じファイル名で内容が異なる場合も古い結果を返さない
+- ヒット・ミス・削除の件数をstats()で取得できる
+- 名前付きのキャッシュはget_memory_cacheでプロセス内に1つだけ作り、cache_statsでまとめて確認できる
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 3600
+
+_MISSING = object()
+
+
+def content_key(text: str, *parts: Optional[str]) -> str:
+    """
+    テキスト全体と付加情報（ファイル名など）のSHA-256からキャッシュキーを作る
+
+    Args:
+        text: キーにするテキスト
+        parts: キーに含める付加情報（Noneは空文字として扱う）
+
+    Returns:
+        str: 16進数のハッシュ値
+    """
+    sha256 = hashlib.sha256(text.encode('utf-8', 'surrogatepass'))
+    for part in parts:
+        sha256.update(b'\0')
+        sha256.update((part or '').encode('utf-8', 'surrogatepass'))
+    return sha256.hexdigest()
+
+
+class BoundedCache:
+    """エントリ数の上限（LRU）と有効期間（TTL）を持つスレッドセーフなキャッシュ"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 name: str = 'cache', clock: Callable[[], float] = time.monotonic):
+        """
+        初期化
+
+        Args:
+            max_entries: 最大エントリ数（0以下の場合は上限なし）
+            ttl_seconds: エントリの有効期間（秒、0以下の場合は期限なし）
+            name: ログや統計に使う名前
+            clock: 現在時刻（秒）を返す関数
+        """
+        self.name = name
+        self.max_entries = int(max_entries or 0)
+        self.ttl_seconds = float(ttl_seconds or 0)
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # キー → (値, 期限)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _expired(self, expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and now >= expires_at
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """値を取得する（ない場合・期限切れの場合はdefault）。取得したエントリは最近使ったものとして扱う"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+            value, expires_at = entry
+            if self._expired(expires_at, self._clock()):
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """値を保存し、上限を超えた分を最後に使った時刻の古い順に削除する"""
+        now = self._clock()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            if self.max_entries > 0 and len(self._entries) > self.max_entries:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # 期限切れのエントリを先に削除し、それでも上限を超える場合は古い順に削除する
+        if self.ttl_seconds > 0:
+            expired = [key for key, (_, expires_at) in self._entries.items() if self._expired(expires_at, now)]
+            for key in expired:
+                del self._entries[key]
+            self._expirations += len(expired)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """エントリを削除して値を返す（ない場合・期限切れの場合はdefault）"""
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+        if entry is _MISSING or self._expired(entry[1], self._clock()):
+            return default
+        return entry[0]
+
+    def clear(self) -> None:
+        """全エントリを削除する（統計は残す）"""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        # 統計と使用順は変更しない
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            return entry is not _MISSING and not self._expired(entry[1], self._clock())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """エントリ数・ヒット数・ミス数・削除数（上限による削除と期限切れ）・ヒット率を返す"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+
+
+_caches: Dict[str, BoundedCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_memory_cache(name: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                     ttl_seconds: float = DEFAULT_TTL_SECONDS) -> BoundedCache:
+    """
+    名前ごとにプロセス内で共有するキャッシュを取得する（上限と有効期間は最初の呼び出しの値を使う）
+
+    Args:
+        name: キャッシュの名前
+        max_entries: 最大エントリ数
+        ttl_seconds: エントリの有効期間（秒）
+
+    Returns:
+        BoundedCache
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = BoundedCache(max_entries=max_entries, ttl_seconds=ttl_seconds, name=name)
+            _caches[name] = cache
+            logger.debug(f"メモリキャッシュを作成しました: {name} (最大{cache.max_entries}件, {cache.ttl_seconds}秒)")
+        return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """get_memory_cacheで作成した全キャッシュの統計を返す"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+一括アップロードモジュール
+複数PDF（multipart）またはZIPアーカイブを受け取り、アップロードフォルダに展開して
+並列に処理し、完了した順に結果を返す（/process/bulkは非同期ジョブとして実行する）
+"""
+
+import os
+import uuid
+import shutil
+import zipfile
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from werkzeug.utils import secure_filename
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+DEFAULT_BULK_WORKERS = 4
+DEFAULT_MAX_FILES = 500
+DEFAULT_MAX_TOTAL_MB = 500
+
+
+class BulkUploadError(ValueError):
+    """一括アップロードの内容が不正な場合の例外"""
+
+
+def _unique_path(upload_folder: str, filename: str, used: set) -> Tuple[str, str]:
+    """同じバッチ内・既存ファイルと重複しないファイル名とパスを返す"""
+    base, ext = os.path.splitext(filename)
+    candidate = filename
+    while candidate in used or os.path.exists(os.path.join(upload_folder, candidate)):
+        candidate = f"{base}_{uuid.uuid4().hex[:8]}{ext}"
+    used.add(candidate)
+    return candidate, os.path.join(upload_folder, candidate)
+
+
+def save_bulk_files(files, upload_folder: str, max_files: int = DEFAULT_MAX_FILES,
+                    max_total_bytes: int = DEFAULT_MAX_TOTAL_MB * 1024 * 1024) -> List[Tuple[str, str]]:
+    """
+    アップロードされたファイル群を保存する（ZIPの場合は中のPDFを展開する）
+
+    Args:
+        files: werkzeugのFileStorageのリスト
+        upload_folder: 保存先フォルダ
+        max_files: 1回のバッチで受け付けるPDFの最大数
+        max_total_bytes: 展開後の合計サイズの上限（ZIP爆弾対策）
+
+    Returns:
+        List[Tuple[str, str]]: (ファイル名, 保存パス)のリスト
+
+    Raises:
+        BulkUploadError: ファイル数・サイズが上限を超えた場合、ZIPが壊れている場合
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    saved = []
+    used = set()
+    total_bytes = 0
+
+    def check_limits(size):
+        nonlocal total_bytes
+        if len(saved) >= max_files:
+            raise BulkUploadError(f"一度に処理できるファイルは{max_files}件までです")
+        total_bytes += size
+        if total_bytes > max_total_bytes:
+            raise BulkUploadError(f"合計サイズが上限（{max_total_bytes // (1024 * 1024)}MB）を超えています")
+
+    for storage in files:
+        original = storage.filename or ''
+        if original.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(storage.stream) as archive:
+                    for info in archive.infolist():
+                        if info.is_dir() or not info.filename.lower().endswith('.pdf'):
+                            continue
+                        # ディレクトリ構造は無視し、ファイル名だけを安全に扱う
+                        name = secure_filename(os.path.basename(info.filename))
+                        if not name:
+                            continue
+                        check_limits(info.file_size)
+                        name, path = _unique_path(upload_folder, name, used)
+                        # zipfileはヘッダーのサイズを超えるデータを読まないため、check_limitsの上限が守られる
+                        with archive.open(info) as src, open(path, 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+                        saved.append((name, path))
+            except zipfile.BadZipFile:
+                raise BulkUploadError(f"ZIPファイルを読み込めません: {original}")
+        elif original.lower().endswith('.pdf'):
+            name = secure_filename(original)
+            if not name:
+                continue
+            storage.stream.seek(0, os.SEEK_END)
+            check_limits(storage.stream.tell())
+            storage.stream.seek(0)
+            name, path = _unique_path(upload_folder, name, used)
+            storage.save(path)
+            saved.append((name, path))
+        else:
+            logger.warning(f"PDF・ZIP以外のファイルはスキップします: {original}")
+
+    logger.info(f"一括アップロード: {len(saved)}件のPDFを保存しました")
+    return saved
+
+
+def iter_completed(items: List[Tuple[str, str]], process: Callable[[str, str], Dict[str, Any]],
+                   max_workers: int = DEFAULT_BULK_WORKERS) -> Iterator[Dict[str, Any]]:
+    """
+    ファイルを並列に処理し、完了した順に結果を返す
+    同時に投入するのはmax_workersの2倍までとし、呼び出し元が途中で読むのをやめた場合
+    （ジェネレータのclose）は、未着手のファイルを処理しない（実行中のファイルの完了は待つ）
+
+    Args:
+        items: (ファイル名, パス)のリスト
+        process: 1ファイルを処理する関数 process(filepath, filename) -> 結果の辞書
+        max_workers: 同時に処理するファイル数
+
+    Yields:
+        Dict: 処理結果（indexにitems内の位置を付与）
+    """
+    if not items:
+        return
+
+    workers = max(1, min(max_workers, len(items)))
+    window = workers * 2
+    pending_items = iter(enumerate(items))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-bulk')
+    futures = {}
+    submitted = 0
+
+    def fill():
+        nonlocal submitted
+        while len(futures) < window:
+            entry = next(pending_items, None)
+            if entry is None:
+                return
+            index, (name, path) = entry
+            futures[executor.submit(process, path, name)] = (index, name)
+            submitted += 1
+
+    try:
+        fill()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"一括処理中にエラーが発生しました ({name}): {str(e)}")
+                    result = {'filename': name, 'success': False, 'error': str(e)}
+                result = dict(result or {'filename': name, 'success': False, 'error': '処理結果が空です'})
+                result['index'] = index
+                yield result
+            fill()
+    finally:
+        if futures:
+            logger.warning(f"一括処理を中断しました（処理中: {len(futures)}件、未着手: {len(items) - submitted}件）")
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -56,9 +56,72 @@ DEFAULT_CONFIG = {
     # OCR設定
     "enable_customer_extraction": "1",
     "enable_amount_extraction": "1",
+    "customer_cache_max_entries": 1000,  # 顧客名キャッシュ（メモリ上）の最大件数
+    "customer_cache_ttl_seconds": 3600,  # 顧客名キャッシュの有効期間（秒）
     "use_ai_ocr": False,
     "ocr_method": "tesseract",
-    "ocr_endpoint": "",
+    "ocr_endpoint": "",  # Azure Form Recognizerのエンドポイント
+    "google_vision_endpoint": "",  # Google VisionのREST APIのエンドポイント（指定した場合はAPIキーで直接呼び出す）
+    "ai_ocr_batch_size": 8,  # Google Visionの1リクエストにまとめるページ数（上限16）
+    "ai_ocr_max_in_flight": 2,  # 同時に送信するバッチ数
+    "ai_ocr_client_workers": 4,  # バッチを送信するプロセス共有のスレッド数（全リクエストの合計の同時送信数）
+    "ocr_dpi": 0,  # OCR時の画像化解像度（0の場合は処理ごとのデフォルト）
+    "ocr_memory_budget_mb": 256,  # OCR時に同時に保持する画像のメモリ上限
+    "ocr_pool_enabled": True,  # 言語データを読み込んだままの常駐OCRワーカーを使う
+    "ocr_pool_workers": 0,  # 0の場合はCPUコア数 // gunicornのワーカー数（WEB_CONCURRENCY）
+    "ocr_pool_task_timeout": 120,  # 1ページのOCRの最大時間（超えたワーカーは再起動）
+    "ocr_pool_health_interval": 5,  # ワーカーの死活監視の間隔（秒）
+    "ocr_pool_wait_timeout": 60,  # プールの結果を待つ最大時間（秒、gunicornの--timeoutより短くする。待ちきれないページは取り消す）
+    "ocr_confidence_threshold": 0.9,  # この信頼度以上の結果が得られたら残りのOCR手法を打ち切る
+    "ocr_page_deadline": 60,  # 拡張OCRで1ページにかける最大時間（秒）
+    "ocr_cloud_delay": None,  # 有料のクラウドOCRを開始する前にローカルOCRの結果を待つ時間（秒）。Noneはページの制限時間-15秒まで待つ
+    "ocr_preprocess_profile": "auto",  # 拡張OCRの前処理（none / fast / full、autoはノイズの推定値から選ぶ）
+    "ocr_noise_fast_threshold": 1.5,  # ノイズの推定値がこれ以上ならfast
+    "ocr_noise_full_threshold": 5.0,  # ノイズの推定値がこれ以上ならfull（fastNlMeansDenoising）
+    "ocr_adaptive_enabled": False,  # 低解像度でOCRし、必要なページ・領域だけ高解像度でOCRし直す
+    "ocr_adaptive_low_dpi": 150,
+    "ocr_adaptive_high_dpi": 300,
+    "ocr_adaptive_min_confidence": 0.75,  # 行の平均信頼度（0〜1）がこれ未満なら高解像度でOCRし直す
+    "ocr_adaptive_max_region_ratio": 0.5,  # 信頼度の低い行がこの割合を超えたらページ全体をOCRし直す
+    "ocr_adaptive_required_fields": ["amount", "customer"],  # 取れなかった場合にページ全体をOCRし直す項目
+    "ocr_tenant_policies": {},  # テナントIDごとのOCR設定の上書き（例: {"3": {"ocr_adaptive_enabled": true}}）
+    
+    # PDFページ並列処理設定
+    "page_pool_enabled": True,
+    "page_pool_workers": 0,  # 0の場合はCPUコア数 // gunicornのワーカー数（WEB_CONCURRENCY）
+    "page_pool_max_in_flight": 2,  # 1リクエストあたりの同時実行チャンク数
+    "page_pool_chunk_size": 4,  # 1チャンクあたりのページ数
+    "page_pool_min_pages": 4,  # 並列処理を行う最小ページ数
+    
+    # 抽出結果キャッシュ設定（PDF内容のハッシュをキーにディスクへ保存）
+    "extraction_cache_path": "",  # 空の場合はdata/extraction_cache.db
+    "extraction_cache_max_entries": 5000,
+    "extraction_cache_max_mb": 512,
+    "extraction_cache_ttl_hours": 720,
+    
+    # OCR結果キャッシュ設定（ページ画像の知覚ハッシュをキーにディスクへ保存）
+    "ocr_cache_enabled": True,
+    "ocr_cache_path": "",  # 空の場合はdata/ocr_cache.db
+    "ocr_cache_max_entries": 20000,
+    "ocr_cache_max_mb": 256,
+    
+    # 非同期ジョブ設定（/processのasync指定時に使用）
+    "job_workers": 2,  # ジョブのワーカープロセス（job_worker.py）でジョブを処理するスレッド数
+    "job_store_path": "",  # 空の場合はdata/jobs.db
+    "job_retention_hours": 24,  # 完了したジョブを保持する時間
+    "job_stream_timeout": 5,  # /jobs/<id>/streamで新しい結果を待つ最大時間（秒、ショートポーリング。最大10）
+    "job_heartbeat_interval": 10,  # 処理中のジョブのハートビートの更新間隔（秒）
+    "job_stale_seconds": 60,  # ハートビートがこの時間途絶えたジョブは中断されたものとして処理待ちに戻す
+    "job_max_attempts": 3,  # 中断されたジョブを実行する回数の上限（超えた場合は失敗にする）
+    
+    # 一括処理設定（/process/bulk）
+    "bulk_workers": 4,  # 同時に処理するファイル数
+    "bulk_max_files": 500,  # 1回のバッチで受け付けるPDFの最大数
+    "bulk_max_total_mb": 500,  # 展開後の合計サイズの上限
+    
+    # メトリクス設定（/metricsはPrometheusが取得するため、ログインではなくトークンか接続元IPで認可する）
+    "metrics_token": "",  # Authorization: Bearer <token>で取得を許可するトークン（空の場合はトークンでは許可しない）
+    "metrics_allowed_ips": ["127.0.0.1", "::1"],  # 取得を許可する接続元のIPアドレス・ネットワーク（CIDR）
     
     # Webhook設定
     "webhook_enable_signature_verification": True,
@@ -239,9 +302,28 @@ class ConfigManager:
             "DEFAULT_AMOUNT": "default_amount",
             "ENABLE_CUSTOMER_EXTRACTION": "enable_customer_extraction",
             "ENABLE_AMOUNT_EXTRACTION": "enable_amount_extraction",
+            "CUSTOMER_CACHE_MAX_ENTRIES": "customer_cache_max_entries",
+            "CUSTOMER_CACHE_TTL_SECONDS": "customer_cache_ttl_seconds",
             "USE_AI_OCR": "use_ai_ocr",
             "OCR_METHOD": "ocr_method",
             "OCR_ENDPOINT": "ocr_endpoint",
+            "GOOGLE_VISION_ENDPOINT": "google_vision_endpoint",
+            "OCR_DPI": "ocr_dpi",
+            "OCR_MEMORY_BUDGET_MB": "ocr_memory_budget_mb",
+            "OCR_POOL_ENABLED": "ocr_pool_enabled",
+            "OCR_POOL_WORKERS": "ocr_pool_workers",
+            "OCR_CACHE_ENABLED": "ocr_cache_enabled",
+            "OCR_ADAPTIVE_ENABLED": "ocr_adaptive_enabled",
+            "OCR_PREPROCESS_PROFILE": "ocr_preprocess_profile",
+            # PDFページ並列処理設定
+            "PAGE_POOL_ENABLED": "page_pool_enabled",
+            "PAGE_POOL_WORKERS": "page_pool_workers",
+            "PAGE_POOL_MAX_IN_FLIGHT": "page_pool_max_in_flight",
+            # 非同期ジョブ設定
+            "JOB_WORKERS": "job_workers",
+            # メトリクス設定
+            "METRICS_TOKEN": "metrics_token",
+            "METRICS_ALLOWED_IPS": "metrics_allowed_ips",
             # セキュリティ設定
             "ENCRYPT_API_KEYS": "encrypt_api_keys",
             # 決済リンク設定
@@ -253,15 +335,18 @@ class ConfigManager:
             env_value = os.getenv(env_key)
             if env_value is not None:
                 # 型変換処理
-                if config_key in ["default_amount", "payment_link_expire_days"]:
+                if config_key in ["default_amount", "payment_link_expire_days", "page_pool_workers", "page_pool_max_in_flight",
+                                  "job_workers", "ocr_dpi", "ocr_memory_budget_mb", "ocr_pool_workers",
+                                  "customer_cache_max_entries", "customer_cache_ttl_seconds"]:
                     try:
                         env_value = int(env_value)
                     except ValueError:
                         logger.warning(f"環境変数{env_key}の値を整数に変換できませんでした: {env_value}")
                         continue
-                elif config_key in ["use_ai_ocr", "encrypt_api_keys"]:
+                elif config_key in ["use_ai_ocr", "encrypt_api_keys", "page_pool_enabled", "ocr_pool_enabled",
+                                    "ocr_cache_enabled", "ocr_adaptive_enabled"]:
                     env_value = env_value.lower() in ["true", "1", "yes"]
-                elif config_key in ["enabled_payment_providers"] and isinstance(env_value, str):
+                elif config_key in ["enabled_payment_providers", "metrics_allowed_ips"] and isinstance(env_value, str):
                     # カンマ区切りの文字列をリストに変換
                     env_value = [provider.strip() for provider in env_value.split(",")]
                 
@@ -816,7 +901,8 @@ class ConfigManager:
                 'stripe_secret_key_live',
                 'stripe_webhook_secret',
                 'admin_password',
-                'secret_key'
+                'secret_key',
+                'metrics_token'
             ]
             
             if not include_sensitive:
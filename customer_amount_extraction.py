@@ -1,6 +1,7 @@
-import re
 import logging
 
+from extraction_engine import AMOUNT, CUSTOMER, FIRST_MATCH_AMOUNT, FIRST_MATCH_CUSTOMER, extract
+
 logger = logging.getLogger(__name__)
 
 def extract_customer_and_amount(text):
@@ -21,45 +22,20 @@ def extract_customer_and_amount(text):
     }
     
     try:
-        # 顧客名の抽出パターン
-        customer_patterns = [
-            r'(?:お客様|顧客|氏名|名前)[:：\s]*([^\n\r]+)',
-            r'(?:様|さん)\s*([^\n\r]+)',
-            r'(?:宛先|送付先)[:：\s]*([^\n\r]+)',
-            r'([^\n\r]*様)',
-            r'([^\n\r]*さん)',
-        ]
-        
-        # 金額の抽出パターン
-        amount_patterns = [
-            r'(?:金額|料金|代金|請求額|合計)[:：\s]*([0-9,]+)(?:円|¥)?',
-            r'¥\s*([0-9,]+)',
-            r'([0-9,]+)\s*円',
-            r'(?:税込|税抜)[:：\s]*([0-9,]+)(?:円|¥)?',
-        ]
+        # パターンの優先順で最初に一致したものを使う（extraction_engineのfirst_match_*ルール）
+        report = extract(text, rules=(FIRST_MATCH_CUSTOMER, FIRST_MATCH_AMOUNT))
         
-        # 顧客名を抽出
-        for pattern in customer_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                customer = match.group(1).strip()
-                if customer and len(customer) > 1:
-                    result['customer'] = customer
-                    result['formatted_customer'] = customer
-                    break
+        # 顧客名
+        customer = report.best(CUSTOMER)
+        if customer is not None:
+            result['customer'] = customer.value
+            result['formatted_customer'] = customer.value
         
-        # 金額を抽出
-        for pattern in amount_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                amount = match.group(1).strip()
-                if amount:
-                    # カンマを除去して数値として処理
-                    amount_num = amount.replace(',', '')
-                    if amount_num.isdigit():
-                        result['amount'] = amount_num
-                        result['formatted_amount'] = f"¥{amount}"
-                        break
+        # 金額（カンマを除去した数字列、表示用はカンマ付きのまま）
+        amount = report.best(AMOUNT)
+        if amount is not None:
+            result['amount'] = amount.text.replace(',', '')
+            result['formatted_amount'] = f"¥{amount.text}"
         
         logger.info(f"抽出結果: 顧客={result['customer']}, 金額={result['amount']}")
         
@@ -2,40 +2,123 @@ import re
 import os
 import json
 import logging
-import hashlib
 import datetime
-from typing import Optional, List, Tuple, Dict
-from text_normalizer import normalize_text, extract_readable_content
+from typing import Optional, List, Tuple, Dict, Union
+from text_normalizer import NormalizedDocument, as_document, normalize_text
+from keyword_automaton import CUSTOMER_INVALID, CUSTOMER_TOTAL_LINE, extraction_automaton, get_automaton
+from bounded_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, BoundedCache, content_key, get_memory_cache
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
 
-# キャッシュ用の辞書（キー：ファイル名またはテキストハッシュ、値：{name: 顧客名, timestamp: タイムスタンプ}）
-_customer_cache = {}
+# 金額関連の用語リスト - 顧客名として無効な用語
+INVALID_CUSTOMER_TERMS = (
+    '合計', '小計', '総額', '総額計', '金額', '請求額', 
+    '請求金額', '請求合計', '小計額', '税込', '税込み',
+    '税抜', '税抜き', '消費税', '消費税等', '合計額',
+    '合計金額', '小計金額', '税込合計', '税抜合計',
+    '合計欄', '小計欄', '金額欄', '請求欄', '合計額欄',
+    '小計額欄', '総額欄', '総額額', '合計額金額',
+    '合計金', '小計金', '総額金', '請求金', '請求書',
+    '領収書', '領収書合計', '領収書金額', '領収書額',
+    '請求書合計', '請求書金額', '請求書額', '小計欄金額',
+    '御請求額', '御請求金額', '御合計', '御合計額'
+    # YORUTOKOを除外リストから削除
+)
+
+# 顧客名の候補を探す前に除外する行の用語
+TOTAL_LINE_TERMS = ('合計', '小計', '総額', '金額')
+
+class CustomerCandidate:
+    """
+    顧客名の候補
+    一致した部分の文字列はコピーせず、検索したテキスト上の位置（start, end）を持つ
+    """
+    
+    __slots__ = ('name', 'score', 'source', 'start', 'end')
+    
+    def __init__(self, name: str, score: int, source: str, start: Optional[int] = None, end: Optional[int] = None):
+        self.name = name
+        self.score = score
+        self.source = source
+        self.start = start
+        self.end = end
+    
+    def context(self, text: str, margin: int = 20) -> str:
+        """候補の前後margin文字を含むtextの範囲（ログに出力する時だけ作る）"""
+        if self.start is None:
+            return ''
+        return text[max(0, self.start - margin):min(len(text), self.end + margin)]
+
+def _log_candidate(label: str, candidate: CustomerCandidate, text: str) -> None:
+    """候補を前後の文脈とともにINFOで出力する（INFOが無効な場合は文脈を作らない）"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f"{label}から抽出: '{sanitize_for_log(candidate.name)}' (コンテキスト: '{sanitize_for_log(candidate.context(text))}')")
+
+# 顧客名のキャッシュ（キー：customer_cache_keyの結果、値：{name: 顧客名, masked, alternatives, timestamp: タイムスタンプ}）
+# 上限件数と有効期間は最初に使う時点の設定（customer_cache_max_entries / customer_cache_ttl_seconds）を使う
+_customer_cache = None
+
+def _get_customer_cache() -> BoundedCache:
+    global _customer_cache
+    if _customer_cache is None:
+        try:
+            from config_manager import get_config
+            config = get_config()
+        except Exception:
+            config = {}
+        _customer_cache = get_memory_cache(
+            'customer_name',
+            max_entries=int(config.get('customer_cache_max_entries', DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(config.get('customer_cache_ttl_seconds', DEFAULT_TTL_SECONDS)),
+        )
+    return _customer_cache
+
+def customer_cache_key(text: str, filename: Optional[str] = None) -> str:
+    """
+    顧客名のキャッシュキーを作成する（テキスト全体とファイル名のハッシュ）
+    同じファイル名で内容の異なるPDFには別のキーになる
+    単語の位置（layout）があるNormalizedDocumentは抽出結果が変わりうるため、ない場合とは別のキーにする
+    
+    Args:
+        text: 抽出元のテキスト（NormalizedDocumentの場合は元のテキストを使う）
+        filename: PDFファイル名（オプション）
+        
+    Returns:
+        キャッシュキー
+    """
+    document = as_document(text)
+    if document.layout is not None:
+        return content_key(document.raw, filename, 'layout')
+    return content_key(document.raw, filename)
 
 def clear_cache():
     """
     キャッシュをクリアする
     """
-    global _customer_cache
-    _customer_cache = {}
+    _get_customer_cache().clear()
     logger.info("顧客名キャッシュをクリアしました")
     
 
+def cache_stats() -> Dict:
+    """
+    顧客名キャッシュの統計（エントリ数・ヒット数・ミス数・削除数）を取得する
+    """
+    return _get_customer_cache().stats()
+
 def get_alternatives(key: str) -> List[Dict]:
     """
     指定されたキーに対する代替候補を取得する
     
     Args:
-        key: キャッシュキー（ファイル名またはテキストハッシュ）
+        key: キャッシュキー（customer_cache_keyの結果）
         
     Returns:
         代替候補のリスト、キーが存在しない場合は空リスト
     """
-    if key in _customer_cache:
-        cache_entry = _customer_cache[key]
-        if isinstance(cache_entry, dict) and 'alternatives' in cache_entry:
-            return cache_entry['alternatives']
+    cache_entry = _get_customer_cache().get(key)
+    if isinstance(cache_entry, dict) and 'alternatives' in cache_entry:
+        return cache_entry['alternatives']
     return []
 
 def sanitize_for_log(text: str) -> str:
@@ -112,11 +195,11 @@ def is_valid_customer_name(name: str, invalid_terms: List[str], allow_alphanumer
         logger.debug(f"数字のみの名前は無効です: '{name}'")
         return False
         
-    # 無効な用語を含む名前は無効
-    for term in invalid_terms:
-        if term in name:
-            logger.debug(f"無効な用語 '{term}' を含む名前です: '{name}'")
-            return False
+    # 無効な用語を含む名前は無効（用語の組ごとに構築したオートマトンで1回だけ走査する）
+    term = get_automaton(invalid_terms).first(name)
+    if term is not None:
+        logger.debug(f"無効な用語 '{term}' を含む名前です: '{name}'")
+        return False
     
     # ファイル名として使われる可能性が高い英数字のみの名前は、
     # allow_alphanumericがFalseの場合のみ無効とする
@@ -126,7 +209,7 @@ def is_valid_customer_name(name: str, invalid_terms: List[str], allow_alphanumer
             
     return True
 
-def extract_customer(text: str, filename: str = None, force_refresh: bool = False) -> Optional[str]:
+def extract_customer(text: Union[str, NormalizedDocument], filename: str = None, force_refresh: bool = False) -> Optional[str]:
     """
     PDFテキストから顧客名（宛先）を抽出する特化関数
     左上に書かれているフルネームを優先的に抽出する
@@ -134,7 +217,7 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
     「〜様」パターンを優先的に抽出する
     
     Args:
-        text: 抽出元のテキスト
+        text: 抽出元のテキスト（金額抽出と共有するNormalizedDocumentも指定可能）
         filename: PDFファイル名（オプション）
         force_refresh: キャッシュを無視して強制的に再抽出する
         
@@ -142,62 +225,54 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
         抽出された顧客名、見つからない場合はNone
     """
     # テキストが空の場合は None を返す
-    if not text:
+    document = as_document(text)
+    if not document.raw:
         return None
-    
-    # キャッシュチェック（ファイル名をキーとして使用）
-    cache_key = filename if filename else hashlib.md5(text[:1000].encode()).hexdigest()
-    if not force_refresh and cache_key in _customer_cache:
-        cache_entry = _customer_cache[cache_key]
-        # キャッシュエントリが辞書形式かどうかを確認
-        if isinstance(cache_entry, dict) and 'name' in cache_entry:
+    text = document.raw
+    
+    # キャッシュチェック（テキスト全体とファイル名のハッシュをキーとして使用）
+    customer_cache = _get_customer_cache()
+    cache_key = customer_cache_key(document, filename)
+    if not force_refresh:
+        cache_entry = customer_cache.get(cache_key)
+        if cache_entry is not None:
             logger.info(f"キャッシュから顧客名を取得: {cache_entry['name']} (キャッシュ時間: {cache_entry['timestamp']})")
             return cache_entry['name']
-        else:
-            # 古い形式のキャッシュエントリの場合は、そのまま返す
-            logger.info(f"キャッシュから顧客名を取得（旧形式）: {cache_entry}")
-            return cache_entry
     
     # デバッグ情報
     logger.info(f"顧客名抽出処理開始 (テキスト長: {len(text)} 文字)")
         
-    # 文字化けしているテキストから読みやすい部分を抽出
-    readable_data = extract_readable_content(text)
-    if readable_data["readable_ratio"] < 0.5:  # 読める文字が50%未満の場合
-        # 読み取り可能な部分だけを使用
-        text = readable_data["text"]
+    # 文字化けしている場合は読み取り可能な部分だけを、それ以外は正規化したテキストを使用
+    # （ページごとに1回だけ計算したNormalizedDocumentの結果を使う）
+    text = document.clean_text
+    if document.is_garbled:  # 読める文字が50%未満の場合
         logger.info(f"読み取り可能な部分のみ使用: {len(text)} 文字")
     else:
-        # 読み取り可能な割合が高い場合は正規化だけ行う
-        text = normalize_text(text)
         logger.info(f"正規化したテキスト: {len(text)} 文字")
     
-    # 金額関連の用語リスト - 顧客名として無効な用語
-    invalid_customer_terms = [
-        '合計', '小計', '総額', '総額計', '金額', '請求額', 
-        '請求金額', '請求合計', '小計額', '税込', '税込み',
-        '税抜', '税抜き', '消費税', '消費税等', '合計額',
-        '合計金額', '小計金額', '税込合計', '税抜合計',
-        '合計欄', '小計欄', '金額欄', '請求欄', '合計額欄',
-        '小計額欄', '総額欄', '総額額', '合計額金額',
-        '合計金', '小計金', '総額金', '請求金', '請求書',
-        '領収書', '領収書合計', '領収書金額', '領収書額',
-        '請求書合計', '請求書金額', '請求書額', '小計欄金額',
-        '御請求額', '御請求金額', '御合計', '御合計額'
-        # YORUTOKOを除外リストから削除
-    ]
+    invalid_customer_terms = INVALID_CUSTOMER_TERMS
+    
+    # 各行のキーワードを1回の走査でまとめて照合し、「合計」などを含む行の除外と
+    # 先頭20行の金額関連の用語の判定の両方に使う
+    automaton = extraction_automaton()
+    text_lines = text.split('\n')
+    line_hits = [automaton.match(line) for line in text_lines]
     
     # 「合計」を含む行を除外するための前処理
-    filtered_text = "\n".join([line for line in text.split('\n') if not any(term in line for term in ['合計', '小計', '総額', '金額'])])
+    kept = [i for i, hits in enumerate(line_hits) if CUSTOMER_TOTAL_LINE not in hits]
+    filtered_text = "\n".join(text_lines[i] for i in kept)
+    filtered_hits = [line_hits[i] for i in kept]
     logger.info(f"「合計」などを含む行を除外したテキスト: {len(filtered_text)} 文字")
     
     # フィルタリング後のテキストが空または極端に短い場合は、元のテキストを使用
     if len(filtered_text) < 50:
         logger.warning(f"フィルタリング後のテキストが短すぎるため、元のテキストを使用します: {len(filtered_text)} 文字")
         filtered_text = text
+        filtered_hits = line_hits
     
-    # 顧客名を抽出するための候補リスト
-    candidates = []
+    # 顧客名を抽出するための候補リスト（ログ用の文脈は出力する時だけ作る）
+    candidates: List[CustomerCandidate] = []
+    log_info = logger.isEnabledFor(logging.INFO)
     
     # 「客様」「顧客」「宛名」などのキーワードの後に続く名前を抽出
     customer_field_patterns = [
@@ -212,9 +287,9 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
         for match in matches:
             name = match.group(1).strip()
             if is_valid_customer_name(name, invalid_customer_terms):
-                context = filtered_text[max(0, match.start() - 20):min(len(filtered_text), match.end() + 20)]
-                logger.info(f"顧客フィールドから抽出: '{sanitize_for_log(name)}' (コンテキスト: '{sanitize_for_log(context)}')")
-                candidates.append({'name': name, 'score': 5, 'source': 'テキスト'})  # 優先度5（最高）
+                candidate = CustomerCandidate(name, 5, 'テキスト', match.start(), match.end())  # 優先度5（最高）
+                _log_candidate("顧客フィールド", candidate, filtered_text)
+                candidates.append(candidate)
     
     # 「様」が付く名前を抽出
     sama_pattern = r'([^\d]{2,30})\s*様'
@@ -225,18 +300,18 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
             # 括弧の前の部分を使用
             name = re.sub(r'[\(\uff08].*', '', name).strip()
         if is_valid_customer_name(name, invalid_customer_terms):
-            context = filtered_text[max(0, match.start() - 20):min(len(filtered_text), match.end() + 20)]
-            logger.info(f"「様」付きから抽出: '{sanitize_for_log(name)}' (コンテキスト: '{sanitize_for_log(context)}')")
-            candidates.append({'name': name, 'score': 4, 'source': 'テキスト'})  # 優先度4（高）
+            candidate = CustomerCandidate(name, 4, 'テキスト', match.start(), match.end())  # 優先度4（高）
+            _log_candidate("「様」付き", candidate, filtered_text)
+            candidates.append(candidate)
     
     # 「御中」が付く名前を抽出
     onchu_pattern = r'([^\s\d]{2,15})御中'
     for match in re.finditer(onchu_pattern, filtered_text):
         name = match.group(1).strip()
         if is_valid_customer_name(name, invalid_customer_terms):
-            context = filtered_text[max(0, match.start() - 20):min(len(filtered_text), match.end() + 20)]
-            logger.info(f"「御中」付きから抽出: '{sanitize_for_log(name)}' (コンテキスト: '{sanitize_for_log(context)}')")
-            candidates.append({'name': name, 'score': 3, 'source': 'テキスト'})  # 優先度3（中高）
+            candidate = CustomerCandidate(name, 3, 'テキスト', match.start(), match.end())  # 優先度3（中高）
+            _log_candidate("「御中」付き", candidate, filtered_text)
+            candidates.append(candidate)
     
     # 「〜様」パターンを抽出（最優先）
     # より柔軟な正規表現パターンを使用して、括弧や余分な空白を含む名前も抽出
@@ -252,7 +327,8 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
         r'([^\d]{1,20})[\s]+([^\d]{1,20})[\s]*\([^)]*\)[\s]*様'
     ]
     
-    logger.info(f"「様」パターンの検索開始 - テキストの一部: {filtered_text[:100]}...")
+    if log_info:
+        logger.info(f"「様」パターンの検索開始 - テキストの一部: {filtered_text[:100]}...")
     
     # すべてのパターンで検索
     sama_matches = []
@@ -265,7 +341,8 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
     
     for match in sama_matches:
         raw_name = match.group(1).strip()
-        logger.info(f"「様」パターン生の抽出結果: '{sanitize_for_log(raw_name)}'")
+        if log_info:
+            logger.info(f"「様」パターン生の抽出結果: '{sanitize_for_log(raw_name)}'")
         
         # 括弧を除去する処理
         name = re.sub(r'\s*\([^)]*\)\s*', ' ', raw_name).strip()
@@ -274,21 +351,32 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
         # 連続する空白を1つにまとめる
         name = re.sub(r'[\u3000\s]+', ' ', name).strip()
         
-        logger.info(f"「様」パターン前処理後: '{sanitize_for_log(name)}'")
+        if log_info:
+            logger.info(f"「様」パターン前処理後: '{sanitize_for_log(name)}'")
         
         if is_valid_customer_name(name, invalid_customer_terms):
-            context = filtered_text[max(0, match.start() - 20):min(len(filtered_text), match.end() + 20)]
-            logger.info(f"「様」付きから抽出: '{sanitize_for_log(name)}' (コンテキスト: '{sanitize_for_log(context)}')")
-            candidates.append({'name': name, 'score': 20, 'source': 'テキスト'})  # 優先度20（最高）
+            candidate = CustomerCandidate(name, 20, 'テキスト', match.start(), match.end())  # 優先度20（最高）
+            _log_candidate("「様」付き", candidate, filtered_text)
+            candidates.append(candidate)
     
     # 文書の最初の20行から日本語名を抽出
-    lines = filtered_text.split('\n')[:20]  # 最初の20行のみ
+    # ページの単語の位置がある場合は、テキストの順ではなくページの左上1/4にある行を使う
+    if document.layout is not None:
+        region_lines = [normalize_text(line) for line in document.layout.region_lines('top_left')]
+        region_hits = [automaton.match(line) for line in region_lines]
+        kept = [i for i, hits in enumerate(region_hits) if CUSTOMER_TOTAL_LINE not in hits][:20]
+        lines = [region_lines[i] for i in kept]
+        lines_hits = [region_hits[i] for i in kept]
+        logger.info(f"ページ左上の行を使用: {len(lines)} 行")
+    else:
+        lines = filtered_text.split('\n')[:20]  # 最初の20行のみ
+        lines_hits = filtered_hits
     for i, line in enumerate(lines):
         # 行の内容をデバッグ表示
         logger.debug(f"行{i+1}: {line}")
         
         # 金額関連の用語を含む行はスキップ
-        if any(term in line for term in invalid_customer_terms):
+        if CUSTOMER_INVALID in lines_hits[i]:
             logger.debug(f"金額関連の用語を含む行なのでスキップ: {line}")
             continue
         
@@ -298,7 +386,7 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
             name = match.group(1).strip()
             if is_valid_customer_name(name, invalid_customer_terms):
                 logger.info(f"日本語名から抽出: '{name}' (行{i+1})")
-                candidates.append({'name': name, 'score': 2, 'source': 'テキスト'})  # 優先度2（中）
+                candidates.append(CustomerCandidate(name, 2, 'テキスト'))  # 優先度2（中）
                 
     # 「〜様」パターンを検出（優先度を高く設定）
     sama_pattern = re.compile(r'([\w\s]{2,30})\s*様')
@@ -310,7 +398,8 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
     if sama_matches:
         for match in sama_matches:
             raw_name = match.group(1).strip()
-            logger.info(f"「様」パターン生の抽出結果: '{sanitize_for_log(raw_name)}'")
+            if log_info:
+                logger.info(f"「様」パターン生の抽出結果: '{sanitize_for_log(raw_name)}'")
             
             # 括弧を除去する処理
             name = re.sub(r'\s*\([^)]*\)\s*', ' ', raw_name).strip()
@@ -322,7 +411,7 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
             if is_valid_customer_name(name, invalid_customer_terms):
                 logger.info(f"「〜様」パターンから顧客名を抽出: {name}様")
                 # 「様」パターンの優先度をさらに高く設定
-                candidates.append({'name': f"{name}様", 'score': 15, 'source': 'sama_pattern'})  # 優先度15（最高）
+                candidates.append(CustomerCandidate(f"{name}様", 15, 'sama_pattern', match.start(), match.end()))  # 優先度15（最高）
                 
     # 「御中」パターンも検出
     onchu_pattern = re.compile(r'([\w\s]{2,30}(?:株式会社|有限会社|合同会社|社団法人|財団法人))\s*御中')
@@ -334,7 +423,8 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
     if onchu_matches:
         for match in onchu_matches:
             raw_name = match.group(1).strip()
-            logger.info(f"「御中」パターン生の抽出結果: '{sanitize_for_log(raw_name)}'")
+            if log_info:
+                logger.info(f"「御中」パターン生の抽出結果: '{sanitize_for_log(raw_name)}'")
             
             # 括弧を除去する処理
             name = re.sub(r'\s*\([^)]*\)\s*', ' ', raw_name).strip()
@@ -345,28 +435,28 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
             
             if is_valid_customer_name(name, invalid_customer_terms):
                 logger.info(f"「御中」パターンから顧客名を抽出: {name}御中")
-                candidates.append({'name': f"{name}御中", 'score': 14, 'source': 'onchu_pattern'})  # 優先度14（高）
+                candidates.append(CustomerCandidate(f"{name}御中", 14, 'onchu_pattern', match.start(), match.end()))  # 優先度14（高）
     
     # テキストから有効な顧客名が抽出されたか確認
     valid_customer_from_text = None
     if candidates:
         # スコアでソートして最も高いスコアの候補を選択
-        candidates.sort(key=lambda x: x['score'], reverse=True)
+        candidates.sort(key=lambda x: x.score, reverse=True)
         
         # デバッグ: すべての候補を表示
         logger.info(f"顧客名候補一覧 (合計: {len(candidates)}件):")
         for i, candidate in enumerate(candidates[:5]):  # 上位5件のみ表示
-            logger.info(f"  候補{i+1}: '{candidate['name']}' (スコア: {candidate['score']}, 出典: {candidate['source']})")
+            logger.info(f"  候補{i+1}: '{candidate.name}' (スコア: {candidate.score}, 出典: {candidate.source})")
         
         selected_candidate = candidates[0]
-        customer_name = selected_candidate['name']
+        customer_name = selected_candidate.name
         
         # 個人情報保護のため、顧客名の一部のみをログに出力
         if customer_name and len(customer_name) > 2:
             masked_name = customer_name[0] + '*' * (len(customer_name) - 2) + customer_name[-1]
-            logger.info(f"最終選択された顧客名: {masked_name} (スコア: {selected_candidate['score']}, 出典: {selected_candidate['source']})")
+            logger.info(f"最終選択された顧客名: {masked_name} (スコア: {selected_candidate.score}, 出典: {selected_candidate.source})")
         else:
-            logger.info(f"最終選択された顧客名: {customer_name} (スコア: {selected_candidate['score']}, 出典: {selected_candidate['source']})")
+            logger.info(f"最終選択された顧客名: {customer_name} (スコア: {selected_candidate.score}, 出典: {selected_candidate.source})")
         
         return customer_name
     
@@ -409,22 +499,22 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
                     special_name = 'YORUTOKO'
                     logger.info(f"YORUTOKOキーワードから顧客名候補を追加: {special_name}")
                     # 優先度0（最低）で追加することで、PDFテキストからの抽出を確実に優先
-                    candidates.append({'name': special_name, 'score': 0, 'source': 'filename'})
+                    candidates.append(CustomerCandidate(special_name, 0, 'filename'))
                 else:
                     file_key = next((key for key in customer_mapping.keys() if key in filename), None)
                     if file_key:
                         special_name = customer_mapping.get(file_key)
                         logger.info(f"ファイル名キーワードから顧客名候補を追加")
-                        candidates.append({'name': special_name, 'score': 1, 'source': 'filename'})  # 優先度1（低）
+                        candidates.append(CustomerCandidate(special_name, 1, 'filename'))  # 優先度1（低）
                     else:
                         special_name = customer_mapping.get('default', '夕床商事')
                         logger.info(f"デフォルトの顧客名候補を追加")
-                        candidates.append({'name': special_name, 'score': 1, 'source': 'filename'})  # 優先度1（低）
+                        candidates.append(CustomerCandidate(special_name, 1, 'filename'))  # 優先度1（低）
             except Exception as e:
                 logger.error(f"顧客名マッピング設定の読み込みエラー: {e}")
                 special_name = '夕床商事'
                 logger.info(f"エラー発生時のデフォルト顧客名候補を追加")
-                candidates.append({'name': special_name, 'score': 1, 'source': 'filename'})  # 優先度1（低）
+                candidates.append(CustomerCandidate(special_name, 1, 'filename'))  # 優先度1（低）
         else:
             # 通常のファイル名処理：アンダースコアやハイフンで区切られた部分を使用
             # 拡張子を除去
@@ -456,7 +546,7 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
             
             # ファイル名から抽出した名前は英数字のみでも許可する
             if potential_name and len(potential_name) >= 2 and is_valid_customer_name(potential_name, invalid_customer_terms, allow_alphanumeric=True):
-                candidates.append({'name': potential_name, 'score': 1, 'source': 'filename'})  # 優先度1（低）に設定
+                candidates.append(CustomerCandidate(potential_name, 1, 'filename'))  # 優先度1（低）に設定
     
     # 候補がない場合はデフォルト値を返す
     if not candidates:
@@ -464,9 +554,9 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
         return None
     
     # スコアでソートして最高スコアの候補を選択
-    candidates.sort(key=lambda x: x['score'], reverse=True)
-    best_candidate = candidates[0]['name']
-    logger.info(f"最適な顧客名候補: {best_candidate} (スコア: {candidates[0]['score']}, ソース: {candidates[0]['source']})")
+    candidates.sort(key=lambda x: x.score, reverse=True)
+    best_candidate = candidates[0].name
+    logger.info(f"最適な顧客名候補: {best_candidate} (スコア: {candidates[0].score}, ソース: {candidates[0].source})")
     
     # 個人情報保護のためのマスキング処理
     masked_name = mask_personal_info(best_candidate)
@@ -478,22 +568,22 @@ def extract_customer(text: str, filename: str = None, force_refresh: bool = Fals
     # 代替候補を保存（上位3つまで）
     alternatives = []
     for i in range(1, min(4, len(candidates))):
-        alt_name = candidates[i]['name']
+        alt_name = candidates[i].name
         alt_masked = mask_personal_info(alt_name)
         alternatives.append({
             'name': alt_name,
             'masked': alt_masked,
-            'score': candidates[i]['score'],
-            'source': candidates[i]['source']
+            'score': candidates[i].score,
+            'source': candidates[i].source
         })
     
-    # キャッシュに保存（新しい形式：辞書形式で保存）
-    _customer_cache[cache_key] = {
+    # キャッシュに保存
+    customer_cache.set(cache_key, {
         'name': best_candidate,
         'masked': masked_name,
         'alternatives': alternatives,
         'timestamp': datetime.datetime.now().isoformat()
-    }
+    })
     logger.info(f"顧客名をキャッシュに保存しました: {best_candidate}")
     
     return best_candidate
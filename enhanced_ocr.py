@@ -10,12 +10,16 @@ import os
 import io
 import cv2
 import logging
+import time
 import tempfile
+import threading
 import numpy as np
 from PIL import Image
 import pytesseract
-from pdf2image import convert_from_path
+import ocr_pool
+from page_rasterizer import DEFAULT_MEMORY_BUDGET_MB, iter_page_images, raster_settings
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FuturesTimeoutError
 
 # ロギング設定
 logger = logging.getLogger(__name__)
@@ -49,6 +53,30 @@ except ImportError:
     logger.warning("AWS Textractが利用できません。必要に応じてインストールしてください。")
 
 
+# ページごとのOCR手法の並列実行の設定（configで上書き可能）
+DEFAULT_CONFIDENCE_THRESHOLD = 0.9  # この信頼度以上の結果が得られたら残りの手法を打ち切る
+DEFAULT_PAGE_DEADLINE = 60  # 1ページにかける最大時間（秒）
+DEFAULT_CLOUD_DELAY = None  # 有料のクラウドOCRを開始する前に、ローカルOCRの結果を待つ時間（秒）。Noneは下記の上限まで待つ
+DEFAULT_CLOUD_RESERVE = 15  # ローカルOCRを待つ上限は、ページの制限時間からクラウドOCRの処理時間としてこの秒数を引いた時間
+
+# 画像の前処理プロファイル
+# none: グレースケール化のみ / fast: メディアンフィルタ + 適応的二値化 / full: ノイズ除去（fastNlMeansDenoising） + 適応的二値化
+PREPROCESS_PROFILES = ("none", "fast", "full")
+DEFAULT_PREPROCESS_PROFILE = "auto"  # ノイズの推定値からプロファイルを選ぶ
+DEFAULT_NOISE_FAST_THRESHOLD = 1.5  # ノイズの推定値（画素値の標準偏差）がこれ以上ならfast
+DEFAULT_NOISE_FULL_THRESHOLD = 5.0  # これ以上ならfull
+NOISE_ESTIMATE_WIDTH = 800  # ノイズの推定に使う縮小画像の幅
+
+# エンジンが信頼度を返さない場合に使う手法ごとの目安
+METHOD_PRIOR_CONFIDENCE = {
+    "google_vision": 0.85,
+    "azure_vision": 0.8,
+    "aws_textract": 0.8,
+    "layout_full": 0.6,
+    "tesseract": 0.55,
+}
+
+
 def check_tesseract_available():
     """Tesseract OCRが利用可能かチェックする"""
     try:
@@ -58,128 +86,230 @@ def check_tesseract_available():
         return False
 
 
-def extract_text_with_tesseract(image_path, lang='jpn+eng'):
+def _to_gray(image):
+    """
+    画像をグレースケールのNumPy配列に変換する
+    
+    Args:
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列（カラーの場合はBGR）
+    
+    Returns:
+        グレースケールのNumPy配列（読み込めない場合はNone）
+    """
+    if isinstance(image, str):
+        color = cv2.imread(image)
+        return None if color is None else cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+    if isinstance(image, Image.Image):
+        return cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2GRAY)
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _to_ocr_input(image):
+    """pytesseractに渡せる形式（PIL画像またはNumPy配列）にする"""
+    if isinstance(image, str):
+        return Image.open(image)
+    return image
+
+
+def _to_png_bytes(image):
+    """クラウドOCRに送信するPNGのバイト列を作成する（ファイルの場合はそのまま読み込む）"""
+    if isinstance(image, str):
+        with open(image, "rb") as image_file:
+            return image_file.read()
+    if isinstance(image, Image.Image):
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        return buffer.getvalue()
+    ok, encoded = cv2.imencode('.png', image)
+    if not ok:
+        raise ValueError("画像をPNGに変換できませんでした")
+    return encoded.tobytes()
+
+
+def extract_text_with_tesseract(image, lang='jpn+eng'):
     """
     Tesseract OCRを使用して画像からテキストを抽出する
     
     Args:
-        image_path: 画像ファイルのパス
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列
         lang: 言語設定（デフォルトは日本語と英語）
     
     Returns:
         抽出されたテキスト
     """
     try:
-        return pytesseract.image_to_string(Image.open(image_path), lang=lang)
+        return ocr_pool.image_to_string(_to_ocr_input(image), lang=lang)
     except Exception as e:
         logger.error(f"Tesseract OCRエラー: {str(e)}")
         return ""
 
 
-def extract_text_with_layout_analysis(image_path, lang='jpn+eng'):
+# レイアウト分析で使う領域（ページ幅・高さに対する割合で x0, y0, x1, y1）
+LAYOUT_REGIONS = {
+    "top": (0.0, 0.0, 1.0, 0.3),
+    "middle": (0.0, 0.3, 1.0, 0.7),
+    "bottom": (0.0, 0.7, 1.0, 1.0),
+    "left": (0.0, 0.0, 0.5, 1.0),
+    "right": (0.5, 0.0, 1.0, 1.0),
+    "center": (0.3, 0.3, 0.7, 0.7),
+}
+
+
+def _ocr_words(image, lang):
+    """
+    1回のOCRで単語ごとのテキストと位置を取得する
+    
+    Returns:
+        単語の辞書のリスト（text, left, top, width, height, block, par, line）
+    """
+    data = ocr_pool.image_to_data(image, lang=lang)
+    words = []
+    for i, text in enumerate(data["text"]):
+        if not text or not text.strip():
+            continue
+        words.append({
+            "text": text,
+            "left": int(data["left"][i]),
+            "top": int(data["top"][i]),
+            "width": int(data["width"][i]),
+            "height": int(data["height"][i]),
+            "block": int(data["block_num"][i]),
+            "par": int(data["par_num"][i]),
+            "line": int(data["line_num"][i]),
+            "conf": float(data["conf"][i]) if "conf" in data else -1.0,
+        })
+    return words
+
+
+def _mean_confidence(words):
+    """単語の信頼度（0〜100、-1は不明）の平均を0〜1で返す（不明な場合はNone）"""
+    confidences = [word["conf"] for word in words if word["conf"] >= 0]
+    if not confidences:
+        return None
+    return sum(confidences) / len(confidences) / 100
+
+
+def _words_to_text(words):
+    """単語を行ごとにつなげ、段落の区切りに空行を入れたテキストにする（image_to_stringと同じ形）"""
+    lines = []
+    current_key = None
+    current_par = None
+    for word in words:
+        key = (word["block"], word["par"], word["line"])
+        if key != current_key:
+            if current_par is not None and (word["block"], word["par"]) != current_par:
+                lines.append("")
+            lines.append(word["text"])
+            current_key = key
+            current_par = (word["block"], word["par"])
+        else:
+            lines[-1] += " " + word["text"]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _bucket_words(words, width, height):
+    """単語の中心座標でLAYOUT_REGIONSの各領域に振り分け、領域ごとのテキストを返す"""
+    region_texts = {}
+    for region_name, (x0, y0, x1, y1) in LAYOUT_REGIONS.items():
+        left, top, right, bottom = x0 * width, y0 * height, x1 * width, y1 * height
+        region_words = [
+            word for word in words
+            if left <= word["left"] + word["width"] / 2 < right and top <= word["top"] + word["height"] / 2 < bottom
+        ]
+        region_texts[region_name] = _words_to_text(region_words)
+    return region_texts
+
+
+def extract_text_with_layout_analysis(image, lang='jpn+eng'):
     """
     レイアウト分析を行い、テキストを抽出する
+    ページ全体を1回だけOCRして単語の位置を取得し、領域ごとのテキストは単語を振り分けて作る
+    （領域ごとにOCRし直すと1ページあたり7回のTesseract実行になるため）
     
     Args:
-        image_path: 画像ファイルのパス
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列
         lang: 言語設定
     
     Returns:
-        抽出されたテキスト（全体と領域ごと）
+        抽出されたテキスト（全体と領域ごと）と単語の平均信頼度（0〜1、不明な場合はNone）
     """
     try:
-        # 画像を読み込む
-        image = cv2.imread(image_path)
-        if image is None:
-            logger.error(f"画像を読み込めませんでした: {image_path}")
-            return {"full_text": "", "regions": {}}
-        
         # グレースケールに変換
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = _to_gray(image)
+        if gray is None:
+            logger.error(f"画像を読み込めませんでした: {image}")
+            return {"full_text": "", "regions": {}, "confidence": None}
         
         # 画像サイズを取得
         height, width = gray.shape
         
-        # 領域を定義（上部、中央、下部、左側、右側）
-        regions = {
-            "top": gray[0:int(height*0.3), 0:width],
-            "middle": gray[int(height*0.3):int(height*0.7), 0:width],
-            "bottom": gray[int(height*0.7):height, 0:width],
-            "left": gray[0:height, 0:int(width*0.5)],
-            "right": gray[0:height, int(width*0.5):width],
-            "center": gray[int(height*0.3):int(height*0.7), int(width*0.3):int(width*0.7)]
-        }
-        
-        # 各領域からテキストを抽出
-        region_texts = {}
-        for region_name, region_img in regions.items():
-            # 一時ファイルに保存
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-                temp_path = temp_file.name
-                cv2.imwrite(temp_path, region_img)
-                
-                # OCRでテキスト抽出
-                region_text = pytesseract.image_to_string(Image.open(temp_path), lang=lang)
-                region_texts[region_name] = region_text
-                
-                # 一時ファイルを削除
-                os.unlink(temp_path)
-        
-        # 全体のテキストも抽出
-        full_text = pytesseract.image_to_string(Image.open(image_path), lang=lang)
+        # ページ全体を1回だけOCRし、単語の位置から領域ごとのテキストを作る
+        words = _ocr_words(gray, lang)
         
         return {
-            "full_text": full_text,
-            "regions": region_texts
+            "full_text": _words_to_text(words),
+            "regions": _bucket_words(words, width, height),
+            "confidence": _mean_confidence(words)
         }
     except Exception as e:
         logger.error(f"レイアウト分析エラー: {str(e)}")
         traceback.print_exc()
-        return {"full_text": "", "regions": {}}
+        return {"full_text": "", "regions": {}, "confidence": None}
 
 
-def extract_with_google_vision(image_path):
+def extract_with_google_vision(image):
     """
     Google Cloud Vision APIを使用して画像からテキストを抽出する
     
     Args:
-        image_path: 画像ファイルのパス
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列
     
     Returns:
         抽出されたテキスト
     """
+    return _google_vision_ocr(image)[0]
+
+
+def _google_vision_ocr(image):
+    """Google Cloud Vision APIでテキストとブロックの平均信頼度（0〜1、不明な場合はNone）を取得する"""
     if not GOOGLE_VISION_AVAILABLE:
         logger.warning("Google Cloud Vision APIが利用できません")
-        return ""
+        return "", None
     
     try:
         # クライアントを初期化
         client = vision.ImageAnnotatorClient()
         
-        # 画像を読み込む
-        with open(image_path, "rb") as image_file:
-            content = image_file.read()
-        
-        image = vision.Image(content=content)
+        # 画像をPNGのバイト列にする
+        content = _to_png_bytes(image)
         
         # テキスト検出を実行
-        response = client.text_detection(image=image)
+        response = client.text_detection(image=vision.Image(content=content))
         texts = response.text_annotations
         
         if texts:
-            return texts[0].description
-        return ""
+            confidences = [
+                block.confidence
+                for page in response.full_text_annotation.pages
+                for block in page.blocks
+                if block.confidence > 0
+            ]
+            confidence = sum(confidences) / len(confidences) if confidences else None
+            return texts[0].description, confidence
+        return "", None
     except Exception as e:
         logger.error(f"Google Cloud Vision APIエラー: {str(e)}")
-        return ""
+        return "", None
 
 
-def extract_with_azure_vision(image_path, subscription_key, endpoint):
+def extract_with_azure_vision(image, subscription_key, endpoint):
     """
     Azure Computer Visionを使用して画像からテキストを抽出する
     
     Args:
-        image_path: 画像ファイルのパス
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列
         subscription_key: Azure Computer VisionのAPIキー
         endpoint: Azure Computer VisionのエンドポイントURL
     
@@ -194,12 +324,11 @@ def extract_with_azure_vision(image_path, subscription_key, endpoint):
         # クライアントを初期化
         client = ComputerVisionClient(endpoint, CognitiveServicesCredentials(subscription_key))
         
-        # 画像を読み込む
-        with open(image_path, "rb") as image_file:
-            image_data = image_file.read()
+        # 画像をPNGのバイト列にする
+        image_data = _to_png_bytes(image)
         
         # テキスト検出を実行
-        results = client.recognize_printed_text_in_stream(image_data)
+        results = client.recognize_printed_text_in_stream(io.BytesIO(image_data))
         
         text = ""
         for region in results.regions:
@@ -214,64 +343,72 @@ def extract_with_azure_vision(image_path, subscription_key, endpoint):
         return ""
 
 
-def extract_with_aws_textract(image_path):
+def extract_with_aws_textract(image):
     """
     AWS Textractを使用して画像からテキストを抽出する
     
     Args:
-        image_path: 画像ファイルのパス
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列
     
     Returns:
         抽出されたテキスト
     """
+    return _aws_textract_ocr(image)[0]
+
+
+def _aws_textract_ocr(image):
+    """AWS Textractでテキストと行の平均信頼度（0〜1、不明な場合はNone）を取得する"""
     if not AWS_TEXTRACT_AVAILABLE:
         logger.warning("AWS Textractが利用できません")
-        return ""
+        return "", None
     
     try:
         # クライアントを初期化
         client = boto3.client('textract')
         
-        # 画像を読み込む
-        with open(image_path, "rb") as image_file:
-            image_bytes = image_file.read()
+        # 画像をPNGのバイト列にする
+        image_bytes = _to_png_bytes(image)
         
         # テキスト検出を実行
         response = client.detect_document_text(Document={'Bytes': image_bytes})
         
         text = ""
+        confidences = []
         for item in response["Blocks"]:
             if item["BlockType"] == "LINE":
                 text += item["Text"] + "\n"
+                if "Confidence" in item:
+                    confidences.append(item["Confidence"])
         
-        return text
+        confidence = sum(confidences) / len(confidences) / 100 if confidences else None
+        return text, confidence
     except Exception as e:
         logger.error(f"AWS Textractエラー: {str(e)}")
-        return ""
+        return "", None
 
 
-def pdf_to_images(pdf_path, dpi=300):
+def pdf_to_images(pdf_path, dpi=300, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
     """
     PDFを画像に変換する
+    全ページを一度に描画せず、メモリ上限に収まるページ数ずつ描画して保存する
     
     Args:
         pdf_path: PDFファイルのパス
         dpi: 解像度（デフォルトは300）
+        memory_budget_mb: 同時に保持する画像の合計メモリ上限（MB）
     
     Returns:
         画像のパスのリスト
     """
     try:
-        # PDFを画像に変換
-        images = convert_from_path(pdf_path, dpi=dpi)
         image_paths = []
         
         # 一時ディレクトリを作成
         temp_dir = tempfile.mkdtemp()
         
         # 各ページを画像として保存
-        for i, image in enumerate(images):
-            image_path = os.path.join(temp_dir, f"page_{i+1}.png")
+        for page_number, image in iter_page_images(pdf_path, dpi=dpi, memory_budget_mb=memory_budget_mb):
+            image_path = os.path.join(temp_dir, f"page_{page_number}.png")
             image.save(image_path, "PNG")
             image_paths.append(image_path)
         
@@ -281,53 +418,290 @@ def pdf_to_images(pdf_path, dpi=300):
         return [], None
 
 
-def preprocess_image(image_path):
+def estimate_noise(gray):
+    """
+    画像のノイズ量を推定する（Immerkærの方法。画素値の標準偏差に相当する値を返す）
+    文字の輪郭に反応しにくいラプラシアンの差分カーネルを縮小画像に適用するだけなので、ノイズ除去よりはるかに軽い
+    
+    Args:
+        gray: グレースケールのNumPy配列
+    
+    Returns:
+        float: ノイズの推定値（電子的に作成されたPDFではほぼ0、スキャン画像では数〜十数）
+    """
+    height, width = gray.shape
+    if width > NOISE_ESTIMATE_WIDTH:
+        gray = cv2.resize(gray, (NOISE_ESTIMATE_WIDTH, max(3, height * NOISE_ESTIMATE_WIDTH // width)),
+                          interpolation=cv2.INTER_AREA)
+        height, width = gray.shape
+    if height < 3 or width < 3:
+        return 0.0
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = cv2.filter2D(gray.astype(np.float32), -1, kernel)[1:-1, 1:-1]
+    return float(np.abs(response).sum() * np.sqrt(np.pi / 2) / (6 * (width - 2) * (height - 2)))
+
+
+def select_preprocess_profile(noise, config=None):
+    """
+    ノイズの推定値から前処理プロファイルを選ぶ
+    
+    Args:
+        noise: estimate_noiseの結果
+        config: 設定情報（ocr_noise_fast_threshold / ocr_noise_full_threshold）
+    
+    Returns:
+        str: PREPROCESS_PROFILESのいずれか
+    """
+    config = config or {}
+    if noise >= float(config.get('ocr_noise_full_threshold', DEFAULT_NOISE_FULL_THRESHOLD)):
+        return "full"
+    if noise >= float(config.get('ocr_noise_fast_threshold', DEFAULT_NOISE_FAST_THRESHOLD)):
+        return "fast"
+    return "none"
+
+
+def _timed(timings, step, func, *args):
+    """funcを実行し、処理時間（ミリ秒）をtimings[step]に記録する"""
+    start = time.perf_counter()
+    result = func(*args)
+    if timings is not None:
+        timings[step] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def preprocess_image(image, profile="full", timings=None, config=None):
     """
     OCRの精度向上のために画像を前処理する
     
     Args:
-        image_path: 画像ファイルのパス
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列
+        profile: 前処理プロファイル（none / fast / full、autoの場合はノイズの推定値から選ぶ）
+        timings: 指定した場合は各処理の時間（ミリ秒）と選んだプロファイルを記録する辞書
+        config: 設定情報（autoの場合のしきい値）
     
     Returns:
-        前処理された画像のパス
+        前処理された画像（noneの場合はグレースケール、それ以外は二値化したNumPy配列。失敗した場合は入力をそのまま返す）
     """
     try:
-        # 画像を読み込む
-        image = cv2.imread(image_path)
-        
         # グレースケールに変換
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = _timed(timings, "to_gray", _to_gray, image)
         
-        # ノイズ除去
-        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+        if profile == "auto":
+            noise = _timed(timings, "noise_estimate", estimate_noise, gray)
+            profile = select_preprocess_profile(noise, config)
+            if timings is not None:
+                timings["noise"] = round(noise, 2)
+        if profile not in PREPROCESS_PROFILES:
+            logger.warning(f"不明な前処理プロファイルのためfullを使用します: {profile}")
+            profile = "full"
+        if timings is not None:
+            timings["profile"] = profile
         
-        # 適応的二値化
-        binary = cv2.adaptiveThreshold(
-            denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
+        if profile == "none":
+            return gray
+        
+        if profile == "fast":
+            # 軽いノイズ除去（メディアンフィルタ）
+            denoised = _timed(timings, "median_blur", cv2.medianBlur, gray, 3)
+        else:
+            # ノイズ除去
+            denoised = _timed(timings, "denoise", cv2.fastNlMeansDenoising, gray, None, 10, 7, 21)
         
-        # 一時ファイルに保存
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-            temp_path = temp_file.name
-            cv2.imwrite(temp_path, binary)
+        # 適応的二値化
+        binary = _timed(timings, "threshold", cv2.adaptiveThreshold,
+                        denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
         
-        return temp_path
+        return binary
     except Exception as e:
         logger.error(f"画像前処理エラー: {str(e)}")
-        return image_path
+        return image
+
+
+def _layout_engine(image):
+    """ローカルのTesseractによるレイアウト分析（ページ全体のテキストは1件だけ返す）"""
+    layout_results = extract_text_with_layout_analysis(image)
+    return {"texts": [("layout_full", layout_results["full_text"])],
+            "confidence": layout_results["confidence"], "regions": layout_results["regions"]}
+
+
+def _enabled_engines(image, config):
+    """
+    ページに適用するOCR手法の一覧を作成する
+    
+    Returns:
+        (手法名, 実行する関数, 有料のクラウドOCRかどうか)のリスト
+    """
+    engines = [("layout", lambda: _layout_engine(image), False)]
+    
+    # Google Cloud Vision API（設定されている場合）
+    if GOOGLE_VISION_AVAILABLE and config.get('use_google_vision', False):
+        def google_vision():
+            text, confidence = _google_vision_ocr(image)
+            return {"texts": [("google_vision", text)], "confidence": confidence}
+        engines.append(("google_vision", google_vision, True))
+    
+    # Azure Computer Vision（設定されている場合。信頼度は返されない）
+    if AZURE_VISION_AVAILABLE and config.get('use_azure_vision', False):
+        subscription_key = config.get('azure_subscription_key', '')
+        endpoint = config.get('azure_endpoint', '')
+        if subscription_key and endpoint:
+            def azure_vision():
+                text = extract_with_azure_vision(image, subscription_key, endpoint)
+                return {"texts": [("azure_vision", text)], "confidence": None}
+            engines.append(("azure_vision", azure_vision, True))
+    
+    # AWS Textract（設定されている場合）
+    if AWS_TEXTRACT_AVAILABLE and config.get('use_aws_textract', False):
+        def aws_textract():
+            text, confidence = _aws_textract_ocr(image)
+            return {"texts": [("aws_textract", text)], "confidence": confidence}
+        engines.append(("aws_textract", aws_textract, True))
+    
+    return engines
+
+
+def _run_engine(func, cancelled, gate=None, delay=0):
+    """
+    OCR手法を1つ実行する
+    有料の手法はローカルOCRの結果を最大delay秒待ち、その間に打ち切られた場合はAPIを呼び出さない
+    """
+    if gate is not None and delay > 0:
+        gate.wait(delay)
+    if cancelled.is_set():
+        return None
+    start = time.perf_counter()
+    result = func()
+    if result is not None:
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def _extract_page_texts(image, config, all_texts, all_region_texts, confidences=None, timings=None,
+                        abandoned=None):
+    """
+    1ページ分の画像に各抽出方法を並列に適用し、結果をall_texts / all_region_textsに追加する
+    信頼度がしきい値以上の結果が得られた時点、またはページの制限時間を過ぎた時点で残りの手法を打ち切る
+    
+    打ち切った時点で実行中の手法のスレッドは止められないため、abandonedに控えておき、
+    次のページの開始前にその完了を（最大でページの制限時間まで）待つ。ページごとに
+    打ち切られたOCRが積み重なり、CPUを奪い合うことを防ぐ
+    
+    Args:
+        image: 画像ファイルのパス、PIL画像、またはNumPy配列
+        config: 設定情報
+        all_texts: (method, text)のタプルのリスト
+        all_region_texts: 領域名ごとのテキストのリスト
+        confidences: all_textsと同じ順に各テキストの信頼度（0〜1、不明な場合はNone）を追加するリスト
+        timings: 指定した場合は前処理の各処理・各OCR手法の時間（ミリ秒）を記録する辞書
+        abandoned: 前のページで打ち切った実行中の手法のFutureの集合（このページで打ち切ったものを追加する）
+    """
+    threshold = float(config.get('ocr_confidence_threshold', DEFAULT_CONFIDENCE_THRESHOLD))
+    deadline = float(config.get('ocr_page_deadline', DEFAULT_PAGE_DEADLINE))
+    cloud_delay = config.get('ocr_cloud_delay', DEFAULT_CLOUD_DELAY)
+    if cloud_delay is None:
+        # ローカルOCRは1ページ数秒〜数十秒かかるため、クラウドOCRの時間を残してページの制限時間近くまで待つ
+        cloud_delay = max(deadline - DEFAULT_CLOUD_RESERVE, 0)
+    cloud_delay = float(cloud_delay)
+    
+    if abandoned:
+        waited = time.perf_counter()
+        _, running = wait(abandoned, timeout=deadline)
+        if running:
+            logger.warning(f"前のページで打ち切ったOCR手法が{len(running)}件、制限時間（{deadline}秒）を過ぎても実行中です")
+        abandoned.intersection_update(running)
+        if timings is not None:
+            timings["abandoned_wait"] = round((time.perf_counter() - waited) * 1000, 1)
+    
+    # 画像の前処理（以降はメモリ上の配列のまま扱う）
+    preprocess_timings = {}
+    processed_image = preprocess_image(image, config.get('ocr_preprocess_profile', DEFAULT_PREPROCESS_PROFILE),
+                                       preprocess_timings, config)
+    if timings is not None:
+        for step, value in preprocess_timings.items():
+            timings[step if step in ("profile", "noise") else f"preprocess.{step}"] = value
+    
+    engines = _enabled_engines(processed_image, config)
+    cancelled = threading.Event()
+    local_done = threading.Event()
+    if all(paid for _, _, paid in engines):
+        local_done.set()
+    
+    executor = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix='ocr-engine')
+    futures = {
+        executor.submit(_run_engine, func, cancelled, local_done if paid else None, cloud_delay): (name, paid)
+        for name, func, paid in engines
+    }
+    pending = set(futures.values())
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            name, paid = futures[future]
+            pending.discard((name, paid))
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"OCR手法 {name} でエラーが発生しました: {str(e)}")
+                result = None
+            if result is None:
+                if not paid:
+                    local_done.set()
+                continue
+            if timings is not None:
+                timings[f"ocr.{name}"] = result.get("elapsed_ms")
+            
+            for method, text in result["texts"]:
+                all_texts.append((method, text))
+                if confidences is not None:
+                    confidences.append(result["confidence"])
+            # 領域ごとのテキストを保存
+            for region, text in result.get("regions", {}).items():
+                all_region_texts.setdefault(region, []).append(text)
+            
+            confidence = result["confidence"]
+            if confidence is not None and confidence >= threshold and pending:
+                logger.info(f"OCR手法 {name} の信頼度が{confidence:.2f}のため、"
+                            f"残りの手法を打ち切ります: {', '.join(n for n, _ in pending)}")
+                break
+            if not paid:
+                # しきい値に届かなかった場合だけ、待機中の有料手法を開始させる
+                # （打ち切る場合はfinallyでcancelledを先に立てるため、有料手法はAPIを呼び出さない）
+                local_done.set()
+    except FuturesTimeoutError:
+        logger.warning(f"ページのOCRが制限時間（{deadline}秒）を超えたため打ち切りました: "
+                       f"{', '.join(n for n, _ in pending)}")
+    finally:
+        # 打ち切りを先に通知してから待機中の有料手法を起こし、APIを呼び出さずに終了させる
+        cancelled.set()
+        local_done.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        if abandoned is not None:
+            abandoned.update(future for future in futures if not future.done())
+
+
+def _extract_page_with_timings(page_number, image, config, all_texts, all_region_texts, confidences,
+                               abandoned=None):
+    """_extract_page_textsを実行し、ページの処理時間の内訳を記録・返却する"""
+    timings = {"page": page_number}
+    start = time.perf_counter()
+    _extract_page_texts(image, config, all_texts, all_region_texts, confidences, timings, abandoned)
+    timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+    steps = ", ".join(f"{step}={value}ms" for step, value in timings.items()
+                      if step not in ("page", "profile", "noise", "total"))
+    logger.info(f"ページ{page_number}の処理時間: {timings['total']}ms "
+                f"(前処理: {timings.get('profile')}, ノイズ推定値: {timings.get('noise')}, {steps})")
+    return timings
 
 
 def extract_text_hybrid(file_path, config=None):
     """
     複数の抽出方法を試し、最も信頼性の高い結果を返す
+    画像化から前処理・OCRまで、画像は一時ファイルを介さずメモリ上で受け渡す
     
     Args:
         file_path: ファイルのパス（PDFまたは画像）
         config: 設定情報
     
     Returns:
-        抽出結果の辞書
+        抽出結果の辞書（page_timingsにはページごとの前処理プロファイルと各処理の時間（ミリ秒）が入る）
     """
     if config is None:
         config = {}
@@ -335,80 +709,42 @@ def extract_text_hybrid(file_path, config=None):
     results = {}
     file_ext = os.path.splitext(file_path)[1].lower()
     
-    # PDFの場合は画像に変換
-    if file_ext == '.pdf':
-        image_paths, temp_dir = pdf_to_images(file_path)
-    else:
-        # 画像ファイルの場合はそのまま使用
-        image_paths = [file_path]
-        temp_dir = None
-    
     all_texts = []
     all_region_texts = {}
+    confidences = []
+    page_timings = []
+    abandoned = set()  # 前のページで打ち切った実行中のOCR手法
     
-    try:
-        for image_path in image_paths:
-            # 画像の前処理
-            processed_image = preprocess_image(image_path)
-            
-            # 方法1: 通常のTesseract OCR
-            if check_tesseract_available():
-                text = extract_text_with_tesseract(processed_image)
-                all_texts.append(("tesseract", text))
-            
-            # 方法2: レイアウト分析
-            layout_results = extract_text_with_layout_analysis(processed_image)
-            all_texts.append(("layout_full", layout_results["full_text"]))
-            
-            # 領域ごとのテキストを保存
-            for region, text in layout_results["regions"].items():
-                if region not in all_region_texts:
-                    all_region_texts[region] = []
-                all_region_texts[region].append(text)
-            
-            # 方法3: Google Cloud Vision API（設定されている場合）
-            if GOOGLE_VISION_AVAILABLE and config.get('use_google_vision', False):
-                text = extract_with_google_vision(processed_image)
-                all_texts.append(("google_vision", text))
-            
-            # 方法4: Azure Computer Vision（設定されている場合）
-            if AZURE_VISION_AVAILABLE and config.get('use_azure_vision', False):
-                subscription_key = config.get('azure_subscription_key', '')
-                endpoint = config.get('azure_endpoint', '')
-                if subscription_key and endpoint:
-                    text = extract_with_azure_vision(processed_image, subscription_key, endpoint)
-                    all_texts.append(("azure_vision", text))
-            
-            # 方法5: AWS Textract（設定されている場合）
-            if AWS_TEXTRACT_AVAILABLE and config.get('use_aws_textract', False):
-                text = extract_with_aws_textract(processed_image)
-                all_texts.append(("aws_textract", text))
-            
-            # 一時ファイルを削除
-            if processed_image != image_path:
-                os.unlink(processed_image)
-    
-    finally:
-        # 一時ファイルとディレクトリを削除
-        if temp_dir:
-            for image_path in image_paths:
-                if os.path.exists(image_path):
-                    os.unlink(image_path)
-            os.rmdir(temp_dir)
+    if file_ext == '.pdf':
+        # PDFの場合は1ページずつ画像化し、処理が終わったページの画像はすぐに解放する
+        try:
+            for page_number, image in iter_page_images(file_path, **raster_settings(config, default_dpi=300)):
+                page_timings.append(_extract_page_with_timings(page_number, image, config, all_texts,
+                                                               all_region_texts, confidences, abandoned))
+        except Exception as e:
+            logger.error(f"PDF画像変換エラー: {str(e)}")
+    else:
+        # 画像ファイルの場合はそのまま使用
+        page_timings.append(_extract_page_with_timings(1, file_path, config, all_texts, all_region_texts, confidences))
     
     # 結果を返す
     results["all_texts"] = all_texts
+    results["confidences"] = confidences
     results["region_texts"] = all_region_texts
+    results["page_timings"] = page_timings
     
     return results
 
 
-def select_best_text(texts):
+def select_best_text(texts, confidences=None):
     """
     複数のテキスト抽出結果から最適なものを選択する
     
     Args:
         texts: (method, text)のタプルのリスト
+        confidences: textsと同じ順の信頼度（0〜1、不明な場合はNone）のリスト
+            指定した場合はエンジンが返した信頼度でスコアリングし（不明な場合は手法ごとの目安を使う）、
+            同じ信頼度ではテキストの長いものを選ぶ
     
     Returns:
         最適なテキスト
@@ -416,14 +752,21 @@ def select_best_text(texts):
     if not texts:
         return ""
     
-    # テキストの長さでスコアリング
     scored_texts = []
-    for method, text in texts:
+    for index, (method, text) in enumerate(texts):
         # 空のテキストはスキップ
         if not text or text.isspace():
             continue
         
-        # スコアを計算
+        if confidences is not None:
+            # 信頼度でスコアリング
+            confidence = confidences[index] if index < len(confidences) else None
+            if confidence is None:
+                confidence = METHOD_PRIOR_CONFIDENCE.get(method, 0.5)
+            scored_texts.append(((confidence, len(text)), method, text))
+            continue
+        
+        # テキストの長さでスコアリング
         score = len(text)
         
         # 特定のメソッドにボーナスを与える
@@ -460,7 +803,7 @@ def get_combined_text(extraction_results):
     region_texts = extraction_results.get("region_texts", {})
     
     # 全体のテキストから最適なものを選択
-    full_text = select_best_text(all_texts)
+    full_text = select_best_text(all_texts, extraction_results.get("confidences"))
     
     # 中央部分のテキストを特に重視
     center_texts = region_texts.get("center", [])
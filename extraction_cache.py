@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抽出結果キャッシュモジュール
+PDFの内容（SHA-256）と抽出ロジックのバージョン、OCRの設定をキーに、ページごとの抽出結果をSQLiteに永続化する
+同じノード上の全ワーカー（gunicornの各プロセス）で共有される
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from page_layout import PageLayout
+from page_stream import PageText
+from sqlite_cache import SQLiteCache
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 抽出ロジック（page_stream / customer_extractor / amount_extractor）を変更した場合は更新する
+EXTRACTOR_VERSION = "4"
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'extraction_cache.db')
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_MB = 512
+DEFAULT_TTL_HOURS = 24 * 30
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """ファイル内容のSHA-256を計算する"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def config_digest(config: Optional[Dict[str, Any]]) -> str:
+    """
+    抽出結果に影響するOCRの設定（テナントごとの上書きを適用済みのocr_*）のハッシュを計算する
+    キャッシュの設定とテナントごとの上書きの一覧自体は含めない
+    """
+    settings = {key: value for key, value in (config or {}).items()
+                if key.startswith('ocr_') and key != 'ocr_tenant_policies' and not key.startswith('ocr_cache_')}
+    data = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def make_key(digest: str, version: str = EXTRACTOR_VERSION, config_hash: Optional[str] = None) -> str:
+    """キャッシュキーを作成する（内容ハッシュ + 抽出ロジックのバージョン + OCR設定のハッシュ）"""
+    key = f"{digest}:v{version}"
+    return f"{key}:c{config_hash}" if config_hash else key
+
+
+def pages_to_records(pages: List[Tuple[PageText, Optional[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """(PageText, fields)のリストをJSON保存用の辞書リストに変換する（単語の位置は辞書にする）"""
+    records = []
+    for page, fields in pages:
+        record = page._asdict()
+        if page.layout is not None:
+            record['layout'] = page.layout.to_dict()
+        records.append({'page': record, 'fields': fields})
+    return records
+
+
+def records_to_pages(records: List[Dict[str, Any]]) -> Iterator[Tuple[PageText, Optional[Dict[str, Any]]]]:
+    """pages_to_recordsで保存した辞書リストを(PageText, fields)に戻す"""
+    for record in records:
+        page = dict(record['page'])
+        if page.get('layout') is not None:
+            page['layout'] = PageLayout.from_dict(page['layout'])
+        yield PageText(**page), record.get('fields')
+
+
+class ExtractionCache(SQLiteCache):
+    """SQLiteを使った抽出結果の永続キャッシュ（サイズ上限とTTLによる削除あり）"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024, ttl_seconds: float = DEFAULT_TTL_HOURS * 3600):
+        """
+        初期化
+
+        Args:
+            path: SQLiteファイルのパス
+            max_entries: 最大エントリ数
+            max_bytes: 保存データの合計サイズ上限（バイト）
+            ttl_seconds: エントリの有効期間（秒）
+        """
+        super().__init__(path, 'extraction_cache', max_entries=max_entries, max_bytes=max_bytes,
+                         ttl_seconds=ttl_seconds, label="抽出結果キャッシュ")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache(config: Optional[Dict[str, Any]] = None) -> ExtractionCache:
+    """
+    プロセス共有のキャッシュインスタンスを取得する
+
+    Args:
+        config: 設定情報（extraction_cache_*）
+
+    Returns:
+        ExtractionCache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = config or {}
+            _cache = ExtractionCache(
+                path=config.get('extraction_cache_path') or DEFAULT_CACHE_PATH,
+                max_entries=int(config.get('extraction_cache_max_entries', DEFAULT_MAX_ENTRIES)),
+                max_bytes=int(config.get('extraction_cache_max_mb', DEFAULT_MAX_MB)) * 1024 * 1024,
+                ttl_seconds=float(config.get('extraction_cache_ttl_hours', DEFAULT_TTL_HOURS)) * 3600,
+            )
+            logger.info(f"抽出結果キャッシュを初期化しました: {_cache.path}")
+        return _cache
@@ -0,0 +1,700 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抽出エンジンモジュール
+金額・顧客名の抽出ルールを登録制にし、テキストの数値トークン化を1回だけ行って全ルールで共有する
+
+- TokenStream: 1ページ分のテキスト（NormalizedDocument）の数値トークン列
+  区切り方（[0-9,.]の連続など）ごとにテキスト全体を1回だけ走査し、同じ区切り方を使うルールで共有する
+  行ごとのトークン（amount_extractor.scan_line）も1ページにつき1回だけ作る
+- ルール: TokenStreamから候補（Candidate）を順位の高い順に返す関数。register_ruleで登録する
+- extract: 指定したルール（省略時は全ルール）を実行し、項目ごとに順位付けした候補を返す
+- best_candidate: 優先度の高いルールから順に実行し、候補が見つかった時点で打ち切る
+
+amount_extractor.extract_invoice_amount、extractors.extract_amount_only、
+customer_amount_extraction.extract_customer_and_amount、AIOCR._extract_amount_with_aiは
+それぞれ対応するルールを呼び出すだけの関数になっている
+"""
+
+import re
+import bisect
+import logging
+import threading
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from text_normalizer import NormalizedDocument, as_document
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 項目
+AMOUNT = "amount"
+CUSTOMER = "customer"
+
+# テキストの種類（TokenStream.textの引数）
+RAW = "raw"  # 元のテキスト
+SOURCE = "source"  # 元のテキスト（文字化けしている場合は読める行だけ）
+SOURCE_NORMALIZED = "source_normalized"  # SOURCEを正規化したもの
+
+# 各ルールが使う区切り方（TokenStream.runsの引数）
+DECIMAL_RUN = re.compile(r"[0-9,.]+")  # 数字・カンマ・ピリオド
+DIGIT_RUN = re.compile(r"[0-9]+")  # 数字のみ
+
+_LINE_TOKENS_KEY = "line_tokens"
+
+_is_word_char = re.compile(r"\w").match
+_YEN_RE = re.compile(r"[¥￥]")
+_HALF_YEN_RE = re.compile(r"¥")
+
+
+class Candidate(NamedTuple):
+    """抽出候補"""
+    field: str  # 項目（AMOUNT / CUSTOMER）
+    value: Any  # 金額は整数、顧客名は文字列
+    score: float  # ルール内での評価値（ルールごとに尺度が異なる）
+    rule: str  # 候補を出したルール
+    source: str  # 候補を見つけたテキストの種類（RAW / SOURCE / SOURCE_NORMALIZED）
+    start: Optional[int]  # テキスト上の開始位置
+    end: Optional[int]  # テキスト上の終了位置
+    text: str  # 一致した部分（金額の数字列・顧客名）
+    context: str  # 前後の文脈（判定に使った範囲や行）
+
+
+class TokenStream:
+    """
+    1ページ分のテキストの数値トークン列（作成はas_streamで行う）
+    走査結果はNormalizedDocument側の辞書に保存し、同じNormalizedDocumentから作ったTokenStreamで共有する
+    （NormalizedDocumentからTokenStreamを参照しないため、循環参照にならずページごとにすぐ解放される）
+    """
+
+    def __init__(self, document: NormalizedDocument):
+        self.document = document
+        # (id(テキスト), 区切り方) → (テキスト, 範囲)、LINE_TOKENS_KEY → 行トークン
+        self._cache: Dict[Any, Any] = document._token_cache
+
+    def text(self, kind: str = RAW) -> str:
+        """テキストの種類（RAW / SOURCE / SOURCE_NORMALIZED）に対応するテキスト"""
+        if kind == RAW:
+            return self.document.raw
+        if kind == SOURCE:
+            return self.document.source_text
+        if kind == SOURCE_NORMALIZED:
+            return self.document.source_normalized
+        raise ValueError(f"不明なテキストの種類: {kind}")
+
+    def runs(self, kind: str, pattern: 're.Pattern') -> List[Tuple[int, int]]:
+        """
+        テキストをpatternの文字の連続（DECIMAL_RUNなど）に区切った範囲
+        テキストと区切り方の組ごとに1回だけ走査し、同じ区切り方を使うルールで共有する
+        （文字化けのないテキストでは元のテキストと読める行が同じオブジェクトのため、それらの間でも共有する）
+        """
+        text = self.text(kind)
+        key = (id(text), pattern.pattern)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] is not text:
+            cached = (text, [match.span() for match in pattern.finditer(text)])
+            self._cache[key] = cached
+        return cached[1]
+
+    def line_tokens(self) -> list:
+        """元のテキストの各行のamount_extractor.LineTokens（数値を含まない行はNone）"""
+        tokens = self._cache.get(_LINE_TOKENS_KEY)
+        if tokens is None:
+            # 行ごとの正規表現の走査はC実装で速いため、行の区切りはscan_lineに任せ、結果だけを共有する
+            from amount_extractor import scan_line
+            tokens = [scan_line(line) for line in self.document.lines]
+            self._cache[_LINE_TOKENS_KEY] = tokens
+        return tokens
+
+
+def as_stream(text: Union[str, NormalizedDocument, TokenStream, None]) -> TokenStream:
+    """テキスト・NormalizedDocumentからTokenStreamを取得する（同じNormalizedDocumentでは走査結果を共有する）"""
+    if isinstance(text, TokenStream):
+        return text
+    return TokenStream(as_document(text))
+
+
+class Rule(NamedTuple):
+    """抽出ルール"""
+    name: str
+    field: str
+    func: Callable[..., Iterable[Candidate]]  # (TokenStream, options) -> 順位の高い順の候補
+    priority: int  # 小さいほど優先（extractで候補を並べる順・best_candidateで実行する順）
+
+
+_rules: Dict[str, Rule] = {}
+_rules_lock = threading.Lock()
+
+
+def register_rule(name: str, field: str, priority: int = 100):
+    """
+    抽出ルールを登録するデコレータ
+
+    Args:
+        name: ルール名（同じ名前で登録した場合は置き換える）
+        field: 項目（AMOUNT / CUSTOMER）
+        priority: 優先度（小さいほど優先）
+    """
+    def decorator(func):
+        with _rules_lock:
+            _rules[name] = Rule(name, field, func, priority)
+        return func
+    return decorator
+
+
+def get_rules(field: Optional[str] = None, names: Optional[Sequence[str]] = None) -> List[Rule]:
+    """登録済みのルールを優先度順に返す（namesを指定した場合はそのルールだけ）"""
+    with _rules_lock:
+        if names is not None:
+            unknown = [name for name in names if name not in _rules]
+            if unknown:
+                raise KeyError(f"未登録の抽出ルール: {', '.join(unknown)}")
+            rules = [_rules[name] for name in names]
+        else:
+            rules = list(_rules.values())
+    if field is not None:
+        rules = [rule for rule in rules if rule.field == field]
+    return sorted(rules, key=lambda rule: rule.priority)
+
+
+class ExtractionReport:
+    """extractの結果（項目ごとに、ルールの優先度順・ルール内の順位順に並べた候補）"""
+
+    def __init__(self, candidates: Dict[str, List[Candidate]]):
+        self.candidates = candidates
+
+    def ranked(self, field: str, rule: Optional[str] = None) -> List[Candidate]:
+        """項目の候補（ruleを指定した場合はそのルールの候補だけ）"""
+        candidates = self.candidates.get(field, [])
+        if rule is not None:
+            candidates = [candidate for candidate in candidates if candidate.rule == rule]
+        return candidates
+
+    def best(self, field: str, rule: Optional[str] = None) -> Optional[Candidate]:
+        """最も順位の高い候補"""
+        candidates = self.ranked(field, rule)
+        return candidates[0] if candidates else None
+
+    def value(self, field: str, rule: Optional[str] = None, default: Any = None) -> Any:
+        """最も順位の高い候補の値"""
+        candidate = self.best(field, rule)
+        return candidate.value if candidate is not None else default
+
+
+def extract(text: Union[str, NormalizedDocument, TokenStream], rules: Optional[Sequence[str]] = None,
+            field: Optional[str] = None, **options) -> ExtractionReport:
+    """
+    共有のトークン列に対して抽出ルールを実行する
+
+    Args:
+        text: 抽出元のテキスト（NormalizedDocument・TokenStreamも指定可能）
+        rules: 実行するルール名（省略時は登録済みの全ルール）
+        field: 実行する項目（省略時は全項目）
+        options: ルールへのオプション（page_countなど）
+
+    Returns:
+        ExtractionReport
+    """
+    stream = as_stream(text)
+    candidates: Dict[str, List[Candidate]] = {}
+    for rule in get_rules(field, rules):
+        candidates.setdefault(rule.field, []).extend(rule.func(stream, options))
+    return ExtractionReport(candidates)
+
+
+def best_candidate(text: Union[str, NormalizedDocument, TokenStream], field: str,
+                   rules: Optional[Sequence[str]] = None, **options) -> Optional[Candidate]:
+    """
+    優先度の高いルールから順に実行し、最初に候補を出したルールの最上位の候補を返す
+    （後のルールは実行しない）
+    """
+    stream = as_stream(text)
+    for rule in get_rules(field, rules):
+        for candidate in rule.func(stream, options):
+            return candidate
+    return None
+
+
+# ---------------------------------------------------------------------------
+# トークン列の周辺を調べる関数
+# ---------------------------------------------------------------------------
+
+def _keyword_before(text: str, position: int, keywords: Sequence[str], gap: str = "") -> Optional[int]:
+    """
+    positionの直前に「キーワード + 空白・gapの文字の連続」があればキーワードの開始位置を返す
+    （複数のキーワードが同じ位置で終わる場合は最も長いもの、つまり最も左から始まるもの）
+    """
+    i = position
+    while i > 0 and (text[i - 1].isspace() or text[i - 1] in gap):
+        i -= 1
+    starts = [i - len(keyword) for keyword in keywords if i >= len(keyword) and text.startswith(keyword, i - len(keyword))]
+    return min(starts) if starts else None
+
+
+def _keyword_yen_before(text: str, position: int, keywords: Sequence[str]) -> Optional[int]:
+    """positionの直前に「キーワード[\\s:：]*[¥￥]?\\s*」があればキーワードの開始位置を返す"""
+    i = position
+    while i > 0 and text[i - 1].isspace():
+        i -= 1
+    if i > 0 and text[i - 1] in "¥￥":
+        i -= 1
+    return _keyword_before(text, i, keywords, ":：")
+
+
+def _yen_after(text: str, position: int) -> Optional[int]:
+    """positionの後ろの空白に続いて「円」があれば、「円」の直後の位置を返す"""
+    i = position
+    length = len(text)
+    while i < length and text[i].isspace():
+        i += 1
+    return i + 1 if i < length and text[i] == "円" else None
+
+
+def _run_end(text: str, position: int, run_chars: str) -> Optional[int]:
+    """positionから始まるrun_charsの文字の連続の終了位置（positionの文字がrun_charsでなければNone）"""
+    length = len(text)
+    if position >= length or text[position] not in run_chars:
+        return None
+    end = position + 1
+    while end < length and text[end] in run_chars:
+        end += 1
+    return end
+
+
+def _runs_before_yen(text: str, run_chars: str) -> Iterator[Tuple[int, int, int]]:
+    """
+    「run_charsの文字の連続 + 空白 + 円」を順に返す（正規表現の([run_chars]+)\\s*円のfinditerと同じ）
+    数字列ごとに調べる代わりに、「円」の位置から直前の数字列を求める
+
+    Yields:
+        (数字列の開始位置, 数字列の終了位置, 「円」の直後の位置)
+    """
+    yen = text.find("円")
+    while yen >= 0:
+        end = yen
+        while end > 0 and text[end - 1].isspace():
+            end -= 1
+        start = end
+        while start > 0 and text[start - 1] in run_chars:
+            start -= 1
+        if start < end:
+            yield start, end, yen + 1
+        yen = text.find("円", yen + 1)
+
+
+def _line_end_after(text: str, position: int) -> bool:
+    """positionの後ろが空白だけで行末（またはテキストの末尾）になるか（正規表現の\\s*$、MULTILINE）"""
+    length = len(text)
+    i = position
+    while i < length and text[i].isspace():
+        if text[i] == "\n":
+            return True
+        i += 1
+    return i == length
+
+
+def _isolated_digits(stream: TokenStream, kind: str) -> Iterator[Tuple[int, int]]:
+    """前後が単語の文字（\\w）でない数字の連続（正規表現の\\b[0-9]+\\b）"""
+    text = stream.text(kind)
+    length = len(text)
+    for start, end in stream.runs(kind, DIGIT_RUN):
+        if start > 0 and _is_word_char(text, start - 1):
+            continue
+        if end < length and _is_word_char(text, end):
+            continue
+        yield start, end
+
+
+def _yen_prefixed(text: str, yen_re: 're.Pattern', run_chars: str) -> Iterator[Tuple[int, int, int]]:
+    """
+    「円記号 + 空白 + run_charsの文字の連続」を左から重ならないように探す（正規表現のfinditerと同じ順）
+
+    Yields:
+        (円記号の位置, 数字列の開始位置, 数字列の終了位置)
+    """
+    length = len(text)
+    found = yen_re.search(text)
+    while found is not None:
+        yen = found.start()
+        digits = yen + 1
+        while digits < length and text[digits].isspace():
+            digits += 1
+        digits_end = _run_end(text, digits, run_chars)
+        if digits_end is not None:
+            yield yen, digits, digits_end
+            found = yen_re.search(text, digits_end)
+        else:
+            found = yen_re.search(text, yen + 1)
+
+
+# ---------------------------------------------------------------------------
+# 金額・顧客名の抽出ルール
+# ---------------------------------------------------------------------------
+
+INVOICE_LINES = "invoice_lines"  # 行ごとのキーワード・位置・円記号による評価（amount_extractor）
+KEYWORD_CONTEXT = "keyword_context"  # キーワード・通貨記号のパターンと前後の文脈による評価（extractors.extract_amount_only）
+SPACED_KEYWORD = "spaced_keyword"  # 文字間に空白の入った「ご請求額」なども探すパターン（AIOCR）
+FIRST_MATCH_AMOUNT = "first_match_amount"  # パターンの優先順で最初に一致したもの（customer_amount_extraction）
+FIRST_MATCH_CUSTOMER = "first_match_customer"
+
+
+@register_rule(INVOICE_LINES, AMOUNT, priority=10)
+def _invoice_lines(stream: TokenStream, options: Dict[str, Any]) -> Iterator[Candidate]:
+    """
+    amount_extractorの候補収集・スコアで評価する（複数ページの場合はテキストを行数で等分し、最後のページを優先）
+    1ページ分のNormalizedDocumentに単語の位置（layout）がある場合、ページ下部は行のページ上の位置で判定する
+
+    Options:
+        page_count: ページ数
+    """
+    from amount_extractor import extractor
+
+    page_count = int(options.get('page_count', 1))
+    document = stream.document
+    # pdfplumberの単語の位置がある場合は、行のページ上の縦位置で「ページ下部」を判定する
+    positions = None
+    if document.layout is not None and page_count == 1:
+        positions = document.layout.line_positions(document.lines)
+    scored = extractor.collect_page_candidates(stream.line_tokens(), page_count, positions)
+    score_candidate = extractor.score_candidate
+    for candidate in scored:
+        candidate.score = score_candidate(candidate)
+    if not scored:
+        return
+    lines = document.lines
+
+    def to_candidate(candidate):
+        index = candidate.index
+        start = sum(map(len, lines[:index])) + index  # 行の開始位置（改行1文字ずつを含む）
+        end = start + len(lines[index])
+        return Candidate(AMOUNT, candidate.amount, candidate.score, INVOICE_LINES, RAW, start, end,
+                         str(candidate.amount), candidate.line)
+
+    # スコアの高い順（同じスコアは先に見つかったものを優先）
+    # best_candidateは最上位だけを使うため、並べ替えは2番目以降が必要になった時に行う
+    by_score = attrgetter("score")
+    best = max(scored, key=by_score)
+    yield to_candidate(best)
+    scored.sort(key=by_score, reverse=True)
+    for candidate in scored:
+        if candidate is not best:
+            yield to_candidate(candidate)
+
+
+# KEYWORD_CONTEXTのパターン（優先度順）
+# 0: 請求金額などのキーワード + [¥￥] + 数字  1: 合計などのキーワード + [¥￥] + 数字  2: 数字 + 円
+# 3: 金額 + 数字 + 円  4: [¥￥] + 数字  5: 100〜999999の数字  6: 3〜6桁の数字
+_KEYWORD_CONTEXT_PATTERNS = 7
+_TOTAL_KEYWORDS = ("ご請求金額", "請求金額", "請求額", "合計金額", "合計額", "総額", "お支払金額", "お支払い金額")
+_SUM_KEYWORDS = ("合計", "総計", "総合計", "総請求額")
+_ITEM_KEYWORDS = ('おやつ', '教材費', '活動費', '利用者負担額', '交通費')
+_CONTEXT_POSTAL_RE = re.compile(r'〒\s*([0-9]{3}[-－]?[0-9]{4})')
+_CONTEXT_RECIPIENT_RE = re.compile(r'[（(]([0-9]{7,10})[）)]')
+_CONTEXT_PHONE_RE = re.compile(r'(?:TEL|電話|FAX|ファックス)[：:]?\s*([0-9\-]{10,13})')
+_CONTEXT_DATE_RE = re.compile(r'[0-9]{4}[年/\-][0-9]{1,2}[月/\-][0-9]{1,2}日?')
+_CONTEXT_DATE_TABLE = str.maketrans('', '', '年月日/-')
+# 文脈にあると優先度を大幅に下げるパターン（郵便番号・受給者番号・年月・月日）
+_CONTEXT_EXCLUDE_RES = tuple(re.compile(pattern) for pattern in (
+    r'〒\s*[0-9]{3}[-－]?[0-9]{4}',
+    r'[（(][0-9]{7,10}[）)]',
+    r'受給者番号[：:]?\s*[0-9]+',
+    r'[0-9]{4}年[0-9]{1,2}月',
+    r'[0-9]{1,2}月[0-9]{1,2}日',
+))
+
+
+def _keyword_context_matches(stream: TokenStream, kind: str) -> Iterator[Tuple[int, int, int, int, int]]:
+    """
+    KEYWORD_CONTEXTの各パターンに一致する数字列を求める
+
+    Yields:
+        (パターンの番号, 一致の開始位置, 一致の終了位置, 数字列の開始位置, 数字列の終了位置)
+    """
+    text = stream.text(kind)
+    for start, end in stream.runs(kind, DECIMAL_RUN):
+        keyword = _keyword_yen_before(text, start, _TOTAL_KEYWORDS)
+        if keyword is not None:
+            yield 0, keyword, end, start, end
+        keyword = _keyword_yen_before(text, start, _SUM_KEYWORDS)
+        if keyword is not None:
+            yield 1, keyword, end, start, end
+        yen_end = _yen_after(text, end)
+        if yen_end is not None:
+            yield 2, start, yen_end, start, end
+            keyword = _keyword_before(text, start, ("金額",), ":：")
+            if keyword is not None:
+                yield 3, keyword, yen_end, start, end
+    for yen, start, end in _yen_prefixed(text, _YEN_RE, "0123456789,.¥￥"):
+        yield 4, yen, end, start, end
+    for start, end in _isolated_digits(stream, kind):
+        if 3 <= end - start <= 6:
+            if text[start] != "0":
+                yield 5, start, end, start, end
+            yield 6, start, end, start, end
+
+
+def _keyword_context_weight(text: str, priority: int, match_start: int, match_end: int,
+                            amount: int) -> Optional[Tuple[int, str]]:
+    """KEYWORD_CONTEXTの候補の優先度と文脈（郵便番号・受給者番号・電話番号・日付と一致する場合はNone）"""
+    context = text[max(0, match_start - 40):min(len(text), match_end + 40)]
+    amount_str = str(amount)
+
+    # 郵便番号・受給者番号・電話番号・日付と一致する金額は除外する
+    postal_match = _CONTEXT_POSTAL_RE.search(context)
+    if postal_match and postal_match.group(1).replace('-', '').replace('－', '') == amount_str:
+        logger.info(f"郵便番号と一致する金額を除外: {amount}")
+        return None
+    recipient_match = _CONTEXT_RECIPIENT_RE.search(context)
+    if recipient_match and (amount_str in recipient_match.group(1) or recipient_match.group(1) in amount_str):
+        logger.info(f"受給者番号と一致する金額を除外: {amount}, 受給者番号: {recipient_match.group(1)}")
+        return None
+    phone_match = _CONTEXT_PHONE_RE.search(context)
+    if phone_match and phone_match.group(1).replace('-', '') == amount_str:
+        logger.info(f"電話番号と一致する金額を除外: {amount}")
+        return None
+    date_match = _CONTEXT_DATE_RE.search(context)
+    if date_match and date_match.group(0).translate(_CONTEXT_DATE_TABLE) == amount_str:
+        logger.info(f"日付と一致する金額を除外: {amount}")
+        return None
+
+    # パターンの順序による優先度
+    weight = _KEYWORD_CONTEXT_PATTERNS - priority
+
+    # 重要なキーワードに基づく優先度調整
+    # （近くの範囲は元の実装どおり、テキスト上の位置で文脈を切り出す）
+    near = context[max(0, match_start - 20):match_end + 20]
+    if 'ご請求額' in context:
+        weight += 15
+    elif '請求額' in context:
+        weight += 12
+    elif '合計' in context and '合計' in near:
+        weight += 10
+    elif '総額' in context:
+        weight += 8
+    elif '金額' in context and '金額' in near:
+        weight += 7
+    elif 'お支払' in context:
+        weight += 6
+
+    # 通貨記号が近くにある場合は優先度を上げる
+    yen_near = context[max(0, match_start - 5):match_end + 5]
+    if '¥' in yen_near or '￥' in yen_near:
+        weight += 5
+
+    # 項目名（おやつ、教材費など）が含まれる場合は優先度を下げる
+    if '合計' not in context:
+        weight -= 5 * sum(1 for keyword in _ITEM_KEYWORDS if keyword in context)
+
+    # 郵便番号や受給者番号などのパターンがある場合は優先度を大幅に下げる
+    weight -= 8 * sum(1 for pattern in _CONTEXT_EXCLUDE_RES if pattern.search(context))
+
+    # 小さすぎる金額や、1000円単位の端数のない金額は優先度を下げる
+    if amount < 1000:
+        weight -= 2
+    if amount >= 1000 and amount % 1000 == 0 and '合計' not in near:
+        weight -= 1
+
+    # 「円」が続く場合は優先度を上げる
+    if '円' in context[match_end:match_end + 5]:
+        weight += 1
+    return weight, context
+
+
+@register_rule(KEYWORD_CONTEXT, AMOUNT, priority=20)
+def _keyword_context(stream: TokenStream, options: Dict[str, Any]) -> Iterator[Candidate]:
+    """
+    キーワード・通貨記号のパターンに一致する数字列を、前後40文字の文脈で評価する
+    元のテキスト（文字化けしている場合は読める行だけ）と正規化したテキストの両方を探す
+    """
+    found = []
+    kinds = [SOURCE]
+    if stream.text(SOURCE_NORMALIZED) != stream.text(SOURCE):
+        kinds.append(SOURCE_NORMALIZED)
+    for kind in kinds:
+        text = stream.text(kind)
+        for priority, match_start, match_end, start, end in _keyword_context_matches(stream, kind):
+            digits = text[start:end].replace(',', '').replace('¥', '').replace('￥', '')
+            try:
+                amount = int(digits)
+            except ValueError:
+                continue
+            if not 100 <= amount < 10000000:  # 100円から1000万円まで
+                continue
+            weighted = _keyword_context_weight(text, priority, match_start, match_end, amount)
+            if weighted is None:
+                continue
+            weight, context = weighted
+            logger.debug(f"金額候補: {amount}円 (優先度: {weight}, パターン: {priority + 1})")
+            found.append(Candidate(AMOUNT, amount, weight, KEYWORD_CONTEXT, kind, match_start, match_end,
+                                   text[start:end], context))
+
+    # 優先度の高い順（同じ優先度なら金額の大きい方）
+    found.sort(key=lambda candidate: (-candidate.score, -candidate.value))
+    return iter(found)
+
+
+# SPACED_KEYWORDのパターン（優先度順）: (キーワード, 円記号の後の数字を探すか)
+# キーワードと同じ行で、「円」または行末が続く最初の数字（円記号の場合は円記号に続く最初の数字）を探す
+# 最後（5）は「数字 + 円」
+_SPACED_KEYWORD_PATTERNS = (
+    (re.compile(r'ご\s*請\s*求\s*額'), False),
+    (re.compile(r'ご\s*請\s*求\s*額'), True),
+    (re.compile(r'請\s*求\s*額'), False),
+    (re.compile(r'合\s*計\s*金\s*額'), False),
+    (re.compile(r'\b合\s*計\b'), False),
+)
+_DECIMAL_CHARS = "0123456789,."
+
+
+def _spaced_keyword_matches(stream: TokenStream) -> Iterator[Tuple[int, int, int, int, int]]:
+    """
+    SPACED_KEYWORDの各パターンに一致する数字列を求める
+
+    Yields:
+        (パターンの番号, 一致の開始位置, 一致の終了位置, 数字列の開始位置, 数字列の終了位置)
+    """
+    text = stream.text(RAW)
+    length = len(text)
+    runs = stream.runs(RAW, DECIMAL_RUN)
+    run_starts = [start for start, _ in runs]
+    for priority, (keyword_re, after_yen) in enumerate(_SPACED_KEYWORD_PATTERNS):
+        position = 0
+        for keyword in keyword_re.finditer(text):
+            if keyword.start() < position:
+                continue
+            line_end = text.find('\n', keyword.end())
+            if line_end < 0:
+                line_end = length
+            found = None
+            if after_yen:
+                yen = text.find('¥', keyword.end(), line_end)
+                while yen >= 0 and found is None:
+                    digits = yen + 1
+                    while digits < length and text[digits].isspace():
+                        digits += 1
+                    digits_end = _run_end(text, digits, _DECIMAL_CHARS)
+                    if digits_end is not None:
+                        found = (digits, digits_end)
+                    else:
+                        yen = text.find('¥', yen + 1, line_end)
+            else:
+                index = bisect.bisect_left(run_starts, keyword.end())
+                while index < len(runs) and runs[index][0] < line_end:
+                    start, end = runs[index]
+                    if _yen_after(text, end) is not None or _line_end_after(text, end):
+                        found = (start, end)
+                        break
+                    index += 1
+            if found is not None:
+                yield priority, keyword.start(), found[1], found[0], found[1]
+                position = found[1]
+    yield from ((len(_SPACED_KEYWORD_PATTERNS), start, yen_end, start, end)
+                for start, end, yen_end in _runs_before_yen(text, _DECIMAL_CHARS))
+
+
+@register_rule(SPACED_KEYWORD, AMOUNT, priority=30)
+def _spaced_keyword(stream: TokenStream, options: Dict[str, Any]) -> Iterator[Candidate]:
+    """OCRで文字間に空白が入った「ご 請 求 額」なども含め、請求額・合計のキーワードに続く数字列を評価する"""
+    text = stream.text(RAW)
+    found = []
+    for priority, match_start, match_end, start, end in _spaced_keyword_matches(stream):
+        try:
+            amount = int(text[start:end].replace(',', '').replace('¥', ''))
+        except ValueError:
+            continue
+        if not 100 <= amount < 10000000:  # 妥当な金額範囲のみ取得
+            continue
+        context = text[max(0, match_start - 40):min(len(text), match_end + 40)]
+        weight = len(_SPACED_KEYWORD_PATTERNS) + 1 - priority
+        # 「ご請求額」が含まれる場合は優先度を大幅に上げる
+        if 'ご請求額' in context:
+            weight += 10
+        elif '請求額' in context:
+            weight += 5
+        elif '合計' in context:
+            weight += 3
+        found.append(Candidate(AMOUNT, amount, weight, SPACED_KEYWORD, RAW, match_start, match_end,
+                               text[start:end], context))
+
+    found.sort(key=lambda candidate: (-candidate.score, -candidate.value))
+    return iter(found)
+
+
+# FIRST_MATCH_AMOUNTのキーワード
+_FIRST_MATCH_AMOUNT_KEYWORD_RE = re.compile(r'(?:金額|料金|代金|請求額|合計)[:：\s]*')
+_FIRST_MATCH_TAX_KEYWORD_RE = re.compile(r'(?:税込|税抜)[:：\s]*')
+_COMMA_CHARS = "0123456789,"
+
+
+def _first_match_amounts(stream: TokenStream) -> Iterator[Tuple[int, int, int]]:
+    """
+    FIRST_MATCH_AMOUNTの各パターン（キーワード + 数字、¥ + 数字、数字 + 円、税込・税抜 + 数字）で
+    最初に一致した数字列を、パターンの順に返す
+
+    Yields:
+        (一致の開始位置, 数字列の開始位置, 数字列の終了位置)
+    """
+    text = stream.text(RAW)
+
+    def first_after_keyword(keyword_re):
+        # キーワード + 区切りの直後から始まる最初の数字列
+        for keyword in keyword_re.finditer(text):
+            end = _run_end(text, keyword.end(), _COMMA_CHARS)
+            if end is not None:
+                return keyword.start(), keyword.end(), end
+        return None
+
+    def first_after_yen():
+        for yen, start, end in _yen_prefixed(text, _HALF_YEN_RE, _COMMA_CHARS):
+            return yen, start, end
+        return None
+
+    def first_before_yen():
+        for start, end, _ in _runs_before_yen(text, _COMMA_CHARS):
+            return start, start, end
+        return None
+
+    for find in (lambda: first_after_keyword(_FIRST_MATCH_AMOUNT_KEYWORD_RE), first_after_yen, first_before_yen,
+                 lambda: first_after_keyword(_FIRST_MATCH_TAX_KEYWORD_RE)):
+        match = find()
+        if match is not None:
+            yield match
+
+
+@register_rule(FIRST_MATCH_AMOUNT, AMOUNT, priority=40)
+def _first_match_amount(stream: TokenStream, options: Dict[str, Any]) -> Iterator[Candidate]:
+    """パターンの優先順に、最初に一致した数字列を候補にする（金額の範囲は確認しない）"""
+    text = stream.text(RAW)
+    matches = list(_first_match_amounts(stream))
+    for rank, (match_start, start, end) in enumerate(matches):
+        digits = text[start:end].replace(',', '')
+        if not digits.isdigit():
+            continue
+        yield Candidate(AMOUNT, int(digits), len(matches) - rank, FIRST_MATCH_AMOUNT, RAW, match_start, end,
+                        text[start:end], text[match_start:end])
+
+
+# FIRST_MATCH_CUSTOMERのパターン（優先度順）
+_FIRST_MATCH_CUSTOMER_RES = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(?:お客様|顧客|氏名|名前)[:：\s]*([^\n\r]+)',
+    r'(?:様|さん)\s*([^\n\r]+)',
+    r'(?:宛先|送付先)[:：\s]*([^\n\r]+)',
+    r'([^\n\r]*様)',
+    r'([^\n\r]*さん)',
+))
+
+
+@register_rule(FIRST_MATCH_CUSTOMER, CUSTOMER, priority=40)
+def _first_match_customer(stream: TokenStream, options: Dict[str, Any]) -> Iterator[Candidate]:
+    """パターンの優先順に、最初に一致した2文字以上の名前を候補にする"""
+    text = stream.text(RAW)
+    for rank, pattern in enumerate(_FIRST_MATCH_CUSTOMER_RES):
+        match = pattern.search(text)
+        if not match:
+            continue
+        customer = match.group(1).strip()
+        if customer and len(customer) > 1:
+            yield Candidate(CUSTOMER, customer, len(_FIRST_MATCH_CUSTOMER_RES) - rank, FIRST_MATCH_CUSTOMER, RAW,
+                            match.start(1), match.end(1), customer, match.group(0))
@@ -1,9 +1,9 @@
 import re
 import logging
-from typing import Tuple, Optional, List, Dict, Any, NamedTuple
+from typing import Tuple, Optional, List, Dict, Any, NamedTuple, Union
 
 # 新しいモジュールをインポート
-from text_normalizer import normalize_text, extract_readable_content
+from text_normalizer import NormalizedDocument, as_document
 
 
 def is_valid_customer_name(customer: str, invalid_terms: list) -> bool:
@@ -45,7 +45,7 @@ def is_valid_customer_name(customer: str, invalid_terms: list) -> bool:
             
     # すべてのチェックをパスした場合は有効
     return True
-from amount_extractor import extract_invoice_amount
+from extraction_engine import AMOUNT, INVOICE_LINES, KEYWORD_CONTEXT, best_candidate, extract
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
@@ -56,298 +56,109 @@ class ExtractionResult(NamedTuple):
     amount: Optional[str]
     context: Optional[Dict[str, Any]] = None  # 追加情報（元の行、スコアなど）
 
-def extract_amount_only(text: str) -> Optional[int]:
+def extract_amount_only(text: Union[str, NormalizedDocument]) -> Optional[int]:
     """
     テキストから金額のみを抽出する
-    複数の正規表現パターンを使用して金額を抽出し、最も適切なものを返す
+    キーワード・通貨記号のパターンに一致する金額を前後の文脈で評価し、最も適切なものを返す
     
     Args:
-        text: 抽出元のテキスト
+        text: 抽出元のテキスト（他の抽出処理と共有するNormalizedDocumentも指定可能）
         
     Returns:
         抽出された金額（整数）、見つからない場合はNone
     """
-    if not text:
+    document = as_document(text)
+    if not document.raw:
         return None
     
     # デバッグ情報
-    logger.info(f"金額抽出処理開始 (テキスト長: {len(text)} 文字)")
+    logger.info(f"金額抽出処理開始 (テキスト長: {len(document.raw)} 文字)")
         
-    # テキストの正規化（全角→半角、空白除去など）
-    normalized_text = normalize_text(text)
-    
-    # 文字化けしているテキストから読みやすい部分を抽出
-    readable_data = extract_readable_content(text)
-    if readable_data["readable_ratio"] < 0.5:  # 読める文字が50%未満の場合
-        # 読み取り可能な部分だけを使用
-        text = readable_data["text"]
-        normalized_text = normalize_text(text)
-        logger.info(f"読み取り可能な部分のみ使用: {len(text)} 文字")
-    
-    # コンテキスト情報を取得（「万」などの単位を検出するため）
-    context = texts = {
-        '一': '1', '二': '2', '三': '3', '四': '4', '五': '5',
-        '六': '6', '七': '7', '八': '8', '九': '9', '零': '0',
-        '拾': '10', '百': '00', '千': '000', '万': '0000'
-    }
-    
-    # 金額を抽出するための正規表現パターン（優先度順）
-    amount_patterns = [
-        # 請求書や領収書でよく使われるパターン（最優先）
-        r'(?:ご請求金額|請求金額|請求額|合計金額|合計額|総額|お支払金額|お支払い金額)[\s:：]*[¥￥]?\s*([0-9,.]+)',
-        r'(?:合計|総計|総合計|総請求額)[\s:：]*[¥￥]?\s*([0-9,.]+)',
-        
-        # 金額の前後に「円」がつくパターン
-        r'([0-9,.]+)\s*円',
-        r'金額[\s:：]*([0-9,.]+)\s*円',
-        
-        # 通貨記号付きの金額
-        r'[¥￥]\s*([0-9,.￥¥]+)',
-        
-        # 3桁以上の数字（少額請求）
-        r'\b([1-9][0-9]{2,5})\b',  # 100〜99999の3-6桁の数字
-        
-        # 金額のみのパターン（最後の手段）
-        r'\b([0-9]{3,6})\b'  # 単語境界を追加して、IDの一部を拾わないようにする
-    ]
-    
-    # 配列にパターンマッチ結果を保存（優先度、金額、コンテキスト）
-    found_amounts = []
-    
-    # 両方のテキストで探索（元のテキストと正規化したテキスト）
-    for search_text in [text, normalized_text]:
-        for priority, pattern in enumerate(amount_patterns):
-            matches = re.finditer(pattern, search_text, re.MULTILINE)
-            for match in matches:
-                try:
-                    # 数値文字列を正規化（カンマ・スペース・通貨記号を除去）
-                    amount_str = (match.group(1)
-                                   .replace(',', '')
-                                   .replace(' ', '')
-                                   .replace('\u3000', '')   # 全角スペース
-                                   .replace('¥', '')
-                                   .replace('￥', '')
-                                   .replace('\u00a5', ''))  # FULLWIDTH YEN SIGN
-                    
-                    # 「?」や「�」が含まれる場合の特殊処理
-                    if '?' in amount_str or '�' in amount_str or '\ufffd' in amount_str:
-                        # 認識できない文字が連続している場合、その数を桁数として扱う
-                        unknown_chars = re.search(r'([\?�\ufffd]+)', amount_str)
-                        if unknown_chars:
-                            # 認識できない文字の数を数えて、その桁数の平均的な金額を推定
-                            num_digits = len(unknown_chars.group(1))
-                            if num_digits >= 1 and num_digits <= 7:
-                                # コンテキストから推定する
-                                if '万' in context:
-                                    # 万単位の場合
-                                    base = 10000
-                                else:
-                                    # 通常の場合
-                                    base = 10 ** (num_digits - 1)
-                                
-                                # 推定金額を計算
-                                amt = base
-                                print(f"認識できない文字を含む金額を推定: {amount_str} → {amt}円 ({num_digits}桁)")
-                                # 推定値なので優先度を下げる
-                                weight = 1
-                                found_amounts.append((weight, amt, context))
-                                continue
-                    
-                    amt = int(amount_str)
-                    
-                    # 妥当な金額範囲のみ取得
-                    if 100 <= amt < 10000000:  # 100円から1000万円まで
-                        context = search_text[max(0, match.start() - 40):min(len(search_text), match.end() + 40)]
-                        
-                        # 郵便番号や受給者番号などを除外するフィルタリング
-                        # 郵便番号パターン（例: 〒7000804）
-                        if re.search(r'〒\s*[0-9]{3,7}', context):
-                            postal_match = re.search(r'〒\s*([0-9]{3}[-－]?[0-9]{4})', context)
-                            if postal_match and postal_match.group(1).replace('-', '').replace('－', '') == str(amt):
-                                logger.info(f"郵便番号と一致する金額を除外: {amt}")
-                                continue
-                                
-                        # 受給者番号パターン（例: （3000068924））
-                        if re.search(r'[（(][0-9]{7,10}[）)]', context):
-                            recipient_match = re.search(r'[（(]([0-9]{7,10})[）)]', context)
-                            if recipient_match:
-                                recipient_num = recipient_match.group(1)
-                                # 受給者番号の一部が金額と一致する場合も除外
-                                if str(amt) in recipient_num or recipient_num in str(amt):
-                                    logger.info(f"受給者番号と一致する金額を除外: {amt}, 受給者番号: {recipient_num}")
-                                    continue
-                        
-                        # 受給者番号が前後の文脈に含まれる場合も除外
-                        if '受給者' in context and re.search(r'[0-9]{7,10}', context):
-                            for num_match in re.finditer(r'[0-9]{7,10}', context):
-                                if str(amt) in num_match.group(0) or num_match.group(0) in str(amt):
-                                    logger.info(f"受給者関連の番号と一致する金額を除外: {amt}")
-                                    continue
-                                    
-                        # 電話番号パターンと一致する場合も除外
-                        phone_pattern = r'(?:TEL|電話|FAX|ファックス)[：:]?\s*[0-9\-]{10,13}'
-                        if re.search(phone_pattern, context):
-                            phone_match = re.search(r'(?:TEL|電話|FAX|ファックス)[：:]?\s*([0-9\-]{10,13})', context)
-                            if phone_match and phone_match.group(1).replace('-', '') == str(amt):
-                                logger.info(f"電話番号と一致する金額を除外: {amt}")
-                                continue
-                                
-                        # 日付パターンと一致する場合も除外
-                        date_pattern = r'[0-9]{4}[年/\-][0-9]{1,2}[月/\-][0-9]{1,2}日?'
-                        if re.search(date_pattern, context):
-                            date_match = re.search(date_pattern, context)
-                            if date_match and date_match.group(0).replace('年', '').replace('月', '').replace('日', '').replace('/', '').replace('-', '') == str(amt):
-                                logger.info(f"日付と一致する金額を除外: {amt}")
-                                continue
-                        
-                        # 優先度を計算（パターンの順序が重要）
-                        weight = len(amount_patterns) - priority
-                        
-                        # 重要なキーワードに基づく優先度調整
-                        if 'ご請求額' in context:
-                            weight += 15
-                        elif '請求額' in context:
-                            weight += 12
-                        elif '合計' in context and '合計' in context[max(0, match.start() - 20):match.end() + 20]:
-                            weight += 10  # 合計の優先度を大幅に上げる（ただし近い位置に「合計」がある場合のみ）
-                        elif '総額' in context:
-                            weight += 8
-                        elif '金額' in context and '金額' in context[max(0, match.start() - 20):match.end() + 20]:
-                            weight += 7  # 「金額」キーワードが近くにある場合
-                        elif 'お支払' in context:
-                            weight += 6  # 「お支払」キーワードが含まれる場合
-                            
-                        # 通貨記号が含まれる場合は優先度を上げる
-                        if '¥' in context[max(0, match.start() - 5):match.end() + 5] or '￥' in context[max(0, match.start() - 5):match.end() + 5]:
-                            weight += 5  # 通貨記号が近くにある場合
-                        
-                        # 項目名が含まれる場合は優先度を下げる（おやつ、教材費など）
-                        item_keywords = ['おやつ', '教材費', '活動費', '利用者負担額', '交通費']
-                        for keyword in item_keywords:
-                            if keyword in context and '合計' not in context:
-                                weight -= 5  # 項目別金額の優先度を大幅に下げる
-                                
-                        # 郵便番号や受給者番号などの特定パターンを検出して優先度を大幅に下げる
-                        exclude_patterns = [
-                            r'〒\s*[0-9]{3}[-－]?[0-9]{4}',  # 郵便番号
-                            r'[（(][0-9]{7,10}[）)]',        # 受給者番号
-                            r'受給者番号[：:]?\s*[0-9]+',     # 受給者番号（別形式）
-                            r'[0-9]{4}年[0-9]{1,2}月',       # 年月表記
-                            r'[0-9]{1,2}月[0-9]{1,2}日'      # 月日表記
-                        ]
-                        
-                        for pattern in exclude_patterns:
-                            if re.search(pattern, context):
-                                weight -= 8  # 郵便番号などのパターンがある場合は優先度を大幅に下げる
-                        
-                        # 金額の大きさも考慮（小さすぎる金額や端数のない綺麗すぎる金額は優先度調整）
-                        if amt < 1000:
-                            weight -= 2
-                        
-                        # 請求書の金額は通常端数がある（1000円ぴったりよりも1,080円のような金額が多い）
-                        # 1000円単位の端数がない金額は、郵便番号などの可能性が高いので優先度を下げる
-                        if amt >= 1000 and amt % 1000 == 0 and '合計' not in context[max(0, match.start() - 20):match.end() + 20]:
-                            weight -= 1
-                        
-                        # 「円」が含まれる場合は優先度を上げる
-                        if '円' in context[match.end():match.end()+5]:
-                            weight += 1
-                        
-                        # 結果を追加
-                        found_amounts.append((weight, amt, context))
-                        print(f"金額候補: {amt}円 (優先度: {weight}, パターン: {priority+1})")
-                        print(f"  コンテキスト: '{context}'")
-                except ValueError:
-                    continue
+    # 文字化けしている場合（読める文字が50%未満）は読み取り可能な部分だけを使用
+    if document.is_garbled:
+        logger.info(f"読み取り可能な部分のみ使用: {len(document.source_text)} 文字")
     
+    # パターン・文脈による評価はextraction_engineのkeyword_contextルールで行う
+    report = extract(document, rules=(KEYWORD_CONTEXT,))
+    found_amounts = report.ranked(AMOUNT)
     if found_amounts:
-        # 優先度でソート（降順）
-        found_amounts.sort(key=lambda x: (-x[0], -x[1]))  # 優先度が同じなら金額の大きい方
-        
-        logger.info(f"抽出された全金額: {[(amt, weight) for weight, amt, _ in found_amounts[:5]]}")
-        logger.info(f"最適な金額: {found_amounts[0][1]}円 (優先度: {found_amounts[0][0]})")
+        logger.info(f"抽出された全金額: {[(c.value, c.score) for c in found_amounts[:5]]}")
+        logger.info(f"最適な金額: {found_amounts[0].value}円 (優先度: {found_amounts[0].score})")
         
         # 代替候補も記録（デバッグ用）
         if len(found_amounts) > 1:
-            logger.info(f"代替金額候補: {[(amt, weight) for weight, amt, _ in found_amounts[1:3]]}")
+            logger.info(f"代替金額候補: {[(c.value, c.score) for c in found_amounts[1:3]]}")
         
         # 最も優先度の高い金額を返す
-        return found_amounts[0][1]
+        return found_amounts[0].value
     
     logger.warning("有効な金額が見つかりませんでした")
     return None
 
-def extract_amount_and_customer(text: str, ocr_data=None) -> ExtractionResult:
+def extract_amount_and_customer(text: Union[str, NormalizedDocument], ocr_data=None) -> ExtractionResult:
     """
     PDFから抽出したテキストから金額と顧客名を抽出する
     複数の抽出戦略を使用して最適な結果を得る
     """
     # 空文字列やNoneの場合は早期リターン
-    if not text:
+    document = as_document(text)
+    if not document.raw:
         return ExtractionResult(None, None)
+    text = document.raw
         
     # テキストを正規化して読み取り可能な部分を抽出
-    readable_content = extract_readable_content(text)
-    normalized_text = readable_content["text"]
+    readable_content = document.readable_content
     
-    # 正規化されたテキストがない場合は元のテキストを使用
-    if not normalized_text:
-        normalized_text = text
-        
-    # テキストの正規化（文字化け対策）
-    normalized_text = normalize_text(normalized_text)
+    # 読み取り可能な部分を正規化（文字化け対策）、ない場合は元のテキストを使用
+    normalized_text = document.readable_normalized if readable_content["text"] else document.normalized
     
     # 正規化後もテキストが空の場合
     if not normalized_text or normalized_text.strip() == '':
         # 文字化けテキストから読める部分を抽出
-        readable_content = extract_readable_content(text)
         if readable_content["readable_ratio"] < 0.3:  # 30%未満しか読めない場合
             logger.warning(f"テキストの可読率が低すぎます: {readable_content['readable_ratio']:.2f}")
             return ExtractionResult(customer=None, amount=None)
         normalized_text = readable_content["text"]
 
-    # 金額の抽出（extract_invoice_amountを使用）
-    amount_result, _ = extract_invoice_amount(normalized_text)
-    amount = amount_result
-    
-    # 金額が見つからない場合は従来の方法を試す
-    if amount is None:
-        amount = extract_amount_only(normalized_text)
+    # 以降の抽出処理は正規化後のテキストを1つのNormalizedDocumentとして共有する
+    normalized_document = NormalizedDocument(normalized_text)
+
+    # 金額の抽出（行ごとの評価で見つからない場合は、パターン・文脈による評価を試す）
+    amount_candidate = best_candidate(normalized_document, AMOUNT, rules=(INVOICE_LINES, KEYWORD_CONTEXT))
+    amount = amount_candidate.value if amount_candidate else None
     
     # 顧客名の抽出
-    customer = extract_customer(normalized_text)
+    customer = extract_customer(normalized_document)
     
     # 追加情報を含む結果を返す
     context = {
         "normalized": True,
         "original_line": "",
-        "amount_extraction_method": "improved_algorithm" if amount_result else "legacy"
+        "amount_extraction_method": "improved_algorithm" if amount_candidate and amount_candidate.rule == INVOICE_LINES else "legacy",
+        "amount_rule": amount_candidate.rule if amount_candidate else None
     }
     
     return ExtractionResult(customer=customer, amount=amount, context=context) if amount is not None else None
 
-def extract_customer(text: str) -> Optional[str]:
+def extract_customer(text: Union[str, NormalizedDocument]) -> Optional[str]:
     """
     PDFテキストから顧客名（宛先）を抽出する特化関数
     左上に書かれているフルネームを優先的に抽出し、「様」を付ける
     """
     # テキストが空の場合は None を返す
-    if not text:
+    document = as_document(text)
+    if not document.raw:
         return None
     
     # デバッグ情報を追加
     print(f"\n===== 顧客名抽出処理開始 =====\n")
-    print(f"元のテキスト長: {len(text)} 文字")
+    print(f"元のテキスト長: {len(document.raw)} 文字")
         
-    # 文字化けしているテキストから読みやすい部分を抽出
-    readable_data = extract_readable_content(text)
-    if readable_data["readable_ratio"] < 0.5:  # 読める文字が50%未満の場合
-        # 読み取り可能な部分だけを使用
-        text = readable_data["text"]
+    # 文字化けしている場合は読み取り可能な部分だけを、それ以外は正規化したテキストを使用
+    text = document.clean_text
+    if document.is_garbled:  # 読める文字が50%未満の場合
         print(f"読み取り可能な部分のみ使用: {len(text)} 文字")
     else:
-        # 読み取り可能な割合が高い場合は正規化だけ行う
-        text = normalize_text(text)
         print(f"正規化したテキスト: {len(text)} 文字")
     
     # 金額関連の用語リスト - 顧客名として無効な用語
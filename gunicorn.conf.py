@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Gunicornの設定ファイル（カレントディレクトリのgunicorn.conf.pyは自動的に読み込まれる）
+
+ワーカーは複数のプロセスのため、prometheus_clientのメトリクスはmultiprocessモードで
+PROMETHEUS_MULTIPROC_DIRのファイルに書き出し、/metricsで全ワーカーの値を合算する（stage_timing参照）
+このファイルは--preloadでアプリを読み込む前に評価されるため、ここで環境変数とディレクトリを用意する
+
+非同期ジョブはWebのワーカーではなく、マスタープロセスが起動するジョブのワーカープロセス（job_worker.py）で
+実行する（JOB_WORKER_PROCESS=0の場合は起動しない）。ジョブの状態の取得（/jobs/<id>/stream）は
+ショートポーリングのため、Webのワーカーはsyncのまま長時間占有されない
+"""
+
+import os
+import glob
+import tempfile
+
+# 前回の起動時のファイルが残っていると値が合算されるため、起動時に削除する
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'invoice_prometheus')
+)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, '*.db')):
+    os.remove(path)
+
+
+def child_exit(server, worker):
+    """終了したワーカー（--max-requestsによる入れ替えなど）のメトリクスのファイルを片付ける"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+
+_job_worker = None
+
+
+def when_ready(server):
+    """ジョブのワーカープロセスを起動する"""
+    global _job_worker
+    if os.environ.get('JOB_WORKER_PROCESS', '1').lower() in ('0', 'false', 'no'):
+        return
+    from job_worker import JobWorkerProcess
+    _job_worker = JobWorkerProcess(server.log)
+    _job_worker.start()
+
+
+def on_exit(server):
+    """ジョブのワーカープロセスを停止する"""
+    if _job_worker is not None:
+        _job_worker.stop()
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+非同期ジョブ管理モジュール
+ジョブの種類と引数（JSON）をSQLiteに登録し、専用のワーカープロセス（job_worker.py）が
+処理待ちのジョブを取り出して実行する。状態とページごとの結果も同じSQLiteに記録する
+ジョブの状態は同じノード上の全プロセス（gunicornの各ワーカーとジョブのワーカー）から参照できる
+
+Webのワーカー（gunicorn）はジョブを登録するだけのため、--max-requestsによる入れ替えや
+タイムアウトによる強制終了の影響を受けない。ジョブのワーカープロセスは処理中のジョブの
+ハートビートを定期的に更新し、ハートビートが途絶えたジョブ（ワーカープロセスの停止）は
+処理待ちに戻して再実行する。再実行の回数が上限に達したジョブは失敗にする
+"""
+
+import os
+import json
+import socket
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jobs.db')
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_RETENTION_HOURS = 24
+DEFAULT_HEARTBEAT_INTERVAL = 10  # ハートビートの更新間隔（秒）
+DEFAULT_STALE_SECONDS = 60  # ハートビートがこの時間更新されないジョブは停止したプロセスのジョブとみなす
+DEFAULT_MAX_ATTEMPTS = 3  # 中断されたジョブを実行し直す回数の上限（最初の実行を含む）
+DEFAULT_POLL_INTERVAL = 1.0  # ワーカープロセスが処理待ちのジョブを確認する間隔（秒）
+# ストリーミング応答で新しいイベントを待つ最大時間（秒）。gunicornのsyncワーカーを長く占有しないように、
+# 取得できたイベントを返した時点で応答を終え、続きはsince=を指定して再度取得する（ショートポーリング）
+MAX_STREAM_SECONDS = 10
+
+ORPHANED_ERROR = "ジョブを処理していたプロセスが繰り返し停止したため、処理を中止しました"
+
+# ジョブの状態
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+
+
+class JobStore:
+    """ジョブの状態とページごとの結果を保存するSQLiteストア"""
+
+    def __init__(self, path: str = DEFAULT_JOBS_PATH, retention_seconds: float = DEFAULT_RETENTION_HOURS * 3600):
+        """
+        初期化
+
+        Args:
+            path: SQLiteファイルのパス
+            retention_seconds: 完了したジョブを保持する期間（秒）
+        """
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " filename TEXT,"
+            " total_pages INTEGER,"
+            " result_count INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " history_file TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " owner TEXT,"
+            " tenant_id TEXT,"
+            " heartbeat_at REAL,"
+            " kind TEXT,"
+            " payload TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker_id TEXT)"
+        )
+        # 以前のスキーマで作成されたストアに列を追加する
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (('owner', 'TEXT'), ('tenant_id', 'TEXT'), ('heartbeat_at', 'REAL'),
+                                    ('kind', 'TEXT'), ('payload', 'TEXT'),
+                                    ('attempts', 'INTEGER NOT NULL DEFAULT 0'), ('worker_id', 'TEXT')):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_results ("
+            " job_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " result TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, seq))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        # SQLiteの接続はスレッドごとに保持する
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            # 複数プロセスからの同時読み書きに備えてWALモードを使用
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, filename: str, owner: Optional[str] = None, tenant_id: Optional[str] = None,
+               kind: Optional[str] = None, payload: Optional[Dict[str, Any]] = None) -> str:
+        """
+        ジョブを登録してIDを返す（古いジョブの削除も行う）
+
+        Args:
+            filename: ファイル名
+            owner: ジョブを登録した利用者（状態の取得時に照合する）
+            tenant_id: 利用者のテナントID
+            kind: ジョブの種類（ワーカープロセスはregister_handlerで登録された処理を呼び出す）
+            payload: 処理に渡す引数（JSONに変換できる値）
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO jobs (id, status, filename, created_at, owner, tenant_id, heartbeat_at, kind, payload)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, STATUS_QUEUED, filename, now, owner, tenant_id, now, kind,
+             json.dumps(payload or {}, ensure_ascii=False))
+        )
+        self._purge(conn, now)
+        conn.commit()
+        return job_id
+
+    def claim(self, worker_id: str, kinds: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        最も古い処理待ちのジョブを処理中にして取り出す
+
+        複数のワーカープロセスが同時に呼び出しても、同じジョブを取り出さないように
+        書き込みロックを取得してから選択と更新を行う
+
+        Args:
+            worker_id: ワーカープロセスの識別子
+            kinds: 処理できるジョブの種類
+
+        Returns:
+            Dict: ジョブID・種類・引数・実行回数（処理待ちのジョブがない場合はNone）
+        """
+        kinds = list(kinds)
+        if not kinds:
+            return None
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT id, kind, payload, attempts FROM jobs WHERE status = ?"
+                f" AND kind IN ({', '.join('?' * len(kinds))}) ORDER BY created_at LIMIT 1",
+                (STATUS_QUEUED, *kinds)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?), heartbeat_at = ?,"
+                    " worker_id = ?, attempts = attempts + 1 WHERE id = ?",
+                    (STATUS_RUNNING, now, now, worker_id, row[0])
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if row is None:
+            return None
+        return {'job_id': row[0], 'kind': row[1], 'payload': json.loads(row[2] or '{}'), 'attempts': row[3] + 1}
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> None:
+        """保持期間を過ぎた完了済みジョブを削除する"""
+        if not self.retention_seconds:
+            return
+        expired = conn.execute(
+            "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (now - self.retention_seconds,)
+        ).fetchall()
+        if expired:
+            conn.executemany("DELETE FROM job_results WHERE job_id = ?", expired)
+            conn.executemany("DELETE FROM jobs WHERE id = ?", expired)
+            logger.info(f"期限切れのジョブを{len(expired)}件削除しました")
+
+    def mark_running(self, job_id: str) -> None:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                     (STATUS_RUNNING, now, now, job_id))
+        conn.commit()
+
+    def heartbeat(self, job_ids: List[str]) -> None:
+        """処理待ち・処理中のジョブのハートビートを更新する"""
+        if not job_ids:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND finished_at IS NULL",
+                         [(now, job_id) for job_id in job_ids])
+        conn.commit()
+
+    def requeue_stale(self, stale_seconds: float = DEFAULT_STALE_SECONDS,
+                      max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """
+        ハートビートがstale_seconds以上更新されていない処理中のジョブを処理待ちに戻す
+
+        実行回数がmax_attemptsに達したジョブと、種類のない（ワーカープロセスで実行できない）
+        以前の形式のジョブは失敗にする
+
+        Returns:
+            int: 処理待ちに戻したジョブの数
+        """
+        now = time.time()
+        stale = "COALESCE(heartbeat_at, started_at, created_at) < ?"
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, finished_at = ?"
+                f" WHERE status IN (?, ?) AND {stale} AND (kind IS NULL OR (status = ? AND attempts >= ?))",
+                (STATUS_FAILED, ORPHANED_ERROR, now, STATUS_QUEUED, STATUS_RUNNING, now - stale_seconds,
+                 STATUS_RUNNING, max_attempts)
+            ).rowcount
+            requeued = conn.execute(
+                f"UPDATE jobs SET status = ?, worker_id = NULL, heartbeat_at = ? WHERE status = ? AND {stale}",
+                (STATUS_QUEUED, now, STATUS_RUNNING, now - stale_seconds)
+            ).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if requeued:
+            logger.warning(f"処理が中断されたジョブを{requeued}件処理待ちに戻しました")
+        if failed:
+            logger.warning(f"処理が中断されたジョブを{failed}件失敗にしました")
+        return requeued
+
+    def set_total_pages(self, job_id: str, total_pages: int) -> None:
+        conn = self._connect()
+        conn.execute("UPDATE jobs SET total_pages = ? WHERE id = ?", (total_pages, job_id))
+        conn.commit()
+
+    def append_result(self, job_id: str, result: Dict[str, Any]) -> None:
+        """ページの処理結果を追加する"""
+        conn = self._connect()
+        (seq,) = conn.execute("SELECT result_count FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.execute(
+            "INSERT INTO job_results (job_id, seq, result) VALUES (?, ?, ?)",
+            (job_id, seq, json.dumps(result, ensure_ascii=False, default=str))
+        )
+        conn.execute("UPDATE jobs SET result_count = ? WHERE id = ?", (seq + 1, job_id))
+        conn.commit()
+
+    def clear_results(self, job_id: str) -> None:
+        """記録済みの結果を削除する（中断されたジョブを最初から実行し直す場合）"""
+        conn = self._connect()
+        conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+        conn.execute("UPDATE jobs SET result_count = 0, total_pages = NULL WHERE id = ?", (job_id,))
+        conn.commit()
+
+    def finish(self, job_id: str, history_file: Optional[str] = None, error: Optional[str] = None) -> None:
+        """ジョブを完了（errorがある場合は失敗）にする"""
+        status = STATUS_FAILED if error else STATUS_COMPLETED
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = ?, history_file = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, history_file, error, time.time(), job_id)
+        )
+        conn.commit()
+
+    def get(self, job_id: str, include_results: bool = True, since: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        ジョブの状態を取得する
+
+        Args:
+            job_id: ジョブID
+            include_results: ページごとの結果を含めるかどうか
+            since: この番号以降の結果のみ返す
+
+        Returns:
+            Dict: ジョブの状態（存在しない場合はNone）
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT id, status, filename, total_pages, result_count, error, history_file,"
+            " created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        job = dict(zip(
+            ('job_id', 'status', 'filename', 'total_pages', 'result_count', 'error', 'history_file',
+             'created_at', 'started_at', 'finished_at'),
+            row
+        ))
+        if include_results:
+            job['results'] = self.get_results(job_id, since)
+        return job
+
+    def get_owner(self, job_id: str) -> Optional[Dict[str, Optional[str]]]:
+        """ジョブを登録した利用者とテナントID（ジョブが存在しない場合はNone）"""
+        row = self._connect().execute("SELECT owner, tenant_id FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {'owner': row[0], 'tenant_id': row[1]}
+
+    def get_results(self, job_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT result FROM job_results WHERE job_id = ? AND seq >= ? ORDER BY seq",
+            (job_id, since)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+def iter_job_events(store: JobStore, job_id: str, poll_interval: float = 0.5,
+                    timeout: Optional[float] = None, since: int = 0,
+                    short_poll: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    ジョブの進行状況をイベントとして順に返す（ストリーミング応答用）
+
+    結果が追加されるたびに{'event': 'result'}を、状態が変わるたびに{'event': 'status'}を返し、
+    ジョブが完了した時点で終了する。完了前に打ち切る場合は続きの位置を{'event': 'continue'}で返す
+
+    Args:
+        store: ジョブストア
+        job_id: ジョブID
+        poll_interval: ポーリング間隔（秒）
+        timeout: 打ち切りまでの時間（秒、Noneの場合は無制限）
+        since: この番号以降の結果から返す（打ち切られたストリームの再開用）
+        short_poll: Trueの場合は新しい結果か状態の変化を返した時点で打ち切る
+    """
+    deadline = time.time() + timeout if timeout else None
+    sent = since
+    last_status = None
+    first = True
+    while True:
+        job = store.get(job_id, include_results=False)
+        if job is None:
+            yield {'event': 'error', 'job_id': job_id, 'error': 'ジョブが見つかりません'}
+            return
+
+        updated = False
+        for result in store.get_results(job_id, since=sent):
+            yield {'event': 'result', 'job_id': job_id, 'index': sent, 'result': result}
+            sent += 1
+            updated = True
+
+        if job['status'] != last_status or job['status'] in FINISHED_STATUSES:
+            # 最初に返す状態は変化として扱わない
+            updated = updated or not first
+            last_status = job['status']
+            yield {'event': 'status', **job}
+
+        # 完了後に追加された結果がないことを確認してから終了する
+        if job['status'] in FINISHED_STATUSES and sent >= job['result_count']:
+            return
+
+        if (short_poll and updated) or (deadline and time.time() >= deadline):
+            # 続きはsince=sentで再度取得するか、/jobs/<id>?since=で取得する
+            yield {'event': 'continue', 'job_id': job_id, 'since': sent}
+            return
+        first = False
+        time.sleep(poll_interval)
+
+
+# ジョブの種類ごとの処理（ワーカープロセスが呼び出す）
+_handlers: Dict[str, Callable[..., Optional[str]]] = {}
+
+
+def register_handler(kind: str, func: Callable[..., Optional[str]]) -> None:
+    """
+    ジョブの種類に処理を登録する
+
+    funcは第1引数にジョブID、キーワード引数にジョブの引数（payload）を受け取り、履歴ファイル名を返す
+    ワーカープロセスでも同じ登録が行われるように、モジュールの読み込み時に呼び出す
+    """
+    _handlers[kind] = func
+
+
+class JobWorker:
+    """
+    ジョブストアから処理待ちのジョブを取り出し、ワーカースレッドで実行する
+    専用のワーカープロセス（job_worker.py）で動かし、Webのワーカーの入れ替えの影響を受けないようにする
+    監視スレッドが処理中のジョブのハートビートを更新し、他のプロセスで中断されたジョブを処理待ちに戻す
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = DEFAULT_JOB_WORKERS,
+                 heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 handlers: Optional[Dict[str, Callable[..., Optional[str]]]] = None):
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.handlers = _handlers if handlers is None else handlers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._active = set()  # このワーカーで処理中のジョブ
+        self._active_lock = threading.Lock()
+        self._slots = threading.Semaphore(self.max_workers)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self) -> None:
+        """stopが呼ばれるまで処理待ちのジョブを取り出して実行する"""
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pdf-job')
+        monitor = threading.Thread(target=self._monitor_loop, name='pdf-job-heartbeat', daemon=True)
+        # 起動時に、停止したプロセスに残されたジョブを処理待ちに戻す
+        self.store.requeue_stale(self.stale_seconds, self.max_attempts)
+        monitor.start()
+        logger.info(f"ジョブのワーカーを開始しました: {self.worker_id} ({self.store.path})")
+        try:
+            while not self._stop.is_set():
+                if not self._slots.acquire(timeout=self.poll_interval):
+                    continue
+                try:
+                    job = self.store.claim(self.worker_id, self.handlers)
+                except Exception as e:
+                    logger.warning(f"処理待ちのジョブの取得に失敗しました: {e}")
+                    job = None
+                if job is None:
+                    self._slots.release()
+                    self._stop.wait(self.poll_interval)
+                    continue
+                with self._active_lock:
+                    self._active.add(job['job_id'])
+                executor.submit(self._run, job)
+        finally:
+            # 処理中のジョブの完了を待つ（待てずに停止した場合は、他のワーカーが処理待ちに戻す）
+            executor.shutdown(wait=True)
+            self._stop.set()
+            logger.info(f"ジョブのワーカーを停止しました: {self.worker_id}")
+
+    def _monitor_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                with self._active_lock:
+                    active = list(self._active)
+                self.store.heartbeat(active)
+                self.store.requeue_stale(self.stale_seconds, self.max_attempts)
+            except Exception as e:
+                logger.warning(f"ジョブのハートビートの更新に失敗しました: {e}")
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job['job_id']
+        try:
+            if job['attempts'] > 1:
+                logger.info(f"中断されたジョブを実行し直します: {job_id} ({job['attempts']}回目)")
+            history_file = self.handlers[job['kind']](job_id, **job['payload'])
+            self.store.finish(job_id, history_file=history_file)
+            logger.info(f"ジョブが完了しました: {job_id}")
+        except Exception as e:
+            logger.error(f"ジョブの処理中にエラーが発生しました ({job_id}): {str(e)}")
+            self.store.finish(job_id, error=str(e))
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+            self._slots.release()
+
+    def start(self) -> 'JobWorker':
+        """別スレッドでrunを開始する（開発サーバーとテスト用）"""
+        self._thread = threading.Thread(target=self.run, name='pdf-job-worker', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        """新しいジョブの取り出しを止める（waitの場合は処理中のジョブの完了を待つ）"""
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store(config: Optional[Dict[str, Any]] = None) -> JobStore:
+    """
+    プロセス共有のジョブストアを取得する
+
+    Args:
+        config: 設定情報（job_store_path, job_retention_hours）
+
+    Returns:
+        JobStore
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            config = config or {}
+            _store = JobStore(
+                path=config.get('job_store_path') or DEFAULT_JOBS_PATH,
+                retention_seconds=float(config.get('job_retention_hours', DEFAULT_RETENTION_HOURS)) * 3600,
+            )
+        return _store
+
+
+def enqueue(kind: str, filename: str, payload: Dict[str, Any], owner: Optional[str] = None,
+            tenant_id: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    ジョブを処理待ちとして登録する（実行はワーカープロセスが行う）
+
+    Args:
+        kind: ジョブの種類（register_handlerで登録したもの）
+        filename: ファイル名
+        payload: 処理に渡す引数（JSONに変換できる値）
+        owner: ジョブを登録した利用者（状態の取得時に照合する）
+        tenant_id: 利用者のテナントID
+        config: 設定情報
+
+    Returns:
+        str: ジョブID
+    """
+    job_id = get_job_store(config).create(filename, owner=owner, tenant_id=tenant_id, kind=kind, payload=payload)
+    logger.info(f"ジョブを登録しました: {job_id} ({kind}, {filename})")
+    return job_id
+
+
+def create_job_worker(config: Optional[Dict[str, Any]] = None) -> JobWorker:
+    """
+    設定に従ってジョブのワーカーを作成する
+
+    Args:
+        config: 設定情報（job_*）
+
+    Returns:
+        JobWorker
+    """
+    config = config or {}
+    return JobWorker(
+        get_job_store(config),
+        max_workers=int(config.get('job_workers', DEFAULT_JOB_WORKERS)),
+        heartbeat_interval=float(config.get('job_heartbeat_interval', DEFAULT_HEARTBEAT_INTERVAL)),
+        stale_seconds=float(config.get('job_stale_seconds', DEFAULT_STALE_SECONDS)),
+        max_attempts=int(config.get('job_max_attempts', DEFAULT_MAX_ATTEMPTS)),
+    )
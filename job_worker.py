@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+非同期ジョブのワーカープロセス
+ジョブストア（SQLite）から処理待ちのジョブを取り出して実行する
+
+    python job_worker.py
+
+gunicornで起動した場合は、gunicorn.conf.pyがマスタープロセスからこのスクリプトを起動し、
+停止した場合は起動し直す（JobWorkerProcess）。ジョブストアは同じノードのSQLiteのため、
+Webのワーカーと同じマシン（コンテナ）で動かす
+"""
+
+import os
+import sys
+import signal
+import logging
+import subprocess
+import threading
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY_SECONDS = 5  # 停止したワーカープロセスを起動し直すまでの時間
+STOP_TIMEOUT_SECONDS = 30  # 停止時に処理中のジョブの完了を待つ時間
+
+
+class JobWorkerProcess:
+    """ジョブのワーカープロセスを起動し、停止した場合は起動し直す（gunicornのマスタープロセス用）"""
+
+    def __init__(self, log=None):
+        self.log = log or logger
+        self._process = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._supervise, name='job-worker-supervisor', daemon=True)
+        self._thread.start()
+
+    def _supervise(self) -> None:
+        script = os.path.abspath(__file__)
+        while not self._stop.is_set():
+            self._process = subprocess.Popen([sys.executable, script])
+            self.log.info(f"ジョブのワーカープロセスを起動しました: pid={self._process.pid}")
+            code = self._process.wait()
+            if self._stop.is_set():
+                return
+            self.log.warning(f"ジョブのワーカープロセスが停止しました（終了コード{code}）。"
+                             f"{RESTART_DELAY_SECONDS}秒後に起動し直します")
+            self._stop.wait(RESTART_DELAY_SECONDS)
+
+    def stop(self) -> None:
+        """ワーカープロセスを停止する（処理中のジョブは完了を待ち、待てない場合は次の起動時に実行し直す）"""
+        self._stop.set()
+        process = self._process
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=STOP_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+
+    # カレントディレクトリをPYTHONPATHに追加（wsgi.pyと同じ）
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+
+    # appの読み込みでジョブの種類ごとの処理が登録される
+    from app import create_app, get_config
+    import job_queue
+
+    create_app()
+    worker = job_queue.create_job_worker(get_config())
+
+    def handle_stop(signum, frame):
+        logger.info("停止のシグナルを受信しました。処理中のジョブの完了を待って終了します")
+        worker.stop(wait=False)
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+キーワード照合モジュール
+複数のキーワードを1回の走査で探すAho–Corasick型のオートマトン
+
+キーワードはグループ（例: 金額の完全一致キーワード、顧客名として無効な用語）ごとに登録し、
+1行を1回走査するだけで、全グループのキーワードの一致（重なり合うものを含む）をまとめて返す
+抽出処理ごとに「any(term in line for term in terms)」を繰り返す代わりに使う
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+DEFAULT_GROUP = "default"
+
+
+class KeywordAutomaton:
+    """グループ分けしたキーワードを1回の走査で照合するオートマトン"""
+
+    def __init__(self, groups: Mapping[str, Iterable[str]]):
+        """
+        初期化（構築は1回だけ行い、照合は何度でも使い回す）
+
+        Args:
+            groups: グループ名 → キーワードのイテラブル
+        """
+        self.groups = {name: tuple(keywords) for name, keywords in groups.items()}
+
+        # トライ木を作る（状態0が根）
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[str, str]]] = [[]]
+        for group, keywords in self.groups.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    next_state = goto[state].get(ch)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][ch] = next_state
+                        goto.append({})
+                        outputs.append([])
+                    state = next_state
+                if (group, keyword) not in outputs[state]:
+                    outputs[state].append((group, keyword))
+
+        # 幅優先で失敗遷移を求め、失敗先の遷移と出力を各状態にまとめて決定性の遷移表にする
+        # （遷移表にない文字は根に戻る）
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            outputs[state] = outputs[state] + [out for out in outputs[fail[state]] if out not in outputs[state]]
+            for ch, next_state in goto[state].items():
+                fail[next_state] = delta[fail[state]].get(ch, 0) if state else 0
+                queue.append(next_state)
+
+        self._delta = delta
+        self._outputs = [tuple((group, keyword, len(keyword)) for group, keyword in out) for out in outputs]
+        # 根にいる間は、いずれかのキーワードの先頭文字までC実装の正規表現で読み飛ばす
+        first_chars = "".join(sorted(goto[0]))
+        self._skip = re.compile(f"[{re.escape(first_chars)}]") if first_chars else None
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[str, str, int, int]]:
+        """
+        テキスト中のキーワードの一致をすべて返す（重なり合う一致も含む、終了位置の順）
+
+        Yields:
+            (グループ名, キーワード, 開始位置, 終了位置)
+        """
+        if self._skip is None:
+            return
+        delta = self._delta
+        outputs = self._outputs
+        skip = self._skip.search
+        state = 0
+        i = 0
+        length = len(text)
+        while i < length:
+            if state == 0:
+                found = skip(text, i)
+                if found is None:
+                    return
+                i = found.start()
+            state = delta[state].get(text[i], 0)
+            i += 1
+            for group, keyword, size in outputs[state]:
+                yield group, keyword, i - size, i
+
+    def match(self, text: str) -> Dict[str, List[Tuple[str, int, int]]]:
+        """
+        1回の走査で全グループの一致をまとめて返す
+
+        Returns:
+            グループ名 → [(キーワード, 開始位置, 終了位置), ...]（一致のないグループは含まない）
+        """
+        # iter_matchesと同じ走査を、行ごとに呼ばれる前提でジェネレータを介さずに行う
+        hits: Dict[str, List[Tuple[str, int, int]]] = {}
+        if self._skip is None:
+            return hits
+        delta = self._delta
+        outputs = self._outputs
+        skip = self._skip.search
+        state = 0
+        i = 0
+        length = len(text)
+        while i < length:
+            if state == 0:
+                found = skip(text, i)
+                if found is None:
+                    break
+                i = found.start()
+            state = delta[state].get(text[i], 0)
+            i += 1
+            if outputs[state]:
+                for group, keyword, size in outputs[state]:
+                    found_hits = hits.get(group)
+                    if found_hits is None:
+                        hits[group] = [(keyword, i - size, i)]
+                    else:
+                        found_hits.append((keyword, i - size, i))
+        return hits
+
+    def first(self, text: str, group: Optional[str] = None) -> Optional[str]:
+        """最初に見つかったキーワード（groupを指定した場合はそのグループのもの）を返す"""
+        for hit_group, keyword, _, _ in self.iter_matches(text):
+            if group is None or hit_group == group:
+                return keyword
+        return None
+
+    def contains(self, text: str, group: Optional[str] = None) -> bool:
+        """いずれかのキーワード（groupを指定した場合はそのグループのもの）を含むか"""
+        return self.first(text, group) is not None
+
+
+_automata: Dict[Tuple, KeywordAutomaton] = {}
+_automata_lock = threading.Lock()
+
+
+def get_automaton(keywords) -> KeywordAutomaton:
+    """
+    キーワードの組ごとに1回だけ構築したオートマトンを取得する
+
+    Args:
+        keywords: グループ名 → キーワードの辞書、またはキーワードのイテラブル（グループ名はDEFAULT_GROUP）
+
+    Returns:
+        KeywordAutomaton
+    """
+    if not isinstance(keywords, Mapping):
+        keywords = {DEFAULT_GROUP: keywords}
+    key = tuple((group, tuple(words)) for group, words in keywords.items())
+    automaton = _automata.get(key)
+    if automaton is None:
+        with _automata_lock:
+            automaton = _automata.get(key)
+            if automaton is None:
+                automaton = KeywordAutomaton(dict(key))
+                _automata[key] = automaton
+    return automaton
+
+
+# 金額抽出・顧客名抽出で行ごとに照合するキーワードのグループ
+AMOUNT_TARGET = "amount_target"
+AMOUNT_PARTIAL = "amount_partial"
+AMOUNT_EXCLUDE = "amount_exclude"
+ID_MARKER = "id_marker"
+CUSTOMER_INVALID = "customer_invalid"
+CUSTOMER_TOTAL_LINE = "customer_total_line"
+
+_extraction_automaton = None
+
+
+def extraction_automaton() -> KeywordAutomaton:
+    """
+    金額抽出・顧客名抽出の全キーワードをまとめたオートマトンを取得する
+    各行を1回走査した結果（match）を、どちらの抽出処理の判定にも使える
+    """
+    global _extraction_automaton
+    if _extraction_automaton is None:
+        # 各抽出モジュールがこのモジュールを読み込むため、キーワードは使用時に読み込む
+        from amount_extractor import TARGET_KEYWORDS, PARTIAL_KEYWORDS, EXCLUDE_KEYWORDS, ID_MARKERS
+        from customer_extractor import INVALID_CUSTOMER_TERMS, TOTAL_LINE_TERMS
+        _extraction_automaton = get_automaton({
+            AMOUNT_TARGET: TARGET_KEYWORDS,
+            AMOUNT_PARTIAL: PARTIAL_KEYWORDS,
+            AMOUNT_EXCLUDE: EXCLUDE_KEYWORDS,
+            ID_MARKER: ID_MARKERS,
+            CUSTOMER_INVALID: INVALID_CUSTOMER_TERMS,
+            CUSTOMER_TOTAL_LINE: TOTAL_LINE_TERMS,
+        })
+    return _extraction_automaton
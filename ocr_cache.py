@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+OCR結果キャッシュモジュール
+画像化したページの知覚ハッシュ（dHash）と画素のダイジェスト、OCRエンジン・言語・解像度をキーに、
+OCR結果をSQLiteに永続化する（最終アクセス順のLRUで削除）
+
+毎月届く同じ書式の請求書や、束ごとに繰り返される表紙・約款のページは、同じ画像であればOCRを実行しない
+同じ書式でも金額などが異なるページを取り違えないよう、知覚ハッシュだけでなく画素のダイジェストも一致した場合にのみ使う
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from sqlite_cache import SQLiteCache
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ocr_cache.db')
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_MAX_MB = 256
+HASH_SIZE = 8  # dHashの一辺（HASH_SIZE * HASH_SIZEビット）
+
+
+def _to_gray_image(image):
+    """PIL画像またはNumPy配列をグレースケールのPIL画像にする"""
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(image)
+    return image if image.mode == 'L' else image.convert('L')
+
+
+def dhash(gray, hash_size: int = HASH_SIZE) -> str:
+    """
+    グレースケール画像の差分ハッシュ（dHash）を16進文字列で返す
+    縮小した画像で横に隣り合う画素の明暗を比較するため、画像の再エンコードなどによる細かな差は吸収される
+    """
+    small = gray.resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | int(pixels[offset + col] < pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def image_key(image, engine: str, lang: str, mode: str) -> str:
+    """
+    キャッシュキーを作成する
+
+    解像度（DPI）は画像の画素数に表れるため、幅・高さをキーに含める
+
+    Args:
+        image: PIL画像またはNumPy配列
+        engine: OCRエンジン名
+        lang: 言語設定
+        mode: OCRの出力形式（ocr_pool.MODE_*）
+
+    Returns:
+        str: キャッシュキー
+    """
+    gray = _to_gray_image(image)
+    digest = hashlib.blake2b(gray.tobytes(), digest_size=16).hexdigest()
+    width, height = gray.size
+    return f"{engine}:{lang}:{mode}:{width}x{height}:{dhash(gray)}:{digest}"
+
+
+class OCRCache(SQLiteCache):
+    """SQLiteを使ったOCR結果の永続キャッシュ（エントリ数・サイズ上限を超えた分はLRUで削除）"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        """
+        初期化
+
+        Args:
+            path: SQLiteファイルのパス
+            max_entries: 最大エントリ数
+            max_bytes: 保存データの合計サイズ上限（バイト）
+        """
+        super().__init__(path, 'ocr_cache', max_entries=max_entries, max_bytes=max_bytes,
+                         label="OCR結果キャッシュ")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache(config: Optional[Dict[str, Any]] = None) -> Optional[OCRCache]:
+    """
+    プロセス共有のOCR結果キャッシュを取得する
+
+    Args:
+        config: 設定情報（ocr_cache_*）
+
+    Returns:
+        OCRCache（無効化されている場合やPILがない場合はNone）
+    """
+    global _cache
+    config = config or {}
+    if not PIL_AVAILABLE or not config.get('ocr_cache_enabled', True):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache(
+                path=config.get('ocr_cache_path') or DEFAULT_CACHE_PATH,
+                max_entries=int(config.get('ocr_cache_max_entries', DEFAULT_MAX_ENTRIES)),
+                max_bytes=int(config.get('ocr_cache_max_mb', DEFAULT_MAX_MB)) * 1024 * 1024,
+            )
+            logger.info(f"OCR結果キャッシュを初期化しました: {_cache.path}")
+        return _cache
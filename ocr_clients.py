@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+クラウドOCRクライアントモジュール
+Google Cloud Vision / Azure Form Recognizerのクライアントを認証情報ごとにプロセス内で使い回し、
+Visionには複数ページをまとめたバッチリクエストを、同時実行数を制限して送信する
+
+- google_vision_endpointを指定した場合はVisionのREST API（images:annotate）を直接呼び出す
+  （プロキシやテスト用のローカルのエンドポイントにも向けられる。認証はAPIキーのみ）
+- 指定しない場合はgoogle-cloud-visionのImageAnnotatorClientを使用する
+  （ocr_endpointはAzureのエンドポイントのため、Visionには使わない）
+"""
+
+import os
+import re
+import json
+import base64
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+try:
+    import requests
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+try:
+    from google.cloud import vision
+    from google.oauth2 import service_account
+    GOOGLE_VISION_AVAILABLE = True
+except ImportError:
+    GOOGLE_VISION_AVAILABLE = False
+
+try:
+    from azure.ai.formrecognizer import DocumentAnalysisClient
+    from azure.core.credentials import AzureKeyCredential
+    AZURE_FORM_RECOGNIZER_AVAILABLE = True
+except ImportError:
+    AZURE_FORM_RECOGNIZER_AVAILABLE = False
+
+DEFAULT_BATCH_SIZE = 8  # 1リクエストあたりのページ数（Visionの同期バッチの上限は16）
+DEFAULT_MAX_IN_FLIGHT = 2  # 同時に送信するバッチ数
+DEFAULT_TIMEOUT = 60  # REST APIのタイムアウト（秒）
+DEFAULT_CLIENT_WORKERS = 4  # バッチを送信するプロセス共有のスレッド数
+VISION_MAX_BATCH_SIZE = 16
+
+# REST APIで使えるAPIキーの形式（サービスアカウントのJSONや認証情報ファイルのパスは使えない）
+_API_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+
+def is_plain_api_key(api_key: str) -> bool:
+    """APIキーの形式（英数字・ハイフン・アンダースコアのみ）かどうか"""
+    return bool(api_key) and bool(_API_KEY_PATTERN.match(api_key))
+
+
+class VisionRestClient:
+    """VisionのREST API（images:annotate）のクライアント（HTTP接続はSessionで使い回す）"""
+
+    def __init__(self, api_key: str, endpoint: str, timeout: float = DEFAULT_TIMEOUT):
+        if not REQUESTS_AVAILABLE:
+            raise ImportError("requestsが利用できないため、Vision REST APIを使用できません")
+        if not is_plain_api_key(api_key):
+            raise ValueError("Vision REST APIにはAPIキーのみ使用できます（サービスアカウントのJSONや認証情報ファイルは使用できません）")
+        self.api_key = api_key
+        self.url = endpoint.rstrip('/') + '/v1/images:annotate'
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def batch_annotate(self, contents: List[bytes]) -> List[str]:
+        """画像（PNGなどのバイト列）をまとめてOCRし、画像ごとのテキストを返す"""
+        body = {
+            'requests': [
+                {
+                    'image': {'content': base64.b64encode(content).decode('ascii')},
+                    'features': [{'type': 'DOCUMENT_TEXT_DETECTION'}],
+                }
+                for content in contents
+            ]
+        }
+        response = self._session.post(self.url, params={'key': self.api_key}, json=body, timeout=self.timeout)
+        response.raise_for_status()
+
+        texts = []
+        for item in response.json().get('responses', []):
+            if item.get('error', {}).get('message'):
+                logger.error(f"Google Vision APIエラー: {item['error']['message']}")
+                texts.append("")
+                continue
+            texts.append(item.get('fullTextAnnotation', {}).get('text', ""))
+        return texts
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class VisionLibraryClient:
+    """google-cloud-visionのImageAnnotatorClientでbatch_annotate_imagesを呼び出すクライアント"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def batch_annotate(self, contents: List[bytes]) -> List[str]:
+        """画像（PNGなどのバイト列）をまとめてOCRし、画像ごとのテキストを返す"""
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        requests_ = [vision.AnnotateImageRequest(image=vision.Image(content=content), features=[feature])
+                     for content in contents]
+        response = self.client.batch_annotate_images(requests=requests_)
+
+        texts = []
+        for item in response.responses:
+            if item.error and item.error.message:
+                logger.error(f"Google Vision APIエラー: {item.error.message}")
+                texts.append("")
+                continue
+            texts.append(item.full_text_annotation.text if item.full_text_annotation else "")
+        return texts
+
+    def close(self) -> None:
+        pass
+
+
+def _create_vision_library_client(api_key: str):
+    if not GOOGLE_VISION_AVAILABLE:
+        raise ImportError("google-cloud-visionが利用できません")
+    if not api_key:
+        # APIキーがない場合、デフォルトの認証情報を使用
+        logger.info("Google Cloud Vision API: デフォルトの認証情報を使用します")
+        return vision.ImageAnnotatorClient()
+    try:
+        # APIキーがJSON形式の場合はサービスアカウントの認証情報として使う
+        credentials_info = json.loads(api_key)
+    except json.JSONDecodeError:
+        # JSONでない場合は認証情報ファイルのパスとして環境変数に設定する
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = api_key
+        logger.info("Google Cloud Vision API: 環境変数から認証情報を作成しました")
+        return vision.ImageAnnotatorClient()
+    credentials = service_account.Credentials.from_service_account_info(credentials_info)
+    logger.info("Google Cloud Vision API: JSONキーから認証情報を作成しました")
+    return vision.ImageAnnotatorClient(credentials=credentials)
+
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _client_key(kind: str, api_key: str, endpoint: str) -> str:
+    # 認証情報そのものをキーとして保持しないようにハッシュ化する
+    digest = hashlib.sha256(f"{api_key}\0{endpoint}".encode('utf-8')).hexdigest()
+    return f"{kind}:{digest}"
+
+
+def _cached_client(kind: str, api_key: str, endpoint: str, factory: Callable[[], Any]) -> Any:
+    key = _client_key(kind, api_key, endpoint)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory()
+            _clients[key] = client
+            logger.info(f"OCRクライアントを作成しました: {kind}")
+        return client
+
+
+def get_vision_client(api_key: str = '', endpoint: str = '', timeout: float = DEFAULT_TIMEOUT):
+    """
+    認証情報ごとにプロセス内で共有するVisionクライアントを取得する
+
+    Args:
+        api_key: APIキー、サービスアカウントのJSON、または認証情報ファイルのパス
+        endpoint: REST APIのエンドポイント（google_vision_endpoint。指定した場合はAPIキーでREST APIを直接呼び出す）
+        timeout: REST APIのタイムアウト（秒）
+
+    Returns:
+        VisionRestClientまたはVisionLibraryClient
+    """
+    if endpoint:
+        return _cached_client('vision_rest', api_key, endpoint, lambda: VisionRestClient(api_key, endpoint, timeout))
+    return _cached_client('vision', api_key, '', lambda: VisionLibraryClient(_create_vision_library_client(api_key)))
+
+
+def get_azure_client(api_key: str, endpoint: str):
+    """認証情報ごとにプロセス内で共有するAzure Form RecognizerのDocumentAnalysisClientを取得する"""
+    if not AZURE_FORM_RECOGNIZER_AVAILABLE:
+        raise ImportError("azure-ai-formrecognizerが利用できません")
+    return _cached_client('azure', api_key, endpoint,
+                          lambda: DocumentAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(api_key)))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 利用中（annotate_in_batchesの実行中）のクライアント・スレッドプールの数と、
+# clear_clientsで外された後も利用中のもの（最後の利用が終わった時点で閉じる）
+_users: Dict[int, int] = {}
+_retired: Dict[int, Any] = {}
+_users_lock = threading.Lock()
+
+
+def _close_resource(resource: Any) -> None:
+    """スレッドプールは停止し（実行中のバッチは完了させる）、クライアントは閉じる"""
+    try:
+        if isinstance(resource, ThreadPoolExecutor):
+            resource.shutdown(wait=False)
+            return
+        close = getattr(resource, 'close', None)
+        if close:
+            close()
+    except Exception as e:
+        logger.warning(f"OCRクライアントを閉じる際にエラーが発生しました: {e}")
+
+
+def _acquire(resources: List[Any]) -> None:
+    with _users_lock:
+        for resource in resources:
+            _users[id(resource)] = _users.get(id(resource), 0) + 1
+
+
+def _release(resources: List[Any]) -> None:
+    closing = []
+    with _users_lock:
+        for resource in resources:
+            count = _users.get(id(resource), 0) - 1
+            if count > 0:
+                _users[id(resource)] = count
+                continue
+            _users.pop(id(resource), None)
+            if id(resource) in _retired:
+                closing.append(_retired.pop(id(resource)))
+    for resource in closing:
+        _close_resource(resource)
+
+
+def clear_clients() -> None:
+    """
+    共有しているクライアントとバッチ送信用のスレッドプールを外す（設定画面でOCRの設定を保存した時）
+    次の呼び出しからは新しい設定でクライアントとスレッドプールを作り直す
+    送信中の呼び出しが使っているものは、その呼び出しが終わった時点で閉じる（使用中に停止しない）
+    """
+    global _executor
+    with _clients_lock:
+        resources = list(_clients.values())
+        _clients.clear()
+    with _executor_lock:
+        if _executor is not None:
+            resources.append(_executor)
+        _executor = None
+
+    closing = []
+    with _users_lock:
+        for resource in resources:
+            if _users.get(id(resource)):
+                _retired[id(resource)] = resource
+            else:
+                closing.append(resource)
+    for resource in closing:
+        _close_resource(resource)
+
+
+def _acquire_executor(config: Optional[Dict[str, Any]]) -> ThreadPoolExecutor:
+    """共有のスレッドプールを取得し、利用中として数える（取得の直後にclear_clientsで外された場合は取り直す）"""
+    while True:
+        executor = get_executor(config)
+        _acquire([executor])
+        with _executor_lock:
+            if _executor is executor:
+                return executor
+        _release([executor])
+
+
+def get_executor(config: Optional[Dict[str, Any]] = None) -> ThreadPoolExecutor:
+    """
+    バッチ送信用のプロセス共有のスレッドプールを取得する（I/O待ちが中心のためスレッドを使う）
+
+    Args:
+        config: 設定情報（ai_ocr_client_workers）。スレッド数は初回作成時の設定で決まり、clear_clientsで作り直す
+
+    Returns:
+        ThreadPoolExecutor
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int((config or {}).get('ai_ocr_client_workers') or DEFAULT_CLIENT_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='ocr-client')
+            logger.info(f"OCRクライアントのスレッドプールを作成しました: {workers}スレッド")
+        return _executor
+
+
+def _batches(items: Iterable[bytes], batch_size: int) -> Iterator[List[bytes]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def annotate_in_batches(client, contents: Iterable[bytes], batch_size: int = DEFAULT_BATCH_SIZE,
+                        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                        executor: Optional[ThreadPoolExecutor] = None,
+                        config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    画像をbatch_size枚ずつまとめてOCRし、画像ごとのテキストを入力順に返す
+    同時に送信するバッチはmax_in_flight件までに制限する（contentsは必要な分だけ読み進める）
+
+    Args:
+        client: get_vision_clientで取得したクライアント
+        contents: 画像（PNGなどのバイト列）のイテラブル
+        batch_size: 1リクエストあたりの画像数（Visionの上限は16）
+        max_in_flight: 同時に送信するバッチ数
+        executor: バッチを送信するスレッドプール（省略時はget_executorの共有のスレッドプール）
+        config: 共有のスレッドプールを作成する場合の設定情報（ai_ocr_client_workers）
+
+    Yields:
+        str: 画像ごとのテキスト
+    """
+    batch_size = max(1, min(batch_size, VISION_MAX_BATCH_SIZE))
+    max_in_flight = max(1, max_in_flight)
+    if executor is None:
+        executor = _acquire_executor(config)
+    else:
+        _acquire([executor])
+    # 実行中にclear_clientsが呼ばれても、このクライアントとスレッドプールは終わるまで閉じない
+    in_use = [client, executor]
+    _acquire([client])
+    batches = _batches(contents, batch_size)
+
+    pending = deque()
+    try:
+        for batch in batches:
+            pending.append((len(batch), executor.submit(client.batch_annotate, batch)))
+            if len(pending) < max_in_flight:
+                continue
+            size, future = pending.popleft()
+            yield from _batch_texts(size, future.result())
+        while pending:
+            size, future = pending.popleft()
+            yield from _batch_texts(size, future.result())
+    finally:
+        for _, future in pending:
+            future.cancel()
+        _release(in_use)
+
+
+def _batch_texts(size: int, texts: List[str]) -> List[str]:
+    # 応答の件数が足りない場合も、入力の画像とずれないように空文字で埋める
+    if len(texts) < size:
+        logger.warning(f"Vision APIの応答が{size}件中{len(texts)}件しかありません")
+    return (list(texts) + [""] * size)[:size]
+
+
+def client_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """設定からバッチの大きさと同時送信数を取得する（ai_ocr_batch_size / ai_ocr_max_in_flight）"""
+    config = config or {}
+    return {
+        'batch_size': int(config.get('ai_ocr_batch_size') or DEFAULT_BATCH_SIZE),
+        'max_in_flight': int(config.get('ai_ocr_max_in_flight') or DEFAULT_MAX_IN_FLIGHT),
+    }
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+OCRワーカープールモジュール
+言語データ（jpn+eng）を読み込んだままのOCRワーカープロセスを常駐させ、ページ画像をキューで受け取って処理する
+pytesseract.image_to_stringのように呼び出しごとにtesseractを起動し直すコストを避ける
+
+- ワーカー内でtesserocrのPyTessBaseAPIを保持し続ける（requirements.txtの必須依存）
+  tesserocrがない環境ではpytesseractで動作するが、ページごとにtesseractを起動し直すため
+  プールの効果はなく、/api/health/ocrは異常（503）を返す
+- ワーカーの死活監視と、一定時間応答のないワーカーの再起動を行う
+- キュー待ち時間とOCR処理時間をメトリクスとして記録する
+- 同じページ画像のOCR結果はocr_cacheから返し、OCRを実行しない
+"""
+
+import csv
+import time
+import atexit
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+from worker_budget import per_web_worker
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+    logger.warning("tesserocrが利用できません。OCRはページごとにtesseractを起動するpytesseractで実行します。")
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+OCR_AVAILABLE = PIL_AVAILABLE and (TESSEROCR_AVAILABLE or PYTESSERACT_AVAILABLE)
+
+DEFAULT_LANG = 'jpn+eng'
+DEFAULT_WORKERS = 0  # 0の場合はCPUコア数 // gunicornのワーカー数（プールはgunicornのワーカーごとに作られる）
+DEFAULT_TASK_TIMEOUT = 120  # 1ページのOCRにかけられる最大時間（秒）
+# 呼び出し元がプールの結果を待つ最大時間（秒）。gunicornの--timeout（120秒）より短くする
+# 待ちきれなかったページはキューから取り消し、このプロセスではやり直さない（混雑時にOCRを二重に実行しない）
+DEFAULT_WAIT_TIMEOUT = 60
+DEFAULT_HEALTH_INTERVAL = 5  # 死活監視の間隔（秒）
+DEFAULT_MAX_RETRIES = 1  # ワーカー異常終了時に同じページを再実行する回数
+
+MODE_STRING = 'string'  # image_to_string相当
+MODE_DATA = 'data'  # image_to_data(output_type=DICT)相当
+
+# pytesseract.Output.DICTと同じキー（tesseractのTSV出力の列）
+_TSV_COLUMNS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                'left', 'top', 'width', 'height', 'conf', 'text')
+
+
+EXPIRED_ERROR = "呼び出し元の待ち時間を過ぎたため処理しませんでした"
+
+
+class OCRPoolError(RuntimeError):
+    """OCRワーカープールで処理できなかった場合の例外"""
+
+
+class OCRPoolTimeout(OCRPoolError):
+    """OCRワーカープールの結果を待ちきれなかった場合の例外（ページは取り消し済み）"""
+
+
+def engine_name() -> str:
+    """ワーカーが使うOCRエンジンの名前（'pytesseract'の場合は言語データを読み込んだままにできない）"""
+    return 'tesserocr' if TESSEROCR_AVAILABLE else 'pytesseract'
+
+
+def _to_pil(image):
+    """NumPy配列の場合はPIL画像に変換する"""
+    if isinstance(image, Image.Image):
+        return image
+    return Image.fromarray(image)
+
+
+def _parse_tsv(tsv: str) -> Dict[str, list]:
+    """tesseractのTSV出力をpytesseract.image_to_data(output_type=DICT)と同じ形の辞書にする"""
+    data = {column: [] for column in _TSV_COLUMNS}
+    for row in csv.reader(tsv.splitlines(), delimiter='\t', quoting=csv.QUOTE_NONE):
+        if len(row) < len(_TSV_COLUMNS) or row[0] == 'level':
+            continue
+        for column, value in zip(_TSV_COLUMNS, row):
+            if column == 'text':
+                data[column].append(value)
+            elif column == 'conf':
+                data[column].append(float(value))
+            else:
+                data[column].append(int(value))
+    return data
+
+
+class OCREngine:
+    """1プロセス（1スレッド）内で言語データを読み込んだまま使い回すOCRエンジン"""
+
+    def __init__(self):
+        self._apis = {}
+
+    def _api(self, lang: str):
+        api = self._apis.get(lang)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=lang)
+            self._apis[lang] = api
+        return api
+
+    def run(self, image, lang: str = DEFAULT_LANG, mode: str = MODE_STRING):
+        """画像をOCRし、modeに応じて文字列または単語ごとの辞書を返す"""
+        image = _to_pil(image)
+        if TESSEROCR_AVAILABLE:
+            api = self._api(lang)
+            api.SetImage(image)
+            if mode == MODE_DATA:
+                return _parse_tsv(api.GetTSVText(0))
+            return api.GetUTF8Text()
+
+        if mode == MODE_DATA:
+            return pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+        return pytesseract.image_to_string(image, lang=lang)
+
+    def close(self):
+        for api in self._apis.values():
+            api.End()
+        self._apis.clear()
+
+
+def _worker_main(worker_key, task_queue, result_queue, engine_factory=OCREngine) -> None:
+    """ワーカープロセスの処理（キューからページ画像を受け取り、結果を返す）"""
+    engine = engine_factory()
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_id, image, lang, mode, deadline = task
+        started = time.time()
+        if deadline is not None and started > deadline:
+            # 呼び出し元が待つのをやめたページは処理しない
+            result_queue.put(('done', worker_key, task_id, (None, EXPIRED_ERROR, 0.0)))
+            continue
+        result_queue.put(('start', worker_key, task_id, started))
+        try:
+            value, error = engine.run(image, lang, mode), None
+        except Exception as e:
+            value, error = None, f"{type(e).__name__}: {e}"
+        result_queue.put(('done', worker_key, task_id, (value, error, time.time() - started)))
+    engine.close()
+
+
+class OCRMetrics:
+    """キュー待ち時間とOCR処理時間の集計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.failures = 0
+        self.restarts = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.ocr_time_total = 0.0
+        self.ocr_time_max = 0.0
+
+    def record(self, queue_wait: float, ocr_time: float, failed: bool = False) -> None:
+        with self._lock:
+            self.tasks += 1
+            self.failures += int(failed)
+            self.queue_wait_total += queue_wait
+            self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+            self.ocr_time_total += ocr_time
+            self.ocr_time_max = max(self.ocr_time_max, ocr_time)
+
+    def record_restart(self) -> None:
+        with self._lock:
+            self.restarts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            tasks = self.tasks or 1
+            return {
+                'tasks': self.tasks,
+                'failures': self.failures,
+                'restarts': self.restarts,
+                'queue_wait_avg_ms': round(self.queue_wait_total / tasks * 1000, 1),
+                'queue_wait_max_ms': round(self.queue_wait_max * 1000, 1),
+                'ocr_time_avg_ms': round(self.ocr_time_total / tasks * 1000, 1),
+                'ocr_time_max_ms': round(self.ocr_time_max * 1000, 1),
+            }
+
+
+class OCRPool:
+    """常駐OCRワーカーのプール"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, task_timeout: float = DEFAULT_TASK_TIMEOUT,
+                 health_interval: float = DEFAULT_HEALTH_INTERVAL, max_retries: int = DEFAULT_MAX_RETRIES,
+                 engine_factory=OCREngine, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        """
+        初期化
+
+        Args:
+            workers: ワーカープロセス数（0の場合はCPUコア数 // gunicornのワーカー数）
+            task_timeout: 1ページのOCRにかけられる最大時間（秒）。超えたワーカーは再起動する
+            health_interval: 死活監視の間隔（秒）
+            max_retries: ワーカー異常終了時に同じページを再実行する回数
+            engine_factory: ワーカー内でOCRエンジンを作成する関数（モジュールレベルで定義されたもの）
+            wait_timeout: 呼び出し元が結果を待つ最大時間（秒）。再実行を含む最大時間がこれより長い場合も、これで打ち切る
+        """
+        self.workers = per_web_worker(workers)
+        self.task_timeout = task_timeout
+        self.health_interval = health_interval
+        self.max_retries = max_retries
+        self.engine_factory = engine_factory
+        self.wait_timeout = min(wait_timeout, task_timeout * (max_retries + 2))
+        self.metrics = OCRMetrics()
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._task_queue = self._ctx.Queue()
+        # 結果側はSimpleQueue（putが同期的に書き込まれるため、直後にワーカーが落ちても開始通知が失われない）
+        self._result_queue = self._ctx.SimpleQueue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = {}  # task_id -> [future, task, submitted_at, retries]
+        self._running = {}  # worker_id -> (task_id, started_at)
+        self._processes = {}
+        self._generations = {}  # worker_id -> 世代番号
+        self._closed = False
+
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+
+        self._dispatcher = threading.Thread(target=self._dispatch_results, name='ocr-pool-dispatcher', daemon=True)
+        self._dispatcher.start()
+        self._monitor = threading.Thread(target=self._monitor_workers, name='ocr-pool-monitor', daemon=True)
+        self._monitor.start()
+        logger.info(f"OCRワーカープールを起動しました: {self.workers}ワーカー ({engine_name()})")
+
+    def _start_worker(self, worker_id: int) -> None:
+        # 再起動のたびに世代番号を進め、古いプロセスからの通知と区別する
+        generation = self._generations.get(worker_id, -1) + 1
+        self._generations[worker_id] = generation
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=((worker_id, generation), self._task_queue, self._result_queue, self.engine_factory),
+            name=f'ocr-worker-{worker_id}',
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def submit(self, image, lang: str = DEFAULT_LANG, mode: str = MODE_STRING) -> Future:
+        """ページ画像をキューに投入し、結果のFutureを返す"""
+        if self._closed:
+            raise OCRPoolError("OCRワーカープールは停止しています")
+        future = Future()
+        task_id = next(self._ids)
+        submitted = time.time()
+        # 待ち時間を過ぎてからワーカーに渡ったページは処理せずに捨てる
+        task = (task_id, image, lang, mode, submitted + self.wait_timeout)
+        future.task_id = task_id
+        with self._lock:
+            self._pending[task_id] = [future, task, submitted, 0]
+        self._task_queue.put(task)
+        return future
+
+    def result(self, future: Future):
+        """
+        結果をwait_timeoutまで待つ
+
+        待ちきれなかった場合はページを取り消し（キュー待ちのページはワーカーが処理せずに捨て、
+        処理中のページは結果を捨てる）、OCRPoolTimeoutを送出する
+        """
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except FutureTimeoutError:
+            self.cancel(future)
+            raise OCRPoolTimeout(f"OCRワーカープールの結果を{self.wait_timeout}秒待ちきれませんでした")
+
+    def cancel(self, future: Future) -> None:
+        """ページを取り消す（結果は呼び出し元に返さない）"""
+        with self._lock:
+            entry = self._pending.pop(getattr(future, 'task_id', None), None)
+        if entry is not None:
+            future.cancel()
+
+    def image_to_string(self, image, lang: str = DEFAULT_LANG) -> str:
+        return self.result(self.submit(image, lang, MODE_STRING))
+
+    def image_to_data(self, image, lang: str = DEFAULT_LANG) -> Dict[str, list]:
+        return self.result(self.submit(image, lang, MODE_DATA))
+
+    def _dispatch_results(self) -> None:
+        """ワーカーからの通知を受け取り、Futureに結果を設定する"""
+        while True:
+            try:
+                kind, worker_key, task_id, payload = self._result_queue.get()
+            except (EOFError, OSError):
+                break
+            if kind == 'stop':
+                break
+
+            worker_id, generation = worker_key
+            with self._lock:
+                if kind == 'start':
+                    entry = self._pending.get(task_id)
+                    if entry:
+                        del entry[4:]
+                        entry.append(payload - entry[2])  # キュー待ち時間
+                    if generation == self._generations.get(worker_id):
+                        self._running[worker_id] = (task_id, payload)
+                        continue
+                    lost = True
+                else:
+                    lost = False
+                    if generation == self._generations.get(worker_id):
+                        self._running.pop(worker_id, None)
+                    entry = self._pending.pop(task_id, None)
+
+            if lost:
+                # 開始通知を受け取る前にワーカーが再起動されていた場合
+                self._retry_or_fail(task_id, worker_id, payload)
+                continue
+            if entry is None:
+                continue
+
+            value, error, ocr_time = payload
+            queue_wait = entry[4] if len(entry) > 4 else 0.0
+            self.metrics.record(queue_wait, ocr_time, failed=error is not None)
+            future = entry[0]
+            if error:
+                future.set_exception(OCRPoolError(error))
+            else:
+                future.set_result(value)
+
+    def _retry_or_fail(self, task_id: int, worker_id: int, started_at: float) -> None:
+        """異常終了したワーカーが処理していたページを再実行する（回数を超えた場合は失敗とする）"""
+        with self._lock:
+            entry = self._pending.get(task_id)
+            if entry is None:
+                return
+            if entry[3] < self.max_retries:
+                entry[3] += 1
+                self._task_queue.put(entry[1])
+                return
+            self._pending.pop(task_id, None)
+        self.metrics.record(entry[4] if len(entry) > 4 else 0.0, time.time() - started_at, failed=True)
+        entry[0].set_exception(OCRPoolError(f"OCRワーカー{worker_id}が処理中に異常終了しました"))
+
+    def _monitor_workers(self) -> None:
+        """ワーカーの死活監視（異常終了・応答なしのワーカーを再起動し、処理中のページを再実行する）"""
+        while not self._closed:
+            time.sleep(self.health_interval)
+            if self._closed:
+                break
+            now = time.time()
+            for worker_id, process in list(self._processes.items()):
+                with self._lock:
+                    running = self._running.get(worker_id)
+                hung = running is not None and now - running[1] > self.task_timeout
+                if process.is_alive() and not hung:
+                    continue
+
+                if hung:
+                    logger.warning(f"OCRワーカー{worker_id}が{self.task_timeout}秒以上応答しないため再起動します")
+                    process.terminate()
+                else:
+                    logger.warning(f"OCRワーカー{worker_id}が終了しました (exitcode={process.exitcode})。再起動します")
+                process.join(timeout=5)
+                self.metrics.record_restart()
+                with self._lock:
+                    # 確認後に開始通知が届いている場合もあるため、再起動と同時に処理中のページを取り出す
+                    running = self._running.pop(worker_id, None)
+                    self._start_worker(worker_id)
+
+                if running:
+                    self._retry_or_fail(running[0], worker_id, running[1])
+
+    def health(self) -> Dict[str, Any]:
+        """ワーカーの状態とメトリクスを返す"""
+        now = time.time()
+        with self._lock:
+            running = dict(self._running)
+            queued = len(self._pending) - len(running)
+        workers = []
+        for worker_id, process in sorted(self._processes.items()):
+            task = running.get(worker_id)
+            workers.append({
+                'worker_id': worker_id,
+                'pid': process.pid,
+                'alive': process.is_alive(),
+                'busy_seconds': round(now - task[1], 1) if task else 0.0,
+            })
+        return {
+            'engine': engine_name(),
+            'workers': workers,
+            'queued': max(0, queued),
+            'metrics': self.metrics.snapshot(),
+        }
+
+    def shutdown(self) -> None:
+        """ワーカーを停止する（処理待ちのページは失敗とする）"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for process in self._processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._result_queue.put(('stop', None, None, None))
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for entry in pending:
+            if not entry[0].done():
+                entry[0].set_exception(OCRPoolError("OCRワーカープールが停止しました"))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def _resolve_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # 省略された場合はconfig_managerの設定を使う
+    if config is not None:
+        return config
+    try:
+        from config_manager import get_config
+        return get_config()
+    except Exception:
+        return {}
+
+
+def get_ocr_pool(config: Optional[Dict[str, Any]] = None) -> Optional[OCRPool]:
+    """
+    プロセス共有のOCRワーカープールを取得する
+
+    無効化されている場合、OCRエンジンがない場合、ページ並列処理などのワーカープロセス内で
+    呼ばれた場合（プールの入れ子を避ける）はNoneを返す
+
+    Args:
+        config: 設定情報（ocr_pool_*）。省略した場合はconfig_managerの設定を使う
+
+    Returns:
+        OCRPoolまたはNone
+    """
+    global _pool
+    config = _resolve_config(config)
+    if not OCR_AVAILABLE or not config.get('ocr_pool_enabled', True):
+        return None
+    if multiprocessing.current_process().name != 'MainProcess':
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = OCRPool(
+                workers=int(config.get('ocr_pool_workers', DEFAULT_WORKERS)),
+                task_timeout=float(config.get('ocr_pool_task_timeout', DEFAULT_TASK_TIMEOUT)),
+                health_interval=float(config.get('ocr_pool_health_interval', DEFAULT_HEALTH_INTERVAL)),
+                wait_timeout=float(config.get('ocr_pool_wait_timeout', DEFAULT_WAIT_TIMEOUT)),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def current_ocr_pool() -> Optional[OCRPool]:
+    """起動済みのOCRワーカープール（未起動の場合はNone。get_ocr_poolと異なりプールを起動しない）"""
+    return _pool
+
+
+def _local_engine() -> OCREngine:
+    # プールを使わない場合もスレッドごとにエンジンを保持して言語データの再読み込みを避ける
+    engine = getattr(_local, 'engine', None)
+    if engine is None:
+        engine = OCREngine()
+        _local.engine = engine
+    return engine
+
+
+def _cache_lookup(image, lang: str, mode: str, config: Dict[str, Any]):
+    """OCR結果キャッシュを引き、(cache, key, 結果)を返す（キャッシュを使わない場合はすべてNone、ミスの場合の結果はNone）"""
+    try:
+        from ocr_cache import get_ocr_cache, image_key
+        cache = get_ocr_cache(config)
+        if cache is None:
+            return None, None, None
+        key = image_key(image, engine_name(), lang, mode)
+        return cache, key, cache.get(key)
+    except Exception as e:
+        logger.warning(f"OCR結果キャッシュを参照できませんでした: {e}")
+        return None, None, None
+
+
+def _run(image, lang: str, mode: str, config: Optional[Dict[str, Any]]):
+    config = _resolve_config(config)
+    cache, key, cached = _cache_lookup(image, lang, mode, config)
+    if cached is not None:
+        return cached
+
+    result = _run_ocr(image, lang, mode, config)
+    if cache is not None and result is not None:
+        try:
+            cache.set(key, result)
+        except Exception as e:
+            logger.warning(f"OCR結果をキャッシュに保存できませんでした: {e}")
+    return result
+
+
+def _run_ocr(image, lang: str, mode: str, config: Dict[str, Any]):
+    pool = get_ocr_pool(config)
+    if pool is not None:
+        try:
+            return pool.result(pool.submit(image, lang, mode))
+        except OCRPoolTimeout:
+            # プールが混雑している場合にこのプロセスでも実行すると、CPUをさらに奪い合うためやり直さない
+            raise
+        except Exception as e:
+            logger.warning(f"OCRワーカープールで処理できなかったため、このプロセスで実行します: {e}")
+    return _local_engine().run(image, lang, mode)
+
+
+def image_to_string(image, lang: str = DEFAULT_LANG, config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    pytesseract.image_to_stringの代わりに使うOCR関数（常駐ワーカーで処理する）
+
+    Args:
+        image: PIL画像またはNumPy配列
+        lang: 言語設定
+        config: 設定情報（ocr_pool_*）
+
+    Returns:
+        str: 抽出されたテキスト
+    """
+    return _run(image, lang, MODE_STRING, config) or ""
+
+
+def image_to_data(image, lang: str = DEFAULT_LANG, config: Optional[Dict[str, Any]] = None) -> Dict[str, list]:
+    """
+    pytesseract.image_to_data(output_type=DICT)の代わりに使うOCR関数（常駐ワーカーで処理する）
+
+    Returns:
+        Dict: 単語ごとのテキストと位置（text, left, top, width, height, block_num, ...）
+    """
+    return _run(image, lang, MODE_DATA, config)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページレイアウトモジュール
+pdfplumberでテキストを抽出した時の文字の座標から単語の矩形を作り、ページ上の位置で検索できるようにする
+
+- 単語の矩形はextract_textが内部で作るTextMap（ページにキャッシュされる）から作るため、
+  テキストの抽出と同じ1回の処理で済み、各単語がテキストの何行目にあるかも正確に分かる
+- 単語は中心の座標で格子状のセル（DEFAULT_CELL_SIZEポイント四方）に振り分けておき、
+  「右下の1/4にある単語」のような領域の検索では領域に重なるセルの単語だけを調べる
+- line_positions: テキストの各行のページ上の縦位置（金額抽出の「ページ下部」の判定に使う）
+- region_lines: 領域内の単語を行ごとにまとめたテキスト（顧客名抽出の「左上」の判定に使う）
+"""
+
+import logging
+from itertools import groupby
+from operator import attrgetter
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+DEFAULT_CELL_SIZE = 50.0  # 格子のセルの一辺（ポイント）。A4で12×17セル
+LINE_TOLERANCE = 3  # extract_wordsから行を作る場合の縦位置の許容差（pdfplumberのy_toleranceのデフォルトと同じ）
+
+# ページの大きさに対する割合で表した領域（左, 上, 右, 下）
+REGIONS = {
+    'top_left': (0.0, 0.0, 0.5, 0.5),
+    'top_right': (0.5, 0.0, 1.0, 0.5),
+    'bottom_left': (0.0, 0.5, 0.5, 1.0),
+    'bottom_right': (0.5, 0.5, 1.0, 1.0),
+    'top': (0.0, 0.0, 1.0, 0.2),
+    'bottom': (0.0, 0.8, 1.0, 1.0),
+}
+
+
+class WordBox(NamedTuple):
+    """1単語の矩形（座標はpdfplumberと同じくページ左上が原点、単位はポイント）"""
+    text: str
+    x0: float
+    top: float
+    x1: float
+    bottom: float
+    line: int  # テキストの行番号（0始まり）
+
+
+class PageLayout:
+    """
+    1ページ分の単語の矩形と、その格子状の空間索引
+    索引は最初の検索の時に作る（ワーカープロセスから返す場合やキャッシュに保存する場合は単語だけを渡す）
+    """
+
+    def __init__(self, words: Sequence[WordBox], width: float, height: float,
+                 line_count: Optional[int] = None, cell_size: float = DEFAULT_CELL_SIZE):
+        self.words = list(words)
+        self.width = float(width)
+        self.height = float(height)
+        # テキストの行数（単語のない行も含む。テキストと対応しているかの確認に使う）
+        self.line_count = line_count if line_count is not None else max((w.line for w in self.words), default=-1) + 1
+        self.cell_size = cell_size
+        self._grid: Optional[Dict[Tuple[int, int], List[int]]] = None
+        self._extent = (0.0, 0.0, 0.0, 0.0)  # 単語の中心の範囲（左, 上, 右, 下）
+        self._line_positions: Optional[List[float]] = None
+
+    def __getstate__(self):
+        # 索引はpickleに含めず、受け取った側で必要になった時に作り直す
+        state = self.__dict__.copy()
+        state['_grid'] = None
+        state['_line_positions'] = None
+        return state
+
+    @classmethod
+    def from_textmap(cls, textmap, width: float, height: float, **kwargs) -> 'PageLayout':
+        """
+        pdfplumberのTextMap（(文字, 文字の情報)の列。空白・改行の文字の情報はNone）から作る
+        TextMapのテキスト（as_string）を改行で分けた行と、単語の行番号が対応する
+        """
+        words = []
+        line = 0
+        chars = []
+        letters = []
+
+        def flush():
+            if chars:
+                words.append(WordBox(
+                    ''.join(letters),
+                    min(float(c['x0']) for c in chars),
+                    min(float(c['top']) for c in chars),
+                    max(float(c['x1']) for c in chars),
+                    max(float(c['bottom']) for c in chars),
+                    line,
+                ))
+                chars.clear()
+                letters.clear()
+
+        for letter, char in textmap.tuples:
+            if char is None or letter.isspace():
+                flush()
+                if letter == '\n':
+                    line += 1
+                continue
+            # 合字を展開した文字は同じ文字の情報が続くため、矩形は1回だけ数える
+            if not chars or chars[-1] is not char:
+                chars.append(char)
+            letters.append(letter)
+        flush()
+        return cls(words, width, height, line_count=line + 1 if textmap.tuples else 0, **kwargs)
+
+    @classmethod
+    def from_words(cls, words: Sequence[Dict[str, Any]], width: float, height: float, **kwargs) -> 'PageLayout':
+        """
+        pdfplumberのextract_wordsの結果から作る
+        行はextract_text（layout=False）と同じく縦位置の近い単語をまとめ、上から順に番号を付ける
+        """
+        ordered = sorted(words, key=lambda w: (float(w.get('doctop', w['top'])), float(w['x0'])))
+        boxes = []
+        line = -1
+        last_top = None
+        for word in ordered:
+            top = float(word.get('doctop', word['top']))
+            if last_top is None or top > last_top + LINE_TOLERANCE:
+                line += 1
+            last_top = top
+            boxes.append(WordBox(word['text'], float(word['x0']), float(word['top']),
+                                 float(word['x1']), float(word['bottom']), line))
+        boxes.sort(key=lambda w: (w.line, w.x0))
+        return cls(boxes, width, height, line_count=line + 1, **kwargs)
+
+    @classmethod
+    def from_page(cls, page, **kwargs) -> 'PageLayout':
+        """
+        pdfplumberのページから作る（extract_textの後に呼ぶと、キャッシュされたTextMapを使うため文字の再処理はない）
+        """
+        get_textmap = getattr(page, 'get_textmap', None)
+        if get_textmap is not None:
+            return cls.from_textmap(get_textmap(), page.width, page.height, **kwargs)
+        return cls.from_words(page.extract_words(), page.width, page.height, **kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSONで保存できる辞書にする（extraction_cache用）"""
+        return {
+            'width': self.width,
+            'height': self.height,
+            'line_count': self.line_count,
+            'words': [list(word) for word in self.words],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PageLayout':
+        """to_dictの結果から戻す"""
+        return cls([WordBox(*word) for word in data['words']], data['width'], data['height'],
+                   line_count=data.get('line_count'))
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def _build_grid(self) -> Dict[Tuple[int, int], List[int]]:
+        """単語を中心の座標のセルに振り分ける（各単語はちょうど1つのセルに入る）"""
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        xs = []
+        ys = []
+        for index, word in enumerate(self.words):
+            x = (word.x0 + word.x1) / 2
+            y = (word.top + word.bottom) / 2
+            xs.append(x)
+            ys.append(y)
+            grid.setdefault(self._cell(x, y), []).append(index)
+        if self.words:
+            self._extent = (min(xs), min(ys), max(xs), max(ys))
+        return grid
+
+    def words_in(self, x0: float, top: float, x1: float, bottom: float) -> List[WordBox]:
+        """
+        中心が領域（x0 <= x < x1, top <= y < bottom）にある単語をテキストの順に返す
+        領域に重なるセルの単語だけを調べる
+        """
+        if self._grid is None:
+            self._grid = self._build_grid()
+        if x1 <= x0 or bottom <= top or not self.words:
+            return []
+        # 調べるセルの範囲は単語のある範囲に限る（ページの外や無限大を指定した場合も同じ）
+        left, upper, right, lower = self._extent
+        col0, row0 = self._cell(min(max(x0, left), right), min(max(top, upper), lower))
+        col1, row1 = self._cell(min(max(x1, left), right), min(max(bottom, upper), lower))
+        grid = self._grid
+        words = self.words
+        found = []
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > len(grid):
+            # 領域がページの大部分を覆う場合は単語のあるセルだけを調べる
+            cells = [cell for key, cell in grid.items() if col0 <= key[0] <= col1 and row0 <= key[1] <= row1]
+        else:
+            cells = [grid[key] for key in ((col, row) for col in range(col0, col1 + 1) for row in range(row0, row1 + 1))
+                     if key in grid]
+        for cell in cells:
+            for index in cell:
+                word = words[index]
+                x = (word.x0 + word.x1) / 2
+                y = (word.top + word.bottom) / 2
+                if x0 <= x < x1 and top <= y < bottom:
+                    found.append(index)
+        found.sort()
+        return [words[index] for index in found]
+
+    def words_in_region(self, region: str) -> List[WordBox]:
+        """REGIONSの名前（'bottom_right'など）で指定した領域の単語を返す（ページの端の単語も含める）"""
+        left, top, right, bottom = REGIONS[region]
+        # 右端・下端の割合が1.0の場合は、ページの外にはみ出した単語も含める
+        x1 = self.width * right if right < 1.0 else float('inf')
+        y1 = self.height * bottom if bottom < 1.0 else float('inf')
+        x0 = self.width * left if left > 0.0 else float('-inf')
+        y0 = self.height * top if top > 0.0 else float('-inf')
+        return self.words_in(x0, y0, x1, y1)
+
+    def region_lines(self, region: str) -> List[str]:
+        """領域内の単語を行ごとに空白でつないだテキスト（上の行から順）"""
+        return [' '.join(word.text for word in line_words)
+                for _, line_words in groupby(self.words_in_region(region), key=attrgetter('line'))]
+
+    def line_positions(self, lines: Sequence[str]) -> Optional[List[float]]:
+        """
+        テキストの各行の縦位置（行の単語の中心の、ページの高さに対する割合。0.0が上端、1.0が下端）
+        linesはこのレイアウトを作った時のテキストを改行で分けたもの
+        行数が異なるなど、テキストと対応しない場合はNone（呼び出し元は行番号による推定を使う）
+        単語のない行は直前の行と同じ位置とする
+        """
+        if self.height <= 0 or len(lines) != self.line_count:
+            return None
+        if self._line_positions is None:
+            positions = [None] * self.line_count
+            for line, line_words in groupby(self.words, key=attrgetter('line')):
+                line_words = list(line_words)
+                top = min(word.top for word in line_words)
+                bottom = max(word.bottom for word in line_words)
+                positions[line] = (top + bottom) / 2 / self.height
+            previous = 0.0
+            for index, position in enumerate(positions):
+                if position is None:
+                    positions[index] = previous
+                else:
+                    previous = position
+            self._line_positions = positions
+        # テキストと単語が対応しているかを各行の最初の単語で確認する
+        for line, line_words in groupby(self.words, key=attrgetter('line')):
+            if next(line_words).text not in lines[line]:
+                return None
+        return self._line_positions
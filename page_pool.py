@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページ並列処理モジュール
+複数ページPDFのページをプロセスプールに分配し、テキスト抽出・OCR・顧客名/金額抽出を並列に実行する
+結果は常にページ順で返す
+"""
+
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from page_stream import PageText, count_pages, iter_pdf_pages
+from adaptive_ocr import adaptive_policy
+from page_rasterizer import raster_settings
+from worker_budget import per_web_worker
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# デフォルト設定（config_manager.DEFAULT_CONFIGと同じキー）
+DEFAULT_WORKERS = 0  # 0の場合はCPUコア数 // gunicornのワーカー数（WEB_CONCURRENCY）
+DEFAULT_MAX_IN_FLIGHT = 2  # 1リクエストあたりの同時実行チャンク数
+DEFAULT_CHUNK_SIZE = 4  # 1チャンクあたりのページ数
+DEFAULT_MIN_PAGES = 4  # これ未満のページ数では並列化しない
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _config_int(config: Dict[str, Any], key: str, default: int) -> int:
+    try:
+        return int(config.get(key, default))
+    except (TypeError, ValueError):
+        logger.warning(f"設定値{key}を整数に変換できませんでした: {config.get(key)}")
+        return default
+
+
+def _resolve_workers(config: Dict[str, Any]) -> int:
+    # プールはgunicornのワーカーごとに作られるため、省略時はノードのCPUコア数をワーカー間で分ける
+    return per_web_worker(_config_int(config, 'page_pool_workers', DEFAULT_WORKERS))
+
+
+def get_executor(config: Optional[Dict[str, Any]] = None) -> Optional[ProcessPoolExecutor]:
+    """
+    プロセス共有のプロセスプールを取得する（初回呼び出し時に生成）
+
+    Args:
+        config: 設定情報
+
+    Returns:
+        ProcessPoolExecutor、ワーカー数が1以下の場合はNone
+    """
+    global _executor, _executor_workers
+    workers = _resolve_workers(config or {})
+    if workers <= 1:
+        return None
+
+    with _executor_lock:
+        if _executor is None:
+            # Flaskのスレッドをforkしないようにspawnで起動する
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _executor_workers = workers
+            logger.info(f"ページ処理用プロセスプールを起動しました: {workers}ワーカー")
+        return _executor
+
+
+def shutdown_executor():
+    """プロセスプールを停止する"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+            _executor_workers = 0
+            logger.info("ページ処理用プロセスプールを停止しました")
+
+
+def page_filename(filename: str, page_number: int, page_count: int) -> str:
+    """ページごとの表示用ファイル名（単一ページの場合は元のファイル名）"""
+    return filename if page_count == 1 else f"{filename}_page{page_number}"
+
+
+def extract_page_fields(text: str, filename: str, layout=None) -> Dict[str, Any]:
+    """
+    1ページ分のテキストから顧客名と金額を抽出する
+
+    Args:
+        text: ページのテキスト
+        filename: 表示用ファイル名（顧客名のフォールバック抽出に使用）
+        layout: ページの単語の位置（page_layout.PageLayout、PageText.layout）
+
+    Returns:
+        customer_name, amount, amount_source_line, timings（段階ごとの処理時間）を含む辞書
+    """
+    import customer_extractor
+    import amount_extractor
+    from text_normalizer import NormalizedDocument
+    from stage_timing import STAGE_AMOUNT, STAGE_CUSTOMER, StageTimer
+
+    timer = StageTimer()
+    # 正規化・行分割はページごとに1回だけ行い、顧客名・金額の抽出で共有する
+    document = NormalizedDocument(text, layout=layout)
+    with timer.span(STAGE_CUSTOMER):
+        customer_name = customer_extractor.extract_customer(document, filename)
+    with timer.span(STAGE_AMOUNT):
+        amount, amount_source_line = amount_extractor.extract_invoice_amount(document)
+    return {
+        'customer_name': customer_name,
+        'amount': amount,
+        'amount_source_line': amount_source_line,
+        # ワーカープロセスで計測した時間は呼び出し元のStageTimer.mergeで記録する
+        'timings': timer.as_dict(),
+    }
+
+
+def _process_page_chunk(pdf_path: str, filename: str, page_numbers: List[int],
+                        raster: Optional[Dict[str, Any]] = None,
+                        ocr_policy: Optional[Dict[str, Any]] = None) -> List[Tuple[PageText, Optional[Dict[str, Any]]]]:
+    """
+    ワーカープロセスで実行される処理
+    チャンク内のページをまとめて1回のオープンで抽出し、顧客名/金額抽出まで行う
+    """
+    results = []
+    for page in iter_pdf_pages(pdf_path, page_numbers=page_numbers, raster=raster, ocr_policy=ocr_policy):
+        fields = None
+        if page.text:
+            try:
+                fields = extract_page_fields(page.text, page_filename(filename, page.page_number, page.page_count),
+                                             layout=page.layout)
+            except Exception as e:
+                # 抽出に失敗したページは呼び出し元で再計算させる
+                logger.error(f"ページ{page.page_number}の顧客名/金額抽出エラー: {e}")
+        results.append((page, fields))
+    return results
+
+
+def iter_pages(pdf_path: str, filename: str, config: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[PageText, Optional[Dict[str, Any]]]]:
+    """
+    PDFのページをページ順に返す
+    ページ数が閾値以上でプロセスプールが使える場合は並列に処理し、それ以外は逐次処理する
+
+    Args:
+        pdf_path: PDFファイルのパス
+        filename: 元のファイル名
+        config: 設定情報（page_pool_* / ocr_*）。テナントごとの上書きを適用した辞書を渡せる
+
+    Yields:
+        (PageText, fields)のタプル。fieldsがNoneの場合は呼び出し元で顧客名/金額を抽出する
+    """
+    config = config or {}
+    executor = None
+    page_count = 0
+    raster = raster_settings(config)
+    ocr_policy = adaptive_policy(config)
+
+    if config.get('page_pool_enabled', True):
+        try:
+            page_count = count_pages(pdf_path)
+            if page_count >= _config_int(config, 'page_pool_min_pages', DEFAULT_MIN_PAGES):
+                executor = get_executor(config)
+        except Exception as e:
+            logger.warning(f"並列処理の準備に失敗したため逐次処理します: {e}")
+            executor = None
+
+    if executor is None:
+        for page in iter_pdf_pages(pdf_path, raster=raster, ocr_policy=ocr_policy):
+            yield page, None
+        return
+
+    chunk_size = max(1, _config_int(config, 'page_pool_chunk_size', DEFAULT_CHUNK_SIZE))
+    max_in_flight = max(1, _config_int(config, 'page_pool_max_in_flight', DEFAULT_MAX_IN_FLIGHT))
+    chunks = [list(range(start, min(start + chunk_size, page_count + 1)))
+              for start in range(1, page_count + 1, chunk_size)]
+    logger.info(f"ページを並列処理します: {page_count}ページ, {len(chunks)}チャンク, 同時実行{max_in_flight}")
+
+    pending = deque()
+    next_chunk = 0
+    try:
+        while next_chunk < len(chunks) or pending:
+            # 1リクエストあたりの同時実行数を超えないように投入する
+            while next_chunk < len(chunks) and len(pending) < max_in_flight:
+                chunk = chunks[next_chunk]
+                future = executor.submit(_process_page_chunk, pdf_path, filename, chunk, raster, ocr_policy)
+                pending.append((chunk, future))
+                next_chunk += 1
+
+            chunk, future = pending.popleft()
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                logger.error(f"ページ{chunk[0]}-{chunk[-1]}の並列処理に失敗したため逐次処理します: {e}")
+                chunk_results = [(page, None) for page in iter_pdf_pages(pdf_path, page_numbers=chunk, raster=raster,
+                                                                         ocr_policy=ocr_policy)]
+
+            for item in chunk_results:
+                yield item
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページ単位の画像化モジュール
+PDF全体を一度に画像化せず、メモリ上限に収まる数ページずつ描画してOCRに渡す
+渡した画像は次のページに進む時点で解放する
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    PDF2IMAGE_AVAILABLE = True
+except ImportError:
+    PDF2IMAGE_AVAILABLE = False
+    logger.warning("pdf2imageが利用できません。PDFの画像化は無効です。")
+
+DEFAULT_DPI = 200  # pdf2imageのデフォルトと同じ
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# PILのモードごとの1ピクセルあたりのバイト数
+_BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'RGB': 3, 'RGBA': 4, 'CMYK': 4}
+
+
+def raster_settings(config: Optional[Dict[str, Any]] = None, default_dpi: int = DEFAULT_DPI) -> Dict[str, int]:
+    """
+    設定から画像化の解像度とメモリ上限を取得する
+
+    Args:
+        config: 設定情報（ocr_dpi / ocr_memory_budget_mb）。ジョブごとに上書きした辞書を渡せる
+        default_dpi: ocr_dpiが未設定（0）の場合に使う解像度
+
+    Returns:
+        Dict: iter_page_imagesに渡すキーワード引数（dpi, memory_budget_mb）
+    """
+    config = config or {}
+    return {
+        'dpi': int(config.get('ocr_dpi') or default_dpi),
+        'memory_budget_mb': int(config.get('ocr_memory_budget_mb') or DEFAULT_MEMORY_BUDGET_MB),
+    }
+
+
+def image_bytes(image) -> int:
+    """PIL画像が占めるおおよそのメモリ量（バイト）"""
+    width, height = image.size
+    return width * height * _BYTES_PER_PIXEL.get(image.mode, 4)
+
+
+def window_size(page_bytes: int, memory_budget_mb: int) -> int:
+    """1回に描画するページ数（最低1ページ）"""
+    if page_bytes <= 0:
+        return 1
+    return max(1, (memory_budget_mb * 1024 * 1024) // page_bytes)
+
+
+def count_pages(pdf_path: str) -> int:
+    """pdfinfoでページ数を取得する"""
+    return int(pdfinfo_from_path(pdf_path)['Pages'])
+
+
+def _render(pdf_path: str, first_page: int, last_page: int, dpi: int, grayscale: bool):
+    return convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page, grayscale=grayscale)
+
+
+def _runs(page_numbers: Iterable[int]) -> Iterator[Tuple[int, int]]:
+    """ページ番号の列を連続した範囲(first, last)にまとめる"""
+    first = last = None
+    for number in page_numbers:
+        if first is None:
+            first = last = number
+        elif number == last + 1:
+            last = number
+        else:
+            yield first, last
+            first = last = number
+    if first is not None:
+        yield first, last
+
+
+def iter_page_images(pdf_path: str, dpi: int = DEFAULT_DPI, memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+                     page_numbers: Optional[Iterable[int]] = None, grayscale: bool = False) -> Iterator[Tuple[int, Any]]:
+    """
+    PDFのページをメモリ上限に収まる枚数ずつ画像化して順に返す
+
+    最初のページの描画結果から1ページあたりのメモリ量を見積もり、
+    memory_budget_mbに収まるページ数（ウィンドウ）ずつconvert_from_pathを呼ぶ
+    返した画像は次のページに進む時点でcloseするため、呼び出し側で保持しないこと
+
+    Args:
+        pdf_path: PDFファイルのパス
+        dpi: 解像度
+        memory_budget_mb: 同時に保持する画像の合計メモリ上限（MB）
+        page_numbers: 処理するページ番号（1始まり、Noneの場合は全ページ）
+        grayscale: グレースケールで描画するかどうか（メモリ使用量は1/3）
+
+    Yields:
+        Tuple[int, PIL.Image.Image]: (ページ番号, 画像)
+    """
+    if page_numbers is None:
+        page_numbers = range(1, count_pages(pdf_path) + 1)
+    numbers = sorted(set(page_numbers))
+
+    window = None
+    for first, last in _runs(numbers):
+        page = first
+        while page <= last:
+            end = min(last, page + (window or 1) - 1)
+            images = _render(pdf_path, page, end, dpi, grayscale)
+            try:
+                if images and window is None:
+                    # 最初の描画結果からウィンドウの大きさを決める
+                    window = window_size(image_bytes(images[0]), memory_budget_mb)
+                    logger.debug(f"画像化ウィンドウ: {window}ページ (dpi={dpi}, 上限={memory_budget_mb}MB)")
+                for offset, image in enumerate(images):
+                    yield page + offset, image
+                    image.close()
+            finally:
+                for image in images:
+                    image.close()
+                del images
+            page = end + 1
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページストリーミング抽出モジュール
+PDFを一度だけ開き、ページごとのテキストとメタデータをジェネレータで返す
+"""
+
+import time
+import logging
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from page_layout import PageLayout
+from text_probe import BACKEND_OCR, BACKEND_PDFPLUMBER, BACKEND_PYPDF2, probe_page
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+try:
+    import pdfplumber
+    PDFPLUMBER_AVAILABLE = True
+except ImportError:
+    PDFPLUMBER_AVAILABLE = False
+    logger.warning("pdfplumberが利用できません。ページストリーミング抽出は無効です。")
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
+try:
+    import ocr_pool
+    from adaptive_ocr import ocr_page_adaptive
+    from page_rasterizer import PDF2IMAGE_AVAILABLE, iter_page_images
+    PYTESSERACT_AVAILABLE = PDF2IMAGE_AVAILABLE and ocr_pool.OCR_AVAILABLE
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+try:
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+    PDFMINER_AVAILABLE = True
+except ImportError:
+    PDFMINER_AVAILABLE = False
+
+
+class PageText(NamedTuple):
+    """1ページ分の抽出結果"""
+    page_number: int  # 1始まりのページ番号
+    page_count: int  # 文書全体のページ数
+    text: str
+    method: str  # 使用した抽出方法（extract_text_from_pdfと同じ名前）
+    width: float = 0.0
+    height: float = 0.0
+    probe: Optional[Dict[str, Any]] = None  # text_probeの判定結果
+    layout: Optional[PageLayout] = None  # 単語の位置（pdfplumberでテキストを抽出したページのみ）
+    elapsed_ms: float = 0.0  # 判定・テキスト抽出（OCRを含む）・単語の位置の取得にかかった時間
+
+
+class _LazyPyPDF2Reader:
+    """PyPDF2のリーダーを必要になった時だけ開くためのヘルパー"""
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        self._file = None
+        self._reader = None
+
+    def page_text(self, page_index: int) -> str:
+        if not PYPDF2_AVAILABLE:
+            return ""
+        if self._reader is None:
+            self._file = open(self.pdf_path, 'rb')
+            self._reader = PyPDF2.PdfReader(self._file)
+        return self._reader.pages[page_index].extract_text() or ""
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._reader = None
+
+
+def _ocr_page(pdf_path: str, page_number: int, raster: Optional[Dict[str, Any]] = None,
+              ocr_policy: Optional[Dict[str, Any]] = None) -> str:
+    """
+    指定した1ページだけを画像化してOCRする（rasterはpage_rasterizer.raster_settingsの結果）
+    ocr_policy（adaptive_ocr.adaptive_policyの結果）を指定した場合は低解像度から始め、必要な場合だけ解像度を上げる
+    """
+    if ocr_policy:
+        text, info = ocr_page_adaptive(pdf_path, page_number, ocr_policy)
+        logger.debug(f"ページ{page_number}の解像度適応型OCR: {info}")
+        return text
+    text = ""
+    for _, image in iter_page_images(pdf_path, page_numbers=[page_number], **(raster or {})):
+        text += ocr_pool.image_to_string(image, lang='jpn+eng')
+    return text
+
+
+# 判定された抽出方法ごとに、テキストが取れなかった場合に続けて試す方法
+_FALLBACK_CHAINS = {
+    BACKEND_PDFPLUMBER: ["PyPDF2", "ocr_pytesseract", "pdfminer.six"],
+    BACKEND_PYPDF2: ["PyPDF2", "ocr_pytesseract", "pdfminer.six"],
+    BACKEND_OCR: ["ocr_pytesseract", "pdfminer.six"],
+}
+
+# ローカルOCRを使わない場合（text_layer_only）の、テキストレイヤーのあるページの抽出方法（pdfplumber → PyPDF2）
+_TEXT_LAYER_CHAIN = ["PyPDF2"]
+
+
+def _fallback_page_text(pdf_path: str, page_index: int, pypdf2_reader: _LazyPyPDF2Reader,
+                        methods: Optional[List[str]] = None,
+                        raster: Optional[Dict[str, Any]] = None,
+                        ocr_policy: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+    """
+    pdfplumberのテキストを使わないページの抽出処理
+    methodsに指定された順（デフォルトはPyPDF2 → OCR → pdfminer.six）で該当ページだけを処理する
+    """
+    for method in methods or _FALLBACK_CHAINS[BACKEND_PDFPLUMBER]:
+        try:
+            if method == "PyPDF2":
+                text = pypdf2_reader.page_text(page_index)
+            elif method == "ocr_pytesseract" and PYTESSERACT_AVAILABLE:
+                text = _ocr_page(pdf_path, page_index + 1, raster, ocr_policy)
+            elif method == "pdfminer.six" and PDFMINER_AVAILABLE:
+                text = pdfminer_extract_text(pdf_path, page_numbers=[page_index])
+            else:
+                continue
+        except Exception as e:
+            logger.warning(f"{method}でページ{page_index + 1}のテキスト抽出エラー: {e}")
+            continue
+        if text.strip():
+            return text, method
+
+    return "", "failed"
+
+
+def count_pages(pdf_path: str) -> int:
+    """PDFのページ数を返す"""
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_pages(pdf_path: str, page_numbers: Optional[list] = None,
+                   raster: Optional[Dict[str, Any]] = None,
+                   ocr_policy: Optional[Dict[str, Any]] = None,
+                   text_layer_only: bool = False) -> Iterator[PageText]:
+    """
+    PDFを一度だけ開き、ページごとのテキストを順に返すジェネレータ
+    一時ファイルへの分割は行わず、ページごとにtext_probeで判定した抽出方法を直接使う
+    （スキャンページはpdfplumber/PyPDF2を試さずにOCRへ回す）
+
+    Args:
+        pdf_path: PDFファイルのパス
+        page_numbers: 処理するページ番号（1始まり）のリスト。Noneの場合は全ページ
+        raster: OCR時の画像化設定（page_rasterizer.raster_settingsの結果）
+        ocr_policy: 解像度適応型OCRのポリシー（adaptive_ocr.adaptive_policyの結果、Noneの場合は固定解像度）
+        text_layer_only: Trueの場合はローカルのOCRを行わず、テキストレイヤーのあるページはpdfplumber → PyPDF2の順に試す
+            スキャンページ（判定がocr）はテキストレイヤーを読まずに空のテキスト（method: ocr）で返し、
+            テキストが取れないページと合わせてOCRは呼び出し元（AI OCRなど）に任せる
+
+    Yields:
+        PageText: ページごとの抽出結果
+    """
+    if not PDFPLUMBER_AVAILABLE:
+        raise ImportError("pdfplumberが利用できないため、ページストリーミング抽出を実行できません")
+
+    pypdf2_reader = _LazyPyPDF2Reader(pdf_path)
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            page_count = len(pdf.pages)
+            targets = page_numbers or range(1, page_count + 1)
+
+            for page_number in targets:
+                page = pdf.pages[page_number - 1]
+                started = time.perf_counter()
+                try:
+                    probe = probe_page(page)
+                    backend = probe.backend
+                    probe_info = probe.to_dict()
+                except Exception as e:
+                    logger.warning(f"ページ{page_number}のテキストレイヤー判定エラー: {e}")
+                    backend = BACKEND_PDFPLUMBER
+                    probe_info = None
+
+                text = ""
+                method = backend
+                layout = None
+                if backend == BACKEND_PDFPLUMBER or (text_layer_only and backend != BACKEND_OCR):
+                    try:
+                        text = page.extract_text() or ""
+                    except Exception as e:
+                        logger.warning(f"pdfplumberでページ{page_number}のテキスト抽出エラー: {e}")
+
+                if text_layer_only and backend == BACKEND_OCR:
+                    # スキャンページはテキストレイヤーを読まず、OCRを呼び出し元に任せる
+                    pass
+                elif not text.strip():
+                    chain = _TEXT_LAYER_CHAIN if text_layer_only else _FALLBACK_CHAINS[backend]
+                    text, method = _fallback_page_text(pdf_path, page_number - 1, pypdf2_reader,
+                                                       chain, raster=raster, ocr_policy=ocr_policy)
+                else:
+                    try:
+                        # extract_textで作られたページの文字の配置（キャッシュ）から単語の位置を取り出す
+                        layout = PageLayout.from_page(page)
+                    except Exception as e:
+                        logger.warning(f"ページ{page_number}の単語の位置の取得エラー: {e}")
+
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                logger.info(f"ページ{page_number}/{page_count}のテキスト抽出: {method} "
+                            f"(判定: {backend}, {len(text)} 文字, {elapsed_ms:.1f} ms)")
+                yield PageText(
+                    page_number=page_number,
+                    page_count=page_count,
+                    text=text,
+                    method=method,
+                    width=float(page.width),
+                    height=float(page.height),
+                    probe=probe_info,
+                    layout=layout,
+                    elapsed_ms=elapsed_ms,
+                )
+
+                # ページ単位のキャッシュを解放してメモリ使用量を抑える
+                if hasattr(page, 'flush_cache'):
+                    page.flush_cache()
+    finally:
+        pypdf2_reader.close()
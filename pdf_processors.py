@@ -4,14 +4,14 @@ PDFからのテキスト抽出、顧客名・金額の識別、決済リンク
 """
 import os
 import logging
-import PyPDF2
-import pdfplumber
 import tempfile
 from datetime import datetime
 from typing import Optional, Dict, Any
 
 # ExtractionResultクラスをインポート
 from extractors import ExtractionResult
+from page_stream import iter_pdf_pages
+from text_probe import BACKEND_OCR
 
 # ロギング設定
 logger = logging.getLogger(__name__)
@@ -28,29 +28,23 @@ def extract_text_from_pdf(pdf_path):
         str: 抽出されたテキスト
     """
     try:
-        # まずpdfplumberでテキスト抽出を試みる
+        # PDFを一度だけ開き、text_probeの判定でテキストレイヤーのあるページだけをpdfplumber → PyPDF2の順に抽出する
+        # スキャンページはテキストレイヤーを読まずにスキップし（ローカルOCRも使わない）、AI OCRに回す
         extracted_text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                extracted_text += page_text + "\n"
+        scanned_pages = 0
+        for page in iter_pdf_pages(pdf_path, text_layer_only=True):
+            if page.method == BACKEND_OCR:
+                scanned_pages += 1
+                continue
+            extracted_text += (page.text or "") + "\n"
         
         # 抽出テキストがある場合はそのまま返す
         if extracted_text.strip():
             return extracted_text
         
-        # PyPDF2でも試してみる
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            pdf_text = ""
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                pdf_text += page.extract_text() + "\n"
-            
-            if pdf_text.strip():
-                return pdf_text
-        
-        # どちらも失敗した場合はAI OCR機能を試す
+        # テキストが取れなかった場合（スキャンページのみの場合を含む）はAI OCR機能を試す
+        if scanned_pages:
+            logger.info(f"スキャンページ{scanned_pages}件をAI OCRで処理します: {pdf_path}")
         try:
             from ai_ocr import process_pdf_with_ai_ocr
             result = process_pdf_with_ai_ocr(pdf_path)
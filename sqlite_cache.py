@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLiteの永続キャッシュモジュール
+キー → JSONの値をSQLiteに保存し、エントリ数・合計サイズの上限を超えた分を最終アクセス順（LRU）で、
+有効期間（TTL）を過ぎた分を作成時刻で削除する
+同じノード上の全ワーカー（gunicornの各プロセス）で共有される
+
+抽出結果キャッシュ（extraction_cache）とOCR結果キャッシュ（ocr_cache）は、このクラスをテーブル名と上限を変えて使う
+"""
+
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+_TABLE_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class SQLiteCache:
+    """SQLiteを使った永続キャッシュ（エントリ数・サイズ上限を超えた分はLRU、期限切れの分はTTLで削除）"""
+
+    def __init__(self, path: str, table: str, max_entries: int = 0, max_bytes: int = 0,
+                 ttl_seconds: float = 0, label: str = "キャッシュ"):
+        """
+        初期化
+
+        Args:
+            path: SQLiteファイルのパス
+            table: テーブル名
+            max_entries: 最大エントリ数（0は上限なし）
+            max_bytes: 保存データの合計サイズ上限（バイト。0は上限なし）
+            ttl_seconds: エントリの有効期間（秒。0は無期限）
+            label: ログに出力するキャッシュの名前
+        """
+        if not _TABLE_NAME_PATTERN.match(table):
+            raise ValueError(f"テーブル名が不正です: {table}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.label = label
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table}(last_access)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table}(created_at)")
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        # SQLiteの接続はスレッドごとに保持する
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            # 複数プロセスからの同時読み書きに備えてWALモードを使用
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count_lookup(self, hit: bool) -> None:
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """キャッシュから値を取得する（ない場合・期限切れの場合はNone）"""
+        conn = self._connect()
+        row = conn.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            conn.commit()
+            row = None
+        self._count_lookup(row is not None)
+        if row is None:
+            return None
+
+        conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """キャッシュに値を保存し、上限を超えた分を削除する"""
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        if self.max_bytes and size > self.max_bytes:
+            logger.warning(f"キャッシュ上限を超えるため保存しません: {size} バイト")
+            return
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, data, size, now, now)
+        )
+        self._evict(conn, now)
+        conn.commit()
+
+    def _totals(self, conn: sqlite3.Connection):
+        return conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+
+    def _over_limit(self, count: int, total: int) -> bool:
+        return bool((self.max_entries and count > self.max_entries) or (self.max_bytes and total > self.max_bytes))
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """
+        期限切れのエントリと、上限を超えた古いエントリ（最終アクセス順）を削除する
+        削除する件数を見積もり、last_accessのインデックスを使って古い順にまとめて削除する（全行は読み込まない）
+        """
+        if self.ttl_seconds:
+            conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        count, total = self._totals(conn)
+        before = count
+        while count and self._over_limit(count, total):
+            excess = count - self.max_entries if self.max_entries and count > self.max_entries else 0
+            if self.max_bytes and total > self.max_bytes:
+                # 平均サイズからサイズ上限に収まるまでの件数を見積もる（足りなければ次の周回で追加削除する）
+                excess = max(excess, math.ceil((total - self.max_bytes) * count / total))
+            excess = max(excess, 1)
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+            count, total = self._totals(conn)
+        if count < before:
+            logger.info(f"{self.label}から{before - count}件を削除しました")
+
+    def clear(self) -> None:
+        """全エントリを削除する"""
+        conn = self._connect()
+        conn.execute(f"DELETE FROM {self.table}")
+        conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """エントリ数・合計サイズと、このプロセスでのヒット・ミス数を返す"""
+        count, total = self._totals(self._connect())
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'entries': count,
+            'bytes': total,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'path': self.path,
+        }
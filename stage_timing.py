@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+処理段階ごとの時間計測モジュール
+/processのパイプラインの各段階（テキスト抽出・顧客名抽出・金額抽出・決済リンク生成・履歴の保存など）の時間を計測し、
+次の3か所に記録する
+
+- 処理結果: 1ページ分の結果の'timings'（段階 → ミリ秒）
+- ログ: 1件ごとに1行のJSON（stage_timingロガー。event, filename, method, provider, timings）
+- メトリクス: 段階・抽出方法・決済プロバイダーごとの処理時間のヒストグラム（get_registry）
+  prometheus_clientがある場合は同じ値をPrometheusのヒストグラム（invoice_stage_duration_seconds）にも記録する
+
+gunicornの各ワーカーは別プロセスのため、環境変数PROMETHEUS_MULTIPROC_DIRを設定した場合（gunicorn.conf.pyで設定する）は
+prometheus_clientのmultiprocessモードでファイルに記録し、/metricsと/api/metrics/stagesは全ワーカーの値を合算して返す
+（合算した値には最大値がないため、max_msはNoneになる）
+
+抽出方法と決済プロバイダーは処理の途中で決まるため、計測した時間はStageTimerに溜めておき、
+finishでラベルが確定してからログとメトリクスに記録する
+"""
+
+import os
+import hmac
+import json
+import time
+import bisect
+import logging
+import ipaddress
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    logger.warning("prometheus_clientが利用できません。Prometheus形式のメトリクスは無効です。")
+
+# 段階の名前
+STAGE_CACHE = 'cache_lookup'  # 抽出結果キャッシュの確認
+STAGE_TEXT = 'text_extraction'  # テキスト抽出（pdfplumber・PyPDF2・OCR。方法はmethodラベルで区別する）
+STAGE_CUSTOMER = 'customer_extraction'
+STAGE_AMOUNT = 'amount_extraction'
+STAGE_PAYMENT = 'payment_link'  # 決済プロバイダーのAPI呼び出し
+STAGE_HISTORY = 'history_write'
+STAGE_TOTAL = 'total'  # 1ページ分の処理全体
+STAGE_REQUEST = 'request_total'  # 1リクエスト（ジョブ）全体。全ページの処理と履歴の保存を含む
+
+# ヒストグラムの区切り（ミリ秒）
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+UNKNOWN_LABEL = 'unknown'
+METHOD_SEPARATOR = '+'  # 複数の方法を組み合わせた抽出方法（例: pdfplumber+ocr_pytesseract）の区切り
+
+PROMETHEUS_METRIC = 'invoice_stage_duration_seconds'
+
+
+def method_label(method: Optional[str]) -> Optional[str]:
+    """
+    抽出方法のラベル（組み合わせの場合は最初の方法）
+    組み合わせごとにラベルが増えないように、主な抽出方法にまとめる
+    """
+    if not method:
+        return method
+    return method.split(METHOD_SEPARATOR, 1)[0].strip() or method
+
+
+def multiprocess_enabled() -> bool:
+    """prometheus_clientのmultiprocessモード（PROMETHEUS_MULTIPROC_DIRの設定あり）で記録しているかどうか"""
+    return PROMETHEUS_AVAILABLE and bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+class Histogram:
+    """処理時間（ミリ秒）のヒストグラム（各区切り以下の件数と合計・最大）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後は最大の区切りを超えたもの
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """分位点の推定値（その件数に達する区切りの上限。最大の区切りを超える場合は最大値、最大値が不明な場合はNone）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return float(self.buckets[index]) if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 1) if self.count else 0.0,
+            'max_ms': round(self.max, 1) if self.max is not None else None,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'buckets': {f"le_{bound}": count for bound, count in zip(self.buckets, self._cumulative())},
+        }
+
+    def _cumulative(self) -> List[int]:
+        cumulative = []
+        total = 0
+        for count in self.counts[:-1]:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    @classmethod
+    def from_cumulative(cls, buckets: Tuple[float, ...], cumulative: List[float], count: float,
+                        total: float) -> 'Histogram':
+        """区切りごとの累積件数・件数・合計から作る（Prometheusのヒストグラムを合算した場合。最大値は不明）"""
+        histogram = cls(buckets)
+        previous = 0
+        for index, value in enumerate(cumulative):
+            histogram.counts[index] = int(value) - previous
+            previous = int(value)
+        histogram.counts[-1] = int(count) - previous
+        histogram.count = int(count)
+        histogram.total = total
+        histogram.max = None
+        return histogram
+
+
+class MetricsRegistry:
+    """段階・抽出方法・決済プロバイダーごとのヒストグラム"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS_MS, prometheus_registry=None):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self._prometheus = None
+        if PROMETHEUS_AVAILABLE:
+            try:
+                self._prometheus = prometheus_client.Histogram(
+                    PROMETHEUS_METRIC,
+                    'PDF処理の段階ごとの処理時間',
+                    ['stage', 'method', 'provider'],
+                    buckets=[bound / 1000 for bound in self.buckets],
+                    registry=prometheus_registry or prometheus_client.REGISTRY,
+                )
+            except ValueError as e:
+                # 同じ名前のメトリクスが登録済みの場合（テストなどで複数作った場合）はPrometheusには記録しない
+                logger.warning(f"Prometheusのヒストグラムを登録できませんでした: {e}")
+
+    def observe(self, stage: str, value_ms: float, method: Optional[str] = None, provider: Optional[str] = None) -> None:
+        key = (stage, method_label(method) or UNKNOWN_LABEL, provider or UNKNOWN_LABEL)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value_ms)
+        if self._prometheus is not None:
+            self._prometheus.labels(*key).observe(value_ms / 1000)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        ヒストグラムの一覧（段階・抽出方法・決済プロバイダーの順）
+        multiprocessモードの場合は全ワーカーの値を合算する
+        """
+        if self._prometheus is not None and multiprocess_enabled():
+            histograms = self._collect_multiprocess()
+        else:
+            with self._lock:
+                histograms = dict(self._histograms)
+        return [{'stage': stage, 'method': method, 'provider': provider, **histogram.snapshot()}
+                for (stage, method, provider), histogram in sorted(histograms.items())]
+
+    def _collect_multiprocess(self) -> Dict[Tuple[str, str, str], Histogram]:
+        """PROMETHEUS_MULTIPROC_DIRの全ワーカーのファイルから、ラベルごとのヒストグラムを合算する"""
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        samples: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for metric in registry.collect():
+            if metric.name != PROMETHEUS_METRIC:
+                continue
+            for sample in metric.samples:
+                key = (sample.labels['stage'], sample.labels['method'], sample.labels['provider'])
+                entry = samples.setdefault(key, {'buckets': {}, 'count': 0.0, 'sum': 0.0})
+                if sample.name.endswith('_bucket'):
+                    entry['buckets'][float(sample.labels['le'])] = sample.value
+                elif sample.name.endswith('_count'):
+                    entry['count'] = sample.value
+                elif sample.name.endswith('_sum'):
+                    entry['sum'] = sample.value
+        histograms = {}
+        for key, entry in samples.items():
+            cumulative = [value for bound, value in sorted(entry['buckets'].items()) if bound != float('inf')]
+            histograms[key] = Histogram.from_cumulative(self.buckets, cumulative, entry['count'], entry['sum'] * 1000)
+        return histograms
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """プロセス共有のメトリクスのレジストリを取得する（初回呼び出し時に生成）"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+class StageTimer:
+    """
+    1件の処理（1ページ、または1リクエスト全体）の段階ごとの時間
+    同じ段階を複数回計測した場合は合計する
+    全体の時間は作成からfinishまでの経過時間に、mergeで加えた時間（作成前やワーカープロセスで計測した時間）を足したもの
+    """
+
+    def __init__(self, method: Optional[str] = None, provider: Optional[str] = None,
+                 registry: Optional[MetricsRegistry] = None):
+        self.method = method
+        self.provider = provider
+        self.registry = registry
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._merged_ms = 0.0
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """ブロックの実行時間を段階stageの時間として記録する（例外が発生した場合も記録する）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000)
+
+    def record(self, stage: str, value_ms: float) -> None:
+        """作成後に計測した時間（ミリ秒）を記録する"""
+        self.timings[stage] = self.timings.get(stage, 0.0) + value_ms
+
+    def merge(self, timings: Optional[Dict[str, float]]) -> None:
+        """
+        別の場所で計測した段階ごとの時間（as_dictの結果）を加える
+        作成前やワーカープロセスで計測した時間のため、全体の時間にも加える
+        """
+        for stage, value_ms in (timings or {}).items():
+            self.record(stage, value_ms)
+            self._merged_ms += value_ms
+
+    def as_dict(self) -> Dict[str, float]:
+        """段階 → ミリ秒（小数点以下1桁）"""
+        return {stage: round(value_ms, 1) for stage, value_ms in self.timings.items()}
+
+    def finish(self, event: str, filename: Optional[str] = None, method: Optional[str] = None,
+               provider: Optional[str] = None, total_stage: str = STAGE_TOTAL) -> Dict[str, float]:
+        """
+        全体の時間を加え、ログとメトリクスに記録する
+
+        Args:
+            event: ログに出力する処理の種類（'page'、'request'など）
+            filename: 処理したファイル名（ログ用）
+            method: テキストの抽出方法（省略時は作成時の値）
+            provider: 決済プロバイダー（省略時は作成時の値）
+            total_stage: 全体の時間を記録する段階（1リクエスト全体の場合はSTAGE_REQUEST）
+
+        Returns:
+            Dict: 段階 → ミリ秒（処理結果の'timings'に入れる）
+        """
+        self.method = method or self.method
+        self.provider = provider or self.provider
+        self.timings[total_stage] = (time.perf_counter() - self._started) * 1000 + self._merged_ms
+        registry = self.registry or get_registry()
+        for stage, value_ms in self.timings.items():
+            registry.observe(stage, value_ms, self.method, self.provider)
+        timings = self.as_dict()
+        logger.info(json.dumps({
+            'event': event,
+            'filename': filename,
+            'method': self.method,
+            'provider': self.provider,
+            'timings': timings,
+        }, ensure_ascii=False))
+        return timings
+
+
+def result_labels(results: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+    """ページごとの結果から、1リクエスト全体のラベル（最初のページの主な抽出方法と決済プロバイダー）を決める"""
+    method = next((r.get('extraction_method') for r in results if isinstance(r, dict) and r.get('extraction_method')), None)
+    method = method_label(method)
+    provider = next((r.get('provider') for r in results if isinstance(r, dict) and r.get('provider')), None)
+    return method, provider
+
+
+def scrape_allowed(config: Optional[Dict[str, Any]], authorization: Optional[str],
+                   remote_addr: Optional[str]) -> bool:
+    """
+    /metricsの取得を許可するかどうか（Prometheusはログインできないため、トークンか接続元IPで認可する）
+
+    Args:
+        config: 設定情報（metrics_token, metrics_allowed_ips）
+        authorization: Authorizationヘッダーの値（Bearer <token>）
+        remote_addr: 接続元のIPアドレス
+
+    Returns:
+        bool: metrics_tokenと一致するトークンが指定された場合、または接続元がmetrics_allowed_ipsに含まれる場合はTrue
+    """
+    config = config or {}
+    token = config.get('metrics_token') or ''
+    if token and authorization:
+        scheme, _, value = authorization.partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(value.strip().encode('utf-8'), token.encode('utf-8')):
+            return True
+
+    allowed = config.get('metrics_allowed_ips') or []
+    if isinstance(allowed, str):
+        allowed = allowed.split(',')
+    if not remote_addr or not allowed:
+        return False
+    try:
+        address = ipaddress.ip_address(remote_addr)
+    except ValueError:
+        return False
+    for network in allowed:
+        try:
+            if address in ipaddress.ip_network(str(network).strip(), strict=False):
+                return True
+        except ValueError:
+            logger.warning(f"metrics_allowed_ipsの値を解釈できませんでした: {network}")
+    return False
+
+
+def prometheus_exposition() -> Optional[Tuple[bytes, str]]:
+    """
+    Prometheusのテキスト形式の出力と、そのContent-Type（prometheus_clientがない場合はNone）
+    multiprocessモードの場合は全ワーカーの値を合算して出力する
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return None
+    if multiprocess_enabled():
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
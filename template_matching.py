@@ -14,6 +14,7 @@ import numpy as np
 import cv2
 from PIL import Image
 import pytesseract
+import ocr_pool
 from pdf2image import convert_from_path
 import tempfile
 
@@ -220,17 +221,9 @@ class TemplateManager:
                 x1, y1, x2, y2 = region["x1"], region["y1"], region["x2"], region["y2"]
                 roi = image[y1:y2, x1:x2]
                 
-                # 一時ファイルに保存
-                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-                    temp_path = temp_file.name
-                    cv2.imwrite(temp_path, roi)
-                    
-                    # OCRでテキスト抽出
-                    text = pytesseract.image_to_string(Image.open(temp_path), lang='jpn+eng')
-                    extracted_info[field_name] = text.strip()
-                    
-                    # 一時ファイルを削除
-                    os.unlink(temp_path)
+                # OCRでテキスト抽出（常駐OCRワーカーに切り出した画像をそのまま渡す）
+                text = ocr_pool.image_to_string(cv2.cvtColor(roi, cv2.COLOR_BGR2RGB), lang='jpn+eng')
+                extracted_info[field_name] = text.strip()
             
             return extracted_info
         except Exception as e:
@@ -253,8 +246,8 @@ def process_pdf_with_template_matching(pdf_path, templates_dir):
         # テンプレートマネージャーを初期化
         template_manager = TemplateManager(templates_dir)
         
-        # PDFを画像に変換
-        images = convert_from_path(pdf_path, dpi=300)
+        # 最初のページだけを画像に変換（全ページを描画しない）
+        images = convert_from_path(pdf_path, dpi=300, first_page=1, last_page=1)
         
         # 最初のページのみ処理
         if not images:
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解像度適応型OCRのテスト
+低解像度のOCR結果が十分な場合は描画し直さず、信頼度の低い行・項目不足のページだけ高解像度でOCRし直すことを確認する
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import adaptive_ocr
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+POLICY = {
+    'low_dpi': 150,
+    'high_dpi': 300,
+    'min_confidence': 0.75,
+    'max_region_ratio': 0.5,
+    'required_fields': ['amount'],
+    'memory_budget_mb': 64,
+}
+
+
+def _ocr_data(lines):
+    """(テキスト, 信頼度, top)の行ごとにimage_to_data(DICT)と同じ形の辞書を作る"""
+    data = {key: [] for key in ("text", "conf", "left", "top", "width", "height", "block_num", "par_num", "line_num")}
+    for number, (text, conf, top) in enumerate(lines, start=1):
+        data["text"].append(text)
+        data["conf"].append(conf)
+        data["left"].append(10)
+        data["top"].append(top)
+        data["width"].append(100)
+        data["height"].append(20)
+        data["block_num"].append(1)
+        data["par_num"].append(1)
+        data["line_num"].append(number)
+    return data
+
+
+def _fake_render(calls):
+    def render(pdf_path, page_number, dpi, memory_budget_mb):
+        calls.append(dpi)
+        image = MagicMock()
+        image.size = (dpi * 8, dpi * 11)
+        return image
+    return render
+
+
+def _all_fields_found(text, required_fields):
+    return []
+
+
+class TestOcrPageAdaptive:
+    """ocr_page_adaptiveのテストクラス"""
+
+    def test_confident_page_is_not_rerendered(self):
+        """低解像度のOCR結果が十分な場合は高解像度で描画しない"""
+        calls = []
+        data = _ocr_data([("請求書", 95, 10), ("ご請求金額 10,000円", 90, 40)])
+        with patch.object(adaptive_ocr, '_render_page', side_effect=_fake_render(calls)), \
+                patch.object(adaptive_ocr.ocr_pool, 'image_to_data', return_value=data):
+            text, info = adaptive_ocr.ocr_page_adaptive('a.pdf', 1, POLICY, field_check=_all_fields_found)
+
+        assert calls == [150]
+        assert text == "請求書\nご請求金額 10,000円\n"
+        assert info['escalation'] == 'none'
+
+    def test_low_confidence_lines_are_reocred_as_regions(self):
+        """信頼度の低い行だけを高解像度の画像から切り出してOCRし直す"""
+        calls = []
+        data = _ocr_data([("請求書", 95, 10), ("株式会社", 92, 40), ("ご請求金額 1O,OOO円", 40, 70)])
+        with patch.object(adaptive_ocr, '_render_page', side_effect=_fake_render(calls)), \
+                patch.object(adaptive_ocr.ocr_pool, 'image_to_data', return_value=data), \
+                patch.object(adaptive_ocr.ocr_pool, 'image_to_string', return_value="ご請求金額 10,000円\n") as ocr:
+            text, info = adaptive_ocr.ocr_page_adaptive('a.pdf', 1, POLICY, field_check=_all_fields_found)
+
+        assert calls == [150, 300]
+        assert ocr.call_count == 1
+        assert text == "請求書\n株式会社\nご請求金額 10,000円\n"
+        assert (info['escalation'], info['regions'], info['dpi']) == ('regions', 1, 300)
+
+    def test_missing_fields_rerender_whole_page(self):
+        """必須項目が取れない場合はページ全体を高解像度でOCRし直す"""
+        calls = []
+        data = _ocr_data([("請求書", 95, 10)])
+        with patch.object(adaptive_ocr, '_render_page', side_effect=_fake_render(calls)), \
+                patch.object(adaptive_ocr.ocr_pool, 'image_to_data', return_value=data), \
+                patch.object(adaptive_ocr.ocr_pool, 'image_to_string', return_value="請求書\nご請求金額 10,000円\n"):
+            text, info = adaptive_ocr.ocr_page_adaptive('a.pdf', 1, POLICY, field_check=lambda text, fields: ['amount'])
+
+        assert calls == [150, 300]
+        assert text == "請求書\nご請求金額 10,000円\n"
+        assert info['escalation'] == 'page'
+
+
+class TestMissingFields:
+    """missing_fieldsのテストクラス"""
+
+    def test_presence_checks(self):
+        """金額・顧客名は値の形と目印だけで判定する（OCRで入った空白は無視する）"""
+        fields = ['amount', 'customer']
+        assert adaptive_ocr.missing_fields("山田 太郎 様\nご 請求 金額 10, 000 円", fields) == []
+        assert adaptive_ocr.missing_fields("株式会社テスト 御中\n合計 ¥5000", fields) == []
+        assert adaptive_ocr.missing_fields("請求金額\n12000", ['amount']) == []
+        assert adaptive_ocr.missing_fields("請求書\n発行日 2025年1月", fields) == ['amount', 'customer']
+
+    def test_does_not_run_extractors(self):
+        """高解像度にするかの判定では金額・顧客名の抽出を行わない"""
+        with patch('amount_extractor.extract_invoice_amount') as amount, \
+                patch('customer_extractor.extract_customer') as customer:
+            adaptive_ocr.missing_fields("山田太郎 様\n合計 10,000円", ['amount', 'customer'])
+        amount.assert_not_called()
+        customer.assert_not_called()
+
+
+class TestPolicy:
+    """adaptive_policy / tenant_configのテストクラス"""
+
+    def test_disabled_by_default(self):
+        """ocr_adaptive_enabledを指定しない場合は無効"""
+        assert adaptive_ocr.adaptive_policy({}) is None
+
+    def test_tenant_overrides(self):
+        """テナントごとの設定で上書きし、元の設定は変更しない"""
+        config = {
+            'ocr_adaptive_enabled': False,
+            'ocr_tenant_policies': {'3': {'ocr_adaptive_enabled': True, 'ocr_adaptive_high_dpi': 400,
+                                          'ocr_adaptive_required_fields': 'amount'}},
+        }
+        policy = adaptive_ocr.adaptive_policy(adaptive_ocr.tenant_config(config, 3))
+
+        assert (policy['low_dpi'], policy['high_dpi']) == (150, 400)
+        assert policy['required_fields'] == ['amount']
+        assert adaptive_ocr.adaptive_policy(adaptive_ocr.tenant_config(config, 4)) is None
+        assert config['ocr_adaptive_enabled'] is False
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+金額抽出のテスト
+1行1回の走査（scan_line）で得たトークン列から、従来どおりの候補・除外判定になることを確認する
+"""
+
+import os
+import sys
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import amount_extractor
+    from amount_extractor import AmountExtractor, extract_invoice_amount, scan_line
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+INVOICE = "\n".join([
+    "請求書",
+    "〒100-0005 東京都千代田区丸の内1-1",
+    "株式会社サンプル 御中",
+    "TEL：03-1234-5678",
+    "品名 数量 単価 金額",
+    "作業費 2 50,000 100,000",
+    "小計 ¥100,000",
+    "消費税 ¥10,000",
+    "ご請求金額 ￥１１０，０００円",
+    "お支払期限 2024年12月31日",
+])
+
+
+class TestScanLine:
+    """scan_lineのテストクラス"""
+
+    def test_line_without_numbers_is_skipped(self):
+        """数値を含まない行はNone"""
+        assert scan_line("請求書") is None
+
+    def test_fullwidth_amount_and_keywords(self):
+        """全角の数字・カンマ・円記号も正規化した場合と同じトークンになる"""
+        tokens = scan_line("ご請求金額 ￥１１０，０００円")
+
+        assert tokens.amounts == (110000,)
+        assert (tokens.kw_exact, tokens.kw_loose, tokens.has_yen, tokens.excluded) == (True, True, True, False)
+
+    def test_partial_keyword(self):
+        """部分一致キーワードだけの行は完全一致にしない"""
+        tokens = scan_line("合計 12,000")
+        assert (tokens.kw_exact, tokens.kw_loose) == (False, True)
+
+    @pytest.mark.parametrize("line", [
+        "小計 ¥100,000",
+        "〒100-0005",
+        "電話 03-1234-5678",
+        "お客様番号：12345",
+        "電話でのお問い合わせ 9:00-18:00",
+    ])
+    def test_excluded_lines(self, line):
+        """除外キーワードや、電話・番号の後ろに数字・区切りが続く行は除外する"""
+        assert scan_line(line).excluded
+
+    def test_marker_without_following_number_is_not_excluded(self):
+        """番号の目印の後ろに数字がなければ除外しない"""
+        assert not scan_line("合計 5,000 番号なし").excluded
+
+
+class TestExtractInvoiceAmount:
+    """金額抽出全体のテストクラス"""
+
+    def test_invoice_amount(self):
+        """小計・消費税・郵便番号・電話番号を除いてご請求金額を選ぶ"""
+        amount, line = extract_invoice_amount(INVOICE)
+        assert amount == 110000
+        assert line == "ご請求金額 ￥１１０，０００円"
+
+    def test_bottom_fallback_without_keywords(self):
+        """完全一致キーワードがない場合はページ下部の金額も候補にする"""
+        text = "\n".join(["明細"] * 8 + ["小計 ¥9,800", "ありがとうございました"])
+        candidates = AmountExtractor().collect_candidates(text)
+
+        assert [c["amount"] for c in candidates] == [9800]
+        assert candidates[0]["bottom"] == 1
+
+    def test_candidates_share_lines(self):
+        """候補は__slots__のレコードで、行の文字列は写さずに元の行を参照する"""
+        candidates = AmountExtractor().collect_candidates(INVOICE)
+        lines = INVOICE.split("\n")
+        best = max(candidates, key=lambda c: c.amount)
+
+        assert not hasattr(best, "__dict__")
+        assert best.line == lines[best.index]
+        assert best["amount"] == best.amount == 110000
+        assert best.get("no_such_key") is None
+
+    def test_pages_reuse_single_scan(self, monkeypatch):
+        """複数ページとして扱う場合も各行は1回だけ走査する"""
+        calls = []
+        original = amount_extractor.scan_line
+        monkeypatch.setattr(amount_extractor, "scan_line", lambda line: calls.append(line) or original(line))
+
+        extract_invoice_amount(INVOICE, page_count=3)
+        assert len(calls) == len(INVOICE.split("\n"))
+
+    def test_filter_candidates_removes_postal_code(self):
+        """文脈の郵便番号と一致する金額は除外する"""
+        candidates = [{"amount": 1000005, "context": "〒100-0005"}, {"amount": 110000, "context": "ご請求金額"}]
+        assert [c["amount"] for c in AmountExtractor().filter_candidates(candidates)] == [110000]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+上限付きメモリキャッシュのテスト
+LRUによる削除、TTL、内容ハッシュのキー、スレッドからの同時アクセス、統計、顧客名キャッシュでの使用を確認する
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import customer_extractor
+    from bounded_cache import BoundedCache, content_key, get_memory_cache
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBoundedCache:
+    """BoundedCacheのテストクラス"""
+
+    def test_evicts_least_recently_used(self):
+        """上限を超えたら最後に使った時刻の古いエントリから削除する"""
+        cache = BoundedCache(max_entries=2, ttl_seconds=0)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert "b" not in cache
+        assert (cache.get("a"), cache.get("c")) == (1, 3)
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl_expiry(self):
+        """有効期間を過ぎたエントリは返さない"""
+        clock = FakeClock()
+        cache = BoundedCache(max_entries=10, ttl_seconds=60, clock=clock)
+        cache.set("k", "v")
+        clock.now += 59
+        assert cache.get("k") == "v"
+        clock.now += 1
+        assert cache.get("k") is None
+        assert len(cache) == 0
+        assert cache.stats()['expirations'] == 1
+
+    def test_expired_entries_are_dropped_before_lru(self):
+        """上限を超えた場合は期限切れのエントリを先に削除する"""
+        clock = FakeClock()
+        cache = BoundedCache(max_entries=2, ttl_seconds=60, clock=clock)
+        cache.set("old", 1)
+        clock.now += 30
+        cache.set("recent", 2)
+        clock.now += 40
+        assert cache.get("recent") == 2
+        cache.set("new", 3)
+
+        stats = cache.stats()
+        assert (stats['expirations'], stats['evictions']) == (1, 0)
+        assert "recent" in cache and "new" in cache
+
+    def test_stats(self):
+        """ヒット・ミスの件数とヒット率を返す"""
+        cache = BoundedCache(max_entries=10, name="test")
+        cache.set("k", None)
+        cache.get("k")
+        cache.get("k")
+        cache.get("missing")
+
+        stats = cache.stats()
+        assert (stats['name'], stats['entries'], stats['hits'], stats['misses']) == ("test", 1, 2, 1)
+        assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+    def test_concurrent_access_stays_bounded(self):
+        """複数スレッドから同時に読み書きしても上限を超えず、統計の件数も合う"""
+        cache = BoundedCache(max_entries=50, ttl_seconds=0)
+
+        def worker(offset):
+            for i in range(2000):
+                key = (offset * 7 + i) % 200
+                if cache.get(key) is None:
+                    cache.set(key, i)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats()
+        assert len(cache) == 50
+        assert stats['hits'] + stats['misses'] == 8 * 2000
+
+    def test_content_key(self):
+        """同じ内容・同じ付加情報なら同じキー、どちらかが違えば別のキーになる"""
+        assert content_key("請求書", "a.pdf") == content_key("請求書", "a.pdf")
+        assert content_key("請求書", "a.pdf") != content_key("請求書B", "a.pdf")
+        assert content_key("請求書", "a.pdf") != content_key("請求書", "b.pdf")
+        assert content_key("請求書", None) == content_key("請求書", "")
+
+    def test_get_memory_cache_is_shared(self):
+        """同じ名前のキャッシュはプロセス内で共有される"""
+        assert get_memory_cache("test_shared", max_entries=5) is get_memory_cache("test_shared")
+
+
+class TestCustomerCache:
+    """顧客名キャッシュのテストクラス"""
+
+    FILENAME = "サンプル商事_invoice.pdf"
+    NO_NAME_TEXT = "請求書\nご請求金額 10,000円"
+
+    def setup_method(self):
+        customer_extractor.clear_cache()
+
+    def test_reused_filename_with_new_content_is_not_stale(self):
+        """同じファイル名でも内容が違えば、前の顧客名を返さない"""
+        first = customer_extractor.extract_customer(self.NO_NAME_TEXT, filename=self.FILENAME)
+        text = "山田 太郎 様\n請求書\n発行日 2024年1月1日\n株式会社サンプル\n東京都千代田区1-1-1"
+        second = customer_extractor.extract_customer(text, filename=self.FILENAME)
+
+        assert first == "サンプル商事"
+        assert second == "山田 太郎"
+
+    def test_repeated_extraction_hits_cache(self):
+        """同じテキスト・ファイル名の2回目はキャッシュから返す"""
+        first = customer_extractor.extract_customer(self.NO_NAME_TEXT, filename=self.FILENAME)
+        hits = customer_extractor.cache_stats()['hits']
+
+        assert customer_extractor.extract_customer(self.NO_NAME_TEXT, filename=self.FILENAME) == first
+        assert customer_extractor.cache_stats()['hits'] == hits + 1
+        key = customer_extractor.customer_cache_key(self.NO_NAME_TEXT, self.FILENAME)
+        assert customer_extractor.get_alternatives(key) == []
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+一括アップロードのテスト
+ZIPの展開・上限チェックと、完了順での結果返却を確認する
+"""
+
+import io
+import os
+import sys
+import time
+import zipfile
+import threading
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from werkzeug.datastructures import FileStorage
+    import bulk_upload
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+def _zip_storage(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename='invoices.zip')
+
+
+class TestSaveBulkFiles:
+    """save_bulk_filesのテストクラス"""
+
+    def test_zip_and_pdf_are_saved(self, tmp_path):
+        """ZIP内のPDFと単体のPDFを保存し、PDF以外は無視する"""
+        files = [
+            _zip_storage({'2025/a.pdf': b'%PDF-a', '2025/b.pdf': b'%PDF-b', 'readme.txt': b'x'}),
+            FileStorage(stream=io.BytesIO(b'%PDF-c'), filename='c.pdf'),
+        ]
+        saved = bulk_upload.save_bulk_files(files, str(tmp_path))
+
+        assert [name for name, _ in saved] == ['a.pdf', 'b.pdf', 'c.pdf']
+        assert open(saved[0][1], 'rb').read() == b'%PDF-a'
+
+    def test_duplicate_names_are_renamed(self, tmp_path):
+        """同名のファイルは上書きせず別名で保存する"""
+        files = [_zip_storage({'x/a.pdf': b'1', 'y/a.pdf': b'2'})]
+        saved = bulk_upload.save_bulk_files(files, str(tmp_path))
+
+        assert len({path for _, path in saved}) == 2
+
+    def test_limits(self, tmp_path):
+        """ファイル数・合計サイズの上限を超えるとBulkUploadError"""
+        with pytest.raises(bulk_upload.BulkUploadError):
+            bulk_upload.save_bulk_files([_zip_storage({'a.pdf': b'1', 'b.pdf': b'2'})], str(tmp_path), max_files=1)
+        with pytest.raises(bulk_upload.BulkUploadError):
+            bulk_upload.save_bulk_files([_zip_storage({'a.pdf': b'0' * 100})], str(tmp_path), max_total_bytes=10)
+
+
+class TestIterCompleted:
+    """iter_completedのテストクラス"""
+
+    def test_results_stream_in_completion_order(self):
+        """先に終わったファイルから結果を返し、例外は失敗結果にする"""
+        items = [('slow.pdf', '/tmp/slow.pdf'), ('fast.pdf', '/tmp/fast.pdf'), ('bad.pdf', '/tmp/bad.pdf')]
+
+        def process(filepath, filename):
+            if filename == 'bad.pdf':
+                raise RuntimeError("壊れたPDF")
+            time.sleep(0.2 if filename == 'slow.pdf' else 0)
+            return {'filename': filename, 'success': True}
+
+        results = list(bulk_upload.iter_completed(items, process, max_workers=3))
+
+        assert results[-1]['filename'] == 'slow.pdf'
+        assert sorted(r['index'] for r in results) == [0, 1, 2]
+        bad = next(r for r in results if r['filename'] == 'bad.pdf')
+        assert bad['success'] is False and bad['error'] == "壊れたPDF"
+
+    def test_submits_in_bounded_window(self):
+        """同時に投入するファイルはmax_workersの2倍まで"""
+        items = [(f'{n}.pdf', f'/tmp/{n}.pdf') for n in range(20)]
+        started = []
+        lock = threading.Lock()
+
+        def process(filepath, filename):
+            with lock:
+                started.append(filename)
+            return {'filename': filename, 'success': True}
+
+        completed = bulk_upload.iter_completed(items, process, max_workers=2)
+        next(completed)
+        time.sleep(0.1)
+        assert len(started) <= 2 * 2 + 1
+        assert len(list(completed)) == 19
+        assert len(started) == 20
+
+    def test_close_cancels_remaining_files(self):
+        """途中でcloseした場合は未着手のファイルを処理しない"""
+        items = [(f'{n}.pdf', f'/tmp/{n}.pdf') for n in range(50)]
+        started = []
+
+        def process(filepath, filename):
+            started.append(filename)
+            time.sleep(0.01)
+            return {'filename': filename, 'success': True}
+
+        completed = bulk_upload.iter_completed(items, process, max_workers=2)
+        next(completed)
+        completed.close()
+        count = len(started)
+        time.sleep(0.05)
+        assert len(started) == count
+        assert count <= 2 * 2 + 1
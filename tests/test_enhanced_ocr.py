@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+拡張OCRのテスト
+画像化から前処理・OCRまで一時ファイルを作らずにメモリ上で処理することを確認する
+"""
+
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+    from PIL import Image
+    import enhanced_ocr
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+def _page_image():
+    array = np.full((400, 300, 3), 255, dtype=np.uint8)
+    array[180:220, 40:260] = 0
+    return Image.fromarray(array)
+
+
+class TestInMemoryPipeline:
+    """メモリ上の画像パイプラインのテストクラス"""
+
+    def test_preprocess_returns_binary_array(self):
+        """前処理結果は二値化されたNumPy配列"""
+        binary = enhanced_ocr.preprocess_image(_page_image())
+        assert isinstance(binary, np.ndarray)
+        assert binary.shape == (400, 300)
+        assert set(np.unique(binary)) <= {0, 255}
+
+    def test_hybrid_does_not_touch_disk(self):
+        """PDFのページ画像を一時ファイルに書き出さず、1回のOCRで全体・領域のテキストを作る"""
+        ocr_inputs = []
+
+        def fake_ocr_data(image, lang=None, output_type=None):
+            ocr_inputs.append(image)
+            return _ocr_data([("請求書", 100, 20, 1, 1, 1), ("合計", 20, 360, 2, 1, 1), ("10,000円", 200, 360, 2, 1, 1)])
+
+        with patch.object(enhanced_ocr, 'iter_page_images', return_value=iter([(1, _page_image())])), \
+                patch.object(enhanced_ocr, 'check_tesseract_available', return_value=True), \
+                patch.object(enhanced_ocr.ocr_pool, 'image_to_data', side_effect=fake_ocr_data), \
+                patch.object(tempfile, 'NamedTemporaryFile', side_effect=AssertionError("一時ファイルを作成した")), \
+                patch.object(tempfile, 'mkdtemp', side_effect=AssertionError("一時ディレクトリを作成した")):
+            result = enhanced_ocr.extract_text_hybrid('invoice.pdf')
+
+        assert [method for method, _ in result["all_texts"]] == ["layout_full"]
+        assert sorted(result["region_texts"]) == sorted(["top", "middle", "bottom", "left", "right", "center"])
+        # 1ページにつきOCRは1回だけ、入力はメモリ上の配列
+        assert len(ocr_inputs) == 1
+        assert isinstance(ocr_inputs[0], np.ndarray)
+
+
+def _ocr_data(words):
+    """image_to_data(output_type=DICT)と同じ形の辞書を作る"""
+    data = {key: [] for key in ("text", "left", "top", "width", "height", "block_num", "par_num", "line_num")}
+    for text, left, top, block, par, line in words:
+        data["text"].append(text)
+        data["left"].append(left)
+        data["top"].append(top)
+        data["width"].append(40)
+        data["height"].append(20)
+        data["block_num"].append(block)
+        data["par_num"].append(par)
+        data["line_num"].append(line)
+    return data
+
+
+class TestLayoutAnalysis:
+    """extract_text_with_layout_analysisのテストクラス"""
+
+    def test_words_are_bucketed_into_regions(self):
+        """単語の位置で領域に振り分け、全体のテキストは段落ごとに空行で区切る"""
+        data = _ocr_data([("請求書", 100, 20, 1, 1, 1), ("", 0, 0, 1, 1, 1),
+                          ("合計", 20, 360, 2, 1, 1), ("10,000円", 200, 360, 2, 1, 1)])
+        with patch.object(enhanced_ocr.ocr_pool, 'image_to_data', return_value=data) as ocr:
+            result = enhanced_ocr.extract_text_with_layout_analysis(_page_image())
+
+        assert ocr.call_count == 1
+        assert result["full_text"] == "請求書\n\n合計 10,000円\n"
+        assert result["regions"]["top"] == "請求書\n"
+        assert result["regions"]["bottom"] == "合計 10,000円\n"
+        assert result["regions"]["left"] == "請求書\n\n合計\n"
+        assert result["regions"]["right"] == "10,000円\n"
+        assert result["regions"]["center"] == ""
+
+
+class TestEngineFanOut:
+    """OCR手法の並列実行のテストクラス"""
+
+    def _run(self, engines, config):
+        all_texts, region_texts, confidences = [], {}, []
+        with patch.object(enhanced_ocr, '_enabled_engines', return_value=engines):
+            enhanced_ocr._extract_page_texts(_page_image(), config, all_texts, region_texts, confidences)
+        return all_texts, confidences
+
+    def test_confident_result_cancels_paid_engines(self):
+        """ローカルOCRの信頼度がしきい値以上なら、待機中の有料OCRは呼び出さない"""
+        paid_calls = []
+
+        def local():
+            return {"texts": [("layout_full", "請求書")], "confidence": 0.95, "regions": {}}
+
+        def paid():
+            paid_calls.append(1)
+            return {"texts": [("google_vision", "請求書")], "confidence": 0.99}
+
+        all_texts, confidences = self._run([("layout", local, False), ("google_vision", paid, True)],
+                                           {'ocr_confidence_threshold': 0.9, 'ocr_cloud_delay': 5})
+
+        assert all_texts == [("layout_full", "請求書")]
+        assert confidences == [0.95]
+        assert paid_calls == []
+
+    def test_paid_engines_wait_for_local_result(self):
+        """既定では有料OCRはローカルOCRの結果が出るまで開始しない"""
+        events = []
+
+        def local():
+            time.sleep(0.3)
+            events.append("local")
+            return {"texts": [("layout_full", "請求書")], "confidence": 0.5, "regions": {}}
+
+        def paid():
+            events.append("paid")
+            return {"texts": [("google_vision", "請求書")], "confidence": 0.99}
+
+        all_texts, _ = self._run([("layout", local, False), ("google_vision", paid, True)], {})
+
+        assert events == ["local", "paid"]
+        assert [method for method, _ in all_texts] == ["layout_full", "google_vision"]
+
+    def test_slow_engine_is_dropped_at_deadline(self):
+        """ページの制限時間を過ぎた手法の結果は待たない"""
+        def local():
+            return {"texts": [("layout_full", "請求書")], "confidence": 0.5, "regions": {}}
+
+        def slow():
+            time.sleep(2)
+            return {"texts": [("aws_textract", "遅い結果")], "confidence": 0.99}
+
+        start = time.time()
+        all_texts, _ = self._run([("layout", local, False), ("aws_textract", slow, True)],
+                                 {'ocr_page_deadline': 0.3, 'ocr_cloud_delay': 0})
+
+        assert time.time() - start < 1.5
+        assert all_texts == [("layout_full", "請求書")]
+
+    def test_next_page_waits_for_abandoned_engine(self):
+        """打ち切った手法が実行中の場合は、次のページの開始前にその完了を待つ（OCRを積み重ねない）"""
+        finished = []
+
+        def local():
+            return {"texts": [("layout_full", "請求書")], "confidence": 0.5, "regions": {}}
+
+        def slow():
+            time.sleep(0.6)
+            finished.append(time.time())
+            return {"texts": [("aws_textract", "遅い結果")], "confidence": 0.99}
+
+        config = {'ocr_page_deadline': 0.2, 'ocr_cloud_delay': 0}
+        engines = [("layout", local, False), ("aws_textract", slow, True)]
+        abandoned = set()
+        with patch.object(enhanced_ocr, '_enabled_engines', return_value=engines):
+            enhanced_ocr._extract_page_texts(_page_image(), config, [], {}, [], abandoned=abandoned)
+            assert len(abandoned) == 1 and not finished
+            timings = {}
+            enhanced_ocr._extract_page_texts(_page_image(), config, [], {}, [], timings, abandoned)
+
+        assert len(finished) >= 1
+        assert timings["abandoned_wait"] > 0
+
+    def test_best_text_is_selected_by_confidence(self):
+        """信頼度がある場合はテキストの長さより信頼度を優先する"""
+        texts = [("tesseract", "請求書 合計 10,000円 （読み取り誤り多数）"), ("aws_textract", "請求書 合計 10,000円")]
+        assert enhanced_ocr.select_best_text(texts, [0.4, 0.92]) == "請求書 合計 10,000円"
+        assert enhanced_ocr.select_best_text(texts) == texts[0][1]
+
+
+class TestPreprocessProfiles:
+    """前処理プロファイルのテストクラス"""
+
+    def test_noise_estimate_separates_clean_and_scanned(self):
+        """電子的に作成したページはノイズがほぼ0、ざらつきのあるスキャン画像は大きい値になる"""
+        clean = np.asarray(_page_image().convert('L'))
+        rng = np.random.default_rng(0)
+        noisy = np.clip(clean.astype(np.int16) + rng.normal(0, 20, clean.shape), 0, 255).astype(np.uint8)
+
+        assert enhanced_ocr.estimate_noise(clean) < enhanced_ocr.DEFAULT_NOISE_FAST_THRESHOLD
+        assert enhanced_ocr.estimate_noise(noisy) >= enhanced_ocr.DEFAULT_NOISE_FULL_THRESHOLD
+        assert enhanced_ocr.select_preprocess_profile(enhanced_ocr.estimate_noise(noisy)) == "full"
+
+    def test_auto_skips_denoise_for_clean_page(self):
+        """autoではきれいなページにノイズ除去を行わず、各処理の時間を記録する"""
+        timings = {}
+        with patch.object(enhanced_ocr.cv2, 'fastNlMeansDenoising',
+                          side_effect=AssertionError("ノイズ除去を実行した")):
+            result = enhanced_ocr.preprocess_image(_page_image(), "auto", timings)
+
+        assert result.shape == (400, 300)
+        assert timings["profile"] == "none"
+        assert "denoise" not in timings and {"to_gray", "noise_estimate"} <= set(timings)
+
+    def test_fast_profile_binarizes_without_denoise(self):
+        """fastはメディアンフィルタと適応的二値化だけを行う"""
+        timings = {}
+        binary = enhanced_ocr.preprocess_image(_page_image(), "fast", timings)
+
+        assert set(np.unique(binary)) <= {0, 255}
+        assert "denoise" not in timings and {"median_blur", "threshold"} <= set(timings)
+
+    def test_page_timings_are_reported(self):
+        """extract_text_hybridの結果にページごとの処理時間の内訳が入る"""
+        with patch.object(enhanced_ocr, 'iter_page_images', return_value=iter([(1, _page_image())])), \
+                patch.object(enhanced_ocr, 'check_tesseract_available', return_value=False), \
+                patch.object(enhanced_ocr.ocr_pool, 'image_to_data', return_value=_ocr_data([])):
+            result = enhanced_ocr.extract_text_hybrid('invoice.pdf', {'ocr_preprocess_profile': 'full'})
+
+        timings = result["page_timings"][0]
+        assert timings["page"] == 1 and timings["profile"] == "full"
+        assert {"preprocess.denoise", "preprocess.threshold", "ocr.layout", "total"} <= set(timings)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抽出結果キャッシュのテスト
+内容ハッシュによるキー、永続化、サイズ上限・TTLによる削除を確認する
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import extraction_cache
+    from extraction_cache import ExtractionCache
+    from page_stream import PageText
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+class TestExtractionCache:
+    """ExtractionCacheのテストクラス"""
+
+    def test_key_depends_on_content_not_filename(self, tmp_path):
+        """同じファイル名でも内容が違えば別のキーになる"""
+        first = tmp_path / "a" / "invoice.pdf"
+        second = tmp_path / "b" / "invoice.pdf"
+        first.parent.mkdir()
+        second.parent.mkdir()
+        first.write_bytes(b"%PDF-1.4 customer A")
+        second.write_bytes(b"%PDF-1.4 customer B")
+
+        key_a = extraction_cache.make_key(extraction_cache.file_digest(str(first)))
+        key_b = extraction_cache.make_key(extraction_cache.file_digest(str(second)))
+        assert key_a != key_b
+        assert key_a.endswith(f":v{extraction_cache.EXTRACTOR_VERSION}")
+
+    def test_key_depends_on_tenant_ocr_config(self):
+        """テナントごとにOCR設定が違えば、同じPDFでも別のキーになる"""
+        config = {'ocr_dpi': 200, 'ocr_cache_path': '', 'paypal_mode': 'sandbox',
+                  'ocr_tenant_policies': {'acme': {'ocr_dpi': 300}}}
+        default_hash = extraction_cache.config_digest(config)
+        acme_hash = extraction_cache.config_digest(dict(config, ocr_dpi=300))
+
+        assert extraction_cache.make_key("d", config_hash=default_hash) != extraction_cache.make_key("d", config_hash=acme_hash)
+        # 順序やOCRに関係しない設定の違いではキーは変わらない
+        reordered = dict(reversed(list(config.items())), paypal_mode='live', ocr_cache_path='/tmp/ocr.db')
+        assert extraction_cache.config_digest(reordered) == default_hash
+
+    def test_persists_across_instances(self, tmp_path):
+        """別インスタンス（別ワーカー）からも同じ結果を読める"""
+        path = str(tmp_path / "cache.db")
+        pages = [(PageText(1, 1, "ご請求金額 10,000円", "pdfplumber"), {'customer_name': '山田様', 'amount': '10000'})]
+        ExtractionCache(path).set("k", extraction_cache.pages_to_records(pages))
+
+        restored = list(extraction_cache.records_to_pages(ExtractionCache(path).get("k")))
+        assert restored == pages
+
+    def test_ttl_expiry(self, tmp_path):
+        """TTLを過ぎたエントリは返さない"""
+        cache = ExtractionCache(str(tmp_path / "cache.db"), ttl_seconds=0.05)
+        cache.set("k", {"v": 1})
+        assert cache.get("k") == {"v": 1}
+        time.sleep(0.1)
+        assert cache.get("k") is None
+
+    def test_max_entries_evicts_least_recently_used(self, tmp_path):
+        """上限を超えると最終アクセスが古いものから削除される"""
+        cache = ExtractionCache(str(tmp_path / "cache.db"), max_entries=2)
+        cache.set("a", 1)
+        time.sleep(0.01)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()['entries'] == 2
+
+    def test_max_bytes(self, tmp_path):
+        """合計サイズの上限を超えないように削除される"""
+        cache = ExtractionCache(str(tmp_path / "cache.db"), max_bytes=100)
+        cache.set("a", "x" * 40)
+        time.sleep(0.01)
+        cache.set("b", "y" * 40)
+        time.sleep(0.01)
+        cache.set("c", "z" * 40)
+        assert cache.stats()['bytes'] <= 100
+        assert cache.get("a") is None
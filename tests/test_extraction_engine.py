@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抽出エンジンのテスト
+ルールの登録と選択、候補の順位と出どころ（ルール・テキストの種類・位置）、
+best_candidateでの打ち切り、1ページ1回のトークン化を確認する
+"""
+
+import os
+import sys
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import extraction_engine
+    from extraction_engine import (
+        AMOUNT, CUSTOMER, DECIMAL_RUN, INVOICE_LINES, KEYWORD_CONTEXT, RAW,
+        as_stream, best_candidate, extract, get_rules, register_rule,
+    )
+    from text_normalizer import as_document
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+INVOICE = "\n".join([
+    "山田 太郎 様",
+    "TEL：03-1234-5678",
+    "小計 ¥100,000",
+    "ご請求金額 ￥110,000円",
+])
+
+
+@pytest.fixture
+def custom_rule():
+    """テスト用のルールを登録し、テスト後に削除する"""
+    calls = []
+
+    @register_rule("test_custom", AMOUNT, priority=5)
+    def _custom(stream, options):
+        calls.append(stream)
+        text = stream.text(RAW)
+        for start, end in stream.runs(RAW, DECIMAL_RUN)[:1]:
+            yield extraction_engine.Candidate(AMOUNT, 1, 1.0, "test_custom", RAW, start, end, text[start:end], "")
+
+    yield calls
+    extraction_engine._rules.pop("test_custom", None)
+
+
+class TestRules:
+    """ルールの登録・選択のテストクラス"""
+
+    def test_builtin_rules_in_priority_order(self):
+        """組み込みのルールは優先度順に並ぶ"""
+        names = [rule.name for rule in get_rules(AMOUNT)]
+        assert names[:2] == [INVOICE_LINES, KEYWORD_CONTEXT]
+        assert all(rule.field == CUSTOMER for rule in get_rules(CUSTOMER))
+
+    def test_unknown_rule_raises(self):
+        """未登録のルール名を指定した場合はKeyError"""
+        with pytest.raises(KeyError):
+            extract(INVOICE, rules=("no_such_rule",))
+
+    def test_custom_rule_is_used(self, custom_rule):
+        """登録したルールは優先度に従って実行される"""
+        assert best_candidate(INVOICE, AMOUNT).rule == "test_custom"
+        assert best_candidate(INVOICE, AMOUNT, rules=(INVOICE_LINES,)).rule == INVOICE_LINES
+
+
+class TestExtract:
+    """extract・best_candidateのテストクラス"""
+
+    def test_candidates_carry_provenance(self):
+        """候補にはルール名・テキストの種類・テキスト上の位置が付く"""
+        report = extract(INVOICE)
+        best = report.best(AMOUNT)
+        assert (best.value, best.rule, best.source) == (110000, INVOICE_LINES, RAW)
+        assert INVOICE[best.start:best.end] == "ご請求金額 ￥110,000円"
+
+        keyword = report.best(AMOUNT, rule=KEYWORD_CONTEXT)
+        assert keyword.value == 110000
+        assert keyword.text == "110,000"
+
+    def test_ranked_within_rule(self):
+        """ルール内の候補は評価値の高い順に並ぶ"""
+        scores = [candidate.score for candidate in extract(INVOICE).ranked(AMOUNT, rule=KEYWORD_CONTEXT)]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_customer_rule(self):
+        """顧客名のルールは項目CUSTOMERの候補を返す"""
+        best = extract("氏名：山田 太郎\n" + INVOICE, field=CUSTOMER).best(CUSTOMER)
+        assert (best.value, best.start, best.end) == ("山田 太郎", 3, 8)
+
+    def test_best_candidate_stops_at_first_rule(self, custom_rule):
+        """best_candidateは候補を出したルールで打ち切り、後のルールは実行しない"""
+        calls = []
+        original = extraction_engine._rules[INVOICE_LINES]
+        extraction_engine._rules[INVOICE_LINES] = original._replace(
+            func=lambda stream, options: calls.append(stream) or original.func(stream, options))
+        try:
+            best_candidate(INVOICE, AMOUNT)
+        finally:
+            extraction_engine._rules[INVOICE_LINES] = original
+        assert len(custom_rule) == 1
+        assert calls == []
+
+    def test_no_candidates(self):
+        """数値がないテキストでは候補なし"""
+        assert best_candidate("請求書", AMOUNT) is None
+        assert extract("").ranked(AMOUNT) == []
+
+
+class TestTokenStream:
+    """TokenStreamのテストクラス"""
+
+    def test_stream_shared_per_document(self):
+        """同じNormalizedDocumentから作ったTokenStreamは走査結果を共有する"""
+        document = as_document(INVOICE)
+        assert as_stream(document).line_tokens() is as_stream(document).line_tokens()
+        assert as_stream(document).runs(RAW, DECIMAL_RUN) is as_stream(document).runs(RAW, DECIMAL_RUN)
+
+    def test_runs_scanned_once(self, monkeypatch):
+        """全ルールを実行しても、テキストと区切り方の組ごとの走査は1回だけ"""
+        calls = []
+        original = extraction_engine.DECIMAL_RUN
+        monkeypatch.setattr(extraction_engine, "DECIMAL_RUN", type("Spy", (), {
+            "pattern": original.pattern,
+            "finditer": staticmethod(lambda text: calls.append(text) or original.finditer(text)),
+        }))
+        extract(as_document(INVOICE))
+        # 文字化けのないテキストでは元のテキストと読める行が同じため、RAWとSOURCEで共有する
+        assert len(calls) == len(set(calls)) == 2
+
+    def test_runs(self):
+        """区切り方ごとの範囲"""
+        stream = as_stream("¥1,000.5円と￥200")
+        text = stream.text(RAW)
+        assert [text[s:e] for s, e in stream.runs(RAW, DECIMAL_RUN)] == ["1,000.5", "200"]
+        assert stream.runs(RAW, DECIMAL_RUN) is stream.runs(RAW, DECIMAL_RUN)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+非同期ジョブ管理のテスト
+ジョブの登録・状態遷移・ページごとの結果の記録とストリーミングを確認する
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import job_queue
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return job_queue.JobStore(path=str(tmp_path / 'jobs.db'))
+
+
+def run_jobs(store, handlers, **kwargs):
+    """処理待ちのジョブがなくなるまでワーカーを動かす"""
+    worker = job_queue.JobWorker(store, max_workers=1, poll_interval=0.01, handlers=handlers, **kwargs).start()
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        rows = store._connect().execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)",
+                                        (job_queue.STATUS_QUEUED, job_queue.STATUS_RUNNING)).fetchone()
+        if rows[0] == 0:
+            break
+        time.sleep(0.01)
+    worker.stop()
+
+
+class TestJobWorker:
+    """JobWorkerのテストクラス"""
+
+    def test_job_results_are_recorded_in_order(self, store):
+        """ページごとの結果が順に記録され、完了時に履歴ファイル名が残る"""
+        def work(job_id, pages):
+            store.set_total_pages(job_id, pages)
+            for n in range(1, pages + 1):
+                store.append_result(job_id, {'page': n, 'success': True})
+            return 'payment_links_20250101_000000.json'
+
+        job_id = store.create('bundle.pdf', kind='pages', payload={'pages': 3})
+        run_jobs(store, {'pages': work})
+
+        job = store.get(job_id)
+        assert job['status'] == job_queue.STATUS_COMPLETED
+        assert job['total_pages'] == 3
+        assert [r['page'] for r in job['results']] == [1, 2, 3]
+        assert job['history_file'] == 'payment_links_20250101_000000.json'
+        assert [r['page'] for r in store.get(job_id, since=2)['results']] == [3]
+
+    def test_exception_marks_job_failed(self, store):
+        """処理中の例外はジョブの失敗として記録される"""
+        def work(job_id):
+            raise ValueError("抽出失敗")
+
+        job_id = store.create('broken.pdf', kind='broken')
+        run_jobs(store, {'broken': work})
+
+        job = store.get(job_id)
+        assert job['status'] == job_queue.STATUS_FAILED
+        assert job['error'] == "抽出失敗"
+
+    def test_unknown_job(self, store):
+        """存在しないジョブはNone"""
+        assert store.get('missing') is None
+        assert store.get_owner('missing') is None
+
+    def test_owner_is_recorded(self, store, monkeypatch):
+        """ジョブを登録した利用者とテナントを記録する（状態の応答には含めない）"""
+        monkeypatch.setattr(job_queue, '_store', store)
+        job_id = job_queue.enqueue('noop', 'a.pdf', {}, owner='user:1', tenant_id='t1')
+        assert store.get_owner(job_id) == {'owner': 'user:1', 'tenant_id': 't1'}
+        assert 'owner' not in store.get(job_id)
+        assert store.get(job_id)['status'] == job_queue.STATUS_QUEUED
+
+    def test_claim_takes_each_job_once(self, store):
+        """処理待ちのジョブは古い順に1回だけ取り出され、処理できない種類のジョブは残る"""
+        first = store.create('a.pdf', kind='process', payload={'filepath': '/tmp/a.pdf'})
+        second = store.create('b.pdf', kind='process')
+        other = store.create('c.pdf', kind='other')
+
+        claimed = store.claim('w1', ['process'])
+        assert claimed == {'job_id': first, 'kind': 'process', 'payload': {'filepath': '/tmp/a.pdf'},
+                           'attempts': 1}
+        assert store.claim('w2', ['process'])['job_id'] == second
+        assert store.claim('w1', ['process']) is None
+        assert store.get(first)['status'] == job_queue.STATUS_RUNNING
+        assert store.get(other)['status'] == job_queue.STATUS_QUEUED
+
+
+def make_stale(store, job_id):
+    conn = store._connect()
+    conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 120, job_id))
+    conn.commit()
+
+
+class TestStaleJobs:
+    """停止したプロセスに残されたジョブの回復のテストクラス"""
+
+    def test_stale_jobs_are_requeued_and_rerun(self, store):
+        """ハートビートの途絶えた処理中のジョブは、ワーカーの起動時に処理待ちに戻して実行し直す"""
+        job_id = store.create('orphan.pdf', kind='process')
+        store.claim('dead-worker', ['process'])
+        make_stale(store, job_id)
+
+        attempts = []
+        run_jobs(store, {'process': lambda job_id: attempts.append(job_id) or 'h.json'}, stale_seconds=60)
+
+        job = store.get(job_id)
+        assert attempts == [job_id]
+        assert job['status'] == job_queue.STATUS_COMPLETED
+        assert job['history_file'] == 'h.json'
+
+    def test_fails_after_max_attempts(self, store):
+        """実行回数が上限に達したジョブは失敗にする"""
+        job_id = store.create('crash.pdf', kind='process')
+        for _ in range(2):
+            store.claim('dead-worker', ['process'])
+            make_stale(store, job_id)
+            store.requeue_stale(stale_seconds=60, max_attempts=2)
+
+        job = store.get(job_id)
+        assert job['status'] == job_queue.STATUS_FAILED
+        assert job['error'] == job_queue.ORPHANED_ERROR
+        assert job['finished_at'] is not None
+
+    def test_queued_jobs_wait_for_worker(self, store):
+        """処理待ちのジョブは、ワーカーが取り出すまで古くなっても失敗にしない"""
+        job_id = store.create('waiting.pdf', kind='process')
+        make_stale(store, job_id)
+        assert store.requeue_stale(stale_seconds=60) == 0
+        assert store.get(job_id)['status'] == job_queue.STATUS_QUEUED
+
+    def test_heartbeat_keeps_running_job_alive(self, store):
+        """処理中のジョブはハートビートが更新されるため処理待ちに戻らない"""
+        release = threading.Event()
+        calls = []
+
+        def work(job_id):
+            calls.append(job_id)
+            return release.wait(5) and 'h.json'
+
+        worker = job_queue.JobWorker(store, max_workers=1, heartbeat_interval=0.02, stale_seconds=0.1,
+                                     poll_interval=0.01, handlers={'slow': work}).start()
+        try:
+            job_id = store.create('slow.pdf', kind='slow')
+            time.sleep(0.3)
+            assert store.get(job_id)['status'] == job_queue.STATUS_RUNNING
+            release.set()
+        finally:
+            worker.stop()
+        assert store.get(job_id)['status'] == job_queue.STATUS_COMPLETED
+        assert len(calls) == 1
+
+    def test_adds_columns_to_old_store(self, tmp_path):
+        """以前のスキーマのストアには所有者・ハートビート・ジョブの種類の列を追加する"""
+        path = str(tmp_path / 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT,"
+                     " total_pages INTEGER, result_count INTEGER NOT NULL DEFAULT 0, error TEXT,"
+                     " history_file TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)")
+        conn.commit()
+        conn.close()
+        store = job_queue.JobStore(path=path)
+        job_id = store.create('a.pdf', owner='user:1', kind='process')
+        assert store.get_owner(job_id)['owner'] == 'user:1'
+        assert store.claim('w1', ['process'])['attempts'] == 1
+
+
+class TestIterJobEvents:
+    """iter_job_eventsのテストクラス"""
+
+    def test_streams_results_until_finished(self, store):
+        """結果を追加順に返し、ジョブの完了で終了する"""
+        job_id = store.create('bundle.pdf')
+        store.mark_running(job_id)
+        release = threading.Event()
+
+        def work():
+            for n in range(1, 3):
+                store.append_result(job_id, {'page': n})
+            release.wait(5)
+            store.finish(job_id, history_file='h.json')
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        events = []
+        for event in job_queue.iter_job_events(store, job_id, poll_interval=0.01, timeout=10):
+            events.append(event)
+            if event['event'] == 'result' and event['index'] == 1:
+                release.set()
+        thread.join()
+
+        results = [e['result']['page'] for e in events if e['event'] == 'result']
+        assert results == [1, 2]
+        assert events[-1]['event'] == 'status'
+        assert events[-1]['status'] == job_queue.STATUS_COMPLETED
+
+    def test_timeout_reports_resume_position(self, store):
+        """打ち切り時は続きを取得するためのsinceを返し、sinceから再開できる"""
+        job_id = store.create('bundle.pdf')
+        store.mark_running(job_id)
+        for n in range(1, 4):
+            store.append_result(job_id, {'page': n})
+
+        events = list(job_queue.iter_job_events(store, job_id, poll_interval=0.01, timeout=0.05))
+        assert events[-1] == {'event': 'continue', 'job_id': job_id, 'since': 3}
+
+        store.finish(job_id, history_file='h.json')
+        resumed = list(job_queue.iter_job_events(store, job_id, poll_interval=0.01, timeout=1, since=2))
+        assert [e['result']['page'] for e in resumed if e['event'] == 'result'] == [3]
+
+    def test_short_poll_returns_available_results(self, store):
+        """ショートポーリングでは取得できた結果を返した時点で打ち切る"""
+        job_id = store.create('bundle.pdf')
+        store.mark_running(job_id)
+        store.append_result(job_id, {'page': 1})
+
+        events = list(job_queue.iter_job_events(store, job_id, poll_interval=0.01, timeout=5, short_poll=True))
+        assert [e['event'] for e in events] == ['result', 'status', 'continue']
+        assert events[-1]['since'] == 1
+
+        # 新しい結果がない場合は、結果が追加されるまで（最大timeout秒）待つ
+        threading.Timer(0.05, store.append_result, (job_id, {'page': 2})).start()
+        started = time.time()
+        events = list(job_queue.iter_job_events(store, job_id, poll_interval=0.01, timeout=5, since=1,
+                                                short_poll=True))
+        assert time.time() - started < 2
+        assert [e['result']['page'] for e in events if e['event'] == 'result'] == [2]
+        assert events[-1] == {'event': 'continue', 'job_id': job_id, 'since': 2}
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+キーワード照合オートマトンのテスト
+1回の走査で、重なり合うものを含めて部分文字列の検索と同じ一致を返すことを確認する
+"""
+
+import os
+import sys
+import random
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import keyword_automaton
+    from keyword_automaton import KeywordAutomaton, extraction_automaton, get_automaton
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+def _naive(groups, text):
+    return sorted(
+        (group, keyword, start, start + len(keyword))
+        for group, keywords in groups.items()
+        for keyword in set(keywords)
+        for start in range(len(text))
+        if text.startswith(keyword, start)
+    )
+
+
+class TestKeywordAutomaton:
+    """KeywordAutomatonのテストクラス"""
+
+    def test_overlapping_matches(self):
+        """重なり合うキーワード・別グループの同じキーワードもすべて返す"""
+        automaton = KeywordAutomaton({'total': ['合計', '合計金額', '金額'], 'invalid': ['金額', '請求書']})
+        hits = automaton.match('合計金額と請求書')
+
+        assert hits['total'] == [('合計', 0, 2), ('合計金額', 0, 4), ('金額', 2, 4)]
+        assert hits['invalid'] == [('金額', 2, 4), ('請求書', 5, 8)]
+
+    def test_matches_naive_substring_search(self):
+        """ランダムなキーワード・テキストでも部分文字列の検索と同じ結果になる"""
+        rng = random.Random(0)
+        alphabet = "合計金額請求書"
+        for _ in range(300):
+            groups = {
+                f"g{n}": ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(5)]
+                for n in range(3)
+            }
+            text = "".join(rng.choice(alphabet + "様 ") for _ in range(rng.randint(0, 40)))
+            automaton = KeywordAutomaton(groups)
+
+            assert sorted(automaton.iter_matches(text)) == _naive(groups, text)
+            assert sorted((g, k, s, e) for g, hits in automaton.match(text).items() for k, s, e in hits) \
+                == _naive(groups, text)
+
+    def test_first_and_contains(self):
+        """groupを指定した場合はそのグループの一致だけを見る"""
+        automaton = KeywordAutomaton({'a': ['合計'], 'b': ['請求書']})
+
+        assert automaton.first('請求書の合計') == '請求書'
+        assert automaton.first('請求書の合計', group='a') == '合計'
+        assert not automaton.contains('御中', group='a')
+
+    def test_empty_keywords(self):
+        """キーワードがない場合は何にも一致しない"""
+        assert KeywordAutomaton({'a': []}).match('合計') == {}
+
+
+class TestGetAutomaton:
+    """get_automaton / extraction_automatonのテストクラス"""
+
+    def test_built_once_per_keyword_set(self):
+        """同じキーワードの組では構築済みのオートマトンを使い回す"""
+        first = get_automaton(['合計', '小計'])
+        assert get_automaton(('合計', '小計')) is first
+        assert get_automaton(['合計']) is not first
+
+    def test_extraction_groups(self):
+        """1回の照合で金額抽出・顧客名抽出の両方のグループの一致を返す"""
+        hits = extraction_automaton().match('ご請求金額合計 TEL')
+
+        assert keyword_automaton.AMOUNT_TARGET in hits
+        assert keyword_automaton.AMOUNT_EXCLUDE in hits
+        assert keyword_automaton.CUSTOMER_INVALID in hits
+        assert keyword_automaton.CUSTOMER_TOTAL_LINE in hits
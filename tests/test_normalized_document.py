@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NormalizedDocumentのテスト
+ページごとの正規化結果を顧客名・金額の抽出で共有し、正規化・可読性の判定が1回だけ行われることを確認する
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import text_normalizer
+    from text_normalizer import NormalizedDocument, as_document, extract_readable_content, normalize_text
+    import customer_extractor
+    import amount_extractor
+    import extractors
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+INVOICE = "請求書\n山田 太郎 様\n〒100-0005 東京都千代田区\nご請求金額 ￥１１０，０００円\n"
+
+
+class TestNormalizedDocument:
+    """NormalizedDocumentのテストクラス"""
+
+    def test_matches_module_functions(self):
+        """各値はnormalize_text / extract_readable_contentと同じ"""
+        document = NormalizedDocument(INVOICE)
+
+        assert document.normalized == normalize_text(INVOICE)
+        assert document.readable_content == extract_readable_content(INVOICE)
+        assert document.readable_ratio == extract_readable_content(INVOICE)["readable_ratio"]
+        assert document.numbers == extract_readable_content(INVOICE)["numbers"]
+        assert document.lines == INVOICE.split("\n")
+
+    def test_line_spans(self):
+        """line_spansは元のテキスト上の各行の範囲"""
+        document = NormalizedDocument(INVOICE)
+        assert [INVOICE[start:end] for start, end in document.line_spans] == document.lines
+
+    def test_garbled_text_uses_readable_lines(self):
+        """読める文字が50%未満の場合は読める行だけを使う"""
+        document = NormalizedDocument("山田 太郎 様\n" + "�\x01" * 40)
+
+        assert document.is_garbled
+        assert document.clean_text == "山田 太郎 様"
+        assert document.source_normalized == normalize_text("山田 太郎 様")
+
+    def test_as_document_reuses_instance(self):
+        """作成済みのNormalizedDocumentはそのまま使う"""
+        document = NormalizedDocument(INVOICE)
+        assert as_document(document) is document
+        assert as_document(None).raw == ""
+
+
+class TestSharedDocument:
+    """抽出処理間での共有のテストクラス"""
+
+    def test_normalization_runs_once_per_page(self):
+        """顧客名・金額の抽出に同じNormalizedDocumentを渡すと正規化は1回だけ行われる"""
+        document = NormalizedDocument(INVOICE)
+        normalizer = text_normalizer.normalizer
+        with patch.object(normalizer, 'normalize', wraps=normalizer.normalize) as normalize, \
+                patch.object(normalizer, 'extract_readable_text', wraps=normalizer.extract_readable_text) as readable:
+            customer_extractor.extract_customer(document, force_refresh=True)
+            amount, _ = amount_extractor.extract_invoice_amount(document)
+            extractors.extract_amount_only(document)
+            extractors.extract_customer(document)
+
+        assert amount == 110000
+        assert normalize.call_count == 1
+        assert readable.call_count == 1
+
+    def test_amount_extraction_does_not_normalize(self):
+        """金額抽出だけの場合は行分割だけを使い、正規化は行わない"""
+        normalizer = text_normalizer.normalizer
+        with patch.object(normalizer, 'normalize', wraps=normalizer.normalize) as normalize:
+            amount_extractor.extract_invoice_amount(INVOICE)
+
+        assert normalize.call_count == 0
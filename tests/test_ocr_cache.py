@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+OCR結果キャッシュのテスト
+同じページ画像ではOCRを実行しないこと、書式が同じでも内容が違うページは区別すること、LRUでの削除を確認する
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from PIL import Image, ImageDraw
+    import ocr_cache
+    import ocr_pool
+    from ocr_cache import OCRCache
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+def _page(amount="10,000", size=(600, 800)):
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 560, 120), fill='black')
+    draw.text((60, 400), f"ご請求金額 {amount}", fill='black')
+    return image
+
+
+class TestImageKey:
+    """image_keyのテストクラス"""
+
+    def test_same_image_has_same_key(self):
+        """同じ内容の画像（RGBとグレースケールの違いを含む）は同じキーになる"""
+        key = ocr_cache.image_key(_page(), 'tesserocr', 'jpn+eng', 'string')
+        assert ocr_cache.image_key(_page().convert('L'), 'tesserocr', 'jpn+eng', 'string') == key
+
+    def test_same_layout_different_amount_is_distinguished(self):
+        """書式が同じで金額だけ違うページは知覚ハッシュが近くても別のキーになる"""
+        first = ocr_cache.image_key(_page("10,000"), 'tesserocr', 'jpn+eng', 'string')
+        second = ocr_cache.image_key(_page("98,000"), 'tesserocr', 'jpn+eng', 'string')
+        assert first.split(':')[4] == second.split(':')[4]
+        assert first != second
+
+    def test_engine_mode_and_resolution_are_part_of_key(self):
+        """エンジン・出力形式・解像度（画素数）が違えば別のキーになる"""
+        key = ocr_cache.image_key(_page(), 'tesserocr', 'jpn+eng', 'string')
+        assert ocr_cache.image_key(_page(), 'pytesseract', 'jpn+eng', 'string') != key
+        assert ocr_cache.image_key(_page(), 'tesserocr', 'jpn+eng', 'data') != key
+        assert ocr_cache.image_key(_page(size=(300, 400)), 'tesserocr', 'jpn+eng', 'string') != key
+
+
+class TestOCRCache:
+    """OCRCacheのテストクラス"""
+
+    def test_hits_and_misses_are_counted(self, tmp_path):
+        """ヒット・ミスの回数をstatsで返す"""
+        cache = OCRCache(str(tmp_path / "ocr.db"))
+        assert cache.get("k") is None
+        cache.set("k", "請求書")
+        assert cache.get("k") == "請求書"
+
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+        assert stats['hit_rate'] == 0.5
+
+    def test_max_entries_evicts_least_recently_used(self, tmp_path):
+        """上限を超えると最終アクセスの古いものから削除する"""
+        cache = OCRCache(str(tmp_path / "ocr.db"), max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+
+class TestOCRPoolCache:
+    """ocr_poolからのキャッシュ利用のテストクラス"""
+
+    def test_repeated_page_skips_ocr(self, tmp_path):
+        """同じページ画像の2回目はOCRを実行せずキャッシュの結果を返す"""
+        cache = OCRCache(str(tmp_path / "ocr.db"))
+        calls = []
+
+        def fake_ocr(image, lang, mode, config):
+            calls.append(mode)
+            return "ご請求金額 10,000"
+
+        with patch.object(ocr_cache, 'get_ocr_cache', return_value=cache), \
+                patch.object(ocr_pool, '_run_ocr', side_effect=fake_ocr):
+            first = ocr_pool.image_to_string(_page(), config={})
+            second = ocr_pool.image_to_string(_page(), config={})
+            ocr_pool.image_to_string(_page("98,000"), config={})
+
+        assert first == second == "ご請求金額 10,000"
+        assert len(calls) == 2
+        assert cache.stats()['hits'] == 1
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+クラウドOCRクライアントのテスト
+ローカルの疑似Vision APIに対して、クライアントの使い回し・バッチリクエスト・同時送信数の制限を確認する
+"""
+
+import os
+import sys
+import json
+import base64
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import requests  # noqa: F401
+    import ocr_clients
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+class FakeVisionServer:
+    """images:annotateを受け付け、画像のバイト列をそのままテキストとして返す疑似Vision API"""
+
+    def __init__(self, delay=0.0):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = delay
+        self.connections = set()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                with server._lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    server.connections.add(self.client_address)
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                    server.requests.append((self.path, len(body['requests'])))
+                    time.sleep(server.delay)
+                    responses = [
+                        {'fullTextAnnotation': {'text': base64.b64decode(item['image']['content']).decode('utf-8')}}
+                        for item in body['requests']
+                    ]
+                    data = json.dumps({'responses': responses}).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def fake_vision():
+    server = FakeVisionServer()
+    yield server
+    server.close()
+    ocr_clients.clear_clients()
+
+
+class TestClientCache:
+    """クライアントの使い回しのテストクラス"""
+
+    def test_client_is_shared_per_credentials(self, fake_vision):
+        """同じ認証情報・エンドポイントでは同じクライアントを返す"""
+        first = ocr_clients.get_vision_client('key-a', fake_vision.endpoint)
+        assert ocr_clients.get_vision_client('key-a', fake_vision.endpoint) is first
+        assert ocr_clients.get_vision_client('key-b', fake_vision.endpoint) is not first
+
+    def test_cache_key_does_not_contain_credentials(self):
+        """認証情報はハッシュ化してキーにする"""
+        assert 'secret' not in ocr_clients._client_key('vision', 'secret', '')
+
+    def test_rest_client_requires_plain_api_key(self, fake_vision):
+        """REST APIにはサービスアカウントのJSONや認証情報ファイルのパスは使えない"""
+        for credentials in ('', '{"type": "service_account"}', '/etc/credentials.json'):
+            with pytest.raises(ValueError):
+                ocr_clients.get_vision_client(credentials, fake_vision.endpoint)
+
+    def test_clear_clients_rebuilds_executor_from_config(self, fake_vision):
+        """clear_clientsの後は、新しい設定のスレッド数でスレッドプールを作り直す"""
+        first = ocr_clients.get_executor({'ai_ocr_client_workers': 2})
+        assert ocr_clients.get_executor({'ai_ocr_client_workers': 6}) is first
+        assert first._max_workers == 2
+
+        ocr_clients.clear_clients()
+        assert ocr_clients.get_executor({'ai_ocr_client_workers': 6})._max_workers == 6
+
+
+class EchoClient:
+    """画像のバイト列をそのままテキストとして返し、閉じられたことを記録するクライアント"""
+
+    def __init__(self):
+        self.closed = False
+
+    def batch_annotate(self, contents):
+        assert not self.closed
+        return [content.decode('utf-8') for content in contents]
+
+    def close(self):
+        self.closed = True
+
+
+class TestClearClients:
+    """clear_clientsのテストクラス"""
+
+    def test_in_flight_call_keeps_client_and_executor(self):
+        """送信中にclear_clientsが呼ばれても、その呼び出しのクライアントとスレッドプールは終わるまで閉じない"""
+        client = ocr_clients._cached_client('echo', 'key', '', EchoClient)
+        pages = [f"page{n}".encode('utf-8') for n in range(4)]
+        texts = ocr_clients.annotate_in_batches(client, pages, batch_size=1, max_in_flight=1)
+        assert next(texts) == "page0"
+        executor = ocr_clients._executor
+
+        ocr_clients.clear_clients()
+        assert not client.closed
+        assert ocr_clients._cached_client('echo', 'key', '', EchoClient) is not client
+
+        assert list(texts) == ["page1", "page2", "page3"]
+        assert client.closed
+        assert executor._shutdown
+        ocr_clients.clear_clients()
+
+    def test_idle_client_is_closed_immediately(self):
+        """利用中でないクライアントはすぐに閉じる"""
+        client = ocr_clients._cached_client('echo', 'key', '', EchoClient)
+        ocr_clients.clear_clients()
+        assert client.closed
+
+
+class TestBatchAnnotate:
+    """annotate_in_batchesのテストクラス"""
+
+    def test_pages_are_sent_in_batches_in_order(self, fake_vision):
+        """複数ページを1リクエストにまとめ、結果は入力の順に返す"""
+        client = ocr_clients.get_vision_client('key', fake_vision.endpoint)
+        pages = [f"page{n}".encode('utf-8') for n in range(7)]
+
+        texts = list(ocr_clients.annotate_in_batches(client, pages, batch_size=3, max_in_flight=2))
+
+        assert texts == [f"page{n}" for n in range(7)]
+        assert sorted(size for _, size in fake_vision.requests) == [1, 3, 3]
+        assert all(path.startswith('/v1/images:annotate?key=key') for path, _ in fake_vision.requests)
+
+    def test_in_flight_batches_are_bounded(self):
+        """同時に送信するバッチはmax_in_flight件まで"""
+        server = FakeVisionServer(delay=0.1)
+        try:
+            client = ocr_clients.VisionRestClient('key', server.endpoint)
+            pages = [f"page{n}".encode('utf-8') for n in range(12)]
+            texts = list(ocr_clients.annotate_in_batches(client, pages, batch_size=2, max_in_flight=2))
+
+            assert len(texts) == 12
+            assert len(server.requests) == 6
+            assert server.max_in_flight == 2
+        finally:
+            server.close()
+
+    def test_connection_is_reused(self, fake_vision):
+        """同じクライアントからのリクエストはHTTP接続を使い回す"""
+        client = ocr_clients.get_vision_client('key', fake_vision.endpoint)
+        for n in range(3):
+            list(ocr_clients.annotate_in_batches(client, [b"page"], max_in_flight=1))
+
+        assert len(fake_vision.requests) == 3
+        assert len(fake_vision.connections) == 1
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+OCRワーカープールのテスト
+常駐ワーカーでの処理、異常終了したワーカーの再起動、メトリクスの記録を確認する
+（OCRエンジンはテスト用のものに差し替える）
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import ocr_pool
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+class EchoEngine:
+    """画像の代わりに文字列を受け取り、そのまま返すテスト用エンジン（ワーカープロセスで生成される）"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+
+    def run(self, image, lang, mode):
+        if image == 'crash':
+            os._exit(1)
+        if image == 'error':
+            raise ValueError("読み取り失敗")
+        if image == 'slow':
+            time.sleep(1)
+        if mode == ocr_pool.MODE_DATA:
+            return {'text': [image], 'pid': self.pid}
+        return f"{lang}:{image}:{self.pid}"
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool():
+    pool = ocr_pool.OCRPool(workers=2, task_timeout=10, health_interval=0.1, max_retries=1,
+                            engine_factory=EchoEngine)
+    yield pool
+    pool.shutdown()
+
+
+class TestOCRPool:
+    """OCRPoolのテストクラス"""
+
+    def test_workers_are_reused(self, pool):
+        """同じワーカープロセスが複数のページを処理する（呼び出しごとに起動しない）"""
+        results = [pool.image_to_string(f"page{n}") for n in range(6)]
+
+        assert [r.split(':')[1] for r in results] == [f"page{n}" for n in range(6)]
+        pids = {r.split(':')[2] for r in results}
+        assert pids <= {str(w['pid']) for w in pool.health()['workers']}
+        assert pool.image_to_data("x")['text'] == ["x"]
+
+    def test_engine_error_is_raised(self, pool):
+        """OCRエンジンの例外は呼び出し元にOCRPoolErrorとして返る"""
+        with pytest.raises(ocr_pool.OCRPoolError):
+            pool.image_to_string('error')
+        assert pool.metrics.snapshot()['failures'] == 1
+
+    def test_crashed_worker_is_restarted(self, pool):
+        """異常終了したワーカーは再起動され、処理中のページは再実行後に失敗となる"""
+        with pytest.raises(ocr_pool.OCRPoolError):
+            pool.submit('crash').result(timeout=30)
+
+        deadline = time.time() + 10
+        while time.time() < deadline and not all(w['alive'] for w in pool.health()['workers']):
+            time.sleep(0.1)
+
+        health = pool.health()
+        assert all(w['alive'] for w in health['workers'])
+        assert health['metrics']['restarts'] == 2  # 初回 + 再実行で2回
+        assert pool.image_to_string('after').split(':')[1] == 'after'
+
+    def test_metrics_separate_queue_wait_and_ocr_time(self, pool):
+        """キュー待ち時間とOCR時間を別々に記録する"""
+        for n in range(4):
+            pool.image_to_string(f"page{n}")
+        metrics = pool.metrics.snapshot()
+
+        assert metrics['tasks'] == 4
+        assert 'queue_wait_avg_ms' in metrics and 'ocr_time_avg_ms' in metrics
+
+    def test_wait_timeout_is_capped(self, pool):
+        """呼び出し元の待ち時間はwait_timeoutまで（再実行を含む最大時間より短くできる）"""
+        capped = ocr_pool.OCRPool(workers=1, task_timeout=120, max_retries=1, engine_factory=EchoEngine,
+                                  wait_timeout=60)
+        try:
+            assert capped.wait_timeout == 60
+        finally:
+            capped.shutdown()
+        assert pool.wait_timeout == 10 * (1 + 2)
+
+
+    def test_timed_out_page_is_not_run_twice(self, monkeypatch):
+        """待ちきれなかったページはキューから取り消し、このプロセスでもやり直さない"""
+        busy = ocr_pool.OCRPool(workers=1, task_timeout=10, health_interval=0.1, engine_factory=EchoEngine,
+                                wait_timeout=0.3)
+        monkeypatch.setattr(ocr_pool, 'get_ocr_pool', lambda config: busy)
+        monkeypatch.setattr(ocr_pool, '_local_engine', lambda: pytest.fail("このプロセスで実行された"))
+        try:
+            slow = busy.submit('slow')
+            with pytest.raises(ocr_pool.OCRPoolTimeout):
+                ocr_pool._run_ocr('queued', 'jpn', ocr_pool.MODE_STRING, {})
+            slow.result(timeout=10)
+            # 待ち時間を過ぎたページはワーカーが処理せずに捨てる
+            assert busy.image_to_string('next').split(':')[1] == 'next'
+            assert busy.metrics.snapshot()['tasks'] == 2
+            assert not busy._pending
+        finally:
+            busy.shutdown()
+
+
+class TestWorkerCount:
+    """ワーカー数のテストクラス"""
+
+    def test_default_is_split_across_web_workers(self, monkeypatch):
+        """省略時はCPUコア数をgunicornのワーカー数で割る"""
+        monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+        monkeypatch.setenv('WEB_CONCURRENCY', '4')
+        pool = ocr_pool.OCRPool(workers=0, engine_factory=EchoEngine)
+        try:
+            assert pool.workers == 2
+        finally:
+            pool.shutdown()
+
+
+class TestCurrentPool:
+    """current_ocr_poolのテストクラス"""
+
+    def test_does_not_start_pool(self, monkeypatch):
+        """未起動の場合はNoneを返し、プールを起動しない"""
+        monkeypatch.setattr(ocr_pool, '_pool', None)
+        assert ocr_pool.current_ocr_pool() is None
+        assert ocr_pool._pool is None
+
+
+class TestParseTsv:
+    """_parse_tsvのテストクラス"""
+
+    def test_tsv_is_converted_to_pytesseract_dict(self):
+        """tesseractのTSVをimage_to_data(DICT)と同じ形にする"""
+        tsv = "5\t1\t1\t1\t1\t1\t10\t20\t30\t40\t96.5\t請求書\n5\t1\t1\t1\t1\t2\t50\t20\t30\t40\t90\t合計"
+        data = ocr_pool._parse_tsv(tsv)
+
+        assert data['text'] == ["請求書", "合計"]
+        assert data['left'] == [10, 50]
+        assert data['conf'] == [96.5, 90.0]
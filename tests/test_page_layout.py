@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページレイアウトのテスト
+pdfplumberのTextMapからの単語の矩形と行番号、格子による領域の検索、
+金額抽出の「ページ下部」・顧客名抽出の「左上」の判定に使う行の位置を確認する
+"""
+
+import os
+import pickle
+import random
+import sys
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from page_layout import PageLayout, WordBox
+    from amount_extractor import extract_invoice_amount
+    from customer_extractor import extract_customer
+    from text_normalizer import NormalizedDocument
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+WIDTH = 595.0
+HEIGHT = 842.0
+
+
+class FakeTextMap:
+    """pdfplumberのTextMapと同じ形（(文字, 文字の情報)の列）のテスト用データ"""
+
+    def __init__(self, lines):
+        # lines: [[(単語, x0, top), ...], ...]（1文字の幅は10、高さは10）
+        self.tuples = []
+        for number, words in enumerate(lines):
+            if number:
+                self.tuples.append(("\n", None))
+            for index, (word, x0, top) in enumerate(words):
+                if index:
+                    self.tuples.append((" ", None))
+                for offset, letter in enumerate(word):
+                    char = {"x0": x0 + offset * 10, "x1": x0 + offset * 10 + 10, "top": top, "bottom": top + 10}
+                    self.tuples.append((letter, char))
+        self.as_string = "".join(letter for letter, _ in self.tuples)
+
+
+INVOICE_LINES = [
+    [("山田太郎", 50, 60), ("請求書", 400, 60)],
+    [("品名", 50, 200), ("金額", 400, 200)],
+    [("作業費", 50, 220), ("9,800", 400, 220)],
+    [("ありがとうございました", 50, 500)],
+    [("振込額", 300, 760), ("¥9,800", 400, 760)],
+    [("以上", 50, 800)],
+]
+
+
+def _layout(lines=INVOICE_LINES):
+    textmap = FakeTextMap(lines)
+    return textmap.as_string, PageLayout.from_textmap(textmap, WIDTH, HEIGHT)
+
+
+class TestPageLayout:
+    """PageLayoutのテストクラス"""
+
+    def test_words_and_lines_from_textmap(self):
+        """単語の矩形とテキストの行番号"""
+        text, layout = _layout()
+        assert layout.line_count == len(text.split("\n"))
+        assert layout.words[1] == WordBox("請求書", 400.0, 60.0, 430.0, 70.0, 0)
+        assert [word.text for word in layout.words if word.line == 4] == ["振込額", "¥9,800"]
+
+    def test_words_in_matches_linear_scan(self):
+        """格子を使った検索は全単語を調べた場合と同じ結果"""
+        rng = random.Random(0)
+        lines = [[(f"w{i}_{j}", rng.uniform(0, WIDTH), i * 14.0) for j in range(5)] for i in range(60)]
+        _, layout = _layout(lines)
+        for _ in range(200):
+            x0, x1 = sorted(rng.uniform(-50, WIDTH + 50) for _ in range(2))
+            top, bottom = sorted(rng.uniform(-50, HEIGHT + 50) for _ in range(2))
+            expected = [word for word in layout.words
+                        if x0 <= (word.x0 + word.x1) / 2 < x1 and top <= (word.top + word.bottom) / 2 < bottom]
+            assert layout.words_in(x0, top, x1, bottom) == expected
+
+    def test_region_lines(self):
+        """領域内の単語を行ごとにまとめる"""
+        _, layout = _layout()
+        assert layout.region_lines("top_left") == ["山田太郎", "品名", "作業費"]
+        assert layout.region_lines("bottom_right") == ["振込額 ¥9,800"]
+
+    def test_line_positions(self):
+        """各行のページ上の縦位置（テキストと対応しない場合はNone）"""
+        text, layout = _layout()
+        positions = layout.line_positions(text.split("\n"))
+        assert positions[0] == pytest.approx(65 / HEIGHT)
+        assert positions[4] == pytest.approx(765 / HEIGHT)
+        assert layout.line_positions(text.split("\n")[:-1]) is None
+        assert layout.line_positions(["x"] * layout.line_count) is None
+
+    def test_from_words(self):
+        """extract_wordsの結果からは縦位置の近い単語を1行にまとめる"""
+        layout = PageLayout.from_words([
+            {"text": "金額", "x0": 400, "x1": 420, "top": 101, "bottom": 111},
+            {"text": "品名", "x0": 50, "x1": 70, "top": 100, "bottom": 110},
+            {"text": "以上", "x0": 50, "x1": 70, "top": 300, "bottom": 310},
+        ], WIDTH, HEIGHT)
+        assert [(word.text, word.line) for word in layout.words] == [("品名", 0), ("金額", 0), ("以上", 1)]
+
+    def test_serialization(self):
+        """辞書・pickleで単語を保存し、索引は受け取った側で作り直す"""
+        _, layout = _layout()
+        layout.words_in_region("top_left")
+        restored = PageLayout.from_dict(layout.to_dict())
+        assert restored.words == layout.words
+        assert restored.region_lines("bottom_right") == layout.region_lines("bottom_right")
+        assert pickle.loads(pickle.dumps(layout))._grid is None
+
+
+class TestLayoutExtraction:
+    """単語の位置を使った抽出のテストクラス"""
+
+    def test_amount_bottom_uses_page_position(self):
+        """行の位置が分かる場合、ページ下部は行数ではなくページ上の位置で判定する"""
+        lines = [
+            [("請求書", 50, 50)],
+            [("明細", 50, 100)],
+            [("作業費", 50, 120)],
+            [("A", 50, 700), ("30,000", 400, 700)],
+            [("B", 50, 780), ("25,000", 400, 780)],
+        ]
+        text, layout = _layout(lines)
+        # 行数で判定すると最後の1行だけがページ下部になる
+        assert extract_invoice_amount(text) == (25000, "B 25,000")
+        # ページ上の位置では下から2行ともページ下部にある
+        assert extract_invoice_amount(NormalizedDocument(text, layout=layout)) == (30000, "A 30,000")
+
+    def test_amount_falls_back_to_line_count(self):
+        """テキストと単語の位置が対応しない場合は行数で判定する"""
+        text, layout = _layout()
+        document = NormalizedDocument(text + "\n追加 5,000", layout=layout)
+        assert extract_invoice_amount(document) == extract_invoice_amount(document.raw)
+
+    def test_customer_uses_top_left_region(self):
+        """顧客名はページ左上の行から探す（右上の発行元の名前は使わない）"""
+        lines = [
+            [("発行元商事", 400, 60)],
+            [("佐藤花子", 50, 100)],
+            [("明細", 50, 300)],
+            [("作業費", 50, 320), ("9,800", 400, 320)],
+        ]
+        text, layout = _layout(lines)
+        assert extract_customer(text, force_refresh=True) == "発行元商事"
+        assert extract_customer(NormalizedDocument(text, layout=layout), force_refresh=True) == "佐藤花子"
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページ並列処理のテスト
+結果がページ順で返ること、1リクエストあたりの同時実行数が制限されることを確認する
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import page_pool
+    from page_stream import PageText
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+class TestIterPages:
+    """page_pool.iter_pagesのテストクラス"""
+
+    def _run(self, page_count, config):
+        in_flight = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def fake_chunk(pdf_path, filename, page_numbers, raster=None, ocr_policy=None):
+            with lock:
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            # 後ろのチャンクほど早く終わるようにして順序の保証を確認する
+            time.sleep(0.01 * (page_count - page_numbers[0]) / page_count)
+            with lock:
+                in_flight['now'] -= 1
+            return [(PageText(n, page_count, f"page {n}", "pdfplumber"), {'amount': n}) for n in page_numbers]
+
+        executor = ThreadPoolExecutor(max_workers=8)
+        try:
+            with patch.object(page_pool, 'count_pages', return_value=page_count), \
+                    patch.object(page_pool, 'get_executor', return_value=executor), \
+                    patch.object(page_pool, '_process_page_chunk', side_effect=fake_chunk):
+                results = list(page_pool.iter_pages('dummy.pdf', 'bundle.pdf', config))
+        finally:
+            executor.shutdown()
+        return results, in_flight['max']
+
+    def test_results_keep_page_order(self):
+        """並列処理でも結果はページ順"""
+        results, _ = self._run(20, {'page_pool_chunk_size': 3, 'page_pool_max_in_flight': 4})
+        assert [page.page_number for page, _ in results] == list(range(1, 21))
+        assert [fields['amount'] for _, fields in results] == list(range(1, 21))
+
+    def test_in_flight_chunks_are_capped_per_request(self):
+        """1リクエストあたりの同時実行チャンク数が上限を超えない"""
+        _, max_in_flight = self._run(40, {'page_pool_chunk_size': 2, 'page_pool_max_in_flight': 2})
+        assert max_in_flight <= 2
+
+    def test_small_documents_are_processed_sequentially(self):
+        """ページ数が閾値未満の場合はプールを使わない"""
+        pages = [PageText(1, 2, "a", "pdfplumber"), PageText(2, 2, "b", "pdfplumber")]
+        with patch.object(page_pool, 'count_pages', return_value=2), \
+                patch.object(page_pool, 'get_executor') as get_executor, \
+                patch.object(page_pool, 'iter_pdf_pages', return_value=iter(pages)):
+            results = list(page_pool.iter_pages('dummy.pdf', 'small.pdf', {'page_pool_min_pages': 4}))
+
+        get_executor.assert_not_called()
+        assert [(page.page_number, fields) for page, fields in results] == [(1, None), (2, None)]
+
+    def test_page_filename(self):
+        """単一ページの場合は元のファイル名を使う"""
+        assert page_pool.page_filename('a.pdf', 1, 1) == 'a.pdf'
+        assert page_pool.page_filename('a.pdf', 2, 3) == 'a.pdf_page2'
+
+
+class TestWorkerCount:
+    """プロセスプールのワーカー数のテストクラス"""
+
+    def test_default_workers_are_split_across_web_workers(self, monkeypatch):
+        """省略時はCPUコア数をgunicornのワーカー数（WEB_CONCURRENCY）で割った数"""
+        monkeypatch.setattr(os, 'cpu_count', lambda: 16)
+        monkeypatch.setenv('WEB_CONCURRENCY', '4')
+        assert page_pool._resolve_workers({'page_pool_workers': 0}) == 4
+
+        monkeypatch.setenv('WEB_CONCURRENCY', '32')
+        assert page_pool._resolve_workers({}) == 1
+
+        monkeypatch.delenv('WEB_CONCURRENCY')
+        assert page_pool._resolve_workers({}) == 16
+
+    def test_configured_workers_are_used_as_is(self, monkeypatch):
+        """ワーカー数を設定した場合はそのまま使う"""
+        monkeypatch.setenv('WEB_CONCURRENCY', '4')
+        assert page_pool._resolve_workers({'page_pool_workers': 3}) == 3
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページ単位の画像化のテスト
+メモリ上限に応じたページ数ずつ描画し、返した画像を解放することを確認する
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import page_rasterizer
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+MB = 1024 * 1024
+
+
+def _fake_render(calls, page_bytes=MB):
+    def render(pdf_path, first_page, last_page, dpi, grayscale):
+        calls.append((first_page, last_page, dpi))
+        images = []
+        for _ in range(first_page, last_page + 1):
+            image = MagicMock()
+            image.size = (page_bytes // 3, 1)
+            image.mode = 'RGB'
+            images.append(image)
+        return images
+    return render
+
+
+class TestIterPageImages:
+    """iter_page_imagesのテストクラス"""
+
+    def test_window_is_bounded_by_memory_budget(self):
+        """最初のページで見積もったメモリ量から、上限に収まるページ数ずつ描画する"""
+        calls = []
+        with patch.object(page_rasterizer, 'count_pages', return_value=10), \
+                patch.object(page_rasterizer, '_render', side_effect=_fake_render(calls)):
+            pages = [number for number, _ in page_rasterizer.iter_page_images('a.pdf', dpi=150, memory_budget_mb=4)]
+
+        assert pages == list(range(1, 11))
+        assert calls == [(1, 1, 150), (2, 5, 150), (6, 9, 150), (10, 10, 150)]
+
+    def test_images_are_closed_after_use(self):
+        """次のページに進むと前の画像はcloseされる"""
+        calls = []
+        seen = []
+        with patch.object(page_rasterizer, 'count_pages', return_value=3), \
+                patch.object(page_rasterizer, '_render', side_effect=_fake_render(calls)):
+            for _, image in page_rasterizer.iter_page_images('a.pdf', memory_budget_mb=1):
+                image.close.assert_not_called()
+                seen.append(image)
+
+        assert all(image.close.called for image in seen)
+        assert len(calls) == 3
+
+    def test_selected_pages_are_grouped_into_runs(self):
+        """指定ページは連続した範囲ごとに描画する"""
+        calls = []
+        with patch.object(page_rasterizer, '_render', side_effect=_fake_render(calls)):
+            pages = [n for n, _ in page_rasterizer.iter_page_images('a.pdf', page_numbers=[7, 2, 3], memory_budget_mb=64)]
+
+        assert pages == [2, 3, 7]
+        assert [(first, last) for first, last, _ in calls] == [(2, 2), (3, 3), (7, 7)]
+
+
+class TestRasterSettings:
+    """raster_settingsのテストクラス"""
+
+    def test_defaults_and_overrides(self):
+        """ocr_dpiが0の場合は呼び出し側のデフォルトを使う"""
+        assert page_rasterizer.raster_settings({'ocr_dpi': 0}, default_dpi=300)['dpi'] == 300
+        assert page_rasterizer.raster_settings({'ocr_dpi': 150, 'ocr_memory_budget_mb': 64}) == \
+            {'dpi': 150, 'memory_budget_mb': 64}
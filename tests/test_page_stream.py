@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページストリーミング抽出のテスト
+PDFを一度だけ開き、ページ単位でテキストを返すことを確認する
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import page_stream
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+def _make_page(text, width=595.0, height=842.0, images=None):
+    page = MagicMock()
+    page.extract_text.return_value = text
+    page.chars = [{'text': c, 'fontname': 'MS-Mincho'} for c in text * 10]
+    page.images = images or []
+    page.width = width
+    page.height = height
+    return page
+
+
+def _make_pdf(pages):
+    pdf = MagicMock()
+    pdf.pages = pages
+    pdf.__enter__.return_value = pdf
+    pdf.__exit__.return_value = False
+    return pdf
+
+
+class TestIterPdfPages:
+    """iter_pdf_pagesのテストクラス"""
+
+    def test_opens_pdf_once_and_yields_pages_in_order(self):
+        """PDFを一度だけ開き、ページ順に結果を返す"""
+        pdf = _make_pdf([_make_page("請求書 1"), _make_page("請求書 2"), _make_page("請求書 3")])
+        fake_pdfplumber = MagicMock()
+        fake_pdfplumber.open.return_value = pdf
+
+        with patch.object(page_stream, 'pdfplumber', fake_pdfplumber, create=True), \
+                patch.object(page_stream, 'PDFPLUMBER_AVAILABLE', True):
+            pages = list(page_stream.iter_pdf_pages('dummy.pdf'))
+
+        assert fake_pdfplumber.open.call_count == 1
+        assert [p.page_number for p in pages] == [1, 2, 3]
+        assert all(p.page_count == 3 for p in pages)
+        assert pages[1].text == "請求書 2"
+        assert all(p.method == "pdfplumber" for p in pages)
+
+    def test_empty_page_uses_fallback_for_that_page_only(self):
+        """テキストが空のページだけフォールバック処理される"""
+        pdf = _make_pdf([_make_page("1ページ目"), _make_page("")])
+        fake_pdfplumber = MagicMock()
+        fake_pdfplumber.open.return_value = pdf
+
+        with patch.object(page_stream, 'pdfplumber', fake_pdfplumber, create=True), \
+                patch.object(page_stream, 'PDFPLUMBER_AVAILABLE', True), \
+                patch.object(page_stream, '_fallback_page_text', return_value=("OCRテキスト", "ocr_pytesseract")) as fallback:
+            pages = list(page_stream.iter_pdf_pages('dummy.pdf'))
+
+        assert fallback.call_count == 1
+        assert fallback.call_args[0][1] == 1  # 2ページ目（0始まりのインデックス）
+        assert pages[1].text == "OCRテキスト"
+        assert pages[1].method == "ocr_pytesseract"
+        assert pages[1].probe['backend'] == "ocr_pytesseract"
+
+    def test_scanned_page_goes_straight_to_ocr(self):
+        """スキャンページはpdfplumber/PyPDF2を試さずにOCRへ回す"""
+        scanned = _make_page("", images=[{'x0': 0, 'x1': 595, 'top': 0, 'bottom': 842}])
+        pdf = _make_pdf([scanned])
+        fake_pdfplumber = MagicMock()
+        fake_pdfplumber.open.return_value = pdf
+
+        with patch.object(page_stream, 'pdfplumber', fake_pdfplumber, create=True), \
+                patch.object(page_stream, 'PDFPLUMBER_AVAILABLE', True), \
+                patch.object(page_stream, '_fallback_page_text', return_value=("OCRテキスト", "ocr_pytesseract")) as fallback:
+            pages = list(page_stream.iter_pdf_pages('dummy.pdf'))
+
+        scanned.extract_text.assert_not_called()
+        assert fallback.call_args[0][3] == ["ocr_pytesseract", "pdfminer.six"]
+        assert pages[0].probe['reason'] == "scanned_image"
+
+    def test_text_layer_only_skips_ocr(self):
+        """text_layer_onlyの場合はOCRを行わず、スキャンページはテキストレイヤーも読まずに返す"""
+        scanned = _make_page("", images=[{'x0': 0, 'x1': 595, 'top': 0, 'bottom': 842}])
+        text_page = _make_page("請求書")
+        text_page.extract_text.return_value = ""
+        pdf = _make_pdf([scanned, text_page])
+        fake_pdfplumber = MagicMock()
+        fake_pdfplumber.open.return_value = pdf
+
+        with patch.object(page_stream, 'pdfplumber', fake_pdfplumber, create=True), \
+                patch.object(page_stream, 'PDFPLUMBER_AVAILABLE', True), \
+                patch.object(page_stream, '_fallback_page_text', return_value=("", "failed")) as fallback:
+            pages = list(page_stream.iter_pdf_pages('dummy.pdf', text_layer_only=True))
+
+        scanned.extract_text.assert_not_called()
+        assert (pages[0].text, pages[0].method) == ("", page_stream.BACKEND_OCR)
+        # テキストレイヤーのあるページはpdfplumber → PyPDF2の順に試す
+        assert fallback.call_count == 1
+        assert fallback.call_args[0][3] == ["PyPDF2"]
+
+    def test_selected_pages_only(self):
+        """page_numbersで指定したページだけを処理する"""
+        pdf = _make_pdf([_make_page("A"), _make_page("B"), _make_page("C")])
+        fake_pdfplumber = MagicMock()
+        fake_pdfplumber.open.return_value = pdf
+
+        with patch.object(page_stream, 'pdfplumber', fake_pdfplumber, create=True), \
+                patch.object(page_stream, 'PDFPLUMBER_AVAILABLE', True):
+            pages = list(page_stream.iter_pdf_pages('dummy.pdf', page_numbers=[3]))
+
+        assert [(p.page_number, p.text) for p in pages] == [(3, "C")]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLiteの永続キャッシュのテスト
+テーブルごとの独立性、サイズ上限での古い順の削除、削除にlast_accessのインデックスを使うことを確認する
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from sqlite_cache import SQLiteCache
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+class TestSQLiteCache:
+    """SQLiteCacheのテストクラス"""
+
+    def test_tables_in_same_file_are_independent(self, tmp_path):
+        """同じファイルでもテーブルが違えば別のキャッシュとして扱う"""
+        path = str(tmp_path / "cache.db")
+        first = SQLiteCache(path, 'first_cache', max_entries=1)
+        second = SQLiteCache(path, 'second_cache', max_entries=1)
+        first.set("k", 1)
+        second.set("k", 2)
+        second.set("other", 3)
+
+        assert first.get("k") == 1
+        assert second.get("k") is None
+        assert first.stats()['entries'] == 1
+
+    def test_max_bytes_evicts_oldest_until_under_limit(self, tmp_path):
+        """サイズの異なるエントリでも、上限に収まるまで最終アクセスが古いものから削除する"""
+        cache = SQLiteCache(str(tmp_path / "cache.db"), 'test_cache', max_bytes=200)
+        for index, length in enumerate((20, 90, 20, 20, 20)):
+            cache.set(f"k{index}", "x" * length)
+            time.sleep(0.01)
+        cache.get("k0")
+        time.sleep(0.01)
+        cache.set("k5", "y" * 90)
+
+        stats = cache.stats()
+        assert stats['bytes'] <= 200
+        assert cache.get("k1") is None
+        assert cache.get("k0") is not None
+        assert cache.get("k5") is not None
+
+    def test_eviction_uses_last_access_index(self, tmp_path):
+        """古い順の削除は全行を読み込まず、last_accessのインデックスを使う"""
+        cache = SQLiteCache(str(tmp_path / "cache.db"), 'test_cache')
+        plan = cache._connect().execute(
+            "EXPLAIN QUERY PLAN SELECT key FROM test_cache ORDER BY last_access ASC LIMIT 10"
+        ).fetchall()
+        assert any('idx_test_cache_last_access' in row[-1] for row in plan)
+
+    def test_invalid_table_name(self, tmp_path):
+        """テーブル名に使えない文字は拒否する"""
+        with pytest.raises(ValueError):
+            SQLiteCache(str(tmp_path / "cache.db"), 'cache; DROP TABLE x')
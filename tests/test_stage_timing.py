@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+処理段階ごとの時間計測のテスト
+段階ごとの時間の記録と合計、ヒストグラムの集計、1行のJSONのログ出力を確認する
+"""
+
+import os
+import sys
+import json
+import logging
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import stage_timing
+    from stage_timing import (STAGE_AMOUNT, STAGE_REQUEST, STAGE_TEXT, STAGE_TOTAL, Histogram,
+                              MetricsRegistry, StageTimer)
+    from page_pool import extract_page_fields
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def registry():
+    # Prometheusのヒストグラムは登録済みの名前と重複するため、テストでは使わない
+    registry = MetricsRegistry()
+    registry._prometheus = None
+    return registry
+
+
+class TestHistogram:
+    """Histogramのテストクラス"""
+
+    def test_buckets_and_quantiles(self):
+        """区切り以下の件数（累積）と分位点の推定値"""
+        histogram = Histogram((10, 100, 1000))
+        for value in (1, 5, 10, 50, 500, 5000):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        assert snapshot['count'] == 6
+        assert snapshot['buckets'] == {'le_10': 3, 'le_100': 4, 'le_1000': 5}
+        assert snapshot['p50_ms'] == 10.0
+        # 最大の区切りを超える場合は最大値
+        assert snapshot['p95_ms'] == 5000.0
+        assert snapshot['max_ms'] == 5000.0
+
+    def test_from_cumulative(self):
+        """全ワーカーを合算した累積件数から作ったヒストグラム（最大値は不明）"""
+        histogram = Histogram.from_cumulative((10, 100, 1000), [3, 4, 5], 6, 5566.0)
+        snapshot = histogram.snapshot()
+        assert snapshot['count'] == 6
+        assert snapshot['buckets'] == {'le_10': 3, 'le_100': 4, 'le_1000': 5}
+        assert snapshot['avg_ms'] == 927.7
+        assert snapshot['p50_ms'] == 10.0
+        assert snapshot['p95_ms'] is None
+        assert snapshot['max_ms'] is None
+
+
+class TestMetricsRegistry:
+    """MetricsRegistryのテストクラス"""
+
+    def test_histograms_per_labels(self, registry):
+        """段階・抽出方法・決済プロバイダーの組み合わせごとに集計する"""
+        registry.observe(STAGE_TEXT, 30.0, 'pdfplumber', 'paypal')
+        registry.observe(STAGE_TEXT, 40.0, 'pdfplumber', 'paypal')
+        registry.observe(STAGE_TEXT, 3000.0, 'ocr_pytesseract', 'paypal')
+        registry.observe(STAGE_AMOUNT, 1.0)
+        rows = {(row['stage'], row['method'], row['provider']): row for row in registry.snapshot()}
+        assert rows[(STAGE_TEXT, 'pdfplumber', 'paypal')]['count'] == 2
+        assert rows[(STAGE_TEXT, 'ocr_pytesseract', 'paypal')]['max_ms'] == 3000.0
+        assert rows[(STAGE_AMOUNT, 'unknown', 'unknown')]['count'] == 1
+
+        registry.reset()
+        assert registry.snapshot() == []
+
+
+class TestStageTimer:
+    """StageTimerのテストクラス"""
+
+    def test_span_and_record_accumulate(self, registry):
+        """同じ段階の時間は合計し、例外が発生したブロックの時間も記録する"""
+        timer = StageTimer(registry=registry)
+        timer.record(STAGE_AMOUNT, 1.5)
+        timer.record(STAGE_AMOUNT, 2.0)
+        with pytest.raises(ValueError):
+            with timer.span(STAGE_TEXT):
+                raise ValueError("抽出エラー")
+        timings = timer.as_dict()
+        assert timings[STAGE_AMOUNT] == 3.5
+        assert STAGE_TEXT in timings
+
+    def test_merge_counts_toward_total(self, registry):
+        """mergeで加えた時間（ワーカーで計測した時間など）は全体の時間にも含める"""
+        timer = StageTimer(registry=registry)
+        timer.merge({STAGE_TEXT: 1000.0, STAGE_AMOUNT: 20.0})
+        timings = timer.finish('page', 'invoice.pdf', method='pdfplumber', provider='stripe')
+        assert timings[STAGE_TOTAL] >= 1020.0
+        rows = {row['stage']: row for row in registry.snapshot()}
+        assert set(rows) == {STAGE_TEXT, STAGE_AMOUNT, STAGE_TOTAL}
+        assert all(row['method'] == 'pdfplumber' and row['provider'] == 'stripe' for row in rows.values())
+
+    def test_finish_logs_one_json_line(self, registry, caplog):
+        """finishは段階ごとの時間を1行のJSONでログに出力する"""
+        timer = StageTimer(provider='paypal', registry=registry)
+        timer.record(STAGE_AMOUNT, 2.25)
+        with caplog.at_level(logging.INFO, logger=stage_timing.logger.name):
+            timings = timer.finish('request', '請求書.pdf', method='pdfplumber', total_stage=STAGE_REQUEST)
+        records = [json.loads(record.getMessage()) for record in caplog.records
+                   if record.name == stage_timing.logger.name]
+        assert records == [{
+            'event': 'request',
+            'filename': '請求書.pdf',
+            'method': 'pdfplumber',
+            'provider': 'paypal',
+            'timings': timings,
+        }]
+        assert STAGE_REQUEST in timings and STAGE_TOTAL not in timings
+
+    def test_result_labels(self):
+        """1リクエスト全体のラベルは最初に見つかった抽出方法と決済プロバイダー"""
+        results = [
+            {'page': 1, 'success': False, 'error': 'エラー'},
+            {'extraction_method': 'ocr_pytesseract', 'provider': None},
+            {'extraction_method': 'pdfplumber', 'provider': 'paypal'},
+        ]
+        assert stage_timing.result_labels(results) == ('ocr_pytesseract', 'paypal')
+        assert stage_timing.result_labels([]) == (None, None)
+
+    def test_combined_method_is_bucketed(self, registry):
+        """組み合わせた抽出方法は最初の方法のラベルにまとめる"""
+        results = [{'extraction_method': 'pdfplumber+ocr_pytesseract', 'provider': 'stripe'}]
+        assert stage_timing.result_labels(results) == ('pdfplumber', 'stripe')
+        registry.observe(STAGE_TEXT, 10.0, 'pdfplumber+ocr_pytesseract', 'stripe')
+        registry.observe(STAGE_TEXT, 20.0, 'pdfplumber', 'stripe')
+        assert [(row['method'], row['count']) for row in registry.snapshot()] == [('pdfplumber', 2)]
+
+
+class TestScrapeAllowed:
+    """scrape_allowedのテストクラス"""
+
+    def test_bearer_token(self):
+        """設定のトークンと一致するBearerトークンは許可する"""
+        config = {'metrics_token': 's3cret', 'metrics_allowed_ips': []}
+        assert stage_timing.scrape_allowed(config, 'Bearer s3cret', '203.0.113.5')
+        assert not stage_timing.scrape_allowed(config, 'Bearer wrong', '203.0.113.5')
+        assert not stage_timing.scrape_allowed(config, None, '203.0.113.5')
+        # トークンが未設定の場合は空のトークンでも許可しない
+        assert not stage_timing.scrape_allowed({'metrics_token': ''}, 'Bearer ', '203.0.113.5')
+
+    def test_allowed_ips(self):
+        """接続元がmetrics_allowed_ips（アドレスまたはCIDR、カンマ区切りの文字列も可）に含まれる場合は許可する"""
+        config = {'metrics_allowed_ips': ['127.0.0.1', '10.0.0.0/8']}
+        assert stage_timing.scrape_allowed(config, None, '127.0.0.1')
+        assert stage_timing.scrape_allowed(config, None, '10.1.2.3')
+        assert not stage_timing.scrape_allowed(config, None, '192.168.0.1')
+        assert stage_timing.scrape_allowed({'metrics_allowed_ips': '::1, 192.168.0.0/24'}, None, '192.168.0.9')
+        assert not stage_timing.scrape_allowed({}, None, '127.0.0.1')
+
+
+class TestPageFieldTimings:
+    """ワーカーでの顧客名・金額抽出の時間のテストクラス"""
+
+    def test_extract_page_fields_reports_timings(self):
+        """抽出結果に顧客名・金額抽出の時間を含める"""
+        fields = extract_page_fields("山田太郎 様\nご請求金額 10,000円", "invoice.pdf")
+        assert fields['amount'] is not None
+        assert set(fields['timings']) == {stage_timing.STAGE_CUSTOMER, STAGE_AMOUNT}
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+テキストレイヤー判定のテスト
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# パスの設定
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from text_probe import probe_page, BACKEND_OCR, BACKEND_PDFPLUMBER, BACKEND_PYPDF2
+except ImportError as e:
+    pytest.skip(f"Required modules not available: {e}", allow_module_level=True)
+
+
+def _page(chars="", images=None, width=600, height=800):
+    return SimpleNamespace(
+        chars=[{'text': c, 'fontname': 'F1'} for c in chars],
+        images=images or [],
+        width=width,
+        height=height,
+    )
+
+
+class TestProbePage:
+    """probe_pageのテストクラス"""
+
+    def test_text_layer(self):
+        """通常のテキストPDFはpdfplumberを選ぶ"""
+        result = probe_page(_page("ご請求金額 10,000円 山田太郎様"))
+        assert result.backend == BACKEND_PDFPLUMBER
+        assert result.reason == "text_layer"
+        assert result.font_count == 1
+
+    def test_scanned_page(self):
+        """画像だけのページはOCRを選ぶ"""
+        result = probe_page(_page("", images=[{'x0': 0, 'x1': 600, 'top': 0, 'bottom': 800}]))
+        assert result.backend == BACKEND_OCR
+        assert result.image_coverage == 1.0
+
+    def test_garbled_text_layer(self):
+        """cid参照ばかりのテキストはPyPDF2を選ぶ"""
+        page = _page()
+        page.chars = [{'text': '(cid:12)', 'fontname': 'F1'}] * 20
+        result = probe_page(page)
+        assert result.backend == BACKEND_PYPDF2
+        assert result.garbled_ratio == 1.0
+
+    def test_blank_page(self):
+        """文字も画像もないページはOCRを選ぶ"""
+        assert probe_page(_page()).backend == BACKEND_OCR
+
+    def test_image_coverage_is_clipped_to_page(self):
+        """ページ外にはみ出した画像は占有率を1.0以下に抑える"""
+        result = probe_page(_page("", images=[{'x0': -100, 'x1': 900, 'top': -100, 'bottom': 1000}]))
+        assert result.image_coverage == 1.0
@@ -1,6 +1,26 @@
 import re
 import unicodedata
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+class _UnreadableFilter(dict):
+    """
+    str.translate用の変換表: 読めない文字（�と制御文字などCで始まるUnicodeカテゴリ）を削除する
+    文字ごとのカテゴリの判定は初めて出てきた時に1回だけ行い、結果を変換表に追加する
+    """
+    
+    def __missing__(self, code):
+        ch = chr(code)
+        if ch == '�' or unicodedata.category(ch).startswith('C'):
+            self[code] = None
+        else:
+            self[code] = code
+        return self[code]
+
+
+# 読める文字数は len(text.translate(_UNREADABLE)) で数える
+_UNREADABLE = _UnreadableFilter()
+_NUMBER_RE = re.compile(r'[0-9,]+')
+
 
 class TextNormalizer:
     """
@@ -24,6 +44,48 @@ class TextNormalizer:
             r'\u3000': ' ',  # 全角スペース
             r'\ufffd': '',  # Unicode REPLACEMENT CHARACTER
         }
+        
+        # 高速化用の変換表（1文字単位の文字化け置換と全角→半角変換をまとめたもの）
+        self._build_fast_path()
+    
+    def _build_fast_path(self):
+        """
+        normalizeの高速化用に、1文字単位の文字化け置換と全角→半角変換を合成した変換表を作る
+        変換表で従来の置換（replaceの繰り返し）と同じ結果にならない設定の場合は高速化しない
+        """
+        self._fast_table = None
+        self._fast_guard = frozenset()
+        
+        single = [(k, v) for k, v in self.mojibake_patterns.items() if len(k) == 1]
+        deleted = {k for k, v in single if v == ''}
+        # 置換済みの文字だけからなる複数文字のパターン（'��'など）は一致しないため無視できる
+        multi = [k for k in self.mojibake_patterns if len(k) > 1 and not set(k) <= deleted]
+        if any(len(zen) != 1 for zen in self.zen_han_map):
+            return
+        
+        def convert(ch):
+            # 文字化け置換 → 全角→半角変換を従来と同じ順に1文字へ適用する
+            for pattern, replacement in single:
+                ch = ch.replace(pattern, replacement)
+            for zen, han in self.zen_han_map.items():
+                ch = ch.replace(zen, han)
+            return ch
+        
+        table = {}
+        for ch in set(k for k, _ in single) | set(self.zen_han_map):
+            converted = convert(ch)
+            if converted != ch:
+                table[ord(ch)] = converted
+        outputs = ''.join(table.values())
+        
+        # 複数文字のパターンは従来どおりreplaceで処理する必要があるため、その先頭文字を含むテキストは従来の処理に回す
+        # 認識不能文字（�）が残る場合は行ごとの修復処理が必要になるため高速化しない
+        # 変換後の文字が再び変換されないこと（変換表を1文字ずつ順に適用しても同時に適用した場合と同じになること）も条件とする
+        guard = frozenset(k[0] for k in multi)
+        if '�' in outputs or '�' not in deleted or guard & set(outputs) or set(map(chr, table)) & set(outputs):
+            return
+        self._fast_table = [(chr(code), converted) for code, converted in table.items()]
+        self._fast_guard = guard
     
     def normalize_spaces(self, text: str) -> str:
         """空白の正規化（連続スペースの単一化など）"""
@@ -85,6 +147,21 @@ class TextNormalizer:
         """テキストの総合的な正規化処理"""
         if not text:
             return ""
+        
+        if self._fast_table is not None and not any(ch in text for ch in self._fast_guard):
+            # 文字化け対応と全角→半角変換は合成した変換表の文字だけを置換する
+            # （日本語を含むテキストではstr.translateは1文字ずつ辞書を引くため、含まれる文字だけのreplaceの方が速い）
+            for ch, converted in self._fast_table:
+                if ch in text:
+                    text = text.replace(ch, converted)
+            # 空白の連続を1つにまとめて前後の空白を除く（normalize_spacesの2回の正規表現と同じ結果）
+            return ' '.join(text.split())
+        return self._normalize_slow(text)
+    
+    def _normalize_slow(self, text: str) -> str:
+        """従来の手順での正規化（変換表で処理できない場合に使用）"""
+        if not text:
+            return ""
             
         # 1. 文字化け対応
         text = self.remove_mojibake(text)
@@ -109,21 +186,23 @@ class TextNormalizer:
         readable_lines = []
         all_numbers = []
         
+        total_readable = 0
+        
         for line in lines:
             # 行の半分以上が読める文字であれば追加
-            readable_chars = sum(1 for c in line if c != '�' and (not unicodedata.category(c).startswith('C')))
+            readable_chars = len(line.translate(_UNREADABLE))
+            total_readable += readable_chars
             if readable_chars > len(line) / 2:
                 readable_lines.append(line)
                 
             # 数値を抽出（金額として使える可能性あり）
-            numbers = re.findall(r'[0-9,]+', line)
+            numbers = _NUMBER_RE.findall(line)
             if numbers:
                 all_numbers.extend(numbers)
                 
-        # 読める文字の割合を計算
+        # 読める文字の割合を計算（改行は制御文字のため、行ごとの読める文字数の合計と同じ）
         total_chars = len(text) if text else 1
-        readable_chars = sum(1 for c in text if c != '�' and (not unicodedata.category(c).startswith('C')))
-        readable_ratio = readable_chars / total_chars
+        readable_ratio = total_readable / total_chars
         
         return {
             "text": '\n'.join(readable_lines),
@@ -142,3 +221,99 @@ def normalize_text(text: str) -> str:
 def extract_readable_content(text: str) -> Dict[str, Any]:
     """文字化けテキストから読める部分を抽出するユーティリティ関数"""
     return normalizer.extract_readable_text(text)
+
+
+class NormalizedDocument:
+    """
+    1ページ分のテキストの正規化結果
+    ページごとに1回だけ作り、金額抽出・顧客名抽出の各処理に渡して共有する
+    各値は最初に使われた時に1回だけ計算する（金額抽出のように行分割だけを使う処理では正規化を行わない）
+    layoutにはpdfplumberで抽出したページの単語の位置（page_layout.PageLayout）を指定できる
+    """
+
+    def __init__(self, raw: str, layout=None):
+        self.raw = raw or ""
+        self.layout = layout  # page_layout.PageLayout（テキストレイヤーのないページなどではNone）
+        self._lines = None
+        self._line_spans = None
+        self._normalized = None
+        self._readable = None
+        self._readable_normalized = None
+        self._token_cache = {}  # extraction_engine.TokenStreamの走査結果（ページ内の抽出処理で共有する）
+
+    @property
+    def lines(self) -> List[str]:
+        """元のテキストの行"""
+        if self._lines is None:
+            self._lines = self.raw.split('\n')
+        return self._lines
+
+    @property
+    def line_spans(self) -> List[Tuple[int, int]]:
+        """各行の元のテキスト上の範囲（開始位置, 終了位置）"""
+        if self._line_spans is None:
+            spans = []
+            start = 0
+            for line in self.lines:
+                spans.append((start, start + len(line)))
+                start += len(line) + 1
+            self._line_spans = spans
+        return self._line_spans
+
+    @property
+    def normalized(self) -> str:
+        """元のテキストを正規化したもの（normalize_text）"""
+        if self._normalized is None:
+            self._normalized = normalizer.normalize(self.raw)
+        return self._normalized
+
+    @property
+    def readable_content(self) -> Dict[str, Any]:
+        """読める部分の抽出結果（extract_readable_contentと同じ辞書）"""
+        if self._readable is None:
+            self._readable = normalizer.extract_readable_text(self.raw)
+        return self._readable
+
+    @property
+    def readable_ratio(self) -> float:
+        """読める文字の割合"""
+        return self.readable_content["readable_ratio"]
+
+    @property
+    def numbers(self) -> List[str]:
+        """各行の数値トークン（[0-9,]+）"""
+        return self.readable_content["numbers"]
+
+    @property
+    def readable_normalized(self) -> str:
+        """読める行だけを正規化したもの"""
+        if self._readable_normalized is None:
+            self._readable_normalized = normalizer.normalize(self.readable_content["text"])
+        return self._readable_normalized
+
+    @property
+    def is_garbled(self) -> bool:
+        """読める文字が50%未満か"""
+        return self.readable_ratio < 0.5
+
+    @property
+    def clean_text(self) -> str:
+        """抽出に使うテキスト（文字化けしている場合は読める行だけ、それ以外は正規化したテキスト）"""
+        return self.readable_content["text"] if self.is_garbled else self.normalized
+
+    @property
+    def source_text(self) -> str:
+        """元のテキスト（文字化けしている場合は読める行だけ）"""
+        return self.readable_content["text"] if self.is_garbled else self.raw
+
+    @property
+    def source_normalized(self) -> str:
+        """source_textを正規化したもの"""
+        return self.readable_normalized if self.is_garbled else self.normalized
+
+
+def as_document(text: Union[str, NormalizedDocument, None]) -> NormalizedDocument:
+    """テキストまたはNormalizedDocumentをNormalizedDocumentにする（作成済みのものはそのまま使う）"""
+    if isinstance(text, NormalizedDocument):
+        return text
+    return NormalizedDocument(text)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+テキストレイヤー判定モジュール
+ページの文字数・フォント・画像の占有率を軽く調べ、どの抽出方法を使うべきかを1つ選ぶ
+（pdfplumber → PyPDF2 → OCR → ... の順に全て試すカスケードを避けるため）
+"""
+
+import logging
+from typing import Any, Dict, NamedTuple
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 判定結果として返す抽出方法（extract_text_from_pdfのmethod名と同じ）
+BACKEND_PDFPLUMBER = "pdfplumber"
+BACKEND_PYPDF2 = "PyPDF2"
+BACKEND_OCR = "ocr_pytesseract"
+
+# テキストレイヤーありと判定する最小文字数
+MIN_TEXT_CHARS = 10
+# 文字化け（cid参照・置換文字）の割合がこれ以上ならpdfplumberのテキストは使わない
+MAX_GARBLED_RATIO = 0.3
+# 画像の占有率がこれ以上ならスキャンページとみなす
+MIN_SCAN_IMAGE_COVERAGE = 0.3
+
+
+class ProbeResult(NamedTuple):
+    """ページ判定の結果"""
+    backend: str
+    char_count: int
+    font_count: int
+    garbled_ratio: float
+    image_coverage: float
+    reason: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def _image_coverage(page) -> float:
+    """ページ面積に対する画像の占有率（0.0〜1.0）"""
+    page_area = float(page.width) * float(page.height)
+    if page_area <= 0:
+        return 0.0
+
+    covered = 0.0
+    for image in page.images:
+        width = max(0.0, min(float(image['x1']), float(page.width)) - max(float(image['x0']), 0.0))
+        height = max(0.0, min(float(image['bottom']), float(page.height)) - max(float(image['top']), 0.0))
+        covered += width * height
+    return min(1.0, covered / page_area)
+
+
+def probe_page(page) -> ProbeResult:
+    """
+    pdfplumberのページを調べ、使うべき抽出方法を判定する
+
+    Args:
+        page: pdfplumberのPageオブジェクト
+
+    Returns:
+        ProbeResult: 判定結果（backendに抽出方法名）
+    """
+    chars = page.chars
+    char_count = 0
+    garbled = 0
+    fonts = set()
+    for char in chars:
+        text = char.get('text', '')
+        if not text or text.isspace():
+            continue
+        char_count += 1
+        fonts.add(char.get('fontname', ''))
+        if text.startswith('(cid:') or text == '�':
+            garbled += 1
+
+    garbled_ratio = garbled / char_count if char_count else 0.0
+    coverage = _image_coverage(page)
+
+    if char_count >= MIN_TEXT_CHARS and garbled_ratio < MAX_GARBLED_RATIO:
+        backend, reason = BACKEND_PDFPLUMBER, "text_layer"
+    elif char_count >= MIN_TEXT_CHARS:
+        # ToUnicodeのないフォントなど。PyPDF2は別のデコード処理を持つので先に試す
+        backend, reason = BACKEND_PYPDF2, "garbled_text_layer"
+    elif coverage >= MIN_SCAN_IMAGE_COVERAGE:
+        backend, reason = BACKEND_OCR, "scanned_image"
+    elif char_count > 0:
+        backend, reason = BACKEND_PDFPLUMBER, "sparse_text_layer"
+    else:
+        # テキストも画像もない（アウトライン化された文字など）
+        backend, reason = BACKEND_OCR, "no_text_layer"
+
+    return ProbeResult(
+        backend=backend,
+        char_count=char_count,
+        font_count=len(fonts),
+        garbled_ratio=round(garbled_ratio, 3),
+        image_coverage=round(coverage, 3),
+        reason=reason,
+    )
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ノード単位のワーカー数の配分モジュール
+ページ処理のプロセスプール（page_pool）と常駐OCRワーカー（ocr_pool）はgunicornのワーカーごとに作られるため、
+ワーカー数を省略した場合はCPUコア数をgunicornのワーカー数（環境変数WEB_CONCURRENCY）で割った数にし、
+ノード全体でCPUコア数を超えるプロセスを起動しないようにする
+"""
+
+import os
+import logging
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+
+def web_workers() -> int:
+    """同じノードで動くgunicornのワーカー数（WEB_CONCURRENCY。未設定・不正な場合は1）"""
+    try:
+        return max(1, int(os.environ.get('WEB_CONCURRENCY') or 1))
+    except ValueError:
+        logger.warning(f"WEB_CONCURRENCYを整数に変換できませんでした: {os.environ.get('WEB_CONCURRENCY')}")
+        return 1
+
+
+def per_web_worker(workers: int = 0) -> int:
+    """
+    gunicornのワーカー1つあたりのプロセス数を決める
+
+    Args:
+        workers: 設定されたプロセス数（0以下の場合はCPUコア数 // gunicornのワーカー数）
+
+    Returns:
+        int: プロセス数（1以上）
+    """
+    if workers > 0:
+        return workers
+    return max(1, (os.cpu_count() or 1) // web_workers())